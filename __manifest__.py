@@ -1,6 +1,6 @@
 {
     'name': 'Nómina Colombiana',
-    'version': '18.0.0.0.0',
+    'version': '18.0.1.0.0',
     'category': 'Human Resources/Payroll',
     'sequence': 38,
     'summary': 'Gestión de nómina para Colombia con todas las prestaciones y requisitos legales',
@@ -45,6 +45,8 @@
         'data/hr_payroll_structure_data.xml',
         'data/hr_contract_type_data.xml',
         'data/res_partner_bank_data.xml',
+        'data/ir_cron_data.xml',
+        'data/hr_payroll_legal_parameter_data.xml',
         
         # Vistas
         'views/hr_employee_views.xml',
@@ -53,8 +55,14 @@
         'views/hr_payslip_run_views.xml',
         'views/hr_salary_rule_views.xml',
         'views/hr_electronic_payroll_views.xml',
+        'views/hr_electronic_payroll_outbox_views.xml',
+        'views/hr_electronic_payroll_number_views.xml',
         'views/hr_pila_views.xml',
+        'views/hr_payroll_legal_parameter_views.xml',
+        'views/hr_payroll_run_metrics_views.xml',
+        'views/hr_payroll_rule_profile_views.xml',
         'views/res_config_settings_views.xml',
+        'views/res_partner_views.xml',
         'views/hr_payroll_report_views.xml',
         'views/menu_views.xml',
         
@@ -0,0 +1,86 @@
+import logging
+
+from odoo import api, SUPERUSER_ID
+
+_logger = logging.getLogger(__name__)
+
+TRANSPORT_CONDITION = "result = contract.wage <= legal['transport_max_smmlv'] * legal['smmlv']"
+PARAFISCAL_CONDITION = ("result = not contract.parafiscal_exempt or "
+                        "contract.wage >= legal['exemption_max_smmlv'] * legal['smmlv']")
+
+# Valores de las reglas noupdate que cambiaron con los parámetros legales por
+# año, el motor nativo y la exoneración de SENA/ICBF
+UPDATED_RULES = {
+    'hr_salary_rule_basic_col': {},
+    'hr_salary_rule_transport_col': {
+        'condition_select': 'python',
+        'condition_python': TRANSPORT_CONDITION,
+        'amount_select': 'code',
+        'amount_python_compute': "result = legal['transport_allowance']",
+    },
+    'hr_salary_rule_he_diurna_col': {},
+    'hr_salary_rule_health_col': {
+        'amount_select': 'code',
+        'amount_python_compute': "result = -contract.wage * legal['health_employee_rate'] / 100.0",
+    },
+    'hr_salary_rule_pension_col': {
+        'amount_select': 'code',
+        'amount_python_compute': "result = -contract.wage * legal['pension_employee_rate'] / 100.0",
+    },
+    'hr_salary_rule_prima_prov_col': {},
+    'hr_salary_rule_cesantias_prov_col': {},
+    'hr_salary_rule_int_cesantias_prov_col': {},
+    'hr_salary_rule_vacaciones_prov_col': {},
+    'hr_salary_rule_sena_col': {
+        'condition_select': 'python',
+        'condition_python': PARAFISCAL_CONDITION,
+        'amount_select': 'code',
+        'amount_python_compute': "result = categories.GROSS * legal['sena_rate'] / 100.0",
+    },
+    'hr_salary_rule_icbf_col': {
+        'condition_select': 'python',
+        'condition_python': PARAFISCAL_CONDITION,
+        'amount_select': 'code',
+        'amount_python_compute': "result = categories.GROSS * legal['icbf_rate'] / 100.0",
+    },
+    'hr_salary_rule_ccf_col': {
+        'amount_select': 'code',
+        'amount_python_compute': "result = categories.GROSS * legal['ccf_rate'] / 100.0",
+    },
+    'hr_salary_rule_net_col': {},
+}
+
+UPDATED_STRUCTURES = [
+    'hr_payroll_structure_col_standard',
+    'hr_payroll_structure_col_integral',
+]
+
+
+def migrate(cr, version):
+    """
+    Aplica a las reglas y estructuras noupdate los valores actuales del módulo
+
+    Los datos de reglas salariales son noupdate y no se recargan en la
+    actualización: sin este paso el código que usa los parámetros legales por
+    año, el motor nativo y las condiciones de exoneración de SENA/ICBF no
+    llegarían a las bases de datos existentes. La regla ARL es nueva y se crea
+    al cargar los datos; aquí solo se agrega a las estructuras.
+    """
+    if not version:
+        return
+    env = api.Environment(cr, SUPERUSER_ID, {})
+
+    for xmlid, values in UPDATED_RULES.items():
+        rule = env.ref('nomina_colombia.%s' % xmlid, raise_if_not_found=False)
+        if rule:
+            rule.write(dict(values, compute_engine='native'))
+
+    arl_rule = env.ref('nomina_colombia.hr_salary_rule_arl_col', raise_if_not_found=False)
+    if arl_rule:
+        for xmlid in UPDATED_STRUCTURES:
+            structure = env.ref('nomina_colombia.%s' % xmlid, raise_if_not_found=False)
+            if structure:
+                structure.write({'rule_ids': [(4, arl_rule.id)]})
+
+    _logger.info("nomina_colombia: %s reglas y %s estructuras actualizadas",
+                 len(UPDATED_RULES), len(UPDATED_STRUCTURES))
@@ -1,8 +1,17 @@
 
 from . import hr_employee
 from . import hr_employee_family
+from . import hr_payroll_legal_parameter
+from . import hr_payroll_run_metrics
+from . import hr_payroll_rule_profile
+from . import hr_payroll_benchmark
 from . import hr_contract
+from . import hr_salary_rule
 from . import hr_payslip
+from . import hr_payslip_run
 from . import hr_electronic_payroll
+from . import hr_electronic_payroll_outbox
+from . import hr_electronic_payroll_numbering
 from . import hr_pila
+from . import res_partner
 from . import res_config_settings
\ No newline at end of file
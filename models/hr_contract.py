@@ -1,327 +1,339 @@
+from dateutil.relativedelta import relativedelta
+
 from odoo import models, fields, api, _
-from odoo.exceptions import ValidationError
-
-# Campos específicos para contratos colombianos
-contract_type_id = fields.Many2one(
-    'hr.contract.type', string='Tipo de Contrato',
-    tracking=True, help='Tipo de contrato según la legislación colombiana')
-
-# Término del contrato
-contract_term = fields.Selection([
-    ('fijo', 'Término Fijo'),
-    ('indefinido', 'Término Indefinido'),
-    ('obra_labor', 'Obra o Labor'),
-    ('aprendizaje', 'Aprendizaje'),
-    ('practicas', 'Prácticas'),
-], string='Término del Contrato', default='indefinido', required=True, tracking=True)
-
-# Duración en meses (para contratos a término fijo)
-duration_months = fields.Integer(
-    string='Duración (Meses)', 
-    tracking=True,
-    help='Duración del contrato en meses (solo para contratos a término fijo)')
-
-# Campos para prórrogas
-has_extension = fields.Boolean(string='Tiene Prórroga', tracking=True)
-extension_count = fields.Integer(string='Número de Prórrogas', default=0, tracking=True)
-extension_date = fields.Date(string='Fecha de Prórroga', tracking=True)
-
-# Periodo de prueba
-trial_period_months = fields.Integer(
-    string='Periodo de Prueba (Meses)', 
-    default=2,
-    tracking=True,
-    help='Duración del periodo de prueba en meses')
-trial_date_end = fields.Date(
-    string='Fin del Periodo de Prueba', 
-    compute='_compute_trial_date_end', 
-    store=True,
-    tracking=True)
-
-# Campos para salario
-wage_type = fields.Selection([
-    ('integral', 'Salario Integral'),
-    ('ordinary', 'Salario Ordinario'),
-], string='Tipo de Salario', default='ordinary', required=True, tracking=True)
-
-integral_factor = fields.Float(
-    string='Factor Salarial Integral', 
-    default=70.0,
-    help='Porcentaje del salario que corresponde a la parte fija (mínimo 70%)',
-    tracking=True)
-
-# Campos para subsidios y beneficios
-transport_allowance = fields.Boolean(
-    string='Auxilio de Transporte', 
-    default=True,
-    tracking=True,
-    help='Indica si el empleado tiene derecho al auxilio de transporte')
-
-food_allowance = fields.Monetary(
-    string='Auxilio de Alimentación', 
-    default=0.0,
-    tracking=True,
-    help='Valor mensual del auxilio de alimentación')
-
-# Campos para deducciones voluntarias
-voluntary_pension = fields.Monetary(
-    string='Pensión Voluntaria', 
-    default=0.0,
-    tracking=True,
-    help='Aporte mensual a pensión voluntaria')
-
-voluntary_afc = fields.Monetary(
-    string='Ahorro AFC', 
-    default=0.0,
-    tracking=True,
-    help='Aporte mensual a cuenta AFC')
-
-# Campos para retención en la fuente
-withholding_method = fields.Selection([
-    ('fixed', 'Fijo'),
-    ('table', 'Tabla'),
-    ('percentage', 'Porcentaje'),
-    ('none', 'No Aplica'),
-], string='Método de Retención', default='table', required=True, tracking=True)
-
-withholding_percentage = fields.Float(
-    string='Porcentaje de Retención', 
-    default=0.0,
-    tracking=True,
-    help='Porcentaje de retención en la fuente (si el método es porcentaje)')
-
-withholding_fixed = fields.Monetary(
-    string='Valor Fijo de Retención', 
-    default=0.0,
-    tracking=True,
-    help='Valor fijo de retención en la fuente (si el método es fijo)')
-
-# Campos para procedimiento 1 o 2 de retención
-withholding_procedure = fields.Selection([
-    ('1', 'Procedimiento 1'),
-    ('2', 'Procedimiento 2'),
-], string='Procedimiento de Retención', default='2', tracking=True)
-
-# Campos para exenciones de retención
-exempt_income_percentage = fields.Float(
-    string='Porcentaje de Renta Exenta', 
-    default=25.0,
-    tracking=True,
-    help='Porcentaje de salario considerado como renta exenta (máximo 25%)')
-
-dependents = fields.Boolean(
-    string='Tiene Dependientes', 
-    default=False,
-    tracking=True,
-    help='Indica si el empleado tiene dependientes para efectos de retención')
-
-# Campos para horas extra y recargos
-has_overtime = fields.Boolean(
-    string='Maneja Horas Extra', 
-    default=True,
-    tracking=True,
-    help='Indica si el contrato permite el pago de horas extra')
-
-# Campos para liquidación
-severance_base = fields.Selection([
-    ('all', 'Salario + Todo lo Constitutivo'),
-    ('wage', 'Solo Salario Básico'),
-    ('legal', 'Según Definición Legal'),
-], string='Base para Cesantías', default='legal', required=True, tracking=True)
-
-# Campos para vacaciones
-vacation_days = fields.Integer(
-    string='Días de Vacaciones por Año', 
-    default=15,
-    tracking=True,
-    help='Días de vacaciones a los que tiene derecho por año')
-
-# Campos para nómina electrónica
-electronic_payroll_code = fields.Char(
-    string='Código para Nómina Electrónica', 
-    copy=False,
-    tracking=True)
-
-# Campos para dotación
-clothing_allowance = fields.Boolean(
-    string='Derecho a Dotación', 
-    default=True,
-    tracking=True,
-    help='Indica si el empleado tiene derecho a dotación')
-
-# Campos para jornada laboral
-schedule_pay = fields.Selection(
-    selection_add=[('biweekly', 'Quincenal')],
-    default='monthly',
-    tracking=True)
-
-work_hours_per_day = fields.Float(
-    string='Horas de Trabajo por Día', 
-    default=8.0,
-    tracking=True,
-    help='Número de horas de trabajo por día')
-
-# Campos para estructura salarial
-struct_id = fields.Many2one(
-    'hr.payroll.structure', 
-    string='Estructura Salarial',
-    tracking=True,
-    domain="['|', ('company_id', '=', False), ('company_id', '=', company_id)]")
-
-# Campos para riesgos laborales
-risk_level = fields.Selection([
-    ('1', 'I - Riesgo Mínimo (0.522%)'),
-    ('2', 'II - Riesgo Bajo (1.044%)'),
-    ('3', 'III - Riesgo Medio (2.436%)'),
-    ('4', 'IV - Riesgo Alto (4.350%)'),
-    ('5', 'V - Riesgo Máximo (6.960%)'),
-], string='Nivel de Riesgo ARL', default='1', tracking=True)
-
-# Campos para firma del contrato
-signed_contract = fields.Boolean(string='Contrato Firmado', default=False, tracking=True)
-signed_date = fields.Date(string='Fecha de Firma', tracking=True)
-
-# Campos para documentos relacionados
-document_ids = fields.One2many(
-    'ir.attachment', 
-    'res_id', 
-    domain=[('res_model', '=', 'hr.contract')],
-    string='Documentos', 
-    help='Documentos relacionados con el contrato')
-
-document_count = fields.Integer(
-    compute='_compute_document_count', 
-    string='Número de Documentos')
-
-# Campos para historial de cambios salariales
-wage_history_ids = fields.One2many(
-    'hr.contract.wage.history', 
-    'contract_id', 
-    string='Historial de Salarios')
-
-# Campos para integración con work entries (nuevo en v18)
-work_entry_source = fields.Selection(
-    selection_add=[('co_attendance', 'Asistencia Colombia')],
-    tracking=True)
-
-# Campos para manejo de incapacidades
-disability_deduction = fields.Selection([
-    ('company', 'Asume la Empresa'),
-    ('eps', 'Asume la EPS'),
-    ('mixed', 'Mixto según normativa'),
-], string='Deducción por Incapacidad', default='mixed', tracking=True)
-
-# Campos para manejo de licencias
-maternity_leave_days = fields.Integer(
-    string='Días de Licencia de Maternidad', 
-    default=126,
-    tracking=True,
-    help='Días de licencia de maternidad según la ley colombiana')
-
-paternity_leave_days = fields.Integer(
-    string='Días de Licencia de Paternidad', 
-    default=8,
-    tracking=True,
-    help='Días de licencia de paternidad según la ley colombiana')
-
-# Métodos computados
-@api.depends('date_start', 'trial_period_months')
-def _compute_trial_date_end(self):
-    for contract in self:
-        if contract.date_start and contract.trial_period_months:
-            contract.trial_date_end = contract.date_start + relativedelta(months=contract.trial_period_months)
-        else:
-            contract.trial_date_end = False
-
-def _compute_document_count(self):
-    for contract in self:
-        contract.document_count = self.env['ir.attachment'].search_count([
-            ('res_model', '=', 'hr.contract'),
-            ('res_id', '=', contract.id)
-        ])
-
-# Restricciones y validaciones
-@api.constrains('wage', 'wage_type', 'integral_factor')
-def _check_wage(self):
-    for contract in self:
-        if contract.wage_type == 'integral':
-            # Verificar que el salario integral sea al menos 10 SMMLV
-            min_wage = self.env['ir.config_parameter'].sudo().get_param('hr_payroll.minimum_wage', 1000000)
-            min_wage_float = float(min_wage)
-            if contract.wage < (min_wage_float * 10):
-                raise ValidationError(_('El salario integral debe ser al menos 10 veces el salario mínimo.'))
+from odoo.exceptions import UserError, ValidationError
+
+
+class HrContract(models.Model):
+    _inherit = 'hr.contract'
+
+    # Campos específicos para contratos colombianos
+    contract_type_id = fields.Many2one(
+        'hr.contract.type', string='Tipo de Contrato',
+        tracking=True, help='Tipo de contrato según la legislación colombiana')
+
+    # Término del contrato
+    contract_term = fields.Selection([
+        ('fijo', 'Término Fijo'),
+        ('indefinido', 'Término Indefinido'),
+        ('obra_labor', 'Obra o Labor'),
+        ('aprendizaje', 'Aprendizaje'),
+        ('practicas', 'Prácticas'),
+    ], string='Término del Contrato', default='indefinido', required=True, tracking=True)
+
+    # Duración en meses (para contratos a término fijo)
+    duration_months = fields.Integer(
+        string='Duración (Meses)', 
+        tracking=True,
+        help='Duración del contrato en meses (solo para contratos a término fijo)')
+
+    # Campos para prórrogas
+    has_extension = fields.Boolean(string='Tiene Prórroga', tracking=True)
+    extension_count = fields.Integer(string='Número de Prórrogas', default=0, tracking=True)
+    extension_date = fields.Date(string='Fecha de Prórroga', tracking=True)
+
+    # Periodo de prueba
+    trial_period_months = fields.Integer(
+        string='Periodo de Prueba (Meses)', 
+        default=2,
+        tracking=True,
+        help='Duración del periodo de prueba en meses')
+    trial_date_end = fields.Date(
+        string='Fin del Periodo de Prueba', 
+        compute='_compute_trial_date_end', 
+        store=True,
+        tracking=True)
+
+    # Campos para salario
+    wage_type = fields.Selection([
+        ('integral', 'Salario Integral'),
+        ('ordinary', 'Salario Ordinario'),
+    ], string='Tipo de Salario', default='ordinary', required=True, tracking=True)
+
+    integral_factor = fields.Float(
+        string='Factor Salarial Integral', 
+        default=70.0,
+        help='Porcentaje del salario que corresponde a la parte fija (mínimo 70%)',
+        tracking=True)
+
+    # Campos para subsidios y beneficios
+    transport_allowance = fields.Boolean(
+        string='Auxilio de Transporte', 
+        default=True,
+        tracking=True,
+        help='Indica si el empleado tiene derecho al auxilio de transporte')
+
+    food_allowance = fields.Monetary(
+        string='Auxilio de Alimentación', 
+        default=0.0,
+        tracking=True,
+        help='Valor mensual del auxilio de alimentación')
+
+    # Campos para deducciones voluntarias
+    voluntary_pension = fields.Monetary(
+        string='Pensión Voluntaria', 
+        default=0.0,
+        tracking=True,
+        help='Aporte mensual a pensión voluntaria')
+
+    voluntary_afc = fields.Monetary(
+        string='Ahorro AFC', 
+        default=0.0,
+        tracking=True,
+        help='Aporte mensual a cuenta AFC')
+
+    # Campos para retención en la fuente
+    withholding_method = fields.Selection([
+        ('fixed', 'Fijo'),
+        ('table', 'Tabla'),
+        ('percentage', 'Porcentaje'),
+        ('none', 'No Aplica'),
+    ], string='Método de Retención', default='table', required=True, tracking=True)
+
+    withholding_percentage = fields.Float(
+        string='Porcentaje de Retención', 
+        default=0.0,
+        tracking=True,
+        help='Porcentaje de retención en la fuente (si el método es porcentaje)')
+
+    withholding_fixed = fields.Monetary(
+        string='Valor Fijo de Retención', 
+        default=0.0,
+        tracking=True,
+        help='Valor fijo de retención en la fuente (si el método es fijo)')
+
+    # Campos para procedimiento 1 o 2 de retención
+    withholding_procedure = fields.Selection([
+        ('1', 'Procedimiento 1'),
+        ('2', 'Procedimiento 2'),
+    ], string='Procedimiento de Retención', default='2', tracking=True)
+
+    # Campos para exenciones de retención
+    exempt_income_percentage = fields.Float(
+        string='Porcentaje de Renta Exenta', 
+        default=25.0,
+        tracking=True,
+        help='Porcentaje de salario considerado como renta exenta (máximo 25%)')
+
+    dependents = fields.Boolean(
+        string='Tiene Dependientes', 
+        default=False,
+        tracking=True,
+        help='Indica si el empleado tiene dependientes para efectos de retención')
+
+    # Campos para horas extra y recargos
+    has_overtime = fields.Boolean(
+        string='Maneja Horas Extra', 
+        default=True,
+        tracking=True,
+        help='Indica si el contrato permite el pago de horas extra')
+
+    # Campos para liquidación
+    severance_base = fields.Selection([
+        ('all', 'Salario + Todo lo Constitutivo'),
+        ('wage', 'Solo Salario Básico'),
+        ('legal', 'Según Definición Legal'),
+    ], string='Base para Cesantías', default='legal', required=True, tracking=True)
+
+    # Campos para vacaciones
+    vacation_days = fields.Integer(
+        string='Días de Vacaciones por Año', 
+        default=15,
+        tracking=True,
+        help='Días de vacaciones a los que tiene derecho por año')
+
+    # Campos para nómina electrónica
+    electronic_payroll_code = fields.Char(
+        string='Código para Nómina Electrónica', 
+        copy=False,
+        tracking=True)
+
+    # Campos para dotación
+    clothing_allowance = fields.Boolean(
+        string='Derecho a Dotación', 
+        default=True,
+        tracking=True,
+        help='Indica si el empleado tiene derecho a dotación')
+
+    # Campos para jornada laboral
+    schedule_pay = fields.Selection(
+        selection_add=[('biweekly', 'Quincenal')],
+        default='monthly',
+        tracking=True)
+
+    work_hours_per_day = fields.Float(
+        string='Horas de Trabajo por Día', 
+        default=8.0,
+        tracking=True,
+        help='Número de horas de trabajo por día')
+
+    # Campos para estructura salarial
+    struct_id = fields.Many2one(
+        'hr.payroll.structure', 
+        string='Estructura Salarial',
+        tracking=True,
+        domain="['|', ('company_id', '=', False), ('company_id', '=', company_id)]")
+
+    # Campos para riesgos laborales
+    risk_level = fields.Selection([
+        ('1', 'I - Riesgo Mínimo (0.522%)'),
+        ('2', 'II - Riesgo Bajo (1.044%)'),
+        ('3', 'III - Riesgo Medio (2.436%)'),
+        ('4', 'IV - Riesgo Alto (4.350%)'),
+        ('5', 'V - Riesgo Máximo (6.960%)'),
+    ], string='Nivel de Riesgo ARL', default='1', tracking=True)
+
+    # Campos para exoneración de aportes
+    parafiscal_exempt = fields.Boolean(
+        string='Exonerado SENA/ICBF',
+        default=False,
+        tracking=True,
+        help='El empleador aplica la exoneración del artículo 114-1 del E.T. para salarios inferiores al tope legal')
+
+    # Campos para firma del contrato
+    signed_contract = fields.Boolean(string='Contrato Firmado', default=False, tracking=True)
+    signed_date = fields.Date(string='Fecha de Firma', tracking=True)
+
+    # Campos para documentos relacionados
+    document_ids = fields.One2many(
+        'ir.attachment', 
+        'res_id', 
+        domain=[('res_model', '=', 'hr.contract')],
+        string='Documentos', 
+        help='Documentos relacionados con el contrato')
+
+    document_count = fields.Integer(
+        compute='_compute_document_count', 
+        string='Número de Documentos')
+
+    # Campos para historial de cambios salariales
+    wage_history_ids = fields.One2many(
+        'hr.contract.wage.history', 
+        'contract_id', 
+        string='Historial de Salarios')
+
+    # Campos para integración con work entries (nuevo en v18)
+    work_entry_source = fields.Selection(
+        selection_add=[('co_attendance', 'Asistencia Colombia')],
+        tracking=True)
+
+    # Campos para manejo de incapacidades
+    disability_deduction = fields.Selection([
+        ('company', 'Asume la Empresa'),
+        ('eps', 'Asume la EPS'),
+        ('mixed', 'Mixto según normativa'),
+    ], string='Deducción por Incapacidad', default='mixed', tracking=True)
+
+    # Campos para manejo de licencias
+    maternity_leave_days = fields.Integer(
+        string='Días de Licencia de Maternidad', 
+        default=126,
+        tracking=True,
+        help='Días de licencia de maternidad según la ley colombiana')
+
+    paternity_leave_days = fields.Integer(
+        string='Días de Licencia de Paternidad', 
+        default=8,
+        tracking=True,
+        help='Días de licencia de paternidad según la ley colombiana')
+
+    # Métodos computados
+    @api.depends('date_start', 'trial_period_months')
+    def _compute_trial_date_end(self):
+        for contract in self:
+            if contract.date_start and contract.trial_period_months:
+                contract.trial_date_end = contract.date_start + relativedelta(months=contract.trial_period_months)
+            else:
+                contract.trial_date_end = False
+
+    def _compute_document_count(self):
+        for contract in self:
+            contract.document_count = self.env['ir.attachment'].search_count([
+                ('res_model', '=', 'hr.contract'),
+                ('res_id', '=', contract.id)
+            ])
+
+    # Restricciones y validaciones
+    @api.constrains('wage', 'wage_type', 'integral_factor')
+    def _check_wage(self):
+        for contract in self:
+            if contract.wage_type == 'integral':
+                # Verificar el salario integral mínimo según los parámetros legales del año
+                legal = self.env['hr.payroll.legal.parameter']._get_legal_values(contract.date_start)
+                if contract.wage < (legal['smmlv'] * legal['integral_min_smmlv']):
+                    raise ValidationError(_('El salario integral debe ser al menos %s veces el salario mínimo.') % legal['integral_min_smmlv'])
             
-            # Verificar que el factor integral sea al menos 70%
-            if contract.integral_factor < 70.0:
-                raise ValidationError(_('El factor salarial integral no puede ser menor al 70%.'))
-
-@api.constrains('contract_term', 'duration_months')
-def _check_contract_term(self):
-    for contract in self:
-        if contract.contract_term == 'fijo' and not contract.duration_months:
-            raise ValidationError(_('Para contratos a término fijo, debe especificar la duración en meses.'))
+                # Verificar el factor integral mínimo
+                if contract.integral_factor < legal['integral_factor']:
+                    raise ValidationError(_('El factor salarial integral no puede ser menor al %s%%.') % legal['integral_factor'])
+
+    @api.constrains('contract_term', 'duration_months')
+    def _check_contract_term(self):
+        for contract in self:
+            if contract.contract_term == 'fijo' and not contract.duration_months:
+                raise ValidationError(_('Para contratos a término fijo, debe especificar la duración en meses.'))
         
-        if contract.contract_term == 'fijo' and contract.duration_months > 36:
-            raise ValidationError(_('Los contratos a término fijo no pueden exceder 3 años (36 meses).'))
-
-@api.constrains('trial_period_months')
-def _check_trial_period(self):
-    for contract in self:
-        if contract.trial_period_months > 2 and contract.contract_term != 'indefinido':
-            raise ValidationError(_('El periodo de prueba no puede exceder 2 meses para contratos diferentes a término indefinido.'))
+            if contract.contract_term == 'fijo' and contract.duration_months > 36:
+                raise ValidationError(_('Los contratos a término fijo no pueden exceder 3 años (36 meses).'))
+
+    @api.constrains('trial_period_months')
+    def _check_trial_period(self):
+        for contract in self:
+            if contract.trial_period_months > 2 and contract.contract_term != 'indefinido':
+                raise ValidationError(_('El periodo de prueba no puede exceder 2 meses para contratos diferentes a término indefinido.'))
         
-        if contract.trial_period_months > 5:
-            raise ValidationError(_('El periodo de prueba no puede exceder 5 meses.'))
-
-@api.constrains('exempt_income_percentage')
-def _check_exempt_income(self):
-    for contract in self:
-        if contract.exempt_income_percentage > 25.0:
-            raise ValidationError(_('El porcentaje de renta exenta no puede exceder el 25%.'))
-
-# Métodos onchange
-@api.onchange('contract_term')
-def _onchange_contract_term(self):
-    if self.contract_term == 'indefinido':
-        self.duration_months = 0
-    elif self.contract_term == 'fijo' and not self.duration_months:
-        self.duration_months = 12
+            if contract.trial_period_months > 5:
+                raise ValidationError(_('El periodo de prueba no puede exceder 5 meses.'))
+
+    @api.constrains('exempt_income_percentage')
+    def _check_exempt_income(self):
+        for contract in self:
+            if contract.exempt_income_percentage > 25.0:
+                raise ValidationError(_('El porcentaje de renta exenta no puede exceder el 25%.'))
+
+    # Métodos onchange
+    @api.onchange('contract_term')
+    def _onchange_contract_term(self):
+        if self.contract_term == 'indefinido':
+            self.duration_months = 0
+        elif self.contract_term == 'fijo' and not self.duration_months:
+            self.duration_months = 12
     
-    if self.contract_term == 'aprendizaje':
-        self.trial_period_months = 0
-        # Buscar estructura salarial para aprendices
-        apprentice_structure = self.env['hr.payroll.structure'].search([
-            ('code', '=', 'APRENDIZ'),
-            '|', ('company_id', '=', self.company_id.id), ('company_id', '=', False)
-        ], limit=1)
-        if apprentice_structure:
-            self.struct_id = apprentice_structure.id
-
-@api.onchange('wage_type')
-def _onchange_wage_type(self):
-    if self.wage_type == 'integral':
-        # Buscar estructura salarial para salario integral
-        integral_structure = self.env['hr.payroll.structure'].search([
-            ('code', '=', 'INTEGRAL'),
-            '|', ('company_id', '=', self.company_id.id), ('company_id', '=', False)
-        ], limit=1)
-        if integral_structure:
-            self.struct_id = integral_structure.id
-    else:
-        # Buscar estructura salarial para salario ordinario
-        ordinary_structure = self.env['hr.payroll.structure'].search([
-            ('code', '=', 'ORDINARIO'),
-            '|', ('company_id', '=', self.company_id.id), ('company_id', '=', False)
-        ], limit=1)
-        if ordinary_structure:
-            self.struct_id = ordinary_structure.id
-
-@api.onchange('employee_id')
-def _onchange_employee_id(self):
-    super(HrContract, self)._onchange_employee_id()
-    if self.employee_id and self.employee_id.arl_risk:
-        self.risk_level = self.employee_id.arl_risk
-        self.risk_level = self.employee_id.arl_risk
+        if self.contract_term == 'aprendizaje':
+            self.trial_period_months = 0
+            # Buscar estructura salarial para aprendices
+            apprentice_structure = self.env['hr.payroll.structure'].search([
+                ('code', '=', 'APRENDIZ'),
+                '|', ('company_id', '=', self.company_id.id), ('company_id', '=', False)
+            ], limit=1)
+            if apprentice_structure:
+                self.struct_id = apprentice_structure.id
+
+    @api.onchange('wage_type')
+    def _onchange_wage_type(self):
+        if self.wage_type == 'integral':
+            # Buscar estructura salarial para salario integral
+            integral_structure = self.env['hr.payroll.structure'].search([
+                ('code', '=', 'INTEGRAL'),
+                '|', ('company_id', '=', self.company_id.id), ('company_id', '=', False)
+            ], limit=1)
+            if integral_structure:
+                self.struct_id = integral_structure.id
+        else:
+            # Buscar estructura salarial para salario ordinario
+            ordinary_structure = self.env['hr.payroll.structure'].search([
+                ('code', '=', 'ORDINARIO'),
+                '|', ('company_id', '=', self.company_id.id), ('company_id', '=', False)
+            ], limit=1)
+            if ordinary_structure:
+                self.struct_id = ordinary_structure.id
+
+    @api.onchange('employee_id')
+    def _onchange_employee_id(self):
+        super(HrContract, self)._onchange_employee_id()
+        if self.employee_id and self.employee_id.arl_risk:
+            self.risk_level = self.employee_id.arl_risk
+            self.risk_level = self.employee_id.arl_risk
     
     # Métodos para prórrogas de contrato
     def action_extend_contract(self):
@@ -431,24 +443,20 @@ def _onchange_employee_id(self):
         return self.env.ref('nomina_colombia_v18.action_report_hr_contract').report_action(self)
     
     # Métodos para cálculos específicos de nómina colombiana
-    def _get_transport_allowance(self):
+    def _get_transport_allowance(self, date=None):
         """Calcula el auxilio de transporte según la normativa colombiana"""
         self.ensure_one()
         if not self.transport_allowance:
             return 0.0
         
-        # Obtener el valor del auxilio de transporte de los parámetros del sistema
-        transport_value = float(self.env['ir.config_parameter'].sudo().get_param(
-            'hr_payroll.transport_allowance', 0.0))
+        # Obtener los valores legales del año de la fecha de referencia
+        legal = self.env['hr.payroll.legal.parameter']._get_legal_values(date)
         
         # Verificar si aplica según el salario (2 SMMLV)
-        min_wage = float(self.env['ir.config_parameter'].sudo().get_param(
-            'hr_payroll.minimum_wage', 0.0))
-        
-        if self.wage > (min_wage * 2):
+        if self.wage > (legal['smmlv'] * legal['transport_max_smmlv']):
             return 0.0
         
-        return transport_value
+        return legal['transport_allowance']
     
     def _get_integral_base(self):
         """Calcula la base del salario integral"""
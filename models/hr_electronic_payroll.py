@@ -1,17 +1,77 @@
 from odoo import api, fields, models, _
 from odoo.exceptions import UserError, ValidationError
+from collections import defaultdict
 from datetime import date, datetime, timedelta
+from dateutil.relativedelta import relativedelta
 import base64
 import hashlib
+import io
 import json
 import logging
-import requests
+import time
 import uuid
-import xml.etree.ElementTree as ET
+from contextlib import ExitStack, contextmanager
 from lxml import etree
+from markupsafe import Markup
+
+from odoo import tools
+from odoo.tools import groupby, split_every
+
+from .hr_electronic_payroll_concepts import (
+    MAX_WORKED_DAYS, WORKED_DAYS_CONCEPT, add_rule_total, diff_concepts, unmapped_rule_codes)
+from .hr_electronic_payroll_dispatcher import DispatchItem, backoff_delay
+from .hr_electronic_payroll_schema import validate_document, validate_documents
+from .hr_electronic_payroll_signature import (
+    certificate_validity, forget_private_keys, load_key_material, process_pool, sign_document, sign_documents)
+from .hr_electronic_payroll_status import DIAN_ACCEPTED_CODE, parse_status_response, status_request
+from .hr_electronic_payroll_storage import (
+    CODEC_MIMETYPES, DEFAULT_CODEC, available_codec, compress, content_size, decompress, open_stream)
+from .hr_electronic_payroll_xml import NominaIndividualBuilder, nomina_tag
 
 _logger = logging.getLogger(__name__)
 
+# Documentos generados y firmados por bloque en la generación por lote
+ELECTRONIC_BATCH_SIZE = 500
+
+# Procesos de firma por defecto en la generación por lote: sin pool, que se
+# activa con el parámetro nomina_colombia.signature_workers
+DEFAULT_SIGNATURE_WORKERS = 1
+
+# Documentos enviados reclamados por transacción en la consulta de estado
+STATUS_POLL_BATCH_SIZE = 500
+
+# Tiempo máximo (segundos) que una ejecución del cron consulta estados
+STATUS_POLL_CRON_TIME_LIMIT = 240
+
+# Espera (segundos) antes de la primera consulta, espera base y máxima entre
+# consultas de un documento en validación, y consultas antes de abandonarlo
+STATUS_FIRST_CHECK_DELAY = 30
+STATUS_CHECK_BACKOFF_BASE = 60.0
+STATUS_CHECK_BACKOFF_MAX = 3600.0
+STATUS_MAX_CHECKS = 30
+
+# Datos técnicos que una nota de ajuste hereda del documento que ajusta
+ADJUSTMENT_NOTE_COPY_FIELDS = [
+    'certificate_id',
+    'software_id',
+    'software_security_code',
+    'technical_key',
+    'dian_environment',
+    'dian_resolution_number',
+    'dian_resolution_date',
+    'dian_prefix',
+]
+
+# Buffer de eventos de la operación masiva en curso, en la caché del cursor
+LOG_BUFFER_CACHE_KEY = 'nomina_colombia.electronic_payroll_log_buffer'
+
+# Campos XML guardados como adjuntos comprimidos, con su campo de nombre de archivo
+XML_STORAGE_FIELDS = {
+    'xml_file': 'xml_filename',
+    'xml_signed_file': 'xml_signed_filename',
+    'dian_response_file': 'dian_response_filename',
+}
+
 
 class HrElectronicPayroll(models.Model):
     _name = 'hr.electronic.payroll'
@@ -27,6 +87,18 @@ class HrElectronicPayroll(models.Model):
         required=True, ondelete='restrict',
         readonly=True, states={'draft': [('readonly', False)]})
     
+    payslip_ids = fields.Many2many(
+        'hr.payslip', 'hr_electronic_payroll_payslip_rel',
+        'electronic_payroll_id', 'payslip_id',
+        string='Nóminas del Mes', copy=False, readonly=True,
+        help='Nóminas confirmadas del mes que cubre el documento (quincenas, vacaciones, primas)')
+    
+    pending_payslip_ids = fields.Many2many(
+        'hr.payslip', 'hr_electronic_payroll_pending_payslip_rel',
+        'electronic_payroll_id', 'payslip_id',
+        string='Nóminas Pendientes de Ajuste', copy=False, readonly=True,
+        help='Nóminas del mes confirmadas después de generar el documento; se reportan con una nota de ajuste')
+    
     employee_id = fields.Many2one(
         'hr.employee', string='Empleado',
         required=True, ondelete='restrict',
@@ -78,6 +150,14 @@ class HrElectronicPayroll(models.Model):
         string='Número DIAN', copy=False,
         readonly=True)
     
+    dian_consecutive = fields.Integer(
+        string='Consecutivo DIAN', copy=False,
+        readonly=True)
+    
+    dian_number_block_id = fields.Many2one(
+        'hr.electronic.payroll.number.block', string='Bloque de Consecutivos',
+        copy=False, readonly=True, index=True)
+    
     dian_operation_type = fields.Selection([
         ('10', 'Estándar'),
         ('20', 'Nota de Ajuste'),
@@ -98,6 +178,7 @@ class HrElectronicPayroll(models.Model):
     
     xml_file = fields.Binary(
         string='Archivo XML', copy=False,
+        compute='_compute_xml_file', inverse='_inverse_xml_file',
         readonly=True)
     
     xml_signed_filename = fields.Char(
@@ -106,6 +187,7 @@ class HrElectronicPayroll(models.Model):
     
     xml_signed_file = fields.Binary(
         string='Archivo XML Firmado', copy=False,
+        compute='_compute_xml_signed_file', inverse='_inverse_xml_signed_file',
         readonly=True)
     
     # Campos para respuesta DIAN
@@ -115,6 +197,7 @@ class HrElectronicPayroll(models.Model):
     
     dian_response_file = fields.Binary(
         string='Archivo de Respuesta', copy=False,
+        compute='_compute_dian_response_file', inverse='_inverse_dian_response_file',
         readonly=True)
     
     dian_response_code = fields.Char(
@@ -129,11 +212,31 @@ class HrElectronicPayroll(models.Model):
         string='ID de Transacción DIAN', copy=False,
         readonly=True)
     
+    dian_zip_key = fields.Char(
+        string='ZipKey DIAN', copy=False, index=True,
+        readonly=True, help='Paquete ZIP en el que se envió el documento')
+    
+    dian_status_next_check = fields.Datetime(
+        string='Próxima Consulta de Estado', copy=False,
+        readonly=True, help='Momento de la siguiente consulta de estado a la DIAN')
+    
+    dian_status_check_count = fields.Integer(
+        string='Consultas de Estado', copy=False,
+        readonly=True)
+    
     dian_cude = fields.Char(
         string='CUDE', copy=False,
         help='Código Único de Documento Electrónico',
         readonly=True)
     
+    xml_validation_errors = fields.Text(
+        string='Errores de Validación Estructural', copy=False,
+        readonly=True)
+    
+    concept_values = fields.Json(
+        string='Conceptos DIAN', copy=False, readonly=True,
+        help='Valores por concepto DIAN (ruta del nodo -> valor) sumados de las líneas de nómina')
+    
     # Campos para PDF
     pdf_filename = fields.Char(
         string='Nombre del Archivo PDF', copy=False,
@@ -141,13 +244,17 @@ class HrElectronicPayroll(models.Model):
     
     pdf_file = fields.Binary(
         string='Archivo PDF', copy=False,
-        readonly=True)
+        attachment=True, readonly=True)
     
     # Campos para registro de eventos
     log_ids = fields.One2many(
         'hr.electronic.payroll.log', 'electronic_payroll_id',
         string='Registro de Eventos')
     
+    outbox_ids = fields.One2many(
+        'hr.electronic.payroll.outbox', 'electronic_payroll_id',
+        string='Envíos DIAN', readonly=True)
+    
     # Campos para notas de ajuste
     is_adjustment_note = fields.Boolean(
         string='Es Nota de Ajuste', default=False,
@@ -254,14 +361,23 @@ class HrElectronicPayroll(models.Model):
         string='Puede Enviarse', compute='_compute_can_be_sent',
         store=True)
     
+    def init(self):
+        # La consulta de estado solo recorre los documentos enviados
+        self.env.cr.execute("""
+            CREATE INDEX IF NOT EXISTS hr_electronic_payroll_status_check_idx
+                ON hr_electronic_payroll (dian_status_next_check)
+             WHERE state = 'sent'
+        """)
+
     # Secuencia
-    @api.model
-    def create(self, vals):
-        if vals.get('name', _('New')) == _('New'):
-            seq_date = vals.get('date', fields.Date.context_today(self))
-            vals['name'] = self.env['ir.sequence'].next_by_code(
-                'hr.electronic.payroll', sequence_date=seq_date) or _('New')
-        return super(HrElectronicPayroll, self).create(vals)
+    @api.model_create_multi
+    def create(self, vals_list):
+        for vals in vals_list:
+            if vals.get('name', _('New')) == _('New'):
+                seq_date = vals.get('date', fields.Date.context_today(self))
+                vals['name'] = self.env['ir.sequence'].next_by_code(
+                    'hr.electronic.payroll', sequence_date=seq_date) or _('New')
+        return super(HrElectronicPayroll, self).create(vals_list)
     
     # Métodos computados
     @api.depends('state', 'dian_response_code')
@@ -288,7 +404,52 @@ class HrElectronicPayroll(models.Model):
     @api.depends('state', 'xml_signed_file')
     def _compute_can_be_sent(self):
         for record in self:
-            record.can_be_sent = record.state in ['generated'] and bool(record.xml_signed_file)
+            record.can_be_sent = record.state in ['generated'] and bool(
+                record.with_context(bin_size=True).xml_signed_file)
+    
+    @api.depends_context('bin_size')
+    def _compute_xml_file(self):
+        self._compute_xml_storage('xml_file')
+    
+    @api.depends_context('bin_size')
+    def _compute_xml_signed_file(self):
+        self._compute_xml_storage('xml_signed_file')
+    
+    @api.depends_context('bin_size')
+    def _compute_dian_response_file(self):
+        self._compute_xml_storage('dian_response_file')
+    
+    def _compute_xml_storage(self, fname):
+        """
+        Lee el XML de un campo de su adjunto comprimido. Cada campo se calcula
+        por separado, de modo que leer uno no descomprime los demás. Con
+        bin_size (vistas de formulario y listas) se retorna el tamaño del XML
+        descomprimido, leído de la cabecera o del final del adjunto.
+        """
+        bin_size = self.env.context.get('bin_size')
+        values = {}
+        for attachment in self._get_xml_attachments([fname]):
+            if bin_size:
+                with self._open_xml_attachment(attachment) as fileobj:
+                    values[attachment.res_id] = content_size(fileobj, attachment.file_size)
+            elif attachment.raw:
+                values[attachment.res_id] = base64.b64encode(decompress(attachment.raw))
+        for record in self:
+            record[fname] = values.get(record._origin.id, False)
+    
+    def _inverse_xml_file(self):
+        self._inverse_xml_storage('xml_file')
+    
+    def _inverse_xml_signed_file(self):
+        self._inverse_xml_storage('xml_signed_file')
+    
+    def _inverse_dian_response_file(self):
+        self._inverse_xml_storage('dian_response_file')
+    
+    def _inverse_xml_storage(self, fname):
+        self._store_xml_payloads(fname, {
+            record.id: record[fname] and base64.b64decode(record[fname]) for record in self
+        })
     
     # Restricciones
     @api.constrains('is_adjustment_note', 'original_electronic_payroll_id', 'adjustment_reason')
@@ -327,29 +488,29 @@ class HrElectronicPayroll(models.Model):
         if self.state != 'draft':
             raise UserError(_("Solo se puede generar documentos en estado borrador."))
         
-        # Validar datos requeridos
-        self._validate_required_data()
+        with self._buffered_log(_('Generación del documento')):
+            # Validar datos requeridos
+            self._validate_required_data()
         
-        # Generar número DIAN
-        if not self.dian_number:
-            self.dian_number = self._get_next_dian_number()
+            # Generar número DIAN
+            self._assign_dian_numbers()
         
-        # Generar XML
-        xml_content = self._generate_xml()
+            # Generar XML
+            xml_content = self._generate_xml()
         
-        # Guardar XML
-        filename = f"NE_{self.company_id.vat}_{self.dian_number}.xml"
-        self.write({
-            'xml_filename': filename,
-            'xml_file': base64.b64encode(xml_content.encode()),
-            'state': 'generated',
-        })
+            # Guardar XML
+            filename = f"NE_{self.company_id.vat}_{self.dian_number}.xml"
+            self.write({
+                'xml_filename': filename,
+                'state': 'generated',
+            })
+            self._store_xml_payloads('xml_file', {self.id: xml_content})
         
-        # Firmar XML
-        self.action_sign()
+            # Firmar XML
+            self.action_sign()
         
-        # Registrar evento
-        self._create_log('generate', _('Documento generado'))
+            # Registrar evento
+            self._create_log('generate', _('Documento generado'))
         
         return True
     
@@ -359,24 +520,23 @@ class HrElectronicPayroll(models.Model):
         """
         self.ensure_one()
         
-        if not self.xml_file:
+        xml_content = self._read_xml_payloads('xml_file').get(self.id)
+        if not xml_content:
             raise UserError(_("No hay XML para firmar."))
         
         if not self.certificate_id:
             raise UserError(_("Debe seleccionar un certificado digital."))
         
-        # Decodificar XML
-        xml_content = base64.b64decode(self.xml_file).decode()
+        # Validación estructural interna antes de firmar
+        self._validate_xml_schema(xml_content)
         
         # Firmar XML
         signed_xml = self._sign_xml(xml_content)
         
         # Guardar XML firmado
         filename = f"NE_{self.company_id.vat}_{self.dian_number}_signed.xml"
-        self.write({
-            'xml_signed_filename': filename,
-            'xml_signed_file': base64.b64encode(signed_xml.encode()),
-        })
+        self.xml_signed_filename = filename
+        self._store_xml_payloads('xml_signed_file', {self.id: signed_xml})
         
         # Registrar evento
         self._create_log('sign', _('Documento firmado'))
@@ -385,21 +545,43 @@ class HrElectronicPayroll(models.Model):
     
     def action_send(self):
         """
-        Envía el XML firmado a la DIAN
+        Encola el XML firmado para su envío a la DIAN
+
+        El envío lo hace el cron de la bandeja de salida, de modo que una
+        respuesta lenta de la DIAN no bloquea la solicitud del usuario.
         """
         self.ensure_one()
         
-        if not self.xml_signed_file:
+        if not self.with_context(bin_size=True).xml_signed_file:
             raise UserError(_("No hay XML firmado para enviar."))
         
         if self.state not in ['generated', 'rejected']:
             raise UserError(_("Solo se pueden enviar documentos generados o rechazados."))
         
-        # Decodificar XML firmado
-        xml_content = base64.b64decode(self.xml_signed_file).decode()
+        if self.env['hr.electronic.payroll.outbox']._enqueue(self):
+            self._create_log('send', _('Documento encolado para envío a DIAN'))
         
-        # Enviar a DIAN
-        response = self._send_to_dian(xml_content)
+        return True
+    
+    def action_check_dian_status(self):
+        """
+        Consulta de inmediato el estado de los documentos enviados, incluso
+        los que agotaron las consultas automáticas
+        """
+        documents = self.filtered(lambda d: d.state == 'sent')
+        if not documents:
+            raise UserError(_("Solo se puede consultar el estado de documentos enviados."))
+        documents.write({'dian_status_check_count': 0})
+        documents._poll_dian_status()
+        return True
+    
+    def _apply_dian_response(self, response):
+        """
+        Guarda la respuesta de la DIAN y actualiza el estado del documento
+
+        :param response: Diccionario retornado por _parse_dian_response
+        """
+        self.ensure_one()
         
         # Procesar respuesta
         if response.get('is_valid'):
@@ -416,8 +598,8 @@ class HrElectronicPayroll(models.Model):
             'dian_response_description': response.get('status_description'),
             'dian_transaction_id': response.get('transaction_id'),
             'dian_response_filename': f"NE_{self.company_id.vat}_{self.dian_number}_response.xml",
-            'dian_response_file': base64.b64encode(response.get('response_xml', '').encode()),
         })
+        self._store_xml_payloads('dian_response_file', {self.id: response.get('response_xml', '').encode()})
         
         # Si fue aceptado, generar PDF
         if state == 'accepted':
@@ -482,7 +664,7 @@ class HrElectronicPayroll(models.Model):
         """
         self.ensure_one()
         
-        if not self.pdf_file:
+        if not self.with_context(bin_size=True).pdf_file:
             raise UserError(_("Debe generar primero el PDF."))
         
         if not self.employee_id.work_email:
@@ -517,7 +699,7 @@ class HrElectronicPayroll(models.Model):
         """
         self.ensure_one()
         
-        if not self.xml_signed_file:
+        if not self.with_context(bin_size=True).xml_signed_file:
             raise UserError(_("No hay XML firmado para descargar."))
         
         return {
@@ -532,7 +714,7 @@ class HrElectronicPayroll(models.Model):
         """
         self.ensure_one()
         
-        if not self.pdf_file:
+        if not self.with_context(bin_size=True).pdf_file:
             raise UserError(_("No hay PDF para descargar."))
         
         return {
@@ -561,6 +743,8 @@ class HrElectronicPayroll(models.Model):
             'dian_response_code': False,
             'dian_response_description': False,
             'dian_transaction_id': False,
+            'dian_zip_key': False,
+            'dian_status_next_check': False,
             'pdf_file': False,
             'pdf_filename': False,
         })
@@ -571,6 +755,22 @@ class HrElectronicPayroll(models.Model):
         return True
     
     # Métodos auxiliares
+    def _check_required_data(self):
+        """
+        Valida los datos requeridos sin interrumpir el lote: el error queda en
+        xml_validation_errors y en el registro de eventos del documento
+
+        :return: True si el documento tiene los datos requeridos
+        """
+        self.ensure_one()
+        try:
+            self._validate_required_data()
+        except UserError as e:
+            self.xml_validation_errors = str(e)
+            self._create_log('error', _('Faltan datos requeridos:\n%s') % e)
+            return False
+        return True
+
     def _validate_required_data(self):
         """
         Valida que todos los datos requeridos estén presentes
@@ -581,14 +781,15 @@ class HrElectronicPayroll(models.Model):
         if not self.company_id.vat:
             raise UserError(_("La compañía no tiene configurado el NIT."))
         
-        if not self.company_id.partner_id.dian_fiscal_responsibility_ids:
+        if not self.company_id.partner_id.dian_fiscal_responsibilities:
             raise UserError(_("La compañía no tiene configuradas las responsabilidades fiscales."))
         
         # Validar datos del empleado
-        if not self.employee_id.identification_id:
+        employee = self.employee_id
+        if not employee.identification_id:
             raise UserError(_("El empleado no tiene configurado el número de identificación."))
         
-        if not self.employee_id.address_home_id:
+        if not employee.private_street or not employee.private_city:
             raise UserError(_("El empleado no tiene configurada la dirección particular."))
         
         # Validar datos técnicos
@@ -601,130 +802,449 @@ class HrElectronicPayroll(models.Model):
         
         return True
     
-    def _get_next_dian_number(self):
+    def _assign_dian_numbers(self):
         """
-        Obtiene el siguiente número para DIAN
+        Asigna los consecutivos DIAN a los documentos que aún no lo tienen
+
+        Los números de cada compañía y prefijo se reservan como un bloque
+        contiguo en una transacción corta y se reparten en memoria; los
+        documentos se actualizan con un único UPDATE.
+
+        :return: Documentos numerados
         """
-        self.ensure_one()
-        
-        # Obtener la secuencia para nómina electrónica
-        sequence = self.env['ir.sequence'].search([
-            ('code', '=', 'dian.electronic.payroll'),
-            ('company_id', '=', self.company_id.id)
-        ], limit=1)
-        
-        if not sequence:
-            raise UserError(_("No se encontró la secuencia para nómina electrónica."))
-        
-        # Obtener el siguiente número
-        next_number = sequence.next_by_id()
-        
-        # Si hay prefijo, agregarlo
-        if self.dian_prefix:
-            next_number = f"{self.dian_prefix}{next_number}"
-        
-        return next_number
+        documents = self.filtered(lambda d: not d.dian_number)
+        Block = self.env['hr.electronic.payroll.number.block']
+        rows = []
+        for (company, prefix), group in groupby(documents, key=lambda d: (d.company_id, d.dian_prefix or '')):
+            block = Block._reserve(company, prefix, len(group))
+            for document, (number, name) in zip(group, block._iter_numbers()):
+                rows.append((document.id, name, number, block.id))
+
+        if rows:
+            self.flush_model(['dian_number', 'dian_consecutive', 'dian_number_block_id'])
+            self.env.cr.execute("""
+                UPDATE hr_electronic_payroll d
+                   SET dian_number = v.dian_number,
+                       dian_consecutive = v.dian_consecutive,
+                       dian_number_block_id = v.block_id
+                  FROM (VALUES %s) AS v(id, dian_number, dian_consecutive, block_id)
+                 WHERE d.id = v.id
+            """ % ', '.join(['%s'] * len(rows)), rows)
+            documents.invalidate_recordset(['dian_number', 'dian_consecutive', 'dian_number_block_id'])
+        return documents
     
     def _generate_xml(self):
         """
         Genera el XML según el formato UBL 2.1 para nómina electrónica
+
+        :return: Contenido XML en bytes (UTF-8)
         """
         self.ensure_one()
-        
-        # Crear el elemento raíz
-        root = ET.Element("NominaIndividual", {
-            "xmlns": "dian:gov:co:facturaelectronica:NominaIndividual",
-            "xmlns:xs": "http://www.w3.org/2001/XMLSchema-instance",
-            "xmlns:ds": "http://www.w3.org/2000/09/xmldsig#",
-            "xmlns:ext": "urn:oasis:names:specification:ubl:schema:xsd:CommonExtensionComponents-2",
-            "xmlns:xades": "http://uri.etsi.org/01903/v1.3.2#",
-            "xmlns:xades141": "http://uri.etsi.org/01903/v1.4.1#",
-            "SchemaLocation": "dian:gov:co:facturaelectronica:NominaIndividual NominaIndividualElectronicaXSD.xsd"
-        })
-        
-        # Información general
-        general_info = ET.SubElement(root, "InformacionGeneral")
-        ET.SubElement(general_info, "Version").text = "V1.0"
-        ET.SubElement(general_info, "Ambiente").text = self.dian_environment
-        ET.SubElement(general_info, "TipoOperacion").text = self.dian_operation_type
-        ET.SubElement(general_info, "FechaGeneracion").text = self.date.strftime("%Y-%m-%d")
-        ET.SubElement(general_info, "PeriodoNomina", {"FechaIngreso": self.period_start.strftime("%Y-%m-%d"), "FechaRetiro": self.period_end.strftime("%Y-%m-%d") if self.period_end else ""})
-        ET.SubElement(general_info, "TipoMoneda").text = self.currency_id.name
-        
-        # Información del empleador
-        employer = ET.SubElement(root, "Empleador")
-        ET.SubElement(employer, "NIT").text = self.company_id.vat.replace("-", "").replace(".", "")
-        ET.SubElement(employer, "RazonSocial").text = self.company_id.name
-        
-        # Información del trabajador
-        employee = ET.SubElement(root, "Trabajador")
-        ET.SubElement(employee, "TipoDocumento").text = self.employee_identification_type
-        ET.SubElement(employee, "NumeroDocumento").text = self.employee_identification
-        ET.SubElement(employee, "PrimerApellido").text = self.employee_first_surname or ""
-        ET.SubElement(employee, "SegundoApellido").text = self.employee_second_surname or ""
-        ET.SubElement(employee, "PrimerNombre").text = self.employee_first_name or ""
-        ET.SubElement(employee, "SegundoNombre").text = self.employee_second_name or ""
-        
-        # Información de la nómina
-        payroll = ET.SubElement(root, "Pago")
-        ET.SubElement(payroll, "Forma").text = "1"  # 1 = Transferencia
-        ET.SubElement(payroll, "Metodo").text = "1"  # 1 = Contado
-        
-        # Devengados
-        earnings = ET.SubElement(root, "Devengados")
-        
-        # Básico
-        basic = ET.SubElement(earnings, "Basico")
-        ET.SubElement(basic, "DiasTrabajados").text = str(self.payslip_worked_days)
-        ET.SubElement(basic, "SueldoTrabajado").text = str(self.payslip_wage)
-        
-        # Deducciones
-        deductions = ET.SubElement(root, "Deducciones")
-        
-        # Salud
-        health = ET.SubElement(deductions, "Salud")
-        ET.SubElement(health, "Porcentaje").text = "4.00"
-        ET.SubElement(health, "Deduccion").text = str(self.payslip_id.health_contribution_employee)
-        
-        # Pensión
-        pension = ET.SubElement(deductions, "Pension")
-        ET.SubElement(pension, "Porcentaje").text = "4.00"
-        ET.SubElement(pension, "Deduccion").text = str(self.payslip_id.pension_contribution_employee)
-        
-        # Convertir a string XML
-        xml_string = ET.tostring(root, encoding='utf-8', method='xml')
-        
-        # Formatear XML para mejor legibilidad
-        parsed_xml = etree.fromstring(xml_string)
-        pretty_xml = etree.tostring(parsed_xml, pretty_print=True, encoding='utf-8').decode()
-        
-        return pretty_xml
+        builder = NominaIndividualBuilder(self.company_id)
+        return builder.tostring(builder.build(self), pretty_print=True)
+    
+    def _validate_xml_schema(self, xml_content):
+        """
+        Valida el XML contra la estructura interna del documento NominaIndividual
+
+        No reemplaza la validación de la DIAN: solo detecta antes de firmar
+        los datos faltantes o mal formados que arma el constructor.
+
+        :param xml_content: Contenido XML en bytes
+        :raises ValidationError: Si el documento no cumple la estructura
+        """
+        self.ensure_one()
+        errors = validate_document(xml_content)
+        if errors:
+            raise ValidationError(_("El documento %s no pasa la validación estructural interna:\n%s") % (
+                self.name, self._format_schema_errors(errors)))
+        return True
+    
+    @api.model
+    def _format_schema_errors(self, errors):
+        """Texto con un error por línea: línea del documento, XPath del nodo y mensaje"""
+        return '\n'.join(
+            _('Línea %(line)s, %(path)s: %(message)s') % {
+                'line': error.line, 'path': error.path, 'message': error.message}
+            for error in errors)
     
     def _sign_xml(self, xml_content):
         """
         Firma el XML con el certificado digital
+
+        :param xml_content: Contenido XML en bytes
+        :return: Contenido XML firmado en bytes
         """
         self.ensure_one()
         
         if not self.certificate_id:
             raise UserError(_("Debe seleccionar un certificado digital."))
         
-        # Aquí iría la lógica para firmar el XML
-        # Este es un proceso complejo que requiere una biblioteca específica
-        # Por ahora, simplemente devolvemos el XML original como ejemplo
-        
-        # En un caso real, se utilizaría una biblioteca como signxml o pyXMLSecurity
-        # para firmar el XML según los requisitos de la DIAN
-        
-        # Calcular CUDE (Código Único de Documento Electrónico)
+        root = etree.fromstring(xml_content)
+        self.dian_cude = self._add_cude(root)
+        return sign_document(
+            NominaIndividualBuilder.tostring(root), self.certificate_id._get_key_material().signer)
+    
+    def _add_cude(self, root):
+        """
+        Agrega el CUDE (Código Único de Documento Electrónico) al documento
+
+        :param root: Elemento raíz lxml del documento
+        :return: CUDE calculado
+        """
+        self.ensure_one()
         cude = self._calculate_cude()
-        self.dian_cude = cude
-        
-        # Agregar CUDE al XML
-        # Esto es simplificado, en un caso real se modificaría el XML correctamente
-        signed_xml = xml_content.replace("</NominaIndividual>", f"<CUDE>{cude}</CUDE></NominaIndividual>")
-        
-        return signed_xml
+        etree.SubElement(root, nomina_tag('CUDE')).text = cude
+        return cude
+    
+    @api.model
+    def _get_signature_workers(self):
+        """Número de procesos para firmar los documentos de un lote"""
+        return int(self.env['ir.config_parameter'].sudo().get_param(
+            'nomina_colombia.signature_workers', DEFAULT_SIGNATURE_WORKERS))
+    
+    def _generate_batch(self):
+        """
+        Genera y firma en una sola pasada los documentos en borrador
+
+        Cada documento se arma con un constructor lxml reutilizado por
+        compañía y se serializa una sola vez. La firma XAdES de los documentos
+        de cada certificado se reparte en un pool de procesos, creado una sola
+        vez por llamada y reutilizado en todos los bloques, y el XML firmado
+        se escribe comprimido directamente al filestore como adjunto del campo
+        xml_signed_file, sin codificar en base64 ni guardar la copia sin firmar.
+
+        Los documentos sin los datos requeridos o que no pasan la validación
+        estructural interna (en el mismo pool de procesos) quedan en borrador con los
+        errores en xml_validation_errors, no se firman y no detienen el lote.
+
+        :return: Documentos generados
+        """
+        documents = self.filtered(lambda d: d.state == 'draft')
+        without_certificate = documents.filtered(lambda d: not d.certificate_id)
+        if without_certificate:
+            raise UserError(_("Los siguientes documentos no tienen certificado digital: %s") % (
+                ', '.join(without_certificate.mapped('name'))))
+
+        builders = {}
+        max_workers = self._get_signature_workers()
+        generated = self.browse()
+        with self._buffered_log(_('Generación y firma por lote')), ExitStack() as stack:
+            # Un solo pool para validar y firmar todos los bloques
+            executor = stack.enter_context(process_pool(max_workers)) if max_workers > 1 else None
+            for batch in split_every(ELECTRONIC_BATCH_SIZE, documents.ids, self.browse):
+                batch = batch.filtered(lambda document: document._check_required_data())
+                if not batch:
+                    continue
+                batch._assign_dian_numbers()
+
+                built = {}
+                for document in batch:
+                    company = document.company_id
+                    if company not in builders:
+                        builders[company] = NominaIndividualBuilder(company)
+                    builder = builders[company]
+
+                    root = builder.build(document)
+                    cude = document._add_cude(root)
+                    built[document] = (cude, builder.tostring(root))
+
+                unsigned = {}
+                schema_errors = validate_documents(
+                    [content for _cude, content in built.values()], max_workers=max_workers, executor=executor)
+                for (document, (cude, content)), errors in zip(built.items(), schema_errors):
+                    if errors:
+                        document.xml_validation_errors = self._format_schema_errors(errors)
+                        document._create_log('error', _('El documento no pasa la validación estructural interna:\n%s') % (
+                            document.xml_validation_errors))
+                        continue
+                    unsigned[document] = content
+                    document.write({
+                        'dian_cude': cude,
+                        'xml_signed_filename': f"NE_{document.company_id.vat}_{document.dian_number}_signed.xml",
+                        'xml_validation_errors': False,
+                        'state': 'generated',
+                    })
+                if not unsigned:
+                    continue
+                batch = self.browse([document.id for document in unsigned])
+                generated |= batch
+
+                signed = {}
+                for certificate, certificate_documents in groupby(unsigned, key=lambda d: d.certificate_id):
+                    signed_contents = sign_documents(
+                        [unsigned[document] for document in certificate_documents],
+                        certificate._get_key_material().signer, max_workers=max_workers, executor=executor)
+                    signed.update(zip(
+                        [document.id for document in certificate_documents], signed_contents))
+                batch._store_xml_payloads('xml_signed_file', signed)
+
+                batch._create_log('generate', _('Documento generado y firmado en lote'))
+                _logger.info("Nómina electrónica: %s documentos generados y firmados", len(batch))
+
+        return generated
+    
+    @api.model
+    def _get_grouping(self):
+        """Agrupación de los documentos: 'month' (empleado y mes) o 'payslip' (nómina)"""
+        return self.env['ir.config_parameter'].sudo().get_param(
+            'nomina_colombia.electronic_payroll_grouping', 'month')
+    
+    @api.model
+    def _read_concept_values(self, line_domain, key):
+        """
+        Suma en una sola consulta agrupada las líneas de nómina por concepto DIAN
+
+        :param line_domain: Dominio sobre hr.payslip.line
+        :param key: Campo de agrupación de las líneas ('employee_id' o 'slip_id')
+        :return: Diccionario {registro de la clave: (vector de conceptos, nóminas)}
+        :raise UserError: Si alguna regla no tiene concepto DIAN asignado
+        """
+        PayslipLine = self.env['hr.payslip.line']
+        PayslipLine.flush_model([key, 'slip_id', 'code', 'total'])
+        groups = PayslipLine._read_group(
+            domain=line_domain,
+            groupby=[key, 'code'],
+            aggregates=['total:sum', 'slip_id:recordset'])
+        unmapped = unmapped_rule_codes(code for _record, code, _total, _payslips in groups)
+        if unmapped:
+            raise UserError(_(
+                "Las reglas salariales %(codes)s no tienen un concepto DIAN asignado. Asígnelas en el "
+                "mapa de conceptos de nómina electrónica o márquelas como no reportadas.") % {
+                    'codes': ', '.join(unmapped)})
+        
+        result = defaultdict(lambda: ({}, self.env['hr.payslip']))
+        for record, code, total, payslips in groups:
+            concepts, slips = result[record]
+            add_rule_total(concepts, code, total)
+            result[record] = (concepts, slips | payslips)
+
+        for concepts, payslips in result.values():
+            concepts[WORKED_DAYS_CONCEPT] = min(sum(payslips.mapped('worked_days')), MAX_WORKED_DAYS)
+        return dict(result)
+    
+    @api.model
+    def _get_month_bounds(self, day):
+        """Primer y último día del mes de una fecha"""
+        month_start = day.replace(day=1)
+        return month_start, month_start + relativedelta(months=1, days=-1)
+    
+    @api.model
+    def _get_month_line_domain(self, company, day, employees=None):
+        """Dominio de las líneas de las nóminas confirmadas del mes"""
+        month_start, month_end = self._get_month_bounds(day)
+        domain = [
+            ('slip_id.state', '=', 'done'),
+            ('slip_id.company_id', '=', company.id),
+            ('slip_id.date_to', '>=', month_start),
+            ('slip_id.date_to', '<=', month_end),
+        ]
+        if employees is not None:
+            domain.append(('employee_id', 'in', employees.ids))
+        return domain
+    
+    @api.model
+    def _aggregate_month(self, company, day, employees=None):
+        """
+        Crea un único documento por empleado con las nóminas confirmadas del mes
+
+        Las líneas de todas las nóminas del mes (quincenas, vacaciones, primas)
+        se suman por empleado y concepto DIAN en una sola consulta agrupada.
+        Los documentos en borrador del mes se actualizan con los nuevos
+        valores; los que ya se generaron o enviaron no se tocan. Las nóminas
+        que estos no cubren (por ejemplo, la segunda quincena confirmada
+        después de generar el documento) quedan en pending_payslip_ids del
+        documento y en su log, para reportarlas con una nota de ajuste.
+
+        :param company: Compañía
+        :param day: Cualquier día del mes
+        :param employees: Empleados a procesar (por defecto, todos)
+        :return: Documentos hr.electronic.payroll creados o actualizados
+        """
+        month_start, month_end = self._get_month_bounds(day)
+        domain = self._get_month_line_domain(company, day, employees) + [
+            '|', ('slip_id.electronic_payroll_id', '=', False),
+            ('slip_id.electronic_payroll_id.period_start', '=', month_start),
+        ]
+        aggregated = self._read_concept_values(domain, 'employee_id')
+        if not aggregated:
+            return self.browse()
+
+        existing = {document.employee_id: document for document in self.search([
+            ('company_id', '=', company.id),
+            ('employee_id', 'in', [employee.id for employee in aggregated]),
+            ('period_start', '=', month_start),
+            ('is_adjustment_note', '=', False),
+            ('state', '!=', 'cancelled'),
+        ])}
+
+        documents = self.browse()
+        vals_list = []
+        for employee, (concepts, payslips) in aggregated.items():
+            latest = payslips.sorted(lambda p: (p.date_to, p.id))[-1]
+            vals = {
+                'payslip_id': latest.id,
+                'payslip_ids': [(6, 0, payslips.ids)],
+                'concept_values': concepts,
+            }
+            document = existing.get(employee)
+            if not document:
+                vals.update({
+                    'employee_id': employee.id,
+                    'date': month_end,
+                    'period_start': month_start,
+                    'period_end': month_end,
+                    'company_id': company.id,
+                    'state': 'draft',
+                })
+                vals_list.append(vals)
+            elif document.state == 'draft':
+                document.write(vals)
+                documents |= document
+            else:
+                pending = payslips - document.payslip_ids - document.pending_payslip_ids
+                if pending:
+                    document.pending_payslip_ids = [(4, payslip.id) for payslip in pending]
+                    document._create_log('other', _(
+                        'Nóminas confirmadas después de generar el documento, pendientes de nota de '
+                        'ajuste: %(payslips)s') % {'payslips': ', '.join(pending.mapped('name'))})
+                    _logger.warning("Nómina electrónica %s ya generada: %s nóminas de %s quedan pendientes de ajuste",
+                                    document.name, len(pending), employee.name)
+        documents |= self.create(vals_list)
+
+        for document in documents:
+            document.payslip_ids.write({
+                'electronic_payroll_id': document.id,
+                'electronic_payroll_status': 'generated',
+            })
+        return documents
+    
+    @api.model
+    def _generate_adjustment_notes(self, company, day, employees=None, reason=None, send=True):
+        """
+        Genera en lote las notas de ajuste de un mes contra los documentos aceptados
+
+        El vector de conceptos de cada empleado se recalcula con una sola
+        consulta agrupada y se compara con el del último documento aceptado
+        del mes. Solo donde algún valor cambió se crea una nota de reemplazo;
+        si el empleado ya no tiene nóminas confirmadas en el mes, una nota de
+        eliminación. Las notas se generan, firman y encolan en el outbox igual
+        que los documentos estándar.
+
+        :param company: Compañía
+        :param day: Cualquier día del mes
+        :param employees: Empleados a revisar (por defecto, todos los del mes)
+        :param reason: Motivo del ajuste
+        :param send: Encolar las notas generadas para envío a la DIAN
+        :return: Notas de ajuste creadas
+        """
+        month_start, month_end = self._get_month_bounds(day)
+        domain = [
+            ('company_id', '=', company.id),
+            ('period_start', '=', month_start),
+            ('state', '=', 'accepted'),
+        ]
+        if employees is not None:
+            domain.append(('employee_id', 'in', employees.ids))
+
+        # Último documento aceptado de cada empleado: el que reportó los valores vigentes
+        current = {}
+        for document in self.search(domain, order='id'):
+            current[document.employee_id] = document
+        current = {employee: document for employee, document in current.items()
+                   if document.dian_operation_type != '30'}
+        if not current:
+            return self.browse()
+
+        # Los documentos con una nota en curso se ajustan cuando esta se resuelva
+        pending = self.search([
+            ('original_electronic_payroll_id', 'in', [document.id for document in current.values()]),
+            ('state', 'in', ['draft', 'generated', 'sent']),
+        ]).original_electronic_payroll_id
+
+        recomputed = self._read_concept_values(
+            self._get_month_line_domain(company, day, self.env['hr.employee'].browse(
+                [employee.id for employee in current])), 'employee_id')
+
+        reason = reason or _('Ajuste de la nómina de %(month)s') % {'month': month_start.strftime('%Y-%m')}
+        vals_list = []
+        for employee, document in current.items():
+            if document in pending:
+                _logger.info("Nómina electrónica %s tiene una nota de ajuste en curso", document.name)
+                continue
+            if not document.concept_values:
+                _logger.warning("Nómina electrónica %s no tiene conceptos guardados: no se puede comparar",
+                                document.name)
+                continue
+            if employee not in recomputed:
+                vals_list.append(document._prepare_adjustment_note_vals(
+                    '30', document.concept_values, document._get_payslips(), reason))
+                continue
+            concepts, payslips = recomputed[employee]
+            if diff_concepts(document.concept_values, concepts):
+                vals_list.append(document._prepare_adjustment_note_vals('20', concepts, payslips, reason))
+        notes = self.create(vals_list)
+        if not notes:
+            return notes
+        # Las nóminas pendientes quedan cubiertas por las notas
+        notes.original_electronic_payroll_id.write({'pending_payslip_ids': [(5, 0, 0)]})
+
+        generated = notes._generate_batch()
+        if send and generated:
+            self.env['hr.electronic.payroll.outbox']._enqueue(generated)
+        _logger.info("Nómina electrónica: %s notas de ajuste para %s documentos aceptados",
+                     len(notes), len(current))
+        return notes
+    
+    def _prepare_adjustment_note_vals(self, operation_type, concepts, payslips, reason):
+        """
+        Valores de una nota de ajuste sobre este documento
+
+        :param operation_type: '20' (reemplazo) o '30' (eliminación)
+        :param concepts: Vector de conceptos de la nota
+        :param payslips: Nóminas que cubre la nota
+        :param reason: Motivo del ajuste
+        :return: Diccionario para create
+        """
+        self.ensure_one()
+        vals = {field_name: self[field_name] for field_name in ADJUSTMENT_NOTE_COPY_FIELDS}
+        vals = self._convert_to_write(vals)
+        vals.update({
+            'payslip_id': payslips.sorted(lambda p: (p.date_to, p.id))[-1].id,
+            'payslip_ids': [(6, 0, payslips.ids)],
+            'employee_id': self.employee_id.id,
+            'company_id': self.company_id.id,
+            'date': fields.Date.context_today(self),
+            'period_start': self.period_start,
+            'period_end': self.period_end,
+            'dian_operation_type': operation_type,
+            'is_adjustment_note': True,
+            'original_electronic_payroll_id': self.id,
+            'adjustment_reason': reason,
+            'concept_values': concepts,
+            'state': 'draft',
+        })
+        return vals
+    
+    def _get_payslips(self):
+        """Nóminas que cubre el documento"""
+        self.ensure_one()
+        return self.payslip_ids or self.payslip_id
+    
+    def _get_concept_values(self):
+        """
+        Vector de conceptos DIAN del documento
+
+        Si no se guardó al crear el documento, se calcula de sus nóminas.
+        """
+        self.ensure_one()
+        if self.concept_values:
+            return self.concept_values
+        payslips = self._get_payslips()
+        concepts, _payslips = self._read_concept_values(
+            [('slip_id', 'in', payslips.ids)], 'employee_id').get(
+            self.employee_id, ({WORKED_DAYS_CONCEPT: 0}, payslips))
+        return concepts
     
     def _calculate_cude(self):
         """
@@ -737,7 +1257,7 @@ class HrElectronicPayroll(models.Model):
             f"{self.company_id.vat}"
             f"{self.dian_number}"
             f"{self.date.strftime('%Y-%m-%d')}"
-            f"{self.payslip_id.net}"
+            f"{sum(self._get_payslips().mapped('net'))}"
             f"{self.employee_id.identification_id}"
             f"{self.software_id}"
             f"{self.technical_key}"
@@ -748,78 +1268,315 @@ class HrElectronicPayroll(models.Model):
         
         return cude
     
-    def _send_to_dian(self, xml_content):
+    def _get_dian_url(self):
         """
-        Envía el XML a la DIAN
+        URL del servicio web de la DIAN según el ambiente del documento
         """
         self.ensure_one()
-        
-        # Configuración del servicio web de la DIAN
         if self.dian_environment == '1':
             # URL de producción
-            url = self.company_id.dian_payroll_url_production
-        else:
-            # URL de pruebas
-            url = self.company_id.dian_payroll_url_test
-        
-        # Preparar la solicitud
-        headers = {
-            'Content-Type': 'application/xml',
-            'Accept': 'application/xml'
+            return self.company_id.dian_payroll_url_production
+        # URL de pruebas
+        return self.company_id.dian_payroll_url_test
+    
+    def _get_signed_payloads(self):
+        """
+        Lee el XML firmado de los documentos directamente de sus adjuntos
+
+        :return: Diccionario {id del documento: XML firmado en bytes}
+        """
+        return self._read_xml_payloads('xml_signed_file')
+    
+    @api.model
+    def _get_xml_storage_codec(self):
+        """Algoritmo de compresión de los XML (zstd, gzip o none)"""
+        return available_codec(self.env['ir.config_parameter'].sudo().get_param(
+            'nomina_colombia.xml_storage_codec', DEFAULT_CODEC))
+    
+    def _get_xml_attachments(self, fnames):
+        return self.env['ir.attachment'].sudo().search([
+            ('res_model', '=', self._name),
+            ('res_field', 'in', list(fnames)),
+            ('res_id', 'in', self._origin.ids),
+        ])
+    
+    def _read_xml_payloads(self, fname):
+        """
+        Lee y descomprime el XML de un campo directamente de los adjuntos
+
+        :param fname: Campo XML (ver XML_STORAGE_FIELDS)
+        :return: Diccionario {id del documento: XML en bytes}
+        """
+        return {
+            attachment.res_id: decompress(attachment.raw)
+            for attachment in self._get_xml_attachments([fname]) if attachment.raw
         }
-        
-        # Enviar la solicitud
+    
+    def _store_xml_payloads(self, fname, payloads):
+        """
+        Guarda el XML de un campo comprimido en adjuntos, sin pasar por base64
+
+        :param fname: Campo XML (ver XML_STORAGE_FIELDS)
+        :param payloads: Diccionario {id del documento: XML en bytes, o False para borrarlo}
+        """
+        documents = self.browse(list(payloads))
+        codec = self._get_xml_storage_codec()
+        filename_field = XML_STORAGE_FIELDS[fname]
+        Attachment = self.env['ir.attachment'].sudo()
+        documents._get_xml_attachments([fname]).unlink()
+        Attachment.create([{
+            'name': document[filename_field] or fname,
+            'res_model': self._name,
+            'res_field': fname,
+            'res_id': document.id,
+            'type': 'binary',
+            'mimetype': CODEC_MIMETYPES[codec],
+            'raw': compress(payloads[document.id], codec),
+        } for document in documents if payloads[document.id]])
+        documents.invalidate_recordset([fname])
+        documents.modified([fname])
+    
+    @contextmanager
+    def _open_xml_payload(self, fname):
+        """
+        Abre el XML de un campo como archivo que se descomprime a medida que se
+        lee, sin cargar el adjunto completo en memoria cuando está en el filestore
+
+        Uso::
+
+            with document._open_xml_payload('xml_file') as stream:
+                root = etree.parse(stream).getroot()
+        """
+        self.ensure_one()
+        attachment = self._get_xml_attachments([fname])[:1]
+        if not attachment:
+            raise UserError(_("El documento %s no tiene %s.") % (self.name, self._fields[fname].string))
+        with self._open_xml_attachment(attachment) as fileobj, open_stream(fileobj) as stream:
+            yield stream
+    
+    @api.model
+    def _open_xml_attachment(self, attachment):
+        """Abre el contenido comprimido de un adjunto, del filestore si está allí"""
+        if attachment.store_fname:
+            return open(attachment._full_path(attachment.store_fname), 'rb')
+        return io.BytesIO(attachment.raw)
+    
+    @api.model
+    def _parse_dian_response(self, content):
+        """
+        Interpreta la respuesta del servicio web de la DIAN
+
+        :param content: Cuerpo de la respuesta en bytes
+        :return: Diccionario con el resultado del envío
+        """
+        response_xml = content.decode('utf-8', errors='replace')
+        namespaces = {'b': 'http://schemas.datacontract.org/2004/07/DianResponse'}
         try:
-            response = requests.post(url, data=xml_content, headers=headers, timeout=30)
-            response.raise_for_status()
-        except requests.exceptions.RequestException as e:
-            # Registrar error
-            self._create_log('error', _('Error al enviar a DIAN: %s') % str(e))
+            root = etree.fromstring(content)
+        except etree.XMLSyntaxError as e:
             return {
                 'is_valid': False,
                 'status_code': 'ERROR',
-                'status_description': str(e),
+                'status_description': _('Error al procesar respuesta'),
                 'error_message': str(e),
-                'response_xml': '',
-                'transaction_id': '',
-            }
-        
-        # Procesar la respuesta
-        try:
-            response_xml = response.text
-            root = ET.fromstring(response_xml)
-            
-            # Extraer información de la respuesta
-            status_code = root.find('.//b:StatusCode', namespaces={'b': 'http://schemas.datacontract.org/2004/07/DianResponse'})
-            status_description = root.find('.//b:StatusDescription', namespaces={'b': 'http://schemas.datacontract.org/2004/07/DianResponse'})
-            transaction_id = root.find('.//b:XmlDocumentKey', namespaces={'b': 'http://schemas.datacontract.org/2004/07/DianResponse'})
-            
-            status_code_text = status_code.text if status_code is not None else 'UNKNOWN'
-            status_description_text = status_description.text if status_description is not None else 'Desconocido'
-            transaction_id_text = transaction_id.text if transaction_id is not None else ''
-            
-            # Determinar si es válido
-            is_valid = status_code_text == '00'
-            
-            return {
-                'is_valid': is_valid,
-                'status_code': status_code_text,
-                'status_description': status_description_text,
-                'error_message': '' if is_valid else status_description_text,
                 'response_xml': response_xml,
-                'transaction_id': transaction_id_text,
-            }
-        except Exception as e:
-            # Registrar error
-            self._create_log('error', _('Error al procesar respuesta de DIAN: %s') % str(e))
-            return {
-                'is_valid': False,
-                'status_code': 'ERROR',
-                'status_description': 'Error al procesar respuesta',
-                'error_message': str(e),
-                'response_xml': response.text,
                 'transaction_id': '',
             }
+        
+        # Extraer información de la respuesta
+        status_code_text = root.findtext('.//b:StatusCode', 'UNKNOWN', namespaces=namespaces)
+        status_description_text = root.findtext('.//b:StatusDescription', 'Desconocido', namespaces=namespaces)
+        transaction_id_text = root.findtext('.//b:XmlDocumentKey', '', namespaces=namespaces)
+        
+        # Determinar si es válido
+        is_valid = status_code_text == '00'
+        
+        return {
+            'is_valid': is_valid,
+            'status_code': status_code_text,
+            'status_description': status_description_text,
+            'error_message': '' if is_valid else status_description_text,
+            'response_xml': response_xml,
+            'transaction_id': transaction_id_text,
+        }
+    
+    def _mark_sent(self, vals=None):
+        """
+        Marca los documentos como enviados y programa su primera consulta de estado
+
+        :param vals: Valores adicionales a escribir (por ejemplo, el ZipKey)
+        """
+        next_check = fields.Datetime.now() + timedelta(seconds=STATUS_FIRST_CHECK_DELAY)
+        self.write(dict(vals or {}, state='sent', dian_status_next_check=next_check, dian_status_check_count=0))
+        self.env.ref('nomina_colombia.ir_cron_electronic_payroll_status')._trigger(at=next_check)
+        return True
+    
+    @api.model
+    def _cron_poll_dian_status(self, time_limit=STATUS_POLL_CRON_TIME_LIMIT):
+        """
+        Consulta el estado de los documentos enviados cuya consulta está vencida.
+
+        Cada bloque se reclama con FOR UPDATE SKIP LOCKED y se confirma en su
+        propia transacción. Los documentos que llegan a un estado final dejan
+        de consultarse; los que siguen en validación se reprograman con espera
+        exponencial, de modo que un documento nunca ocupa un proceso esperando.
+        Si se agota el tiempo con consultas vencidas pendientes, el cron se
+        programa de nuevo de inmediato.
+        """
+        deadline = time.monotonic() + time_limit
+        polled = 0
+        while time.monotonic() < deadline:
+            documents = self._claim_status_batch()
+            if not documents:
+                break
+            documents._poll_dian_status()
+            self.env.cr.commit()
+            polled += len(documents)
+
+        if polled and self._has_due_status_checks():
+            self.env.ref('nomina_colombia.ir_cron_electronic_payroll_status')._trigger()
+        return polled
+    
+    @api.model
+    def _has_due_status_checks(self):
+        return bool(self.search_count([
+            ('state', '=', 'sent'), ('dian_status_next_check', '<=', fields.Datetime.now())], limit=1))
+    
+    @api.model
+    def _claim_status_batch(self, limit=STATUS_POLL_BATCH_SIZE):
+        """Bloquea y retorna los documentos enviados con consulta de estado vencida"""
+        self.flush_model(['state', 'dian_status_next_check'])
+        self.env.cr.execute("""
+            SELECT id
+              FROM hr_electronic_payroll
+             WHERE state = 'sent'
+               AND dian_status_next_check <= %s
+          ORDER BY dian_status_next_check, dian_zip_key, id
+             LIMIT %s
+               FOR UPDATE SKIP LOCKED
+        """, [fields.Datetime.now(), limit])
+        return self.browse([row[0] for row in self.env.cr.fetchall()])
+    
+    def _poll_dian_status(self):
+        """
+        Consulta el estado de los documentos: una solicitud GetStatusZip por
+        ZipKey y una GetStatus por documento enviado de forma individual
+        """
+        groups = []
+        items = []
+        for (url, zip_key), documents in groupby(self, key=lambda d: (d._get_dian_url(), d.dian_zip_key)):
+            if zip_key:
+                batches = [self.browse([document.id for document in documents])]
+            else:
+                batches = list(documents)
+            for batch in batches:
+                track_id = zip_key or batch.dian_transaction_id or batch.dian_cude
+                payload, headers = status_request(track_id, url, zip_status=bool(zip_key))
+                groups.append(batch)
+                items.append(DispatchItem(len(items), url, payload, track_id, headers, idempotent=True))
+        results = self.env['hr.electronic.payroll.outbox']._get_dispatcher().dispatch(items)
+        
+        final = []
+        pending = self.browse()
+        for documents, result in zip(groups, results):
+            statuses = []
+            if result.ok:
+                try:
+                    statuses = parse_status_response(result.content)
+                except etree.XMLSyntaxError as e:
+                    _logger.warning("Respuesta de estado DIAN inválida: %s", e)
+            if len(documents) == 1 and not documents.dian_zip_key:
+                by_document = {documents.id: statuses[0]} if statuses else {}
+            else:
+                by_key = {status['document_key']: status for status in statuses}
+                by_file = {status['filename']: status for status in statuses}
+                by_document = {}
+                for document in documents:
+                    filename = document.xml_signed_filename or ''
+                    status = (by_key.get(document.dian_cude) or by_file.get(filename)
+                              or by_file.get(filename.rsplit('.', 1)[0]))
+                    if status:
+                        by_document[document.id] = status
+            for document in documents:
+                status = by_document.get(document.id)
+                if status and status['final']:
+                    final.append((document, status))
+                else:
+                    pending |= document
+        
+        with self._buffered_log(_('Consulta de estado DIAN'), summary=True):
+            self._apply_dian_statuses(final)
+            pending._reschedule_status_check()
+            self.browse([document.id for document, _status in final])._generate_accepted_pdfs()
+        _logger.info("Consulta de estado DIAN: %s documentos consultados en %s solicitudes, %s finalizados",
+                     len(self), len(items), len(final))
+    
+    def _apply_dian_statuses(self, statuses):
+        """
+        Guarda el estado final de los documentos con escrituras agrupadas
+
+        :param statuses: Lista de tuplas (documento, estado de parse_status_response)
+        """
+        if not statuses:
+            return
+        for (code, description), group in groupby(
+                statuses, key=lambda item: (item[1]['status_code'], item[1]['status_description'])):
+            self.browse([document.id for document, _status in group]).write({
+                'state': 'accepted' if code == DIAN_ACCEPTED_CODE else 'rejected',
+                'dian_response_code': code,
+                'dian_response_description': description,
+                'dian_status_next_check': False,
+            })
+        
+        # El identificador de la transacción es distinto en cada documento
+        rows = [(document.id, status['document_key']) for document, status in statuses if status['document_key']]
+        if rows:
+            self.flush_model(['dian_transaction_id'])
+            self.env.cr.execute("""
+                UPDATE hr_electronic_payroll d
+                   SET dian_transaction_id = v.transaction_id
+                  FROM (VALUES %s) AS v(id, transaction_id)
+                 WHERE d.id = v.id
+            """ % ', '.join(['%s'] * len(rows)), rows)
+            self.browse([row[0] for row in rows]).invalidate_recordset(['dian_transaction_id'])
+        
+        for document, status in statuses:
+            if document.state == 'accepted':
+                document._create_log('send', _('Documento aceptado por DIAN'))
+            else:
+                document._create_log('send', _('Documento rechazado por DIAN: %s') % status['status_description'])
+    
+    def _generate_accepted_pdfs(self):
+        """
+        Genera el PDF de los documentos aceptados, cada uno en su savepoint: un
+        error en el reporte queda en el registro del documento y no revierte
+        el estado DIAN ya guardado
+        """
+        for document in self.filtered(lambda d: d.state == 'accepted'):
+            try:
+                with self._log_savepoint():
+                    document.action_generate_pdf()
+            except Exception as e:
+                _logger.exception("Error generando el PDF de la nómina electrónica %s", document.name)
+                document._create_log('error', _('No se pudo generar el PDF: %s') % e)
+    
+    def _reschedule_status_check(self):
+        """Programa la siguiente consulta de los documentos que siguen en validación"""
+        now = fields.Datetime.now()
+        for count, group in groupby(self, key=lambda d: d.dian_status_check_count + 1):
+            documents = self.browse([document.id for document in group])
+            if count >= STATUS_MAX_CHECKS:
+                documents.write({'dian_status_check_count': count, 'dian_status_next_check': False})
+                for document in documents:
+                    document._create_log('error', _(
+                        'La DIAN no reportó un estado final después de %s consultas') % count)
+                continue
+            documents.write({
+                'dian_status_check_count': count,
+                # La espera base es el mínimo para no volver a reclamarlos en la misma ejecución
+                'dian_status_next_check': now + timedelta(seconds=STATUS_CHECK_BACKOFF_BASE + backoff_delay(
+                    count, STATUS_CHECK_BACKOFF_BASE, STATUS_CHECK_BACKOFF_MAX)),
+            })
     
     def _create_cancellation_note(self):
         """
@@ -861,7 +1618,16 @@ class HrElectronicPayroll(models.Model):
     def _create_log(self, action_type, description):
         """
         Crea un registro en el log de eventos
+
+        Dentro de _buffered_log el evento solo se acumula en memoria y se
+        registra al final de la operación.
         """
+        buffer = self.env.cr.cache.get(LOG_BUFFER_CACHE_KEY)
+        if buffer is not None:
+            now = fields.Datetime.now()
+            buffer.extend((document.id, action_type, description, now) for document in self)
+            return True
+        
         self.ensure_one()
         
         self.env['hr.electronic.payroll.log'].create({
@@ -872,10 +1638,133 @@ class HrElectronicPayroll(models.Model):
             'description': description,
         })
         
-        # Agregar mensaje al chatter
-        self.message_post(body=description)
+        # Agregar mensaje al chatter, solo si las notas por documento están activas
+        if self._log_document_notes_enabled():
+            self.message_post(body=description)
         
         return True
+    
+    @api.model
+    def _log_document_notes_enabled(self):
+        """Indica si los eventos del log también se publican como nota en cada documento"""
+        return tools.str2bool(self.env['ir.config_parameter'].sudo().get_param(
+            'nomina_colombia.electronic_payroll_document_notes', 'False'))
+    
+    def _get_log_summary_target(self):
+        """Registro con chatter que recibe el resumen del documento: su lote de nómina o la compañía"""
+        self.ensure_one()
+        run = self.payslip_id.payslip_run_id
+        if run and hasattr(run, 'message_post'):
+            return run
+        return self.company_id.partner_id
+    
+    @contextmanager
+    def _buffered_log(self, title, run=None, summary=False):
+        """
+        Acumula los eventos de una operación masiva y los registra al final
+
+        Mientras el contexto está abierto, _create_log solo guarda los eventos
+        en memoria. Al salir, los registros del log se insertan en un solo
+        create y, si se indica, el registro run recibe un mensaje con el
+        resumen de la operación. Las notas por documento (una por documento,
+        sin seguidores ni notificaciones) solo se publican si el parámetro
+        nomina_colombia.electronic_payroll_document_notes está activo. Los
+        contextos anidados comparten el buffer del más externo. Los savepoints
+        abiertos dentro del contexto deben usar _log_savepoint, que descarta
+        los eventos acumulados dentro del savepoint si este se revierte.
+
+        :param title: Título del resumen
+        :param run: Registro con chatter donde publicar el resumen (por ejemplo, el lote)
+        :param summary: Sin run, publica un resumen en el lote o la compañía de
+                        cada documento; lo usan los crons
+        """
+        cache = self.env.cr.cache
+        if LOG_BUFFER_CACHE_KEY in cache:
+            yield cache[LOG_BUFFER_CACHE_KEY]
+            return
+        buffer = cache[LOG_BUFFER_CACHE_KEY] = []
+        try:
+            yield buffer
+        finally:
+            cache.pop(LOG_BUFFER_CACHE_KEY, None)
+        self._flush_log_buffer(buffer, title, run, summary)
+    
+    @api.model
+    @contextmanager
+    def _log_savepoint(self):
+        """
+        Abre un savepoint; si se revierte, descarta del buffer de _buffered_log
+        los eventos registrados dentro de él, como la base de datos descarta
+        sus escrituras
+        """
+        buffer = self.env.cr.cache.get(LOG_BUFFER_CACHE_KEY)
+        mark = len(buffer) if buffer is not None else 0
+        try:
+            with self.env.cr.savepoint():
+                yield
+        except Exception:
+            if buffer is not None:
+                del buffer[mark:]
+            raise
+    
+    @api.model
+    def _flush_log_buffer(self, events, title, run=None, summary=False):
+        """
+        Registra los eventos acumulados con escrituras agrupadas
+
+        :param events: Lista de tuplas (id del documento, tipo, descripción, fecha)
+        :param title: Título del resumen
+        :param run: Registro donde publicar el resumen
+        :param summary: Publicar el resumen en el lote o la compañía de cada documento
+        """
+        if not events:
+            return
+        user_id = self.env.user.id
+        self.env['hr.electronic.payroll.log'].create([{
+            'electronic_payroll_id': document_id,
+            'date': date,
+            'user_id': user_id,
+            'action_type': action_type,
+            'description': description,
+        } for document_id, action_type, description, date in events])
+        
+        groups = dict(groupby(events, key=lambda event: event[0]))
+        if self._log_document_notes_enabled():
+            bodies = {
+                document_id: Markup('<p>%s</p><ul>%s</ul>') % (
+                    title, Markup().join(Markup('<li>%s</li>') % event[2] for event in group))
+                for document_id, group in groups.items()
+            }
+            self.browse(list(bodies))._message_log_batch(bodies=bodies)
+        
+        if run and hasattr(run, 'message_post'):
+            self._post_log_summary(run, title, events)
+        elif summary:
+            by_target = defaultdict(list)
+            for document in self.browse(list(groups)):
+                by_target[document._get_log_summary_target()].extend(groups[document.id])
+            for target, target_events in by_target.items():
+                self._post_log_summary(target, title, target_events)
+        _logger.info("Nómina electrónica: %s eventos registrados para %s documentos (%s)",
+                     len(events), len(groups), title)
+    
+    @api.model
+    def _post_log_summary(self, target, title, events):
+        """
+        Publica en target un mensaje con la cantidad de eventos por tipo
+
+        :param target: Registro con chatter
+        :param title: Título del resumen
+        :param events: Lista de tuplas (id del documento, tipo, descripción, fecha)
+        """
+        counts = defaultdict(int)
+        for event in events:
+            counts[event[1]] += 1
+        labels = dict(self.env['hr.electronic.payroll.log']._fields['action_type']._description_selection(self.env))
+        target.message_post(body=Markup('<p>%s</p><ul>%s</ul>') % (
+            _('%(title)s: %(count)s documentos') % {'title': title, 'count': len({event[0] for event in events})},
+            Markup().join(Markup('<li>%s: %s</li>') % (labels.get(action_type, action_type), count)
+                          for action_type, count in counts.items())))
 
 
 class HrElectronicPayrollLog(models.Model):
@@ -984,37 +1873,66 @@ class HrElectronicCertificate(models.Model):
             else:
                 record.state = 'draft'
     
-    @api.model
-    def create(self, vals):
-        record = super(HrElectronicCertificate, self).create(vals)
-        record._extract_certificate_info()
-        return record
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super(HrElectronicCertificate, self).create(vals_list)
+        records._extract_certificate_info()
+        return records
     
     def write(self, vals):
         result = super(HrElectronicCertificate, self).write(vals)
         if 'certificate_file' in vals or 'password' in vals:
+            # La llave en caché corresponde al archivo anterior
+            self.env.registry.clear_cache()
+            forget_private_keys(self.ids)
             self._extract_certificate_info()
         return result
     
+    def unlink(self):
+        key_ids = self.ids
+        result = super(HrElectronicCertificate, self).unlink()
+        self.env.registry.clear_cache()
+        forget_private_keys(key_ids)
+        return result
+    
+    @tools.ormcache('self.id')
+    def _get_key_material(self):
+        """
+        Interpreta el archivo PKCS#12 una sola vez por proceso y guarda la
+        llave y la cadena de certificados en la caché hasta que se modifique
+        el archivo o la contraseña
+
+        :return: KeyMaterial con el certificado, la cadena y el SignerMaterial
+        """
+        self.ensure_one()
+        certificate = self.sudo()
+        if not certificate.certificate_file:
+            raise UserError(_("El certificado %s no tiene archivo.") % certificate.name)
+        try:
+            return load_key_material(
+                base64.b64decode(certificate.certificate_file), certificate.password, key_id=certificate.id)
+        except ValueError as e:
+            raise UserError(_("No se pudo leer el certificado %(name)s: %(error)s") % {
+                'name': certificate.name, 'error': e})
+    
     def _extract_certificate_info(self):
         """
-        Extrae información del certificado digital
+        Extrae emisor, sujeto y vigencia del certificado digital
         """
         for record in self:
             if not record.certificate_file or not record.password:
                 continue
             
             try:
-                # Aquí iría la lógica para extraer información del certificado
-                # Usando bibliotecas como cryptography o PyOpenSSL
-                # Por ahora, establecemos valores de ejemplo
-                
-                record.issuer = "Autoridad Certificadora"
-                record.subject = f"CN={record.company_id.name}"
-                record.valid_from = fields.Date.today()
-                record.valid_to = fields.Date.today() + timedelta(days=365)
-                
-            except Exception as e:
+                certificate = record._get_key_material().certificate
+                valid_from, valid_to = certificate_validity(certificate)
+                record.write({
+                    'issuer': certificate.issuer.rfc4514_string(),
+                    'subject': certificate.subject.rfc4514_string(),
+                    'valid_from': valid_from.date(),
+                    'valid_to': valid_to.date(),
+                })
+            except UserError as e:
                 record.message_post(body=_("Error al extraer información del certificado: %s") % str(e))
     
     def action_check_validity(self):
@@ -0,0 +1,214 @@
+"""
+Conceptos DIAN del documento NominaIndividual.
+
+Cada código de regla salarial se asigna de forma declarativa a la ruta del
+nodo del documento donde se reporta su valor. El vector de conceptos de un
+documento es un diccionario {ruta: valor} que se obtiene sumando las líneas
+de nómina de todas las nóminas que cubre (quincenas, vacaciones, primas) y
+que el constructor convierte en los nodos Devengados y Deducciones en el
+orden del esquema XSD.
+
+Toda regla salarial debe tener un concepto en RULE_CONCEPT_MAP o estar en
+NON_REPORTED_RULE_CODES (aportes del empleador, provisiones y totales): una
+regla sin concepto asignado detiene la generación en lugar de omitirse.
+"""
+DEVENGADOS = 'Devengados'
+DEDUCCIONES = 'Deducciones'
+
+WORKED_DAYS_CONCEPT = 'Devengados/Basico/DiasTrabajados'
+HEALTH_RATE_CONCEPT = 'Deducciones/Salud/Porcentaje'
+PENSION_RATE_CONCEPT = 'Deducciones/FondoPension/Porcentaje'
+
+# Días trabajados máximos de un mes comercial
+MAX_WORKED_DAYS = 30
+
+# Diferencia mínima para considerar que un concepto cambió
+CONCEPT_TOLERANCE = 0.01
+
+# Nodos DIAN de horas extra y recargos, en el orden del esquema:
+# HED extra diurna, HEN extra nocturna, HRN recargo nocturno, HEDDF extra
+# diurna dominical o festiva, HRDDF recargo diurno dominical o festivo, HENDF
+# extra nocturna dominical o festiva y HRNDF recargo nocturno dominical o festivo
+OVERTIME_NODES = ['HED', 'HEN', 'HRN', 'HEDDF', 'HRDDF', 'HENDF', 'HRNDF']
+OVERTIME_CONCEPTS = {node: 'Devengados/%ss/%s/Pago' % (node, node) for node in OVERTIME_NODES}
+
+DISABILITY_CONCEPT = 'Devengados/Incapacidades/Incapacidad/Pago'
+LEAVE_CONCEPT = 'Devengados/Licencias/LicenciaR/Pago'
+
+# Código de regla salarial -> ruta del nodo en el documento
+RULE_CONCEPT_MAP = {
+    'BASIC': 'Devengados/Basico/SueldoTrabajado',
+    'TRANS': 'Devengados/Transporte/AuxilioTransporte',
+    # Horas extra y recargos en el nodo DIAN de su tipo: por el código DIAN,
+    # por el código de los tipos de entrada de trabajo (HEFD, HEFN, RN, RF)
+    # y por los códigos heredados de las reglas
+    **{node: OVERTIME_CONCEPTS[node] for node in OVERTIME_NODES},
+    'HEO': OVERTIME_CONCEPTS['HED'],
+    'RN': OVERTIME_CONCEPTS['HRN'],
+    'HENO': OVERTIME_CONCEPTS['HRN'],
+    'HEFD': OVERTIME_CONCEPTS['HEDDF'],
+    'HEDO': OVERTIME_CONCEPTS['HEDDF'],
+    'RF': OVERTIME_CONCEPTS['HRDDF'],
+    'HEFN': OVERTIME_CONCEPTS['HENDF'],
+    'HEDN': OVERTIME_CONCEPTS['HENDF'],
+    'RNF': OVERTIME_CONCEPTS['HRNDF'],
+    'HENN': OVERTIME_CONCEPTS['HRNDF'],
+    # Horas extra sin tipo: se reportan como diurnas
+    'CO_OVERTIME': OVERTIME_CONCEPTS['HED'],
+    'VACATION': 'Devengados/Vacaciones/VacacionesComunes/Pago',
+    'CO_VACATION': 'Devengados/Vacaciones/VacacionesComunes/Pago',
+    'PRIMA': 'Devengados/Primas/Pago',
+    'CO_PRIMA': 'Devengados/Primas/Pago',
+    'CESANTIAS': 'Devengados/Cesantias/Pago',
+    'CO_CESANTIAS': 'Devengados/Cesantias/Pago',
+    'INT_CESANTIAS': 'Devengados/Cesantias/PagoIntereses',
+    'CO_INT_CESANTIAS': 'Devengados/Cesantias/PagoIntereses',
+    'DISABILITY': DISABILITY_CONCEPT,
+    'CO_DISABILITY': DISABILITY_CONCEPT,
+    'LEAVE': LEAVE_CONCEPT,
+    'CO_LEAVE': LEAVE_CONCEPT,
+    'HEALTH': 'Deducciones/Salud/Deduccion',
+    'SALUD_EMP': 'Deducciones/Salud/Deduccion',
+    'PENSION': 'Deducciones/FondoPension/Deduccion',
+    'PENSION_EMP': 'Deducciones/FondoPension/Deduccion',
+    'RETENCION': 'Deducciones/RetencionFuente',
+    'CO_RETENCION': 'Deducciones/RetencionFuente',
+}
+
+# Reglas que no se reportan en el documento: aportes del empleador,
+# provisiones y totales
+NON_REPORTED_RULE_CODES = frozenset([
+    'ARL', 'SENA', 'ICBF', 'CCF',
+    'SALUD_EMP_EMPRESA', 'PENSION_EMP_EMPRESA',
+    'PRIMA_PROV', 'CES_PROV', 'INT_CES_PROV', 'VAC_PROV',
+    'GROSS', 'NET',
+])
+
+# Rutas de los conceptos en el orden del esquema XSD
+CONCEPT_LAYOUT = [
+    WORKED_DAYS_CONCEPT,
+    'Devengados/Basico/SueldoTrabajado',
+    'Devengados/Transporte/AuxilioTransporte',
+    *[OVERTIME_CONCEPTS[node] for node in OVERTIME_NODES],
+    'Devengados/Vacaciones/VacacionesComunes/Pago',
+    'Devengados/Primas/Pago',
+    'Devengados/Cesantias/Pago',
+    'Devengados/Cesantias/PagoIntereses',
+    DISABILITY_CONCEPT,
+    LEAVE_CONCEPT,
+    HEALTH_RATE_CONCEPT,
+    'Deducciones/Salud/Deduccion',
+    PENSION_RATE_CONCEPT,
+    'Deducciones/FondoPension/Deduccion',
+    'Deducciones/RetencionFuente',
+]
+
+# Conceptos obligatorios en el esquema: se reportan en cero si no hay valor
+REQUIRED_CONCEPTS = {
+    WORKED_DAYS_CONCEPT,
+    'Devengados/Basico/SueldoTrabajado',
+    HEALTH_RATE_CONCEPT,
+    'Deducciones/Salud/Deduccion',
+    PENSION_RATE_CONCEPT,
+    'Deducciones/FondoPension/Deduccion',
+}
+
+# Conceptos que no son valores monetarios y no entran en los totales
+NON_MONETARY_CONCEPTS = {WORKED_DAYS_CONCEPT, HEALTH_RATE_CONCEPT, PENSION_RATE_CONCEPT}
+
+
+def add_rule_total(values, code, total):
+    """
+    Acumula el total de las líneas de una regla en su concepto DIAN
+
+    Las deducciones se registran en la nómina con signo negativo y el
+    documento las reporta en positivo.
+
+    :param values: Vector de conceptos {ruta: valor}
+    :param code: Código de la regla salarial
+    :param total: Total de las líneas de la regla
+    :return: Ruta del concepto, o None si la regla no tiene concepto
+    """
+    path = RULE_CONCEPT_MAP.get(code)
+    if path:
+        amount = -total if path.startswith(DEDUCCIONES + '/') else total
+        values[path] = round(values.get(path, 0.0) + (amount or 0.0), 2)
+    return path
+
+
+def unmapped_rule_codes(codes):
+    """Códigos de regla sin concepto DIAN que tampoco están marcados como no reportados"""
+    return sorted(set(codes) - RULE_CONCEPT_MAP.keys() - NON_REPORTED_RULE_CODES)
+
+
+def concept_totals(values):
+    """
+    Totales del documento
+
+    :param values: Vector de conceptos {ruta: valor}
+    :return: Tupla (total devengados, total deducciones)
+    """
+    devengados = deducciones = 0.0
+    for path, amount in values.items():
+        if path in NON_MONETARY_CONCEPTS:
+            continue
+        if path.startswith(DEVENGADOS + '/'):
+            devengados += amount
+        elif path.startswith(DEDUCCIONES + '/'):
+            deducciones += amount
+    return round(devengados, 2), round(deducciones, 2)
+
+
+def diff_concepts(old, new, tolerance=CONCEPT_TOLERANCE):
+    """
+    Conceptos que cambiaron entre dos vectores
+
+    Un concepto ausente en uno de los vectores se compara como cero.
+
+    :param old: Vector de conceptos reportado
+    :param new: Vector de conceptos recalculado
+    :return: Diccionario {ruta: (valor reportado, valor recalculado)}
+    """
+    changes = {}
+    for path in set(old) | set(new):
+        old_value = old.get(path, 0.0)
+        new_value = new.get(path, 0.0)
+        if abs(new_value - old_value) >= tolerance:
+            changes[path] = (old_value, new_value)
+    return changes
+
+
+def format_concept(path, value):
+    """Texto del nodo: días como entero, porcentajes y valores con dos decimales"""
+    if path == WORKED_DAYS_CONCEPT:
+        return str(int(value))
+    return '%.2f' % value
+
+
+def build_concept_nodes(maker, values):
+    """
+    Arma los nodos Devengados y Deducciones a partir del vector de conceptos
+
+    :param maker: ElementMaker del documento
+    :param values: Vector de conceptos {ruta: valor}
+    :return: Lista con los elementos raíz de los grupos, en orden del esquema
+    """
+    nodes = {}
+    roots = []
+    for path in CONCEPT_LAYOUT:
+        if path not in values and path not in REQUIRED_CONCEPTS:
+            continue
+        parent = None
+        prefix = None
+        for tag in path.split('/'):
+            prefix = '%s/%s' % (prefix, tag) if prefix else tag
+            node = nodes.get(prefix)
+            if node is None:
+                node = nodes[prefix] = maker(tag)
+                if parent is None:
+                    roots.append(node)
+                else:
+                    parent.append(node)
+            parent = node
+        parent.text = format_concept(path, values.get(path, 0.0))
+    return roots
@@ -0,0 +1,139 @@
+"""
+Despachador asíncrono de documentos a los servicios web de la DIAN.
+
+Los documentos de la bandeja de salida se envían desde un bucle asyncio con un
+límite de envíos simultáneos. Las solicitudes HTTP usan una sola sesión de
+requests con un pool de conexiones del tamaño del límite, de modo que las
+conexiones TLS se reutilizan entre documentos; cada solicitud corre en un hilo
+del ejecutor del bucle para no bloquear a las demás.
+
+Los tiempos de espera, los errores de conexión y las respuestas 5xx se
+reintentan con espera exponencial y jitter. El servicio de la DIAN no
+deduplica los envíos, así que un envío solo se repite dentro de la ronda
+cuando la solicitud no alcanzó a procesarse (conexión rechazada o sin
+establecer, respuesta 503). Ante un tiempo de espera de lectura o cualquier
+otro 5xx el documento pudo quedar recibido: el resultado se retorna como
+reintentable y la bandeja consulta su estado por CUDE antes de reenviarlo.
+Las consultas de estado (idempotent) se reintentan en todos los casos.
+"""
+import asyncio
+import random
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+DEFAULT_CONCURRENCY = 8
+DEFAULT_TIMEOUT = 30
+DEFAULT_MAX_ATTEMPTS = 4
+DEFAULT_BACKOFF_BASE = 1.0
+DEFAULT_BACKOFF_MAX = 60.0
+
+# Respuesta con la que el servidor indica que no procesó la solicitud
+HTTP_SERVICE_UNAVAILABLE = 503
+
+# headers: cabeceras propias de la solicitud (por ejemplo, las de un paquete ZIP)
+# idempotent: la solicitud puede repetirse sin efectos (consultas de estado)
+DispatchItem = namedtuple('DispatchItem', ['key', 'url', 'payload', 'cude', 'headers', 'idempotent'],
+                          defaults=(None, False))
+
+DispatchResult = namedtuple('DispatchResult', [
+    'key', 'ok', 'retryable', 'status_code', 'content', 'error', 'attempts', 'duration'])
+
+
+def backoff_delay(attempt, base=DEFAULT_BACKOFF_BASE, maximum=DEFAULT_BACKOFF_MAX):
+    """Espera antes del reintento número `attempt` (exponencial con jitter completo)"""
+    return random.uniform(0, min(maximum, base * 2 ** (attempt - 1)))
+
+
+def _not_sent(error):
+    """El error ocurrió antes de que la solicitud llegara al servidor"""
+    reason = getattr(error.args[0], 'reason', None) if error.args else None
+    return isinstance(error, requests.ConnectTimeout) or isinstance(reason, NewConnectionError)
+
+
+class DianDispatcher:
+    """
+    Envía documentos a la DIAN con concurrencia limitada y reintentos
+
+    Uso::
+
+        dispatcher = DianDispatcher(concurrency=8)
+        results = dispatcher.dispatch([DispatchItem(outbox.id, url, payload, cude), ...])
+    """
+
+    def __init__(self, concurrency=DEFAULT_CONCURRENCY, timeout=DEFAULT_TIMEOUT,
+                 max_attempts=DEFAULT_MAX_ATTEMPTS, backoff_base=DEFAULT_BACKOFF_BASE,
+                 backoff_max=DEFAULT_BACKOFF_MAX):
+        self.concurrency = max(1, concurrency)
+        self.timeout = timeout
+        self.max_attempts = max(1, max_attempts)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+    def _new_session(self):
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.concurrency, pool_maxsize=self.concurrency)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session.headers.update({
+            'Content-Type': 'application/xml',
+            'Accept': 'application/xml',
+        })
+        return session
+
+    def _post(self, session, item):
+        return session.post(item.url, data=item.payload, headers=item.headers, timeout=self.timeout)
+
+    async def _submit(self, loop, executor, session, semaphore, item):
+        start = time.monotonic()
+        attempt = 0
+        while True:
+            attempt += 1
+            status_code = None
+            async with semaphore:
+                try:
+                    response = await loop.run_in_executor(executor, self._post, session, item)
+                except (requests.Timeout, requests.ConnectionError) as e:
+                    error = str(e)
+                    resend = item.idempotent or _not_sent(e)
+                except requests.RequestException as e:
+                    return DispatchResult(item.key, False, False, None, b'', str(e), attempt,
+                                          time.monotonic() - start)
+                else:
+                    status_code = response.status_code
+                    if status_code < 400:
+                        return DispatchResult(item.key, True, False, status_code, response.content, '',
+                                              attempt, time.monotonic() - start)
+                    if status_code < 500:
+                        return DispatchResult(item.key, False, False, status_code, response.content,
+                                              'HTTP %s' % status_code, attempt, time.monotonic() - start)
+                    error = 'HTTP %s' % status_code
+                    resend = item.idempotent or status_code == HTTP_SERVICE_UNAVAILABLE
+
+            if not resend or attempt >= self.max_attempts:
+                return DispatchResult(item.key, False, True, status_code, b'', error, attempt,
+                                      time.monotonic() - start)
+            # La espera ocurre fuera del semáforo para no ocupar un cupo de envío
+            await asyncio.sleep(backoff_delay(attempt, self.backoff_base, self.backoff_max))
+
+    async def _dispatch(self, items):
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor, self._new_session() as session:
+            return await asyncio.gather(*(
+                self._submit(loop, executor, session, semaphore, item) for item in items))
+
+    def dispatch(self, items):
+        """
+        Envía los documentos y espera todas las respuestas
+
+        :param items: Lista de DispatchItem
+        :return: Lista de DispatchResult en el mismo orden
+        """
+        if not items:
+            return []
+        return asyncio.run(self._dispatch(items))
@@ -0,0 +1,241 @@
+from odoo import models, fields, api, tools, _
+from odoo.exceptions import UserError
+from odoo.tools import SQL
+from psycopg2 import errors
+import logging
+
+_logger = logging.getLogger(__name__)
+
+# Código de la secuencia de consecutivos DIAN de nómina electrónica
+DIAN_SEQUENCE_CODE = 'dian.electronic.payroll'
+
+# Espera máxima por la secuencia en la transacción de reserva
+NUMBER_BLOCK_LOCK_TIMEOUT = '5s'
+
+
+class HrElectronicPayrollNumberBlock(models.Model):
+    _name = 'hr.electronic.payroll.number.block'
+    _description = 'Bloque de Consecutivos DIAN'
+    _order = 'id desc'
+
+    sequence_id = fields.Many2one(
+        'ir.sequence', string='Secuencia',
+        required=True, ondelete='restrict', readonly=True)
+
+    company_id = fields.Many2one(
+        'res.company', string='Compañía',
+        required=True, readonly=True, index=True)
+
+    prefix = fields.Char(string='Prefijo DIAN', readonly=True)
+
+    number_from = fields.Integer(string='Desde', required=True, readonly=True)
+    number_to = fields.Integer(string='Hasta', required=True, readonly=True)
+    number_increment = fields.Integer(string='Incremento', default=1, required=True, readonly=True)
+
+    user_id = fields.Many2one(
+        'res.users', string='Usuario',
+        default=lambda self: self.env.user, readonly=True)
+
+    document_ids = fields.One2many(
+        'hr.electronic.payroll', 'dian_number_block_id',
+        string='Documentos', readonly=True)
+
+    size = fields.Integer(string='Números Reservados', compute='_compute_size')
+
+    def _compute_size(self):
+        for block in self:
+            block.size = (block.number_to - block.number_from) // (block.number_increment or 1) + 1
+
+    @api.model
+    def _get_dian_sequence(self, company):
+        """
+        Secuencia de consecutivos DIAN de la compañía
+
+        Los bloques se toman del contador de la secuencia, por lo que no puede
+        tener subsecuencias por rango de fechas.
+        """
+        sequence = self.env['ir.sequence'].sudo().search([
+            ('code', '=', DIAN_SEQUENCE_CODE),
+            ('company_id', 'in', [company.id, False]),
+        ], order='company_id', limit=1)
+
+        if not sequence:
+            raise UserError(_("No se encontró la secuencia para nómina electrónica."))
+        if sequence.use_date_range:
+            raise UserError(_("La secuencia %(name)s de nómina electrónica no puede usar subsecuencias "
+                              "por fecha.") % {'name': sequence.name})
+        return sequence
+
+    @api.model
+    def _reserve(self, company, prefix, size):
+        """
+        Reserva un bloque contiguo de consecutivos
+
+        La reserva y el registro del bloque se confirman en una transacción
+        corta e independiente: la secuencia solo queda bloqueada mientras se
+        toma el bloque y no durante la generación del lote. Si el lote falla
+        después, el bloque ya registrado aparece en el reporte de consecutivos
+        sin usar.
+
+        Cuando la otra transacción no puede ver la secuencia, la compañía o el
+        usuario (creados y aún sin confirmar en la transacción actual), o no
+        obtiene el bloqueo porque la transacción actual ya tiene la fila de la
+        secuencia, el bloque se reserva en la transacción actual. En pruebas
+        también se usa la transacción actual.
+
+        :param company: Compañía
+        :param prefix: Prefijo DIAN de los documentos
+        :param size: Cantidad de números
+        :return: Bloque hr.electronic.payroll.number.block
+        """
+        sequence = self._get_dian_sequence(company)
+        sequence.flush_recordset()
+        values = {
+            'sequence_id': sequence.id,
+            'company_id': company.id,
+            'prefix': prefix,
+        }
+
+        block_id = None
+        if not self.env.registry.in_test_mode():
+            block_id = self._reserve_in_new_transaction(sequence, values, size)
+        if block_id is None:
+            block_id = self._create_block(self.env.cr, sequence, values, size)
+        sequence.invalidate_recordset(['number_next', 'number_next_actual'])
+
+        block = self.browse(block_id)
+        _logger.info("Nómina electrónica: reservados %s consecutivos DIAN (%s-%s)",
+                     size, block.number_from, block.number_to)
+        return block
+
+    @api.model
+    def _reserve_in_new_transaction(self, sequence, values, size):
+        """
+        Reserva el bloque en un cursor propio que se confirma de inmediato
+
+        :return: ID del bloque, o None si la reserva debe hacerse en la
+                 transacción actual
+        """
+        try:
+            with self.env.registry.cursor() as cr:
+                cr.execute("""
+                    SELECT EXISTS(SELECT 1 FROM ir_sequence WHERE id = %s)
+                       AND EXISTS(SELECT 1 FROM res_company WHERE id = %s)
+                       AND EXISTS(SELECT 1 FROM res_users WHERE id = %s)
+                """, [sequence.id, values['company_id'], self.env.uid])
+                if not cr.fetchone()[0]:
+                    return None
+                # Si la transacción actual tiene la fila, esperar sería un bloqueo mutuo
+                cr.execute("SET LOCAL lock_timeout = %s", [NUMBER_BLOCK_LOCK_TIMEOUT])
+                return self._create_block(cr, sequence, values, size)
+        except errors.LockNotAvailable:
+            _logger.warning("Nómina electrónica: la secuencia %s está bloqueada; el bloque de consecutivos "
+                            "se reserva en la transacción actual", sequence.name)
+            return None
+
+    @api.model
+    def _create_block(self, cr, sequence, values, size):
+        number_from, increment = self._take_numbers(cr, sequence, size)
+        block = self.with_env(self.env(cr=cr)).sudo().create(dict(
+            values,
+            number_from=number_from,
+            number_to=number_from + increment * (size - 1),
+            number_increment=increment,
+        ))
+        block.flush_recordset()
+        return block.id
+
+    @api.model
+    def _take_numbers(self, cr, sequence, size):
+        """
+        Avanza el contador de la secuencia en ``size`` números
+
+        La fila de la secuencia se bloquea para que las reservas concurrentes
+        no intercalen números. Las secuencias estándar avanzan la secuencia de
+        PostgreSQL con nextval/setval: ALTER SEQUENCE la bloquea antes, de modo
+        que los next_by_id de otras transacciones esperan a que termine la
+        reserva en lugar de tomar un número dentro del bloque. Las secuencias
+        sin huecos avanzan la columna number_next.
+
+        :param cr: Cursor de la transacción de reserva
+        :param sequence: Secuencia DIAN
+        :param size: Cantidad de números
+        :return: Tupla (primer número, incremento)
+        """
+        cr.execute("""
+            SELECT implementation, number_increment
+              FROM ir_sequence
+             WHERE id = %s
+               FOR UPDATE
+        """, [sequence.id])
+        implementation, increment = cr.fetchone()
+
+        if implementation == 'standard':
+            sequence_name = 'ir_sequence_%03d' % sequence.id
+            # Sin cambios en la secuencia: solo toma el bloqueo que excluye a nextval
+            cr.execute(SQL("ALTER SEQUENCE %s INCREMENT BY %s", SQL.identifier(sequence_name), increment))
+            cr.execute("SELECT nextval(%s)", [sequence_name])
+            number_from = cr.fetchone()[0]
+            if size > 1:
+                cr.execute("SELECT setval(%s, %s)", [sequence_name, number_from + increment * (size - 1)])
+            return number_from, increment
+
+        cr.execute("""
+            UPDATE ir_sequence
+               SET number_next = number_next + number_increment * %(size)s
+             WHERE id = %(id)s
+         RETURNING number_next - number_increment * %(size)s
+        """, {'id': sequence.id, 'size': size})
+        return cr.fetchone()[0], increment
+
+    def _iter_numbers(self):
+        """
+        Números del bloque, asignados en memoria
+
+        :return: Generador de tuplas (consecutivo, número DIAN con prefijos)
+        """
+        self.ensure_one()
+        sequence = self.sequence_id
+        for number in range(self.number_from, self.number_to + 1, self.number_increment):
+            yield number, '%s%s' % (self.prefix or '', sequence.get_next_char(number))
+
+
+class HrElectronicPayrollNumberUnused(models.Model):
+    _name = 'hr.electronic.payroll.number.unused'
+    _description = 'Consecutivos DIAN sin Usar'
+    _auto = False
+    _order = 'company_id, prefix, number'
+
+    block_id = fields.Many2one('hr.electronic.payroll.number.block', string='Bloque', readonly=True)
+    company_id = fields.Many2one('res.company', string='Compañía', readonly=True)
+    prefix = fields.Char(string='Prefijo DIAN', readonly=True)
+    number = fields.Integer(string='Consecutivo', readonly=True)
+    date_reserved = fields.Datetime(string='Fecha de Reserva', readonly=True)
+    electronic_payroll_id = fields.Many2one(
+        'hr.electronic.payroll', string='Documento Cancelado', readonly=True)
+    reason = fields.Selection([
+        ('unassigned', 'Reservado sin asignar'),
+        ('cancelled', 'Documento cancelado'),
+    ], string='Motivo', readonly=True)
+
+    def init(self):
+        # Cada número reservado que no quedó en un documento vigente
+        tools.drop_view_if_exists(self.env.cr, self._table)
+        self.env.cr.execute("""
+            CREATE OR REPLACE VIEW %s AS (
+                SELECT row_number() OVER (ORDER BY b.id, n.number) AS id,
+                       b.id AS block_id,
+                       b.company_id,
+                       b.prefix,
+                       n.number,
+                       b.create_date AS date_reserved,
+                       d.id AS electronic_payroll_id,
+                       CASE WHEN d.id IS NULL THEN 'unassigned' ELSE 'cancelled' END AS reason
+                  FROM hr_electronic_payroll_number_block b
+            CROSS JOIN LATERAL generate_series(b.number_from, b.number_to, b.number_increment) AS n(number)
+             LEFT JOIN hr_electronic_payroll d
+                    ON d.dian_number_block_id = b.id
+                   AND d.dian_consecutive = n.number
+                 WHERE d.id IS NULL OR d.state = 'cancelled'
+            )
+        """ % self._table)
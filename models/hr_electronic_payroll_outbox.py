@@ -0,0 +1,348 @@
+from odoo import models, fields, api, _
+from odoo.exceptions import UserError
+from datetime import timedelta
+import logging
+import time
+
+from lxml import etree
+
+from odoo.tools import groupby, split_every
+
+from .hr_electronic_payroll_dispatcher import (
+    DEFAULT_CONCURRENCY, DEFAULT_MAX_ATTEMPTS, DEFAULT_TIMEOUT,
+    DianDispatcher, DispatchItem, backoff_delay)
+from .hr_electronic_payroll_status import DIAN_NOT_FOUND_CODE, parse_status_response, status_request
+from .hr_electronic_payroll_zip import (
+    DIAN_ZIP_MAX_DOCUMENTS, build_zip, package_key, parse_zip_response, zip_filename)
+
+_logger = logging.getLogger(__name__)
+
+# Documentos reclamados y despachados por transacción
+DISPATCH_BATCH_SIZE = 200
+
+# Tiempo máximo (segundos) que una ejecución del cron despacha documentos
+DISPATCH_CRON_TIME_LIMIT = 240
+
+# Rondas de despacho antes de marcar el envío como fallido, y espera base
+# (segundos) entre rondas; dentro de cada ronda el despachador ya reintenta
+OUTBOX_MAX_ROUNDS = 5
+OUTBOX_BACKOFF_BASE = 60.0
+OUTBOX_BACKOFF_MAX = 3600.0
+
+
+class HrElectronicPayrollOutbox(models.Model):
+    _name = 'hr.electronic.payroll.outbox'
+    _description = 'Bandeja de Salida DIAN'
+    _order = 'next_attempt, id'
+
+    electronic_payroll_id = fields.Many2one(
+        'hr.electronic.payroll', string='Nómina Electrónica',
+        required=True, ondelete='cascade', index=True)
+
+    company_id = fields.Many2one(
+        related='electronic_payroll_id.company_id',
+        string='Compañía', store=True)
+
+    cude = fields.Char(
+        string='CUDE', required=True, index=True,
+        help='CUDE del documento enviado')
+
+    state = fields.Selection([
+        ('pending', 'Pendiente'),
+        ('done', 'Enviado'),
+        ('failed', 'Fallido'),
+    ], string='Estado', default='pending', required=True, index=True)
+
+    next_attempt = fields.Datetime(
+        string='Próximo Intento', default=fields.Datetime.now, index=True)
+
+    round_count = fields.Integer(string='Rondas de Envío')
+    attempt_count = fields.Integer(string='Intentos HTTP')
+    date_sent = fields.Datetime(string='Fecha de Envío', readonly=True)
+    http_status = fields.Integer(string='Estado HTTP', readonly=True)
+    duration = fields.Float(string='Duración (s)', digits=(16, 3), readonly=True)
+    last_error = fields.Text(string='Último Error', readonly=True)
+    zip_key = fields.Char(
+        string='ZipKey', readonly=True, index=True,
+        help='Identificador del paquete ZIP asignado por la DIAN')
+
+    def init(self):
+        # Un solo envío pendiente por CUDE
+        self.env.cr.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS hr_electronic_payroll_outbox_pending_cude_uniq
+                ON hr_electronic_payroll_outbox (cude)
+             WHERE state = 'pending'
+        """)
+
+    @api.model
+    def _enqueue(self, documents):
+        """
+        Encola documentos firmados para su envío a la DIAN
+
+        Los documentos cuyo CUDE ya tiene un envío pendiente se ignoran.
+
+        :param documents: Registros hr.electronic.payroll firmados
+        :return: Entradas creadas
+        """
+        unsigned = documents.filtered(lambda d: not d.dian_cude)
+        if unsigned:
+            raise UserError(_("Los siguientes documentos no están firmados: %s") % (
+                ', '.join(unsigned.mapped('name'))))
+
+        pending = set(self.search([
+            ('cude', 'in', documents.mapped('dian_cude')),
+            ('state', '=', 'pending'),
+        ]).mapped('cude'))
+        vals_list = []
+        for document in documents:
+            if document.dian_cude in pending:
+                continue
+            pending.add(document.dian_cude)
+            vals_list.append({'electronic_payroll_id': document.id, 'cude': document.dian_cude})
+
+        entries = self.create(vals_list)
+        if entries:
+            self.env.ref('nomina_colombia.ir_cron_electronic_payroll_outbox')._trigger()
+        return entries
+
+    @api.model
+    def _get_dispatcher(self):
+        ICPSudo = self.env['ir.config_parameter'].sudo()
+        return DianDispatcher(
+            concurrency=int(ICPSudo.get_param('nomina_colombia.dian_send_concurrency', DEFAULT_CONCURRENCY)),
+            timeout=float(ICPSudo.get_param('nomina_colombia.dian_send_timeout', DEFAULT_TIMEOUT)),
+            max_attempts=int(ICPSudo.get_param('nomina_colombia.dian_send_max_attempts', DEFAULT_MAX_ATTEMPTS)),
+        )
+
+    @api.model
+    def _get_send_mode(self):
+        return self.env['ir.config_parameter'].sudo().get_param('nomina_colombia.dian_send_mode', 'zip')
+
+    @api.model
+    def _get_zip_max_documents(self):
+        return min(DIAN_ZIP_MAX_DOCUMENTS, int(self.env['ir.config_parameter'].sudo().get_param(
+            'nomina_colombia.dian_zip_max_documents', DIAN_ZIP_MAX_DOCUMENTS)))
+
+    @api.model
+    def _cron_dispatch(self, time_limit=DISPATCH_CRON_TIME_LIMIT):
+        """
+        Despacha los envíos pendientes hasta agotar la cola o el tiempo disponible.
+
+        Cada bloque se reclama con FOR UPDATE SKIP LOCKED y se confirma en su
+        propia transacción, de modo que varias copias del cron pueden despachar
+        en paralelo sin enviar dos veces el mismo documento. Si el despacho de
+        un bloque falla, sus cambios se revierten y sus entradas quedan
+        fallidas con el error, sin detener los bloques siguientes.
+        """
+        deadline = time.monotonic() + time_limit
+        dispatched = 0
+        while time.monotonic() < deadline:
+            entries = self._claim_batch()
+            if not entries:
+                break
+            try:
+                with self.env['hr.electronic.payroll']._log_savepoint():
+                    entries._dispatch()
+            except Exception as e:
+                _logger.exception("Bandeja DIAN: error despachando %s documentos", len(entries))
+                entries.write({'state': 'failed', 'last_error': str(e)})
+            self.env.cr.commit()
+            dispatched += len(entries)
+
+        if dispatched and self._has_due_entries():
+            self.env.ref('nomina_colombia.ir_cron_electronic_payroll_outbox')._trigger()
+        return dispatched
+
+    @api.model
+    def _claim_batch(self, limit=DISPATCH_BATCH_SIZE):
+        """Bloquea y retorna los envíos pendientes vencidos que no estén tomados por otro proceso"""
+        self.flush_model(['state', 'next_attempt'])
+        self.env.cr.execute("""
+            SELECT id
+              FROM hr_electronic_payroll_outbox
+             WHERE state = 'pending'
+               AND next_attempt <= %s
+          ORDER BY next_attempt, id
+             LIMIT %s
+               FOR UPDATE SKIP LOCKED
+        """, [fields.Datetime.now(), limit])
+        return self.browse([row[0] for row in self.env.cr.fetchall()])
+
+    @api.model
+    def _has_due_entries(self):
+        return bool(self.search_count([
+            ('state', '=', 'pending'), ('next_attempt', '<=', fields.Datetime.now())], limit=1))
+
+    def _dispatch(self):
+        """Envía los documentos de las entradas y aplica las respuestas de la DIAN"""
+        payloads = self.electronic_payroll_id._get_signed_payloads()
+        entries = self.filtered(lambda e: e.electronic_payroll_id.id in payloads)
+        (self - entries).write({'state': 'failed', 'last_error': _('El documento no tiene XML firmado.')})
+
+        with self.env['hr.electronic.payroll']._buffered_log(_('Envío a la DIAN'), summary=True):
+            entries = entries._skip_received()
+            if self._get_send_mode() == 'zip':
+                entries._dispatch_zip(payloads)
+            else:
+                entries._dispatch_single(payloads)
+        _logger.info("Bandeja DIAN: %s documentos despachados", len(entries))
+
+    def _skip_received(self):
+        """
+        Consulta por CUDE el estado de los envíos que ya tuvieron intentos
+
+        La DIAN no deduplica los envíos: un intento que terminó en tiempo de
+        espera o en error del servidor pudo quedar recibido. Antes de reenviar
+        esos documentos se consulta su estado con GetStatus; los que la DIAN ya
+        conoce se dan por enviados y toman el estado consultado. Si la consulta
+        falla, el envío pasa a la siguiente ronda sin reenviarse.
+
+        :return: Entradas que deben enviarse
+        """
+        retried = self.filtered('attempt_count')
+        if not retried:
+            return self
+
+        items = []
+        for entry in retried:
+            url = entry.electronic_payroll_id._get_dian_url()
+            payload, headers = status_request(entry.cude, url)
+            items.append(DispatchItem(entry.id, url, payload, entry.cude, headers, idempotent=True))
+        results = self._get_dispatcher().dispatch(items)
+
+        now = fields.Datetime.now()
+        unknown = self.browse()
+        final = []
+        for entry, result in zip(retried, results):
+            status = None
+            if result.ok:
+                try:
+                    status = next(iter(parse_status_response(result.content)), None)
+                except etree.XMLSyntaxError as e:
+                    result = result._replace(ok=False, retryable=True, error=_(
+                        'Respuesta de estado DIAN inválida: %(error)s') % {'error': e})
+            if not result.ok:
+                entry._handle_failure(result, now)
+                continue
+            if not status or status['status_code'] == DIAN_NOT_FOUND_CODE:
+                unknown |= entry
+                continue
+
+            entry.write(dict(entry._get_round_vals(result), state='done', date_sent=now))
+            document = entry.electronic_payroll_id
+            document._mark_sent()
+            document._create_log('send', _('La DIAN ya había recibido el documento; no se reenvía'))
+            if status['final']:
+                final.append((document, status))
+
+        Document = self.env['hr.electronic.payroll']
+        Document._apply_dian_statuses(final)
+        Document.browse([document.id for document, _status in final])._generate_accepted_pdfs()
+        return (self - retried) | unknown
+
+    def _dispatch_single(self, payloads):
+        """Envía cada documento en su propia solicitud (respuesta síncrona)"""
+        items = [
+            DispatchItem(entry.id, entry.electronic_payroll_id._get_dian_url(),
+                         payloads[entry.electronic_payroll_id.id], entry.cude)
+            for entry in self
+        ]
+        results = self._get_dispatcher().dispatch(items)
+
+        now = fields.Datetime.now()
+        for entry, result in zip(self, results):
+            document = entry.electronic_payroll_id
+            if result.ok:
+                entry.write(dict(entry._get_round_vals(result), state='done', date_sent=now))
+                document._apply_dian_response(document._parse_dian_response(result.content))
+            else:
+                entry._handle_failure(result, now)
+
+    def _dispatch_zip(self, payloads):
+        """
+        Empaqueta los documentos en ZIP de hasta el máximo permitido por
+        solicitud y registra el ZipKey de cada paquete. Los documentos que la
+        DIAN rechaza en la validación inicial se marcan rechazados; los demás
+        quedan enviados a la espera de la consulta de estado.
+        """
+        max_documents = self._get_zip_max_documents()
+        sequence = int(fields.Datetime.now().timestamp() * 1000)
+        packages = []
+        items = []
+        for (url, company), group in groupby(
+                self, key=lambda e: (e.electronic_payroll_id._get_dian_url(), e.company_id)):
+            for package in split_every(max_documents, [entry.id for entry in group], self.browse):
+                filename = zip_filename(company.vat, sequence + len(packages))
+                content = build_zip([
+                    (entry.electronic_payroll_id.xml_signed_filename, payloads[entry.electronic_payroll_id.id])
+                    for entry in package
+                ])
+                packages.append(package)
+                items.append(DispatchItem(
+                    len(items), url, content, package_key(package.mapped('cude')),
+                    {'Content-Type': 'application/zip', 'X-File-Name': filename}))
+        results = self._get_dispatcher().dispatch(items)
+
+        now = fields.Datetime.now()
+        for package, result in zip(packages, results):
+            if not result.ok:
+                for entry in package:
+                    entry._handle_failure(result, now)
+                continue
+
+            try:
+                zip_key, errors = parse_zip_response(result.content)
+            except etree.XMLSyntaxError as e:
+                # El paquete pudo llegar a la DIAN: no se reintenta automáticamente
+                result = result._replace(ok=False, retryable=False, error=_(
+                    'Respuesta del envío ZIP inválida: %(error)s') % {'error': e})
+                for entry in package:
+                    entry._handle_failure(result, now)
+                continue
+            for entry in package:
+                entry.write(dict(entry._get_round_vals(result), state='done', date_sent=now, zip_key=zip_key))
+
+            documents = package.electronic_payroll_id
+            rejected = documents.filtered(lambda d: d.xml_signed_filename in errors)
+            (documents - rejected)._mark_sent({'dian_zip_key': zip_key})
+            for document in rejected:
+                document._apply_dian_response({
+                    'is_valid': False,
+                    'status_code': 'ZIP',
+                    'status_description': errors[document.xml_signed_filename],
+                    'error_message': errors[document.xml_signed_filename],
+                    'response_xml': result.content.decode('utf-8', errors='replace'),
+                    'transaction_id': '',
+                })
+                document.dian_zip_key = zip_key
+            for document in documents - rejected:
+                document._create_log('send', _('Documento enviado a DIAN en el paquete %s') % zip_key)
+
+    def _get_round_vals(self, result):
+        self.ensure_one()
+        return {
+            'round_count': self.round_count + 1,
+            'attempt_count': self.attempt_count + result.attempts,
+            'http_status': result.status_code or 0,
+            'duration': result.duration,
+            'last_error': result.error or False,
+        }
+
+    def _handle_failure(self, result, now):
+        """Programa la siguiente ronda del envío o lo marca fallido"""
+        self.ensure_one()
+        vals = self._get_round_vals(result)
+        if result.retryable and vals['round_count'] < OUTBOX_MAX_ROUNDS:
+            vals['next_attempt'] = now + timedelta(
+                seconds=backoff_delay(vals['round_count'], OUTBOX_BACKOFF_BASE, OUTBOX_BACKOFF_MAX))
+        else:
+            vals['state'] = 'failed'
+            self.electronic_payroll_id._create_log('error', _('Error al enviar a DIAN: %s') % result.error)
+        self.write(vals)
+
+    def action_retry(self):
+        """Vuelve a encolar los envíos fallidos"""
+        failed = self.filtered(lambda e: e.state == 'failed')
+        failed.write({'state': 'pending', 'round_count': 0, 'next_attempt': fields.Datetime.now()})
+        self.env.ref('nomina_colombia.ir_cron_electronic_payroll_outbox')._trigger()
+        return True
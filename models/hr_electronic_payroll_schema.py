@@ -0,0 +1,75 @@
+"""
+Validación estructural interna de los documentos NominaIndividual.
+
+El esquema XSD del módulo describe la estructura que arma el constructor; no
+es el esquema oficial de la DIAN, cuya validación sigue ocurriendo al recibir
+el documento. El esquema se compila una sola vez por proceso y se reutiliza en todas las
+validaciones. La validación de un lote puede repartirse en el pool de
+procesos de la firma, donde cada proceso compila el esquema una vez.
+"""
+import functools
+import os
+from collections import namedtuple
+
+from lxml import etree
+
+from .hr_electronic_payroll_signature import pool_map
+
+NOMINA_SCHEMA_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    'data', 'xsd', 'nomina_individual_structure.xsd')
+
+# Documentos mínimos por proceso para que valga la pena validar en paralelo
+SCHEMA_MIN_DOCUMENTS_PER_WORKER = 100
+
+# Esquemas compilados de este proceso, por ruta
+_SCHEMAS = {}
+
+# path: XPath del nodo con el error, line: línea en el documento
+SchemaError = namedtuple('SchemaError', ['path', 'line', 'message'])
+
+
+def get_schema(path=NOMINA_SCHEMA_PATH):
+    """Esquema compilado, cargado la primera vez que se usa en el proceso"""
+    schema = _SCHEMAS.get(path)
+    if schema is None:
+        schema = _SCHEMAS[path] = etree.XMLSchema(etree.parse(path))
+    return schema
+
+
+def validate_document(content, path=NOMINA_SCHEMA_PATH):
+    """
+    Valida un documento contra el esquema
+
+    :param content: Documento en bytes
+    :param path: Ruta del esquema
+    :return: Lista de SchemaError, vacía si el documento es válido
+    """
+    try:
+        document = etree.fromstring(content, parser=etree.XMLParser(remove_blank_text=False))
+    except etree.XMLSyntaxError as e:
+        return [SchemaError('/', e.lineno or 0, e.msg)]
+
+    schema = get_schema(path)
+    if schema.validate(document):
+        return []
+    return [SchemaError(error.path or '/', error.line, error.message) for error in schema.error_log]
+
+
+def validate_documents(contents, max_workers=1, path=NOMINA_SCHEMA_PATH, executor=None):
+    """
+    Valida un lote de documentos, en paralelo si el lote es grande
+
+    :param contents: Lista de documentos en bytes
+    :param max_workers: Número máximo de procesos de validación
+    :param path: Ruta del esquema
+    :param executor: Pool ya abierto que se reutiliza en lugar de crear uno
+    :return: Lista con los errores de cada documento, en el mismo orden
+    """
+    task = functools.partial(validate_document, path=path)
+    workers = min(max_workers, len(contents) // SCHEMA_MIN_DOCUMENTS_PER_WORKER)
+    if workers <= 1:
+        return [task(content) for content in contents]
+
+    chunksize = max(1, len(contents) // (workers * 4))
+    return pool_map(task, contents, workers, chunksize, executor=executor)
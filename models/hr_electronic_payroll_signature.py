@@ -0,0 +1,311 @@
+"""
+Firma XAdES-EPES enveloped de los documentos de nómina electrónica DIAN.
+
+El archivo PKCS#12 del certificado se interpreta una sola vez por proceso
+(ver hr.electronic.certificate._get_key_material) y de él se extrae un
+SignerMaterial con valores simples: la llave privada en PEM, el certificado
+en DER y los datos del certificado firmante que exige XAdES. Ese material se
+puede enviar a otros procesos, de modo que la canonicalización, los resúmenes
+y la firma RSA de todo un lote se reparten en un pool de procesos. Cada
+proceso carga la llave privada una sola vez y la reutiliza para todos los
+documentos que firma.
+
+La firma sigue la política de firma v2 de la DIAN: canonicalización C14N
+inclusiva, RSA-SHA256, referencias al documento (transformación enveloped),
+al KeyInfo y a las SignedProperties, ubicada en
+ext:UBLExtensions/ext:UBLExtension/ext:ExtensionContent.
+"""
+import base64
+import functools
+import hashlib
+import multiprocessing
+import os
+import runpy
+import uuid
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import padding
+from cryptography.hazmat.primitives.serialization import pkcs12
+from lxml import etree
+
+DS_NAMESPACE = 'http://www.w3.org/2000/09/xmldsig#'
+XADES_NAMESPACE = 'http://uri.etsi.org/01903/v1.3.2#'
+EXT_NAMESPACE = 'urn:oasis:names:specification:ubl:schema:xsd:CommonExtensionComponents-2'
+
+C14N_ALGORITHM = 'http://www.w3.org/TR/2001/REC-xml-c14n-20010315'
+SIGNATURE_ALGORITHM = 'http://www.w3.org/2001/04/xmldsig-more#rsa-sha256'
+DIGEST_ALGORITHM = 'http://www.w3.org/2001/04/xmlenc#sha256'
+ENVELOPED_TRANSFORM = 'http://www.w3.org/2000/09/xmldsig#enveloped-signature'
+SIGNED_PROPERTIES_TYPE = 'http://uri.etsi.org/01903#SignedProperties'
+
+# Política de firma de la DIAN y su resumen SHA-256 publicado
+DIAN_POLICY_IDENTIFIER = 'https://facturaelectronica.dian.gov.co/politicadefirma/v2/politicadefirmav2.pdf'
+DIAN_POLICY_HASH = 'dMoMvtcG5aIzgYo0tIsSQeVJBDnUnfSOfBpxXrmor0Y='
+DIAN_SIGNER_ROLE = 'supplier'
+
+# Hora legal colombiana para el SigningTime
+COLOMBIA_TZ = timezone(timedelta(hours=-5))
+
+# Documentos por tarea enviada a cada proceso del pool
+SIGNATURE_TASKS_PER_WORKER = 4
+
+KeyMaterial = namedtuple('KeyMaterial', ['certificate', 'chain', 'signer'])
+
+# key_id: ID del registro del certificado, que identifica su llave en la caché
+SignerMaterial = namedtuple('SignerMaterial', [
+    'key_pem', 'certificate_der', 'certificate_digest', 'issuer_name', 'serial_number', 'key_id'],
+    defaults=(None,))
+
+# Llaves privadas ya cargadas en este proceso: key_id -> (resumen del PEM, llave)
+_PRIVATE_KEYS = {}
+
+# Archivo que prepara las rutas de módulos de Odoo en los procesos del pool
+WORKER_BOOTSTRAP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'hr_electronic_payroll_worker.py')
+
+
+def certificate_validity(certificate):
+    """
+    Vigencia del certificado en UTC
+
+    cryptography 42 agregó not_valid_before_utc y not_valid_after_utc y
+    desaconsejó los atributos sin zona horaria; con versiones anteriores se
+    usan estos últimos, que ya están en UTC.
+
+    :param certificate: Certificado x509
+    :return: Tupla (inicio, fin) de la vigencia
+    """
+    if hasattr(certificate, 'not_valid_before_utc'):
+        return certificate.not_valid_before_utc, certificate.not_valid_after_utc
+    return (certificate.not_valid_before.replace(tzinfo=timezone.utc),
+            certificate.not_valid_after.replace(tzinfo=timezone.utc))
+
+
+def process_pool(workers):
+    """
+    Pool de procesos para firmar o validar documentos
+
+    Los procesos se crean con forkserver (o spawn donde no existe) y no con
+    fork, para no heredar la conexión a la base de datos, los hilos ni los
+    locks del servidor. Cada proceso recibe al iniciar las rutas de módulos de
+    Odoo para poder importar las funciones de las tareas.
+
+    :param workers: Número de procesos
+    :return: ProcessPoolExecutor
+    """
+    import odoo.addons
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+    return ProcessPoolExecutor(
+        max_workers=workers, mp_context=context, initializer=runpy.run_path,
+        initargs=(WORKER_BOOTSTRAP_PATH, {'ADDONS_PATH': list(odoo.addons.__path__)}))
+
+
+def pool_map(task, contents, workers, chunksize, executor=None):
+    """
+    Aplica la tarea a los documentos en el pool recibido o, si no hay, en uno
+    nuevo que se cierra al terminar
+
+    :param task: Función que procesa un documento
+    :param contents: Lista de documentos en bytes
+    :param workers: Número de procesos del pool nuevo
+    :param chunksize: Documentos por tarea enviada a cada proceso
+    :param executor: Pool abierto por el llamador (ver process_pool)
+    :return: Lista de resultados, en el mismo orden
+    """
+    if executor is not None:
+        return list(executor.map(task, contents, chunksize=chunksize))
+    with process_pool(workers) as executor:
+        return list(executor.map(task, contents, chunksize=chunksize))
+
+
+def load_key_material(p12_data, password, key_id=None):
+    """
+    Interpreta el archivo PKCS#12 y prepara el material de firma
+
+    :param p12_data: Contenido binario del archivo .p12
+    :param password: Contraseña del archivo
+    :param key_id: ID del certificado, para la caché de llaves de cada proceso
+    :return: KeyMaterial con el certificado, la cadena y el SignerMaterial
+    """
+    private_key, certificate, chain = pkcs12.load_key_and_certificates(
+        p12_data, password.encode() if password else None)
+    if private_key is None or certificate is None:
+        raise ValueError('El archivo PKCS#12 no contiene la llave privada y el certificado')
+
+    certificate_der = certificate.public_bytes(serialization.Encoding.DER)
+    signer = SignerMaterial(
+        key_pem=private_key.private_bytes(
+            serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()),
+        certificate_der=certificate_der,
+        certificate_digest=_digest(certificate_der),
+        issuer_name=certificate.issuer.rfc4514_string(),
+        serial_number=str(certificate.serial_number),
+        key_id=key_id,
+    )
+    return KeyMaterial(certificate=certificate, chain=tuple(chain or ()), signer=signer)
+
+
+def _load_private_key(signer):
+    """
+    Llave privada del firmante, cargada una sola vez por proceso
+
+    La caché guarda una sola llave por certificado: si el archivo cambia, la
+    llave nueva reemplaza a la anterior en lugar de acumularse.
+    """
+    fingerprint = hashlib.sha256(signer.key_pem).digest()
+    cached = _PRIVATE_KEYS.get(signer.key_id)
+    if cached is None or cached[0] != fingerprint:
+        cached = _PRIVATE_KEYS[signer.key_id] = (
+            fingerprint, serialization.load_pem_private_key(signer.key_pem, password=None))
+    return cached[1]
+
+
+def forget_private_keys(key_ids):
+    """Descarta de la caché de este proceso las llaves de los certificados indicados"""
+    for key_id in key_ids:
+        _PRIVATE_KEYS.pop(key_id, None)
+
+
+def _digest(data):
+    return base64.b64encode(hashlib.sha256(data).digest()).decode()
+
+
+def _c14n(element):
+    return etree.tostring(element, method='c14n')
+
+
+def _ds(name):
+    return '{%s}%s' % (DS_NAMESPACE, name)
+
+
+def _xades(name):
+    return '{%s}%s' % (XADES_NAMESPACE, name)
+
+
+def _ext(name):
+    return '{%s}%s' % (EXT_NAMESPACE, name)
+
+
+def _sub(parent, tag, text=None, **attributes):
+    element = etree.SubElement(parent, tag, attributes)
+    if text is not None:
+        element.text = text
+    return element
+
+
+def _reference(signed_info, uri, digest_value=None, **attributes):
+    reference = _sub(signed_info, _ds('Reference'), URI=uri, **attributes)
+    if uri == '':
+        transforms = _sub(reference, _ds('Transforms'))
+        _sub(transforms, _ds('Transform'), Algorithm=ENVELOPED_TRANSFORM)
+    _sub(reference, _ds('DigestMethod'), Algorithm=DIGEST_ALGORITHM)
+    return _sub(reference, _ds('DigestValue'), digest_value)
+
+
+def _signed_properties(qualifying_properties, signature_id, signer, signing_time):
+    signed_properties = _sub(qualifying_properties, _xades('SignedProperties'), Id='%s-signedprops' % signature_id)
+    signature_properties = _sub(signed_properties, _xades('SignedSignatureProperties'))
+    _sub(signature_properties, _xades('SigningTime'), signing_time.isoformat(timespec='seconds'))
+
+    cert = _sub(_sub(signature_properties, _xades('SigningCertificate')), _xades('Cert'))
+    cert_digest = _sub(cert, _xades('CertDigest'))
+    _sub(cert_digest, _ds('DigestMethod'), Algorithm=DIGEST_ALGORITHM)
+    _sub(cert_digest, _ds('DigestValue'), signer.certificate_digest)
+    issuer_serial = _sub(cert, _xades('IssuerSerial'))
+    _sub(issuer_serial, _ds('X509IssuerName'), signer.issuer_name)
+    _sub(issuer_serial, _ds('X509SerialNumber'), signer.serial_number)
+
+    policy = _sub(_sub(signature_properties, _xades('SignaturePolicyIdentifier')), _xades('SignaturePolicyId'))
+    _sub(_sub(policy, _xades('SigPolicyId')), _xades('Identifier'), DIAN_POLICY_IDENTIFIER)
+    policy_hash = _sub(policy, _xades('SigPolicyHash'))
+    _sub(policy_hash, _ds('DigestMethod'), Algorithm=DIGEST_ALGORITHM)
+    _sub(policy_hash, _ds('DigestValue'), DIAN_POLICY_HASH)
+
+    roles = _sub(_sub(signature_properties, _xades('SignerRole')), _xades('ClaimedRoles'))
+    _sub(roles, _xades('ClaimedRole'), DIAN_SIGNER_ROLE)
+    return signed_properties
+
+
+def sign_tree(root, signer, signing_time=None):
+    """
+    Agrega la firma XAdES-EPES enveloped al árbol del documento
+
+    :param root: Elemento raíz lxml del documento
+    :param signer: SignerMaterial del certificado
+    :param signing_time: Fecha y hora de la firma (por defecto ahora, hora colombiana)
+    :return: Elemento ds:Signature agregado
+    """
+    signing_time = signing_time or datetime.now(COLOMBIA_TZ)
+    signature_id = 'xmldsig-%s' % uuid.uuid4()
+
+    # El contenedor de la extensión va primero y hace parte del resumen del
+    # documento; la transformación enveloped solo excluye ds:Signature
+    extensions = etree.Element(_ext('UBLExtensions'))
+    root.insert(0, extensions)
+    content = _sub(_sub(extensions, _ext('UBLExtension')), _ext('ExtensionContent'))
+    document_digest = _digest(_c14n(root))
+
+    signature = _sub(content, _ds('Signature'), Id=signature_id)
+    signed_info = _sub(signature, _ds('SignedInfo'))
+    _sub(signed_info, _ds('CanonicalizationMethod'), Algorithm=C14N_ALGORITHM)
+    _sub(signed_info, _ds('SignatureMethod'), Algorithm=SIGNATURE_ALGORITHM)
+    _reference(signed_info, '', document_digest, Id='%s-ref0' % signature_id)
+    key_info_digest = _reference(signed_info, '#%s-keyinfo' % signature_id)
+    properties_digest = _reference(
+        signed_info, '#%s-signedprops' % signature_id, Type=SIGNED_PROPERTIES_TYPE)
+
+    signature_value = _sub(signature, _ds('SignatureValue'), Id='%s-sigvalue' % signature_id)
+    key_info = _sub(signature, _ds('KeyInfo'), Id='%s-keyinfo' % signature_id)
+    _sub(_sub(key_info, _ds('X509Data')), _ds('X509Certificate'),
+         base64.b64encode(signer.certificate_der).decode())
+
+    qualifying_properties = _sub(
+        _sub(signature, _ds('Object')), _xades('QualifyingProperties'), Target='#%s' % signature_id)
+    signed_properties = _signed_properties(qualifying_properties, signature_id, signer, signing_time)
+
+    key_info_digest.text = _digest(_c14n(key_info))
+    properties_digest.text = _digest(_c14n(signed_properties))
+    signature_value.text = base64.b64encode(_load_private_key(signer).sign(
+        _c14n(signed_info), padding.PKCS1v15(), hashes.SHA256())).decode()
+    return signature
+
+
+def sign_document(xml_content, signer, signing_time=None):
+    """
+    Firma un documento serializado; es la tarea que ejecuta cada proceso del pool
+
+    :param xml_content: Documento en bytes (UTF-8)
+    :param signer: SignerMaterial del certificado
+    :param signing_time: Fecha y hora de la firma
+    :return: Documento firmado en bytes (UTF-8)
+    """
+    root = etree.fromstring(xml_content)
+    sign_tree(root, signer, signing_time)
+    return etree.tostring(root, xml_declaration=True, encoding='UTF-8')
+
+
+def sign_documents(contents, signer, max_workers=1, signing_time=None, executor=None):
+    """
+    Firma un lote de documentos, en paralelo si hay más de un proceso
+
+    Los procesos (ver process_pool) solo reciben el contenido de cada
+    documento y el SignerMaterial.
+
+    :param contents: Lista de documentos en bytes
+    :param signer: SignerMaterial del certificado
+    :param max_workers: Número máximo de procesos de firma
+    :param signing_time: Fecha y hora de la firma, común al lote
+    :param executor: Pool ya abierto que se reutiliza en lugar de crear uno
+    :return: Lista de documentos firmados, en el mismo orden
+    """
+    signing_time = signing_time or datetime.now(COLOMBIA_TZ)
+    task = functools.partial(sign_document, signer=signer, signing_time=signing_time)
+    workers = min(max_workers, len(contents))
+    if workers <= 1:
+        return [task(content) for content in contents]
+
+    chunksize = max(1, len(contents) // (workers * SIGNATURE_TASKS_PER_WORKER))
+    return pool_map(task, contents, workers, chunksize, executor=executor)
@@ -0,0 +1,100 @@
+"""
+Consulta de estado de documentos de nómina electrónica en la DIAN.
+
+Los documentos enviados en paquetes ZIP se consultan con GetStatusZip, una
+solicitud por ZipKey que retorna el estado de todos los documentos del
+paquete. Los documentos enviados de forma individual se consultan con
+GetStatus por su track id (CUDE).
+
+Las consultas viajan en un sobre SOAP 1.2 con la acción y el destino en las
+cabeceras WS-Addressing, como las espera el servicio WCF de la DIAN.
+"""
+from lxml import etree
+
+DIAN_WCF_NAMESPACE = 'http://wcf.dian.colombia'
+SOAP_NAMESPACE = 'http://www.w3.org/2003/05/soap-envelope'
+WSA_NAMESPACE = 'http://www.w3.org/2005/08/addressing'
+DIAN_STATUS_NAMESPACES = {
+    'b': 'http://schemas.datacontract.org/2004/07/DianResponse',
+}
+
+SOAP_ACTION_GET_STATUS = 'http://wcf.dian.colombia/IWcfDianCustomerServices/GetStatus'
+SOAP_ACTION_GET_STATUS_ZIP = 'http://wcf.dian.colombia/IWcfDianCustomerServices/GetStatusZip'
+
+# Códigos con los que la DIAN indica que el documento sigue en validación
+DIAN_IN_PROCESS_CODES = frozenset(['66', '98'])
+
+# Código de documento validado
+DIAN_ACCEPTED_CODE = '00'
+
+# Código con el que GetStatus indica que la DIAN no tiene el documento
+DIAN_NOT_FOUND_CODE = '90'
+
+
+def soap_envelope(operation, action, url):
+    """
+    Sobre SOAP 1.2 de una operación del servicio de la DIAN
+
+    :param operation: Elemento de la operación, que va en el cuerpo del sobre
+    :param action: Acción SOAP de la operación
+    :param url: URL del servicio, para la cabecera wsa:To
+    :return: Tupla (sobre en bytes, cabeceras HTTP)
+    """
+    envelope = etree.Element('{%s}Envelope' % SOAP_NAMESPACE, nsmap={
+        'soap': SOAP_NAMESPACE, 'wsa': WSA_NAMESPACE, 'wcf': DIAN_WCF_NAMESPACE})
+    header = etree.SubElement(envelope, '{%s}Header' % SOAP_NAMESPACE)
+    etree.SubElement(header, '{%s}Action' % WSA_NAMESPACE).text = action
+    etree.SubElement(header, '{%s}To' % WSA_NAMESPACE).text = url
+    etree.SubElement(envelope, '{%s}Body' % SOAP_NAMESPACE).append(operation)
+    headers = {'Content-Type': 'application/soap+xml; charset=utf-8; action="%s"' % action}
+    return etree.tostring(envelope, xml_declaration=True, encoding='UTF-8'), headers
+
+
+def status_request(track_id, url, zip_status=False):
+    """
+    Solicitud de la consulta de estado
+
+    :param track_id: ZipKey del paquete o CUDE del documento
+    :param url: URL del servicio de la DIAN
+    :param zip_status: True para GetStatusZip, False para GetStatus
+    :return: Tupla (sobre SOAP en bytes, cabeceras)
+    """
+    operation = etree.Element('{%s}%s' % (DIAN_WCF_NAMESPACE, 'GetStatusZip' if zip_status else 'GetStatus'))
+    etree.SubElement(operation, '{%s}trackId' % DIAN_WCF_NAMESPACE).text = track_id
+    return soap_envelope(operation, SOAP_ACTION_GET_STATUS_ZIP if zip_status else SOAP_ACTION_GET_STATUS, url)
+
+
+def parse_status_response(content):
+    """
+    Interpreta la respuesta de GetStatus o GetStatusZip
+
+    :param content: Cuerpo de la respuesta en bytes
+    :return: Lista de diccionarios, uno por documento, con las llaves
+             filename, document_key, status_code, status_description y
+             final (False mientras el documento sigue en validación o la
+             respuesta no trae código de estado)
+    """
+    root = etree.fromstring(content)
+    if etree.QName(root).localname == 'DianResponse':
+        responses = [root]
+    else:
+        responses = root.iterfind('.//b:DianResponse', namespaces=DIAN_STATUS_NAMESPACES)
+
+    statuses = []
+    for response in responses:
+        status_code = response.findtext('b:StatusCode', '', namespaces=DIAN_STATUS_NAMESPACES).strip()
+        errors = [
+            message.text for message in response.iterfind(
+                'b:ErrorMessage/b:string', namespaces=DIAN_STATUS_NAMESPACES)
+            if message.text
+        ]
+        description = response.findtext('b:StatusDescription', '', namespaces=DIAN_STATUS_NAMESPACES)
+        statuses.append({
+            'filename': response.findtext('b:XmlFileName', '', namespaces=DIAN_STATUS_NAMESPACES),
+            'document_key': response.findtext('b:XmlDocumentKey', '', namespaces=DIAN_STATUS_NAMESPACES),
+            'status_code': status_code,
+            'status_description': '\n'.join([description] + errors) if errors else description,
+            # Sin código la DIAN aún no ha procesado el documento
+            'final': bool(status_code) and status_code not in DIAN_IN_PROCESS_CODES,
+        })
+    return statuses
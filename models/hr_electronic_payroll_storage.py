@@ -0,0 +1,132 @@
+"""
+Almacenamiento comprimido de los XML de nómina electrónica.
+
+Los XML (sin firmar, firmado y respuesta de la DIAN) se guardan como adjuntos
+comprimidos con zstd o gzip. La compresión es determinística, de modo que un
+mismo contenido produce los mismos bytes y el filestore, que direcciona los
+archivos por su checksum, lo guarda una sola vez.
+
+El algoritmo se detecta por la firma de los primeros bytes, así que los
+adjuntos guardados sin comprimir o con otro algoritmo se siguen leyendo.
+"""
+import gzip
+import io
+import logging
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+_logger = logging.getLogger(__name__)
+
+GZIP_MAGIC = b'\x1f\x8b'
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+# Tamaño máximo de la cabecera de un frame zstd, donde va el tamaño del contenido
+ZSTD_FRAME_HEADER_MAX_SIZE = 18
+STREAM_CHUNK_SIZE = 1 << 16
+
+CODEC_MIMETYPES = {
+    'zstd': 'application/zstd',
+    'gzip': 'application/gzip',
+    'none': 'application/xml',
+}
+
+DEFAULT_CODEC = 'gzip'
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 10
+
+
+def available_codec(codec):
+    """Algoritmo a usar: zstd requiere el paquete zstandard, de lo contrario se usa gzip"""
+    if codec not in CODEC_MIMETYPES:
+        return DEFAULT_CODEC
+    if codec == 'zstd' and zstandard is None:
+        _logger.warning("El paquete zstandard no está instalado; los XML se comprimen con gzip")
+        return 'gzip'
+    return codec
+
+
+def detect_codec(header):
+    """Algoritmo con el que se comprimió un contenido, según sus primeros bytes"""
+    if header[:4] == ZSTD_MAGIC:
+        return 'zstd'
+    if header[:2] == GZIP_MAGIC:
+        return 'gzip'
+    return 'none'
+
+
+def compress(content, codec):
+    """
+    Comprime el contenido
+
+    :param content: Contenido en bytes
+    :param codec: 'zstd', 'gzip' o 'none'
+    :return: Contenido comprimido en bytes
+    """
+    if codec == 'zstd':
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(content)
+    if codec == 'gzip':
+        # mtime=0 para que el mismo contenido produzca los mismos bytes
+        return gzip.compress(content, compresslevel=GZIP_LEVEL, mtime=0)
+    return content
+
+
+def _require_zstandard():
+    if zstandard is None:
+        raise ValueError("El paquete zstandard es necesario para leer contenido comprimido con zstd")
+
+
+def decompress(content):
+    """Descomprime el contenido según el algoritmo detectado"""
+    codec = detect_codec(content)
+    if codec == 'zstd':
+        _require_zstandard()
+        return zstandard.ZstdDecompressor().decompress(content)
+    if codec == 'gzip':
+        return gzip.decompress(content)
+    return content
+
+
+def content_size(fileobj, size):
+    """
+    Tamaño del contenido descomprimido, sin descomprimirlo: zstd lo guarda en
+    la cabecera del frame y gzip en los últimos 4 bytes (módulo 2**32)
+
+    :param fileobj: Archivo binario con posicionamiento (seek)
+    :param size: Tamaño del archivo comprimido
+    :return: Tamaño en bytes
+    """
+    header = fileobj.read(ZSTD_FRAME_HEADER_MAX_SIZE)
+    codec = detect_codec(header)
+    if codec == 'zstd':
+        _require_zstandard()
+        frame_size = zstandard.frame_content_size(header)
+        if frame_size >= 0:
+            return frame_size
+        # Frame sin tamaño declarado: se cuenta el contenido a medida que se lee
+        fileobj.seek(0)
+        with open_stream(fileobj) as stream:
+            return sum(len(chunk) for chunk in iter(lambda: stream.read(STREAM_CHUNK_SIZE), b''))
+    if codec == 'gzip':
+        fileobj.seek(-4, io.SEEK_END)
+        return int.from_bytes(fileobj.read(4), 'little')
+    return size
+
+
+def open_stream(fileobj):
+    """
+    Envuelve un archivo binario en un lector que descomprime a medida que se lee
+
+    :param fileobj: Archivo binario con posicionamiento (seek)
+    :return: Archivo binario con el contenido descomprimido
+    """
+    header = fileobj.read(4)
+    fileobj.seek(0)
+    codec = detect_codec(header)
+    if codec == 'zstd':
+        _require_zstandard()
+        return zstandard.ZstdDecompressor().stream_reader(fileobj)
+    if codec == 'gzip':
+        return gzip.GzipFile(fileobj=fileobj, mode='rb')
+    return fileobj
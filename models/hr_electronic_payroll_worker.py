@@ -0,0 +1,14 @@
+"""
+Arranque de los procesos de firma y validación de nómina electrónica.
+
+Los pools de procesos se crean con forkserver o spawn, de modo que sus
+procesos no conocen las rutas de módulos de Odoo. Al iniciar cada proceso,
+ProcessPoolExecutor ejecuta este archivo por su ruta (runpy.run_path) con
+``ADDONS_PATH`` en sus globales, antes de recibir la primera tarea. Este
+archivo no se importa como módulo.
+"""
+import odoo.addons
+
+for addons_path in ADDONS_PATH:  # noqa: F821
+    if addons_path not in odoo.addons.__path__:
+        odoo.addons.__path__.append(addons_path)
@@ -0,0 +1,147 @@
+"""
+Constructor lxml del documento NominaIndividual de la DIAN.
+
+El constructor se crea una vez por lote (compañía) y se reutiliza para todos
+los documentos: el mapa de espacios de nombres, los datos del empleador y los
+parámetros legales de cada año se calculan una sola vez. Cada documento se
+arma directamente como árbol lxml y se serializa una única vez, sin pasar por
+xml.etree ni volver a interpretar el texto.
+"""
+from lxml import etree
+from lxml.builder import ElementMaker
+
+from .hr_electronic_payroll_concepts import (
+    HEALTH_RATE_CONCEPT, PENSION_RATE_CONCEPT, build_concept_nodes, concept_totals)
+
+NOMINA_NAMESPACE = 'dian:gov:co:facturaelectronica:NominaIndividual'
+
+NOMINA_NSMAP = {
+    None: NOMINA_NAMESPACE,
+    'xs': 'http://www.w3.org/2001/XMLSchema-instance',
+    'ds': 'http://www.w3.org/2000/09/xmldsig#',
+    'ext': 'urn:oasis:names:specification:ubl:schema:xsd:CommonExtensionComponents-2',
+    'xades': 'http://uri.etsi.org/01903/v1.3.2#',
+    'xades141': 'http://uri.etsi.org/01903/v1.4.1#',
+}
+
+NOMINA_SCHEMA_LOCATION = 'dian:gov:co:facturaelectronica:NominaIndividual NominaIndividualElectronicaXSD.xsd'
+
+# Forma y método de pago: 1 = Transferencia, 1 = Contado
+PAYMENT_FORM = '1'
+PAYMENT_METHOD = '1'
+
+# Tipo de operación de las notas de ajuste -> nodo del documento predecesor
+PREDECESSOR_NODES = {
+    '20': 'ReemplazandoPredecesor',
+    '30': 'EliminandoPredecesor',
+}
+
+# Tipo de operación de la nota de eliminación: solo referencia al documento
+# eliminado, sin trabajador, pago, conceptos ni totales
+DELETION_OPERATION_TYPE = '30'
+
+
+def nomina_tag(name):
+    """Nombre calificado de un nodo en el espacio de nombres NominaIndividual"""
+    return '{%s}%s' % (NOMINA_NAMESPACE, name)
+
+
+def _date(value):
+    return value.strftime('%Y-%m-%d') if value else ''
+
+
+class NominaIndividualBuilder:
+    """
+    Arma los documentos NominaIndividual de una compañía
+
+    Uso::
+
+        builder = NominaIndividualBuilder(company)
+        for document in documents:
+            content = builder.tostring(builder.build(document))
+    """
+
+    def __init__(self, company):
+        self.env = company.env
+        self.E = ElementMaker(namespace=NOMINA_NAMESPACE, nsmap=NOMINA_NSMAP)
+        self.employer_vat = (company.vat or '').replace('-', '').replace('.', '')
+        self.employer_name = company.name
+        self._legal_by_year = {}
+
+    def _legal_values(self, day):
+        if day.year not in self._legal_by_year:
+            self._legal_by_year[day.year] = self.env['hr.payroll.legal.parameter']._get_legal_values(day)
+        return self._legal_by_year[day.year]
+
+    def build(self, document):
+        """
+        Construye el árbol del documento
+
+        :param document: Registro hr.electronic.payroll
+        :return: Elemento raíz lxml
+        """
+        E = self.E
+        root = E.NominaIndividual(
+            *self._predecessor_nodes(document),
+            E.InformacionGeneral(
+                E.Version('V1.0'),
+                E.Ambiente(document.dian_environment),
+                E.TipoOperacion(document.dian_operation_type),
+                E.FechaGeneracion(_date(document.date)),
+                E.PeriodoNomina(
+                    FechaIngreso=_date(document.period_start),
+                    FechaRetiro=_date(document.period_end)),
+                E.TipoMoneda(document.currency_id.name),
+            ),
+            E.Empleador(
+                E.NIT(self.employer_vat),
+                E.RazonSocial(self.employer_name),
+            ),
+            SchemaLocation=NOMINA_SCHEMA_LOCATION,
+        )
+        if document.dian_operation_type != DELETION_OPERATION_TYPE:
+            root.extend(self._payroll_nodes(document))
+        return root
+
+    def _payroll_nodes(self, document):
+        """Trabajador, pago, conceptos y totales del documento"""
+        E = self.E
+        legal = self._legal_values(document.period_start or document.date)
+        concepts = dict(document._get_concept_values())
+        concepts[HEALTH_RATE_CONCEPT] = legal['health_employee_rate']
+        concepts[PENSION_RATE_CONCEPT] = legal['pension_employee_rate']
+        devengados, deducciones = concept_totals(concepts)
+        return [
+            E.Trabajador(
+                E.TipoDocumento(document.employee_identification_type or ''),
+                E.NumeroDocumento(document.employee_identification or ''),
+                E.PrimerApellido(document.employee_first_surname or ''),
+                E.SegundoApellido(document.employee_second_surname or ''),
+                E.PrimerNombre(document.employee_first_name or ''),
+                E.SegundoNombre(document.employee_second_name or ''),
+            ),
+            E.Pago(
+                E.Forma(PAYMENT_FORM),
+                E.Metodo(PAYMENT_METHOD),
+            ),
+            *build_concept_nodes(E, concepts),
+            E.DevengadosTotal('%.2f' % devengados),
+            E.DeduccionesTotal('%.2f' % deducciones),
+            E.ComprobanteTotal('%.2f' % (devengados - deducciones)),
+        ]
+
+    def _predecessor_nodes(self, document):
+        """Referencia al documento que reemplaza o elimina una nota de ajuste"""
+        node = PREDECESSOR_NODES.get(document.dian_operation_type)
+        predecessor = document.original_electronic_payroll_id
+        if not node or not predecessor:
+            return []
+        return [self.E(node,
+                       NumeroPred=predecessor.dian_number or predecessor.name or '',
+                       CUNEPred=predecessor.dian_cude or '',
+                       FechaGenPred=_date(predecessor.date))]
+
+    @staticmethod
+    def tostring(root, pretty_print=False):
+        """Serializa el documento una sola vez, con declaración XML en UTF-8"""
+        return etree.tostring(root, xml_declaration=True, encoding='UTF-8', pretty_print=pretty_print)
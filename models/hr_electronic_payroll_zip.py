@@ -0,0 +1,65 @@
+"""
+Empaquetado ZIP de documentos de nómina electrónica para el envío asíncrono
+a la DIAN (estilo SendBillAsync).
+
+Los documentos firmados se agrupan en un solo ZIP comprimido por solicitud.
+La DIAN responde con un ZipKey, que identifica el paquete en las consultas de
+estado posteriores, y con la lista de documentos que no superaron la
+validación inicial, identificados por el nombre del archivo dentro del ZIP.
+"""
+import hashlib
+import io
+import zipfile
+
+from lxml import etree
+
+# Máximo de documentos por paquete permitido por el servicio
+DIAN_ZIP_MAX_DOCUMENTS = 50
+
+DIAN_RESPONSE_NAMESPACES = {
+    'b': 'http://schemas.datacontract.org/2004/07/UploadDocumentResponse',
+    'c': 'http://schemas.datacontract.org/2004/07/XmlParamsResponseTrackId',
+}
+
+
+def build_zip(files):
+    """
+    Comprime los documentos en un solo ZIP en memoria
+
+    :param files: Lista de tuplas (nombre del archivo, contenido en bytes)
+    :return: Contenido del ZIP en bytes
+    """
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as package:
+        for filename, content in files:
+            package.writestr(filename, content)
+    return buffer.getvalue()
+
+
+def zip_filename(nit, sequence):
+    """Nombre del paquete: z + NIT (10 dígitos) + consecutivo hexadecimal (10 dígitos)"""
+    nit = ''.join(char for char in (nit or '') if char.isdigit())
+    return 'z%s%010x.zip' % (nit.zfill(10)[-10:], sequence)
+
+
+def package_key(cudes):
+    """Identificador del paquete en el despachador, a partir de los CUDE que contiene"""
+    return hashlib.sha384('|'.join(sorted(cudes)).encode()).hexdigest()
+
+
+def parse_zip_response(content):
+    """
+    Interpreta la respuesta del envío de un paquete
+
+    :param content: Cuerpo de la respuesta en bytes
+    :return: Tupla (ZipKey, {nombre del archivo: mensaje de error})
+    """
+    root = etree.fromstring(content)
+    zip_key = root.findtext('.//b:ZipKey', '', namespaces=DIAN_RESPONSE_NAMESPACES)
+    errors = {}
+    for track in root.iterfind('.//c:XmlParamsResponseTrackId', namespaces=DIAN_RESPONSE_NAMESPACES):
+        if track.findtext('c:Success', 'false', namespaces=DIAN_RESPONSE_NAMESPACES).lower() == 'true':
+            continue
+        filename = track.findtext('c:XmlFileName', '', namespaces=DIAN_RESPONSE_NAMESPACES)
+        errors[filename] = track.findtext('c:ProcessedMessage', '', namespaces=DIAN_RESPONSE_NAMESPACES)
+    return zip_key, errors
@@ -0,0 +1,427 @@
+"""
+Benchmark de nómina colombiana.
+
+Genera una compañía sintética con N empleados y mide los procesos principales
+(cálculo y confirmación del lote, PILA, archivos bancarios, provisiones,
+certificados y XML de nómina electrónica) con su tiempo y número de consultas.
+
+Se ejecuta desde ``odoo-bin shell`` sobre una base de datos desechable::
+
+    env['hr.payroll.benchmark']._run_benchmark(employee_count=10000, label='mi-rama')
+    env.cr.rollback()  # o commit, para conservar los datos generados
+
+Solo lo pueden ejecutar los administradores. El resultado se escribe en un
+archivo JSON en el filestore para comparar ramas con 1k, 10k y 50k empleados.
+"""
+from odoo import models, fields, api, tools, _
+from odoo.exceptions import AccessError
+from odoo.tools import split_every
+from datetime import datetime, time as dt_time, timedelta
+import json
+import logging
+import os
+import random
+import time
+
+from .hr_electronic_payroll_xml import NominaIndividualBuilder
+
+_logger = logging.getLogger(__name__)
+
+# Tamaños de referencia para comparar ramas
+BENCHMARK_SIZES = (1000, 10000, 50000)
+
+# Registros por llamada a create al generar los datos
+GENERATOR_BATCH_SIZE = 2000
+
+# Proporción de empleados con cada novedad en el mes generado
+OVERTIME_RATIO = 0.30
+DISABILITY_RATIO = 0.05
+VACATION_RATIO = 0.08
+INTEGRAL_RATIO = 0.03
+
+# Escenarios medidos, en orden de ejecución
+BENCHMARK_SCENARIOS = [
+    'run_compute',
+    'confirm',
+    'pila',
+    'bank_files',
+    'provisions',
+    'certificates_zip',
+    'electronic_xml',
+]
+
+# Jornada en UTC equivalente a 8:00-17:00 en Colombia (UTC-5), con una hora de almuerzo
+WORK_START = dt_time(13, 0)
+WORK_HOURS = 8
+OVERTIME_START = dt_time(22, 0)
+OVERTIME_HOURS = 2
+
+
+class HrPayrollBenchmark(models.AbstractModel):
+    _name = 'hr.payroll.benchmark'
+    _description = 'Benchmark de Nómina'
+
+    @api.model
+    def _run_benchmark(self, employee_count=1000, date_from=None, scenarios=None, label=None, seed=42):
+        """
+        Genera los datos y ejecuta los escenarios cronometrados
+
+        :param employee_count: Número de empleados a generar
+        :param date_from: Primer día del mes de nómina (por defecto el mes anterior)
+        :param scenarios: Escenarios a ejecutar (por defecto BENCHMARK_SCENARIOS)
+        :param label: Etiqueta libre para identificar la rama o el equipo
+        :param seed: Semilla del generador aleatorio, para datos reproducibles
+        :return: Diccionario con los resultados
+        """
+        if not self.env.is_system():
+            raise AccessError(_('Solo los administradores pueden ejecutar el benchmark de nómina.'))
+        if date_from is None:
+            date_from = fields.Date.context_today(self).replace(day=1) - timedelta(days=1)
+        date_from = fields.Date.to_date(date_from).replace(day=1)
+
+        start = time.perf_counter()
+        data = self._generate_company(employee_count, date_from, seed=seed)
+        generation_time = time.perf_counter() - start
+        _logger.info("Benchmark: %s empleados generados en %.1f s", employee_count, generation_time)
+
+        results = []
+        for scenario in scenarios or BENCHMARK_SCENARIOS:
+            results.extend(getattr(self, '_scenario_%s' % scenario)(data))
+
+        report = {
+            'label': label,
+            'date': fields.Datetime.to_string(fields.Datetime.now()),
+            'database': self.env.cr.dbname,
+            'employee_count': employee_count,
+            'period': fields.Date.to_string(date_from),
+            'seed': seed,
+            'generation_seconds': round(generation_time, 3),
+            'scenarios': results,
+        }
+        path = self._get_output_path(employee_count)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as output_file:
+            json.dump(report, output_file, indent=2, ensure_ascii=False)
+        _logger.info("Benchmark: resultados escritos en %s", path)
+        report['output_path'] = path
+        return report
+
+    @api.model
+    def _get_output_path(self, employee_count):
+        timestamp = fields.Datetime.now().strftime('%Y%m%d_%H%M%S')
+        return os.path.join(
+            tools.config.filestore(self.env.cr.dbname), 'nomina_colombia', 'benchmark',
+            'benchmark_%s_%s.json' % (employee_count, timestamp))
+
+    def _measure(self, scenario, func, record_count):
+        """
+        Ejecuta un escenario en un savepoint y mide tiempo y consultas. Los
+        errores se registran en el resultado para no detener los demás escenarios.
+
+        :return: Diccionario con el resultado del escenario
+        """
+        cr = self.env.cr
+        self.env.flush_all()
+        self.env.invalidate_all()
+        result = {'scenario': scenario, 'records': record_count}
+        queries_before = cr.sql_log_count
+        start = time.perf_counter()
+        try:
+            with cr.savepoint(flush=True):
+                func()
+                self.env.flush_all()
+            result['status'] = 'ok'
+        except Exception as e:
+            _logger.warning("Benchmark: el escenario %s falló: %s", scenario, e)
+            result.update(status='error', error=str(e))
+        result['seconds'] = round(time.perf_counter() - start, 4)
+        result['queries'] = cr.sql_log_count - queries_before
+        result['queries_per_record'] = round(result['queries'] / record_count, 3) if record_count else None
+        _logger.info("Benchmark: %(scenario)s %(status)s en %(seconds)s s con %(queries)s consultas", result)
+        return result
+
+    # Generador de datos
+    @api.model
+    def _generate_company(self, employee_count, date_from, seed=42):
+        """
+        Crea una compañía colombiana sintética con empleados, afiliaciones,
+        familiares, cuentas bancarias, contratos, entradas de trabajo y un lote
+        de nómina con una nómina por empleado
+
+        :return: Diccionario con los registros generados
+        """
+        rng = random.Random(seed)
+        date_to = (date_from + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+        legal = self.env['hr.payroll.legal.parameter']._get_legal_values(date_to)
+
+        company = self.env['res.company'].create({
+            'name': _('Benchmark Nómina %s') % employee_count,
+            'country_id': self.env.ref('base.co').id,
+            'vat': '900%06d' % rng.randrange(10 ** 6),
+        })
+        benchmark = self.with_company(company)
+
+        entities = benchmark._generate_entities(company)
+        employees = benchmark._generate_employees(company, employee_count, entities, rng)
+        benchmark._generate_families(employees, rng)
+        contracts = benchmark._generate_contracts(employees, date_from, legal, rng)
+        benchmark._generate_work_entries(contracts, date_from, date_to, rng)
+
+        payslip_run = benchmark.env['hr.payslip.run'].create({
+            'name': _('Benchmark %s') % date_from.strftime('%Y-%m'),
+            'date_start': date_from,
+            'date_end': date_to,
+            'company_id': company.id,
+        })
+        payslips = benchmark.env['hr.payslip']
+        for batch in split_every(GENERATOR_BATCH_SIZE, contracts.ids, contracts.browse):
+            payslips |= benchmark.env['hr.payslip'].create([{
+                'name': _('Nómina %s') % contract.employee_id.name,
+                'employee_id': contract.employee_id.id,
+                'contract_id': contract.id,
+                'struct_id': contract.struct_id.id,
+                'payslip_run_id': payslip_run.id,
+                'company_id': company.id,
+                'date_from': date_from,
+                'date_to': date_to,
+            } for contract in batch])
+
+        return {
+            'company': company,
+            'employees': employees,
+            'contracts': contracts,
+            'payslip_run': payslip_run,
+            'payslips': payslips,
+            'date_from': date_from,
+            'date_to': date_to,
+        }
+
+    @api.model
+    def _generate_entities(self, company):
+        """Crea las entidades de seguridad social y los bancos de las cuentas"""
+        Partner = self.env['res.partner']
+        entities = {}
+        for key, names in [
+            ('eps', ['EPS Sura', 'Nueva EPS', 'Sanitas', 'Compensar EPS']),
+            ('pension', ['Porvenir', 'Protección', 'Colfondos', 'Colpensiones']),
+            ('severance', ['Porvenir Cesantías', 'Protección Cesantías']),
+            ('arl', ['ARL Sura', 'Positiva', 'Colmena']),
+            ('ccf', ['Compensar', 'Cafam', 'Colsubsidio', 'Comfama']),
+        ]:
+            entities[key] = Partner.create([{
+                'name': name,
+                'is_company': True,
+                'company_id': company.id,
+            } for name in names])
+        entities['banks'] = self.env['res.bank'].search([('country', '=', self.env.ref('base.co').id)])
+        if not entities['banks']:
+            entities['banks'] = self.env['res.bank'].create({'name': 'Banco Benchmark'})
+        return entities
+
+    @api.model
+    def _generate_employees(self, company, employee_count, entities, rng):
+        """Crea empleados con contacto, cuenta bancaria y afiliaciones EPS/AFP/ARL"""
+        employees = self.env['hr.employee']
+        for batch in split_every(GENERATOR_BATCH_SIZE, range(employee_count), list):
+            names = [(index, 'Empleado', 'Benchmark', '%06d' % index) for index in batch]
+            partners = self.env['res.partner'].create([{
+                'name': ' '.join(name[1:]),
+                'company_id': company.id,
+            } for name in names])
+            accounts = self.env['res.partner.bank'].create([{
+                'partner_id': partner.id,
+                'acc_number': '%011d' % (10 ** 10 + name[0]),
+                'bank_id': rng.choice(entities['banks']).id,
+                'company_id': company.id,
+            } for name, partner in zip(names, partners)])
+            employees |= self.env['hr.employee'].create([{
+                'name': ' '.join(name[1:]),
+                'first_name': name[1],
+                'first_surname': name[2],
+                'second_surname': name[3],
+                'identification_type': 'CC',
+                'identification_id': str(10 ** 9 + name[0]),
+                'company_id': company.id,
+                'work_contact_id': partner.id,
+                'bank_account_id': account.id,
+                'account_type': rng.choice(['savings', 'current']),
+                'eps_id': rng.choice(entities['eps']).id,
+                'pension_fund_id': rng.choice(entities['pension']).id,
+                'severance_fund_id': rng.choice(entities['severance']).id,
+                'arl_id': rng.choice(entities['arl']).id,
+                'arl_risk': rng.choices('12345', weights=[70, 15, 8, 5, 2])[0],
+            } for name, partner, account in zip(names, partners, accounts)])
+        return employees
+
+    @api.model
+    def _generate_families(self, employees, rng):
+        """Crea entre cero y tres familiares por empleado"""
+        today = fields.Date.context_today(self)
+        vals_list = []
+        for employee in employees:
+            for position in range(rng.randint(0, 3)):
+                relation = 'spouse' if position == 0 else 'child'
+                age = rng.randint(25, 60) if relation == 'spouse' else rng.randint(0, 24)
+                vals_list.append({
+                    'employee_id': employee.id,
+                    'relation_type': relation,
+                    'first_name': 'Familiar',
+                    'first_surname': employee.first_surname or 'Benchmark',
+                    'identification_type': 'CC' if age >= 18 else 'TI',
+                    'identification_id': '%s%s' % (employee.identification_id, position),
+                    'birth_date': today - timedelta(days=age * 365 + rng.randint(0, 364)),
+                    'is_student': relation == 'child' and age >= 18,
+                })
+        for batch in split_every(GENERATOR_BATCH_SIZE, vals_list, list):
+            self.env['hr.employee.family'].create(batch)
+
+    @api.model
+    def _generate_contracts(self, employees, date_from, legal, rng):
+        """Crea un contrato vigente por empleado con salarios entre 1 y 8 SMMLV"""
+        standard = self.env.ref('nomina_colombia.hr_payroll_structure_col_standard')
+        integral = self.env.ref('nomina_colombia.hr_payroll_structure_col_integral')
+        vals_list = []
+        for employee in employees:
+            is_integral = rng.random() < INTEGRAL_RATIO
+            if is_integral:
+                wage = round(legal['smmlv'] * legal['integral_min_smmlv'] * rng.uniform(1.0, 1.5), -3)
+            else:
+                wage = round(legal['smmlv'] * rng.choice([1.0, 1.0, 1.2, 1.5, 2.0, 3.0, 5.0, 8.0]), -3)
+            vals_list.append({
+                'name': _('Contrato %s') % employee.name,
+                'employee_id': employee.id,
+                'company_id': employee.company_id.id,
+                'wage': wage,
+                'wage_type': 'integral' if is_integral else 'ordinary',
+                'state': 'open',
+                'date_start': date_from.replace(month=1, day=1),
+                'contract_term': 'indefinido',
+                'transport_allowance': wage <= legal['transport_max_smmlv'] * legal['smmlv'],
+                'risk_level': employee.arl_risk or '1',
+                'struct_id': (integral if is_integral else standard).id,
+            })
+        contracts = self.env['hr.contract']
+        for batch in split_every(GENERATOR_BATCH_SIZE, vals_list, list):
+            contracts |= self.env['hr.contract'].create(batch)
+        return contracts
+
+    @api.model
+    def _generate_work_entries(self, contracts, date_from, date_to, rng):
+        """
+        Crea las entradas de trabajo del mes: jornada normal de lunes a viernes,
+        horas extra diurnas y bloques de incapacidad y vacaciones que reemplazan
+        los días normales
+        """
+        attendance = self.env.ref('hr_work_entry.work_entry_type_attendance')
+        overtime = self.env.ref('nomina_colombia.work_entry_type_hed_col')
+        disability = self.env.ref('nomina_colombia.work_entry_type_inc_col')
+        vacation = self.env.ref('nomina_colombia.work_entry_type_vac_col')
+
+        workdays = [
+            date_from + timedelta(days=offset)
+            for offset in range((date_to - date_from).days + 1)
+            if (date_from + timedelta(days=offset)).weekday() < 5
+        ]
+
+        def entry(contract, work_entry_type, day, start, hours):
+            date_start = datetime.combine(day, start)
+            return {
+                'name': work_entry_type.name,
+                'employee_id': contract.employee_id.id,
+                'contract_id': contract.id,
+                'company_id': contract.company_id.id,
+                'work_entry_type_id': work_entry_type.id,
+                'date_start': date_start,
+                'date_stop': date_start + timedelta(hours=hours),
+            }
+
+        vals_list = []
+        for contract in contracts:
+            # Bloque de novedad que reemplaza días normales
+            novelty_days = {}
+            roll = rng.random()
+            if roll < DISABILITY_RATIO:
+                first = rng.randrange(len(workdays))
+                novelty_days = dict.fromkeys(workdays[first:first + rng.randint(2, 5)], disability)
+            elif roll < DISABILITY_RATIO + VACATION_RATIO:
+                first = rng.randrange(len(workdays))
+                novelty_days = dict.fromkeys(workdays[first:first + rng.randint(5, 10)], vacation)
+
+            for day in workdays:
+                vals_list.append(entry(contract, novelty_days.get(day, attendance), day, WORK_START, WORK_HOURS))
+
+            if rng.random() < OVERTIME_RATIO:
+                for day in rng.sample(workdays, k=min(len(workdays), rng.randint(1, 6))):
+                    if day not in novelty_days:
+                        vals_list.append(entry(contract, overtime, day, OVERTIME_START, OVERTIME_HOURS))
+
+        for batch in split_every(GENERATOR_BATCH_SIZE * 5, vals_list, list):
+            self.env['hr.work.entry'].create(batch)
+
+    # Escenarios
+    def _scenario_run_compute(self, data):
+        payslips = data['payslips']
+        return [self._measure('run_compute', payslips.compute_sheet, len(payslips))]
+
+    def _scenario_confirm(self, data):
+        payslips = data['payslips']
+        return [self._measure('confirm', payslips.action_payslip_done, len(payslips))]
+
+    def _scenario_pila(self, data):
+        payslips = data['payslips']
+        pila = self.env['hr.pila'].create({
+            'company_id': data['company'].id,
+            'date_from': data['date_from'],
+            'date_to': data['date_to'],
+            'payslip_ids': [(6, 0, payslips.ids)],
+        })
+        return [self._measure('pila', pila._generate_pila_content, len(payslips))]
+
+    def _scenario_bank_files(self, data):
+        """Un resultado por formato bancario"""
+        Wizard = self.env['hr.payroll.bank.file.wizard']
+        payslips = data['payslip_run'].slip_ids
+        bank = self.env['res.bank'].search([], limit=1)
+        results = []
+        for file_format, _label in Wizard._fields['file_format'].selection:
+            wizard = Wizard.create({
+                'payslip_run_id': data['payslip_run'].id,
+                'bank_id': bank.id,
+                'file_format': file_format,
+                'payment_date': data['date_to'],
+            })
+            method = getattr(wizard, '_generate_%s_content' % file_format)
+            results.append(self._measure('bank_%s' % file_format, lambda: method(payslips), len(payslips)))
+        return results
+
+    def _scenario_provisions(self, data):
+        wizard = self.env['hr.payroll.provision.wizard'].create({
+            'date_from': data['date_from'],
+            'date_to': data['date_to'],
+            'employee_ids': [(6, 0, data['employees'].ids)],
+            'generate_journal_entries': False,
+        })
+        employees = wizard._get_employees()
+        return [self._measure('provisions', lambda: wizard._calculate_provisions(employees), len(employees))]
+
+    def _scenario_certificates_zip(self, data):
+        wizard = self.env['hr.payroll.certificate.wizard'].create({
+            'employee_ids': [(6, 0, data['employees'].ids)],
+            'certificate_type': 'labor',
+            'date_from': data['date_from'].replace(month=1, day=1),
+            'date_to': data['date_to'],
+            'include_signature': False,
+            'company_id': data['company'].id,
+        })
+        return [self._measure('certificates_zip', wizard._generate_certificates_zip, len(data['employees']))]
+
+    def _scenario_electronic_xml(self, data):
+        payslips = data['payslips'].filtered(lambda p: p.state == 'done')
+        payslips._create_electronic_payroll_documents()
+        documents = payslips.electronic_payroll_id
+
+        def generate_xml():
+            builder = NominaIndividualBuilder(data['company'])
+            for document in documents:
+                builder.tostring(builder.build(document))
+        return [self._measure('electronic_xml', generate_xml, len(documents))]
@@ -0,0 +1,201 @@
+from odoo import models, fields, api, tools, _
+from odoo.exceptions import UserError, ValidationError
+from odoo.tools import frozendict
+import logging
+
+_logger = logging.getLogger(__name__)
+
+# Campos del parámetro que se exponen en el registro de valores legales
+LEGAL_VALUE_FIELDS = [
+    'smmlv',
+    'transport_allowance',
+    'uvt',
+    'health_employee_rate',
+    'health_employer_rate',
+    'pension_employee_rate',
+    'pension_employer_rate',
+    'ccf_rate',
+    'sena_rate',
+    'icbf_rate',
+    'severance_interest_rate',
+    'integral_factor',
+    'integral_min_smmlv',
+    'transport_max_smmlv',
+    'max_ibc_smmlv',
+    'exemption_max_smmlv',
+]
+
+# Clases de riesgo ARL y el campo de tasa correspondiente
+ARL_RATE_FIELDS = {
+    '1': 'arl_rate_1',
+    '2': 'arl_rate_2',
+    '3': 'arl_rate_3',
+    '4': 'arl_rate_4',
+    '5': 'arl_rate_5',
+}
+
+
+class HrPayrollLegalParameter(models.Model):
+    _name = 'hr.payroll.legal.parameter'
+    _description = 'Parámetros Legales de Nómina por Año'
+    _order = 'year desc'
+    _rec_name = 'year'
+
+    year = fields.Integer(string='Año', required=True)
+    active = fields.Boolean(default=True)
+
+    # Campos para valores base
+    smmlv = fields.Float(string='Salario Mínimo (SMMLV)', required=True)
+    transport_allowance = fields.Float(string='Auxilio de Transporte', required=True)
+    uvt = fields.Float(string='Valor UVT', required=True)
+
+    # Campos para aportes a seguridad social (porcentajes)
+    health_employee_rate = fields.Float(string='Salud Empleado (%)', default=4.0)
+    health_employer_rate = fields.Float(string='Salud Empleador (%)', default=8.5)
+    pension_employee_rate = fields.Float(string='Pensión Empleado (%)', default=4.0)
+    pension_employer_rate = fields.Float(string='Pensión Empleador (%)', default=12.0)
+    arl_rate_1 = fields.Float(string='ARL Riesgo I (%)', default=0.522, digits=(16, 3))
+    arl_rate_2 = fields.Float(string='ARL Riesgo II (%)', default=1.044, digits=(16, 3))
+    arl_rate_3 = fields.Float(string='ARL Riesgo III (%)', default=2.436, digits=(16, 3))
+    arl_rate_4 = fields.Float(string='ARL Riesgo IV (%)', default=4.350, digits=(16, 3))
+    arl_rate_5 = fields.Float(string='ARL Riesgo V (%)', default=6.960, digits=(16, 3))
+
+    # Campos para parafiscales (porcentajes)
+    ccf_rate = fields.Float(string='Caja de Compensación (%)', default=4.0)
+    sena_rate = fields.Float(string='SENA (%)', default=2.0)
+    icbf_rate = fields.Float(string='ICBF (%)', default=3.0)
+
+    # Campos para prestaciones y topes
+    severance_interest_rate = fields.Float(string='Intereses de Cesantías (%)', default=12.0)
+    integral_factor = fields.Float(
+        string='Factor Salarial Integral (%)', default=70.0,
+        help='Porción del salario integral que constituye base de aportes')
+    integral_min_smmlv = fields.Float(
+        string='Salario Integral Mínimo (SMMLV)', default=13.0,
+        help='Número de salarios mínimos que debe igualar el salario integral')
+    transport_max_smmlv = fields.Float(
+        string='Tope Auxilio de Transporte (SMMLV)', default=2.0,
+        help='Salario máximo, en salarios mínimos, con derecho a auxilio de transporte')
+    max_ibc_smmlv = fields.Float(
+        string='Tope IBC (SMMLV)', default=25.0,
+        help='Ingreso base de cotización máximo en salarios mínimos')
+    exemption_max_smmlv = fields.Float(
+        string='Tope Exoneración SENA/ICBF (SMMLV)', default=10.0,
+        help='Salario por debajo del cual aplica la exoneración del artículo 114-1 del E.T.')
+
+    fsp_tier_ids = fields.One2many(
+        'hr.payroll.legal.parameter.fsp', 'parameter_id',
+        string='Fondo de Solidaridad Pensional', copy=True)
+
+    _sql_constraints = [
+        ('year_uniq', 'unique(year)', 'Ya existen parámetros legales para este año.'),
+    ]
+
+    @api.constrains('smmlv', 'transport_allowance', 'uvt')
+    def _check_base_values(self):
+        for parameter in self:
+            if parameter.smmlv <= 0 or parameter.uvt <= 0 or parameter.transport_allowance < 0:
+                raise ValidationError(_('Los valores de SMMLV, UVT y auxilio de transporte deben ser positivos.'))
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super(HrPayrollLegalParameter, self).create(vals_list)
+        self.env.registry.clear_cache()
+        return records
+
+    def write(self, vals):
+        result = super(HrPayrollLegalParameter, self).write(vals)
+        self.env.registry.clear_cache()
+        return result
+
+    def unlink(self):
+        result = super(HrPayrollLegalParameter, self).unlink()
+        self.env.registry.clear_cache()
+        return result
+
+    @api.model
+    def _get_legal_values(self, date=None):
+        """
+        Retorna los valores legales vigentes para la fecha indicada
+
+        :param date: Fecha de referencia (por defecto hoy)
+        :return: frozendict con los valores del año correspondiente
+        """
+        date = fields.Date.to_date(date) or fields.Date.context_today(self)
+        return self._get_legal_values_for_year(date.year)
+
+    @api.model
+    @tools.ormcache('year')
+    def _get_legal_values_for_year(self, year):
+        """
+        Resuelve los parámetros del año, o del último año anterior configurado.
+        El resultado se guarda en la caché del proceso hasta que se modifique
+        algún parámetro.
+        """
+        parameter = self.sudo().search([('year', '<=', year)], order='year desc', limit=1)
+        if not parameter:
+            raise UserError(_('No hay parámetros legales de nómina configurados para el año %s.') % year)
+        if parameter.year != year:
+            _logger.warning("Parámetros legales del año %s no encontrados, se usan los de %s", year, parameter.year)
+        return parameter._to_legal_values()
+
+    def _to_legal_values(self):
+        """Convierte el registro en un diccionario inmutable apto para caché"""
+        self.ensure_one()
+        values = {field_name: self[field_name] for field_name in LEGAL_VALUE_FIELDS}
+        values.update({
+            'year': self.year,
+            'arl_rates': frozendict({
+                risk_class: self[field_name] for risk_class, field_name in ARL_RATE_FIELDS.items()
+            }),
+            'fsp_tiers': tuple(
+                (tier.smmlv_from, tier.smmlv_to, tier.rate)
+                for tier in self.fsp_tier_ids.sorted('smmlv_from')
+            ),
+        })
+        return frozendict(values)
+
+    @api.model
+    def _get_fsp_rate(self, ibc, date=None):
+        """
+        Retorna el porcentaje del Fondo de Solidaridad Pensional para un IBC
+
+        :param ibc: Ingreso base de cotización
+        :param date: Fecha de referencia
+        :return: Porcentaje aplicable (0.0 si no aplica)
+        """
+        values = self._get_legal_values(date)
+        smmlv_count = ibc / values['smmlv']
+        for smmlv_from, smmlv_to, rate in values['fsp_tiers']:
+            if smmlv_count >= smmlv_from and (not smmlv_to or smmlv_count < smmlv_to):
+                return rate
+        return 0.0
+
+
+class HrPayrollLegalParameterFsp(models.Model):
+    _name = 'hr.payroll.legal.parameter.fsp'
+    _description = 'Tramo del Fondo de Solidaridad Pensional'
+    _order = 'smmlv_from'
+
+    parameter_id = fields.Many2one(
+        'hr.payroll.legal.parameter', string='Parámetro Legal',
+        required=True, ondelete='cascade', index=True)
+    smmlv_from = fields.Float(string='Desde (SMMLV)', required=True)
+    smmlv_to = fields.Float(string='Hasta (SMMLV)', help='Vacío o cero para sin límite superior')
+    rate = fields.Float(string='Porcentaje (%)', required=True)
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super(HrPayrollLegalParameterFsp, self).create(vals_list)
+        self.env.registry.clear_cache()
+        return records
+
+    def write(self, vals):
+        result = super(HrPayrollLegalParameterFsp, self).write(vals)
+        self.env.registry.clear_cache()
+        return result
+
+    def unlink(self):
+        result = super(HrPayrollLegalParameterFsp, self).unlink()
+        self.env.registry.clear_cache()
+        return result
@@ -0,0 +1,38 @@
+from odoo import models, fields, api, _
+
+
+class HrPayrollRuleProfile(models.Model):
+    _name = 'hr.payroll.rule.profile'
+    _description = 'Perfilado de Reglas Salariales'
+    _order = 'date desc, total_us desc'
+
+    date = fields.Datetime(string='Fecha', required=True, default=fields.Datetime.now, index=True)
+    structure_id = fields.Many2one(
+        'hr.payroll.structure', string='Estructura', required=True, ondelete='cascade', index=True)
+    rule_id = fields.Many2one('hr.salary.rule', string='Regla', required=True, ondelete='cascade', index=True)
+    code = fields.Char(related='rule_id.code', string='Código', store=True)
+    compute_engine = fields.Selection(related='rule_id.compute_engine', string='Motor de Cálculo')
+
+    calls = fields.Integer(string='Llamadas', help='Nóminas en las que se evaluó la regla')
+    total_us = fields.Float(string='Tiempo Total (µs)', digits=(16, 1))
+    mean_us = fields.Float(string='Tiempo Promedio (µs)', digits=(16, 1), aggregator='avg')
+    p95_us = fields.Float(string='Percentil 95 (µs)', digits=(16, 1), aggregator='max')
+    max_us = fields.Float(string='Máximo (µs)', digits=(16, 1), aggregator='max')
+    batch_us = fields.Float(
+        string='Manejador por Lote (µs)', digits=(16, 1),
+        help='Tiempo del manejador nativo por lote, incluido en el total')
+    query_count = fields.Integer(string='Consultas SQL')
+    queries_per_call = fields.Float(
+        string='Consultas por Llamada', digits=(16, 2),
+        compute='_compute_queries_per_call', store=True, aggregator='avg')
+
+    @api.depends('query_count', 'calls')
+    def _compute_queries_per_call(self):
+        for profile in self:
+            profile.queries_per_call = profile.query_count / profile.calls if profile.calls else profile.query_count
+
+    @api.model
+    def action_clear_profile(self):
+        """Elimina los resultados de perfilado acumulados"""
+        self.sudo().search([]).unlink()
+        return {'type': 'ir.actions.client', 'tag': 'reload'}
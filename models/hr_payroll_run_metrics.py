@@ -0,0 +1,216 @@
+from odoo import models, fields, api, tools, _
+from contextlib import contextmanager
+from dateutil.relativedelta import relativedelta
+import logging
+import os
+import time
+
+_logger = logging.getLogger(__name__)
+
+# Etapas instrumentadas del proceso de nómina
+METRIC_STAGES = [
+    ('worked_days', 'Días Trabajados'),
+    ('rules', 'Evaluación de Reglas'),
+    ('summary', 'Campos Resumen'),
+    ('confirm', 'Confirmación'),
+    ('electronic', 'Nómina Electrónica'),
+    ('pila', 'PILA'),
+    ('bank', 'Archivo Bancario'),
+    ('provision', 'Provisiones'),
+    ('accounting', 'Contabilidad'),
+]
+
+# Meses incluidos en la exportación Prometheus
+DEFAULT_EXPORT_MONTHS = 13
+
+# Métricas exportadas: (nombre, campo agregado, ayuda)
+PROMETHEUS_METRICS = [
+    ('nomina_payroll_stage_seconds', 'wall_time', 'Tiempo total de la etapa en segundos'),
+    ('nomina_payroll_stage_queries', 'query_count', 'Consultas SQL ejecutadas en la etapa'),
+    ('nomina_payroll_stage_rows_written', 'rows_written', 'Filas escritas en la etapa'),
+    ('nomina_payroll_stage_records', 'record_count', 'Registros procesados en la etapa'),
+    ('nomina_payroll_stage_executions', '__count', 'Ejecuciones de la etapa'),
+]
+
+
+class HrPayrollRunMetrics(models.Model):
+    _name = 'hr.payroll.run.metrics'
+    _description = 'Métricas de Ejecución de Nómina'
+    _order = 'date desc, id desc'
+
+    date = fields.Datetime(string='Fecha', required=True, default=fields.Datetime.now, index=True)
+    period = fields.Date(string='Período', index=True, help='Primer día del mes de nómina medido')
+    stage = fields.Selection(METRIC_STAGES, string='Etapa', required=True, index=True)
+    company_id = fields.Many2one('res.company', string='Compañía', default=lambda self: self.env.company)
+    run_id = fields.Many2one('hr.payslip.run', string='Lote de Nómina', ondelete='set null', index=True)
+    user_id = fields.Many2one('res.users', string='Usuario', default=lambda self: self.env.user)
+    res_model = fields.Char(string='Modelo')
+
+    wall_time = fields.Float(string='Tiempo (s)', digits=(16, 4))
+    query_count = fields.Integer(string='Consultas SQL')
+    rows_written = fields.Integer(string='Filas Escritas')
+    record_count = fields.Integer(string='Registros Procesados')
+    time_per_record = fields.Float(
+        string='Tiempo por Registro (ms)', digits=(16, 3),
+        compute='_compute_per_record', store=True, aggregator='avg')
+    queries_per_record = fields.Float(
+        string='Consultas por Registro', digits=(16, 2),
+        compute='_compute_per_record', store=True, aggregator='avg')
+
+    @api.depends('wall_time', 'query_count', 'record_count')
+    def _compute_per_record(self):
+        for metric in self:
+            count = metric.record_count or 1
+            metric.time_per_record = metric.wall_time * 1000.0 / count
+            metric.queries_per_record = metric.query_count / count
+
+    @api.model
+    def _is_enabled(self):
+        return tools.str2bool(self.env['ir.config_parameter'].sudo().get_param(
+            'nomina_colombia.run_metrics_enabled', 'True'))
+
+    @contextmanager
+    def _track_stage(self, stage, records, run=None, period=None):
+        """
+        Mide el tiempo, las consultas y las filas escritas de una etapa
+
+        Uso::
+
+            with self.env['hr.payroll.run.metrics']._track_stage('pila', pila) as measure:
+                ...
+                measure['rows'] = len(lines)
+
+        :param stage: Código de la etapa (ver METRIC_STAGES)
+        :param records: Registros procesados en la etapa
+        :param run: Lote de nómina (por defecto el lote común de las nóminas)
+        :param period: Fecha del período (por defecto la fecha final de los registros)
+
+        Las filas escritas solo se registran cuando la etapa las informa en
+        ``measure['rows']``. Si la etapa falla, la transacción actual puede
+        estar abortada: la métrica se guarda entonces en un cursor separado y
+        cualquier error al guardarla solo se registra en el log, sin ocultar
+        el error original.
+        """
+        measure = {'rows': 0}
+        if not self._is_enabled():
+            yield measure
+            return
+
+        cr = self.env.cr
+        queries_before = cr.sql_log_count
+        start = time.perf_counter()
+        try:
+            yield measure
+        except Exception:
+            wall_time = time.perf_counter() - start
+            query_count = cr.sql_log_count - queries_before
+            self._record_failed_stage(stage, records, run, period, wall_time, query_count, measure['rows'])
+            raise
+        wall_time = time.perf_counter() - start
+        query_count = cr.sql_log_count - queries_before
+        self._record_stage(stage, records, run, period, wall_time, query_count, measure['rows'])
+
+    def _record_failed_stage(self, stage, records, run, period, wall_time, query_count, rows):
+        """
+        Guarda la métrica de una etapa fallida en su propia transacción
+
+        Los registros que aún no están confirmados (lote o compañía creados en
+        la transacción abortada) no son visibles desde el otro cursor; en ese
+        caso la métrica se descarta con una advertencia.
+        """
+        values = self._prepare_stage_values(stage, records, run, period, wall_time, query_count, rows)
+        try:
+            with self.env.registry.cursor() as cr:
+                self.with_env(self.env(cr=cr)).sudo().create(values)
+        except Exception:
+            _logger.warning("No se pudo registrar la métrica de la etapa fallida %s", stage, exc_info=True)
+
+    def _record_stage(self, stage, records, run, period, wall_time, query_count, rows):
+        self.sudo().create(self._prepare_stage_values(stage, records, run, period, wall_time, query_count, rows))
+
+    def _prepare_stage_values(self, stage, records, run, period, wall_time, query_count, rows):
+        if run is None and 'payslip_run_id' in records._fields:
+            run = records.payslip_run_id if len(records.payslip_run_id) == 1 else None
+        if period is None and 'date_to' in records._fields:
+            period = min(records.mapped('date_to'), default=None)
+        company = records.company_id[:1] if 'company_id' in records._fields else self.env.company
+
+        return {
+            'stage': stage,
+            'period': period and fields.Date.to_date(period).replace(day=1),
+            'company_id': (company or self.env.company).id,
+            'run_id': run.id if run else False,
+            'res_model': records._name,
+            'wall_time': wall_time,
+            'query_count': query_count,
+            'rows_written': rows,
+            'record_count': len(records),
+        }
+
+    @api.model
+    def _get_prometheus_text(self, months=DEFAULT_EXPORT_MONTHS):
+        """
+        Genera las métricas agregadas por compañía, mes y etapa en el formato
+        de texto de Prometheus
+
+        :param months: Número de meses hacia atrás a incluir
+        :return: Texto de la exposición
+        """
+        date_from = fields.Date.context_today(self).replace(day=1) - relativedelta(months=months - 1)
+        groups = self.sudo()._read_group(
+            [('period', '>=', date_from)],
+            ['company_id', 'period:month', 'stage'],
+            [field_name if field_name == '__count' else '%s:sum' % field_name
+             for _name, field_name, _help in PROMETHEUS_METRICS],
+        )
+
+        lines = []
+        for index, (metric_name, _field_name, help_text) in enumerate(PROMETHEUS_METRICS):
+            lines.append('# HELP %s %s' % (metric_name, help_text))
+            lines.append('# TYPE %s gauge' % metric_name)
+            for company, period, stage, *values in groups:
+                labels = 'company="%s",period="%s",stage="%s"' % (
+                    self._escape_label(company.name or ''), period.strftime('%Y-%m') if period else '', stage)
+                lines.append('%s{%s} %s' % (metric_name, labels, float(values[index] or 0.0)))
+        return '\n'.join(lines) + '\n'
+
+    @api.model
+    def _escape_label(self, value):
+        return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+    @api.model
+    def _get_prometheus_path(self):
+        return os.path.join(tools.config.filestore(self.env.cr.dbname), 'nomina_colombia', 'payroll_metrics.prom')
+
+    @api.model
+    def _export_prometheus(self, months=DEFAULT_EXPORT_MONTHS):
+        """
+        Escribe la exposición Prometheus en el filestore de la base de datos,
+        para que la recoja el node exporter (textfile collector) o un sidecar
+
+        :param months: Número de meses hacia atrás a incluir
+        :return: Ruta del archivo escrito
+        """
+        path = self._get_prometheus_path()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Escritura atómica para que el colector nunca lea un archivo parcial
+        temp_path = '%s.tmp' % path
+        with open(temp_path, 'w', encoding='utf-8') as metrics_file:
+            metrics_file.write(self._get_prometheus_text(months))
+        os.replace(temp_path, path)
+        _logger.info("Métricas de nómina exportadas a %s", path)
+        return path
+
+    @api.model
+    def action_export_prometheus(self):
+        path = self._export_prometheus()
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': _('Métricas Exportadas'),
+                'message': _('Archivo Prometheus escrito en %s') % path,
+                'type': 'success',
+                'sticky': False,
+            },
+        }
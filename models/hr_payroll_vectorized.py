@@ -0,0 +1,199 @@
+"""
+Calculadora vectorizada de nómina para salarios fijos.
+
+Evalúa las reglas estándar de la estructura sobre arreglos de NumPy, una
+posición por nómina, en el mismo orden y con la misma acumulación de
+categorías que el motor de reglas, de modo que las líneas resultantes son
+idénticas a las del cálculo nómina por nómina.
+
+Cada manejador vectorizado recibe la regla y el diccionario de arreglos del
+lote y retorna (máscara, monto, cantidad, tasa). La máscara indica en qué
+nóminas se cumple la condición de la regla (None para todas).
+
+NumPy es opcional: sin él ninguna estructura es vectorizable y las nóminas de
+los lotes en modo vectorizado se calculan con el motor de reglas. Tampoco son
+vectorizables las estructuras con reglas cuya cantidad es una expresión, que
+el motor de reglas evalúa por nómina.
+"""
+import logging
+from collections import defaultdict
+
+_logger = logging.getLogger(__name__)
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+    _logger.warning("El paquete numpy no está instalado; los lotes vectorizados usan el motor de reglas")
+
+VECTOR_RULE_HANDLERS = {}
+
+# Códigos de entradas de trabajo que no constituyen novedad
+NORMAL_WORK_ENTRY_CODES = ['WORK100', 'CO_WORK']
+
+# Mismas constantes que los manejadores nativos
+NET_CATEGORIES = ['BASIC', 'AUX', 'EXTRA', 'COMP', 'DED', 'SOC']
+PROVISION_BASE_CATEGORIES = {
+    'PRIMA_PROV': 'GROSS',
+    'CES_PROV': 'GROSS',
+    'INT_CES_PROV': 'GROSS',
+    'VAC_PROV': 'BASIC',
+}
+
+
+def vector_rule_handler(*codes):
+    """Registra un manejador vectorizado para los códigos de regla indicados"""
+    def decorator(handler):
+        for code in codes:
+            VECTOR_RULE_HANDLERS[code] = handler
+        return handler
+    return decorator
+
+
+def constant_quantity(rule):
+    """Cantidad de la regla si es un número fijo, None si es una expresión"""
+    try:
+        return float(rule.quantity or 1.0)
+    except ValueError:
+        return None
+
+
+def _ones(data):
+    return np.ones(data['size'])
+
+
+@vector_rule_handler('BASIC')
+def _vector_basic(rule, data):
+    return None, data['wage'], _ones(data), _ones(data) * 100.0
+
+
+@vector_rule_handler('TRANS')
+def _vector_transport(rule, data):
+    mask = data['wage'] <= data['transport_max_smmlv'] * data['smmlv']
+    return mask, data['transport_allowance'], _ones(data), _ones(data) * 100.0
+
+
+@vector_rule_handler('HED')
+def _vector_daytime_overtime(rule, data):
+    # Las nóminas vectorizadas no tienen horas extra (serían novedad), el monto es cero
+    return None, np.zeros(data['size']), _ones(data), _ones(data) * 100.0
+
+
+@vector_rule_handler('HEALTH')
+def _vector_health(rule, data):
+    return None, -data['wage'] * data['health_employee_rate'] / 100.0, _ones(data), _ones(data) * 100.0
+
+
+@vector_rule_handler('PENSION')
+def _vector_pension(rule, data):
+    return None, -data['wage'] * data['pension_employee_rate'] / 100.0, _ones(data), _ones(data) * 100.0
+
+
+@vector_rule_handler('ARL')
+def _vector_arl(rule, data):
+    return None, data['wage'] * data['arl_rate'] / 100.0, _ones(data), _ones(data) * 100.0
+
+
+@vector_rule_handler('SENA', 'ICBF', 'CCF')
+def _vector_parafiscal(rule, data):
+    mask = None
+    if rule.code in ('SENA', 'ICBF'):
+        mask = ~data['parafiscal_exempt'] | (data['wage'] >= data['exemption_max_smmlv'] * data['smmlv'])
+    rate = data['%s_rate' % rule.code.lower()]
+    return mask, data['categories']['GROSS'] * rate / 100.0, _ones(data), _ones(data) * 100.0
+
+
+@vector_rule_handler(*PROVISION_BASE_CATEGORIES)
+def _vector_provision(rule, data):
+    base = data['categories'][PROVISION_BASE_CATEGORIES[rule.code]]
+    return None, base, _ones(data) * constant_quantity(rule), _ones(data) * rule.amount_percentage
+
+
+@vector_rule_handler('NET')
+def _vector_net(rule, data):
+    amount = np.zeros(data['size'])
+    for code in NET_CATEGORIES:
+        amount = amount + data['categories'][code]
+    return None, amount, _ones(data), _ones(data) * 100.0
+
+
+def can_vectorize_structure(structure):
+    """Indica si todas las reglas de la estructura tienen manejador vectorizado"""
+    if np is None:
+        return False
+    return all(
+        rule.compute_engine == 'native' and rule.code in VECTOR_RULE_HANDLERS
+        and constant_quantity(rule) is not None
+        for rule in structure.rule_ids
+    )
+
+
+def build_input_arrays(payslips):
+    """
+    Construye los arreglos de entrada del lote: salario, parámetros legales del
+    año de cada nómina, tasa ARL según la clase de riesgo y exoneraciones.
+    """
+    LegalParameter = payslips.env['hr.payroll.legal.parameter']
+    legal_by_year = {}
+    rows = []
+    for payslip in payslips:
+        contract = payslip.contract_id
+        year = payslip.date_to.year
+        if year not in legal_by_year:
+            legal_by_year[year] = LegalParameter._get_legal_values_for_year(year)
+        legal = legal_by_year[year]
+        rows.append((contract.wage, legal, legal['arl_rates'][contract.risk_level or '1'], contract.parafiscal_exempt))
+
+    data = {
+        'size': len(rows),
+        'wage': np.array([row[0] for row in rows], dtype=float),
+        'arl_rate': np.array([row[2] for row in rows], dtype=float),
+        'parafiscal_exempt': np.array([bool(row[3]) for row in rows], dtype=bool),
+        'categories': defaultdict(lambda: np.zeros(len(rows))),
+    }
+    for key in ('smmlv', 'transport_allowance', 'transport_max_smmlv', 'exemption_max_smmlv',
+                'health_employee_rate', 'pension_employee_rate', 'ccf_rate', 'sena_rate', 'icbf_rate'):
+        data[key] = np.array([row[1][key] for row in rows], dtype=float)
+    return data
+
+
+def compute_line_values(structure, payslips):
+    """
+    Calcula las líneas de nómina de una estructura para todo el lote
+
+    :param structure: Estructura salarial común a las nóminas
+    :param payslips: Nóminas del lote
+    :return: Lista de diccionarios para crear hr.payslip.line
+    """
+    data = build_input_arrays(payslips)
+    slip_ids = payslips.ids
+    contract_ids = [payslip.contract_id.id for payslip in payslips]
+    employee_ids = [payslip.employee_id.id for payslip in payslips]
+
+    vals_list = []
+    for rule in structure.rule_ids.sorted(lambda r: (r.sequence, r.id)):
+        mask, amount, quantity, rate = VECTOR_RULE_HANDLERS[rule.code](rule, data)
+        if mask is None:
+            mask = np.ones(data['size'], dtype=bool)
+        total = np.where(mask, amount * quantity * rate / 100.0, 0.0)
+
+        # Acumular en la categoría y sus padres, como el motor de reglas
+        category = rule.category_id
+        while category:
+            data['categories'][category.code] = data['categories'][category.code] + total
+            category = category.parent_id
+
+        for index in np.flatnonzero(mask):
+            vals_list.append({
+                'sequence': rule.sequence,
+                'code': rule.code,
+                'name': rule.name,
+                'salary_rule_id': rule.id,
+                'contract_id': contract_ids[index],
+                'employee_id': employee_ids[index],
+                'amount': float(amount[index]),
+                'quantity': float(quantity[index]),
+                'rate': float(rate[index]),
+                'slip_id': slip_ids[index],
+            })
+    return vals_list
@@ -1,5 +1,118 @@
 from odoo import models, fields, api, _
-from odoo.exceptions import ValidationError
+from odoo.exceptions import UserError, ValidationError
+from odoo.tools import frozendict, groupby, split_every
+from .hr_salary_rule import NATIVE_AMOUNTS_CACHE_KEY, RULE_PROFILE_CACHE_KEY
+from .hr_payroll_vectorized import NORMAL_WORK_ENTRY_CODES, can_vectorize_structure, compute_line_values
+import hashlib
+import logging
+
+_logger = logging.getLogger(__name__)
+
+# Tamaño del lote para las consultas agrupadas de líneas de nómina
+SUMMARY_BATCH_SIZE = 1000
+
+# Clave en la caché del cursor para el espacio de nombres de reglas del lote
+RULE_NAMESPACE_CACHE_KEY = 'nomina_colombia.rule_namespace'
+
+# Tamaño del lote de inserción de líneas en el cálculo vectorizado
+LINE_CREATE_BATCH_SIZE = 5000
+
+# Clave del buffer de auditoría en los datos de precommit del cursor
+HISTORY_BUFFER_KEY = 'nomina_colombia.payslip_history'
+
+# Filas por inserción al vaciar el buffer de auditoría
+HISTORY_INSERT_BATCH_SIZE = 1000
+
+# Días que se conservan los eventos de cálculo sin consolidar
+DEFAULT_HISTORY_RETENTION_DAYS = 90
+
+# Campos del contrato que alimentan el cálculo y forman parte de la huella de entradas
+FINGERPRINT_CONTRACT_FIELDS = [
+    'wage',
+    'wage_type',
+    'integral_factor',
+    'transport_allowance',
+    'risk_level',
+    'parafiscal_exempt',
+    'severance_base',
+    'withholding_method',
+    'withholding_percentage',
+    'withholding_fixed',
+    'withholding_procedure',
+    'exempt_income_percentage',
+    'dependents',
+    'voluntary_pension',
+    'voluntary_afc',
+]
+
+# Campos del empleado que forman parte de la huella de entradas de la nómina
+FINGERPRINT_EMPLOYEE_FIELDS = [
+    'arl_risk',
+    'pila_sub_type',
+    'transport_subsidy',
+    'clothing_allowance',
+]
+
+# Campos de los familiares del empleado que forman parte de la huella
+FINGERPRINT_FAMILY_FIELDS = ['relation_type', 'birth_date', 'is_dependent', 'is_beneficiary']
+
+# Código de regla salarial -> campo resumen de la nómina
+LINE_CODE_SUMMARY_MAP = {
+    'DISABILITY': 'disability_value',
+    'CO_DISABILITY': 'disability_value',
+    'LEAVE': 'leave_value',
+    'CO_LEAVE': 'leave_value',
+    'HEO': 'overtime_value',
+    'HEN': 'overtime_value',
+    'HEDO': 'overtime_value',
+    'HEDN': 'overtime_value',
+    'HENO': 'overtime_value',
+    'HENN': 'overtime_value',
+    'CO_OVERTIME': 'overtime_value',
+    'VACATION': 'vacation_value',
+    'CO_VACATION': 'vacation_value',
+    'PRIMA': 'prima_value',
+    'CO_PRIMA': 'prima_value',
+    'CESANTIAS': 'cesantias_value',
+    'CO_CESANTIAS': 'cesantias_value',
+    'INT_CESANTIAS': 'intereses_cesantias_value',
+    'CO_INT_CESANTIAS': 'intereses_cesantias_value',
+    'RETENCION': 'withholding_tax',
+    'CO_RETENCION': 'withholding_tax',
+    'SALUD_EMP': 'health_contribution_employee',
+    'PENSION_EMP': 'pension_contribution_employee',
+    'SALUD_EMP_EMPRESA': 'health_contribution_company',
+    'PENSION_EMP_EMPRESA': 'pension_contribution_company',
+    'ARL': 'arl_contribution',
+    'ICBF': 'parafiscal_icbf',
+    'SENA': 'parafiscal_sena',
+    'CCF': 'parafiscal_caja',
+}
+
+# Código de categoría de regla -> campo resumen de la nómina
+LINE_CATEGORY_SUMMARY_MAP = {
+    'DED': 'total_deductions',
+}
+
+# Campos resumen que solo se llenan para un tipo de liquidación
+LIQUIDATION_SUMMARY_FIELDS = {
+    'prima_value': 'prima',
+    'cesantias_value': 'cesantias',
+    'intereses_cesantias_value': 'intereses_cesantias',
+}
+
+# Campos resumen calculados a partir de las líneas de nómina
+LINE_SUMMARY_FIELDS = sorted(set(LINE_CODE_SUMMARY_MAP.values()) | set(LINE_CATEGORY_SUMMARY_MAP.values()))
+
+# Campos calculados a partir de los días trabajados
+WORKED_DAYS_FIELDS = [
+    'worked_days',
+    'transport_allowance',
+    'disability_days',
+    'leave_days',
+    'overtime_hours',
+    'vacation_days',
+]
 
 class HrPayslip(models.Model):
     _inherit = 'hr.payslip'
@@ -53,7 +166,7 @@ class HrPayslip(models.Model):
         help='Días de incapacidad en el periodo')
 
     disability_value = fields.Monetary(
-        string='Valor Incapacidades', compute='_compute_disability_value', store=True,
+        string='Valor Incapacidades', compute='_compute_line_summary', store=True,
         help='Valor total de las incapacidades en el periodo')
 
     # Campos para licencias
@@ -62,7 +175,7 @@ class HrPayslip(models.Model):
         help='Días de licencia en el periodo')
 
     leave_value = fields.Monetary(
-        string='Valor Licencias', compute='_compute_leave_value', store=True,
+        string='Valor Licencias', compute='_compute_line_summary', store=True,
         help='Valor total de las licencias en el periodo')
 
     # Campos para horas extra
@@ -71,7 +184,7 @@ class HrPayslip(models.Model):
         help='Total de horas extra en el periodo')
 
     overtime_value = fields.Monetary(
-        string='Valor Horas Extra', compute='_compute_overtime', store=True,
+        string='Valor Horas Extra', compute='_compute_line_summary', store=True,
         help='Valor total de las horas extra en el periodo')
 
     # Campos para vacaciones
@@ -80,65 +193,65 @@ class HrPayslip(models.Model):
         help='Días de vacaciones en el periodo')
 
     vacation_value = fields.Monetary(
-        string='Valor Vacaciones', compute='_compute_vacation_value', store=True,
+        string='Valor Vacaciones', compute='_compute_line_summary', store=True,
         help='Valor total de las vacaciones en el periodo')
 
     # Campos para prima de servicios
     prima_value = fields.Monetary(
-        string='Valor Prima de Servicios', compute='_compute_prima_value', store=True,
+        string='Valor Prima de Servicios', compute='_compute_line_summary', store=True,
         help='Valor de la prima de servicios')
 
     # Campos para cesantías
     cesantias_value = fields.Monetary(
-        string='Valor Cesantías', compute='_compute_cesantias_value', store=True,
+        string='Valor Cesantías', compute='_compute_line_summary', store=True,
         help='Valor de las cesantías')
 
     intereses_cesantias_value = fields.Monetary(
-        string='Valor Intereses Cesantías', compute='_compute_intereses_cesantias_value', store=True,
+        string='Valor Intereses Cesantías', compute='_compute_line_summary', store=True,
         help='Valor de los intereses sobre cesantías')
 
     # Campos para retención en la fuente
     withholding_tax = fields.Monetary(
-        string='Retención en la Fuente', compute='_compute_withholding_tax', store=True,
+        string='Retención en la Fuente', compute='_compute_line_summary', store=True,
         help='Valor de la retención en la fuente')
 
     # Campos para deducciones
     total_deductions = fields.Monetary(
-        string='Total Deducciones', compute='_compute_total_deductions', store=True,
+        string='Total Deducciones', compute='_compute_line_summary', store=True,
         help='Valor total de las deducciones')
 
     # Campos para aportes a seguridad social
     health_contribution_employee = fields.Monetary(
-        string='Aporte Salud Empleado', compute='_compute_social_security', store=True,
+        string='Aporte Salud Empleado', compute='_compute_line_summary', store=True,
         help='Aporte del empleado a salud (4%)')
 
     pension_contribution_employee = fields.Monetary(
-        string='Aporte Pensión Empleado', compute='_compute_social_security', store=True,
+        string='Aporte Pensión Empleado', compute='_compute_line_summary', store=True,
         help='Aporte del empleado a pensión (4%)')
 
     health_contribution_company = fields.Monetary(
-        string='Aporte Salud Empresa', compute='_compute_social_security', store=True,
+        string='Aporte Salud Empresa', compute='_compute_line_summary', store=True,
         help='Aporte de la empresa a salud (8.5%)')
 
     pension_contribution_company = fields.Monetary(
-        string='Aporte Pensión Empresa', compute='_compute_social_security', store=True,
+        string='Aporte Pensión Empresa', compute='_compute_line_summary', store=True,
         help='Aporte de la empresa a pensión (12%)')
 
     arl_contribution = fields.Monetary(
-        string='Aporte ARL', compute='_compute_social_security', store=True,
+        string='Aporte ARL', compute='_compute_line_summary', store=True,
         help='Aporte a riesgos laborales según nivel de riesgo')
 
     # Campos para parafiscales
     parafiscal_icbf = fields.Monetary(
-        string='Aporte ICBF', compute='_compute_parafiscales', store=True,
+        string='Aporte ICBF', compute='_compute_line_summary', store=True,
         help='Aporte al ICBF (3%)')
 
     parafiscal_sena = fields.Monetary(
-        string='Aporte SENA', compute='_compute_parafiscales', store=True,
+        string='Aporte SENA', compute='_compute_line_summary', store=True,
         help='Aporte al SENA (2%)')
 
     parafiscal_caja = fields.Monetary(
-        string='Aporte Caja Compensación', compute='_compute_parafiscales', store=True,
+        string='Aporte Caja Compensación', compute='_compute_line_summary', store=True,
         help='Aporte a Caja de Compensación Familiar (4%)')
 
     # Campos para histórico de nómina
@@ -212,206 +325,144 @@ class HrPayslip(models.Model):
         string='Mensaje del Proceso', copy=False, readonly=True,
         help='Mensaje informativo sobre el estado del proceso')
 
+    compute_chunk_id = fields.Many2one(
+        'hr.payslip.run.chunk', string='Bloque de Cálculo',
+        copy=False, readonly=True, index=True, ondelete='set null',
+        help='Bloque del lote en el que se calcula esta nómina')
+
+    input_fingerprint = fields.Char(
+        string='Huella de Entradas', copy=False, readonly=True,
+        help='Resumen de contrato, días trabajados, entradas, parámetros legales y '
+             'versiones de reglas usados en el último cálculo')
+
     # Campos para integración con el nuevo sistema de entradas de trabajo de v18
     work_entry_source = fields.Selection(
         selection_add=[('co_attendance', 'Asistencia Colombia')],
         readonly=True, states={'draft': [('readonly', False)]})
 
-# Métodos computados
-@api.depends('worked_days_line_ids', 'worked_days_line_ids.number_of_days')
-def _compute_worked_days(self):
-    for payslip in self:
-        worked_days = 0
-        for line in payslip.worked_days_line_ids:
-            if line.work_entry_type_id.code in ['WORK100', 'CO_WORK']:
-                worked_days += line.number_of_days
-        payslip.worked_days = round(worked_days)
-
-@api.depends('employee_id', 'contract_id', 'worked_days')
-def _compute_transport_allowance(self):
-    for payslip in self:
-        if not payslip.contract_id or not payslip.worked_days:
-            payslip.transport_allowance = 0.0
-            continue
-        
-        if not payslip.contract_id.transport_allowance:
-            payslip.transport_allowance = 0.0
-            continue
-        
-        # Obtener el valor del auxilio de transporte
-        transport_value = payslip.contract_id._get_transport_allowance()
-        
-        # Prorratear según días trabajados
-        days_in_month = 30  # En Colombia se calcula sobre 30 días
-        payslip.transport_allowance = transport_value * (payslip.worked_days / days_in_month)
-
-@api.depends('worked_days_line_ids', 'worked_days_line_ids.number_of_days')
-def _compute_disability_days(self):
-    for payslip in self:
-        disability_days = 0
-        for line in payslip.worked_days_line_ids:
-            if line.work_entry_type_id.code in ['LEAVE90', 'LEAVE100', 'CO_DISABILITY']:
-                disability_days += line.number_of_days
-        payslip.disability_days = round(disability_days)
-
-@api.depends('line_ids', 'line_ids.total')
-def _compute_disability_value(self):
-    for payslip in self:
-        disability_value = 0.0
-        for line in payslip.line_ids:
-            if line.code in ['DISABILITY', 'CO_DISABILITY']:
-                disability_value += line.total
-        payslip.disability_value = disability_value
-
-@api.depends('worked_days_line_ids', 'worked_days_line_ids.number_of_days')
-def _compute_leave_days(self):
-    for payslip in self:
-        leave_days = 0
-        for line in payslip.worked_days_line_ids:
-            if line.work_entry_type_id.code in ['LEAVE', 'CO_LEAVE']:
-                leave_days += line.number_of_days
-        payslip.leave_days = round(leave_days)
-
-@api.depends('line_ids', 'line_ids.total')
-def _compute_leave_value(self):
-    for payslip in self:
-        leave_value = 0.0
-        for line in payslip.line_ids:
-            if line.code in ['LEAVE', 'CO_LEAVE']:
-                leave_value += line.total
-        payslip.leave_value = leave_value
-
-@api.depends('worked_days_line_ids', 'worked_days_line_ids.number_of_hours')
-def _compute_overtime(self):
-    for payslip in self:
-        overtime_hours = 0.0
-        overtime_value = 0.0
-        
-        # Horas extra
-        for line in payslip.worked_days_line_ids:
-            if line.work_entry_type_id.code in ['CO_OVERTIME', 'CO_OVERTIME_NIGHT', 'CO_OVERTIME_HOLIDAY']:
-                overtime_hours += line.number_of_hours
-        
-        # Valor de horas extra
-        for line in payslip.line_ids:
-            if line.code in ['HEO', 'HEN', 'HEDO', 'HEDN', 'HENO', 'HENN', 'CO_OVERTIME']:
-                overtime_value += line.total
-                
-                payslip.overtime_hours = overtime_hours
-                payslip.overtime_value = overtime_value
-    
+    # Métodos computados
     @api.depends('worked_days_line_ids', 'worked_days_line_ids.number_of_days')
-    def _compute_vacation_days(self):
+    def _compute_worked_days(self):
         for payslip in self:
-            vacation_days = 0
+            worked_days = 0
             for line in payslip.worked_days_line_ids:
-                if line.work_entry_type_id.code in ['LEAVE120', 'CO_VACATION']:
-                    vacation_days += line.number_of_days
-            payslip.vacation_days = round(vacation_days)
-    
-    @api.depends('line_ids', 'line_ids.total')
-    def _compute_vacation_value(self):
-        for payslip in self:
-            vacation_value = 0.0
-            for line in payslip.line_ids:
-                if line.code in ['VACATION', 'CO_VACATION']:
-                    vacation_value += line.total
-            payslip.vacation_value = vacation_value
-    
-    @api.depends('line_ids', 'line_ids.total', 'liquidation_type')
-    def _compute_prima_value(self):
-        for payslip in self:
-            prima_value = 0.0
-            if payslip.liquidation_type == 'prima':
-                for line in payslip.line_ids:
-                    if line.code in ['PRIMA', 'CO_PRIMA']:
-                        prima_value += line.total
-            payslip.prima_value = prima_value
-    
-    @api.depends('line_ids', 'line_ids.total', 'liquidation_type')
-    def _compute_cesantias_value(self):
-        for payslip in self:
-            cesantias_value = 0.0
-            if payslip.liquidation_type == 'cesantias':
-                for line in payslip.line_ids:
-                    if line.code in ['CESANTIAS', 'CO_CESANTIAS']:
-                        cesantias_value += line.total
-            payslip.cesantias_value = cesantias_value
-    
-    @api.depends('line_ids', 'line_ids.total', 'liquidation_type')
-    def _compute_intereses_cesantias_value(self):
+                if line.work_entry_type_id.code in ['WORK100', 'CO_WORK']:
+                    worked_days += line.number_of_days
+            payslip.worked_days = round(worked_days)
+
+    @api.depends('employee_id', 'contract_id', 'worked_days', 'date_to')
+    def _compute_transport_allowance(self):
         for payslip in self:
-            intereses_value = 0.0
-            if payslip.liquidation_type == 'intereses_cesantias':
-                for line in payslip.line_ids:
-                    if line.code in ['INT_CESANTIAS', 'CO_INT_CESANTIAS']:
-                        intereses_value += line.total
-            payslip.intereses_cesantias_value = intereses_value
-    
-    @api.depends('line_ids', 'line_ids.total')
-    def _compute_withholding_tax(self):
+            if not payslip.contract_id or not payslip.worked_days:
+                payslip.transport_allowance = 0.0
+                continue
+        
+            if not payslip.contract_id.transport_allowance:
+                payslip.transport_allowance = 0.0
+                continue
+        
+            # Obtener el valor del auxilio de transporte
+            transport_value = payslip.contract_id._get_transport_allowance(payslip.date_to)
+        
+            # Prorratear según días trabajados
+            days_in_month = 30  # En Colombia se calcula sobre 30 días
+            payslip.transport_allowance = transport_value * (payslip.worked_days / days_in_month)
+
+    @api.depends('worked_days_line_ids', 'worked_days_line_ids.number_of_days')
+    def _compute_disability_days(self):
         for payslip in self:
-            withholding_tax = 0.0
-            for line in payslip.line_ids:
-                if line.code in ['RETENCION', 'CO_RETENCION']:
-                    withholding_tax += line.total
-            payslip.withholding_tax = withholding_tax
-    
-    @api.depends('line_ids', 'line_ids.total')
-    def _compute_total_deductions(self):
+            disability_days = 0
+            for line in payslip.worked_days_line_ids:
+                if line.work_entry_type_id.code in ['LEAVE90', 'LEAVE100', 'CO_DISABILITY']:
+                    disability_days += line.number_of_days
+            payslip.disability_days = round(disability_days)
+
+    @api.depends('worked_days_line_ids', 'worked_days_line_ids.number_of_days')
+    def _compute_leave_days(self):
         for payslip in self:
-            total_deductions = 0.0
-            for line in payslip.line_ids:
-                if line.category_id.code == 'DED':
-                    total_deductions += line.total
-            payslip.total_deductions = total_deductions
-    
-    @api.depends('line_ids', 'line_ids.total', 'contract_id')
-    def _compute_social_security(self):
+            leave_days = 0
+            for line in payslip.worked_days_line_ids:
+                if line.work_entry_type_id.code in ['LEAVE', 'CO_LEAVE']:
+                    leave_days += line.number_of_days
+            payslip.leave_days = round(leave_days)
+
+    @api.depends('worked_days_line_ids', 'worked_days_line_ids.number_of_hours')
+    def _compute_overtime(self):
         for payslip in self:
-            health_employee = 0.0
-            pension_employee = 0.0
-            health_company = 0.0
-            pension_company = 0.0
-            arl = 0.0
-            
-            for line in payslip.line_ids:
-                if line.code == 'SALUD_EMP':
-                    health_employee += line.total
-                elif line.code == 'PENSION_EMP':
-                    pension_employee += line.total
-                elif line.code == 'SALUD_EMP_EMPRESA':
-                    health_company += line.total
-                elif line.code == 'PENSION_EMP_EMPRESA':
-                    pension_company += line.total
-                elif line.code == 'ARL':
-                    arl += line.total
-            
-            payslip.health_contribution_employee = health_employee
-            payslip.pension_contribution_employee = pension_employee
-            payslip.health_contribution_company = health_company
-            payslip.pension_contribution_company = pension_company
-            payslip.arl_contribution = arl
-    
-    @api.depends('line_ids', 'line_ids.total')
-    def _compute_parafiscales(self):
+            overtime_hours = 0.0
+            for line in payslip.worked_days_line_ids:
+                if line.work_entry_type_id.code in ['CO_OVERTIME', 'CO_OVERTIME_NIGHT', 'CO_OVERTIME_HOLIDAY']:
+                    overtime_hours += line.number_of_hours
+            payslip.overtime_hours = overtime_hours
+
+    @api.depends('worked_days_line_ids', 'worked_days_line_ids.number_of_days')
+    def _compute_vacation_days(self):
         for payslip in self:
-            icbf = 0.0
-            sena = 0.0
-            caja = 0.0
-            
+            vacation_days = 0
+            for line in payslip.worked_days_line_ids:
+                if line.work_entry_type_id.code in ['LEAVE120', 'CO_VACATION']:
+                    vacation_days += line.number_of_days
+            payslip.vacation_days = round(vacation_days)
+
+    @api.depends('line_ids', 'line_ids.total', 'line_ids.code', 'line_ids.category_id', 'liquidation_type')
+    def _compute_line_summary(self):
+        """
+        Calcula todos los campos resumen a partir de las líneas de nómina en una sola pasada.
+
+        Las nóminas ya guardadas se agregan con una consulta agrupada por lote;
+        los registros nuevos (onchange) se recorren en memoria.
+        """
+        totals = {payslip: dict.fromkeys(LINE_SUMMARY_FIELDS, 0.0) for payslip in self}
+
+        stored = self.filtered('id')
+        for payslip, code, category_code, amount in stored._read_line_totals():
+            self._add_line_summary(totals[payslip], code, category_code, amount)
+
+        for payslip in self - stored:
             for line in payslip.line_ids:
-                if line.code == 'ICBF':
-                    icbf += line.total
-                elif line.code == 'SENA':
-                    sena += line.total
-                elif line.code == 'CCF':
-                    caja += line.total
-            
-            payslip.parafiscal_icbf = icbf
-            payslip.parafiscal_sena = sena
-            payslip.parafiscal_caja = caja
-    
+                self._add_line_summary(totals[payslip], line.code, line.category_id.code, line.total)
+
+        for payslip, values in totals.items():
+            # Prima, cesantías e intereses solo aplican a su tipo de liquidación
+            for field_name, liquidation_type in LIQUIDATION_SUMMARY_FIELDS.items():
+                if payslip.liquidation_type != liquidation_type:
+                    values[field_name] = 0.0
+            payslip.update(values)
+
+    @api.model
+    def _add_line_summary(self, values, code, category_code, amount):
+        """Acumula el total de una línea en el campo resumen correspondiente"""
+        field_name = LINE_CODE_SUMMARY_MAP.get(code)
+        if field_name:
+            values[field_name] += amount
+        field_name = LINE_CATEGORY_SUMMARY_MAP.get(category_code)
+        if field_name:
+            values[field_name] += amount
+
+    def _read_line_totals(self):
+        """
+        Suma las líneas de nómina agrupadas por nómina, código y categoría
+
+        :return: Generador de tuplas (nómina, código, código de categoría, total)
+        """
+        PayslipLine = self.env['hr.payslip.line']
+        PayslipLine.flush_model(['slip_id', 'code', 'category_id', 'total'])
+        codes = list(LINE_CODE_SUMMARY_MAP)
+        categories = self.env['hr.salary.rule.category'].search([
+            ('code', 'in', list(LINE_CATEGORY_SUMMARY_MAP)),
+        ])
+        for batch_ids in split_every(SUMMARY_BATCH_SIZE, self.ids):
+            groups = PayslipLine._read_group(
+                domain=[
+                    ('slip_id', 'in', list(batch_ids)),
+                    '|', ('code', 'in', codes), ('category_id', 'in', categories.ids),
+                ],
+                groupby=['slip_id', 'code', 'category_id'],
+                aggregates=['total:sum'],
+            )
+            for payslip, code, category, total in groups:
+                yield payslip, code, category.code, total or 0.0
+
     # Sobrescritura de métodos estándar
     @api.model
     def get_worked_day_lines(self, contracts, date_from, date_to):
@@ -429,7 +480,9 @@ def _compute_overtime(self):
         """
         Extiende el diccionario local para las reglas salariales con funciones específicas de Colombia
         """
-        res = super(HrPayslip, self)._get_base_local_dict()
+        # Reutilizar el espacio de nombres congelado del lote en cálculo, si existe
+        namespace = self.env.cr.cache.get(RULE_NAMESPACE_CACHE_KEY) or self._get_frozen_rule_namespace()
+        res = dict(namespace)
         
         # Añadir funciones específicas para Colombia
         res.update({
@@ -441,10 +494,24 @@ def _compute_overtime(self):
             'get_base_salary': self._get_base_salary,
             'get_integral_salary_base': self._get_integral_salary_base,
             'get_transport_allowance': self._get_transport_allowance,
+            'get_legal_values': self._get_legal_values,
+            'legal': self._get_legal_values(),
         })
         
         return res
     
+    def _get_frozen_rule_namespace(self):
+        """
+        Construye una sola vez el espacio de nombres común a todas las nóminas
+        
+        El código de las reglas se compila una vez por versión; cada evaluación
+        valida igualmente el diccionario local completo de la nómina y
+        restringe los builtins (ver hr.salary.rule._eval_rule_code).
+        
+        :return: frozendict con las funciones base
+        """
+        return frozendict(super(HrPayslip, self)._get_base_local_dict())
+    
     def action_payslip_done(self):
         """
         Sobrescribe el método estándar para incluir validaciones y procesos específicos de Colombia
@@ -454,24 +521,18 @@ def _compute_overtime(self):
             if not payslip.worked_days and payslip.liquidation_type == 'normal':
                 raise UserError(_("No puede confirmar una nómina sin días trabajados."))
         
+        Metrics = self.env['hr.payroll.run.metrics']
+        
         # Llamar al método original
-        result = super(HrPayslip, self).action_payslip_done()
+        with Metrics._track_stage('confirm', self):
+            result = super(HrPayslip, self).action_payslip_done()
         
         # Procesos adicionales para Colombia
-        for payslip in self:
-            # Crear histórico
-            self.env['hr.payslip.history'].create({
-                'payslip_id': payslip.id,
-                'employee_id': payslip.employee_id.id,
-                'date': fields.Date.today(),
-                'user_id': self.env.user.id,
-                'action': 'confirm',
-                'notes': _('Nómina confirmada'),
-            })
-            
-            # Generar nómina electrónica si corresponde
-            if payslip.company_id.electronic_payroll_enabled:
-                payslip.generate_electronic_payroll()
+        self._log_history('confirm', _('Nómina confirmada'))
+        electronic = self.filtered('company_id.electronic_payroll_enabled')
+        with Metrics._track_stage('electronic', electronic):
+            # Generar nómina electrónica
+            electronic._create_electronic_payroll_documents()
         
         return result
     
@@ -488,17 +549,8 @@ def _compute_overtime(self):
         result = super(HrPayslip, self).action_payslip_cancel()
         
         # Procesos adicionales para Colombia
+        self._log_history('cancel', _('Nómina cancelada'))
         for payslip in self:
-            # Crear histórico
-            self.env['hr.payslip.history'].create({
-                'payslip_id': payslip.id,
-                'employee_id': payslip.employee_id.id,
-                'date': fields.Date.today(),
-                'user_id': self.env.user.id,
-                'action': 'cancel',
-                'notes': _('Nómina cancelada'),
-            })
-            
             # Cancelar nómina electrónica si existe
             if payslip.electronic_payroll_id:
                 payslip.electronic_payroll_id.action_cancel()
@@ -515,23 +567,203 @@ def _compute_overtime(self):
             payslip.version += 1
             payslip.has_modifications = True
         
-        # Llamar al método original
-        result = super(HrPayslip, self).compute_sheet()
+        Metrics = self.env['hr.payroll.run.metrics']
         
-        # Procesos adicionales para Colombia
-        for payslip in self:
-            # Crear histórico
-            self.env['hr.payslip.history'].create({
-                'payslip_id': payslip.id,
-                'employee_id': payslip.employee_id.id,
-                'date': fields.Date.today(),
-                'user_id': self.env.user.id,
-                'action': 'compute',
-                'notes': _('Nómina calculada (versión %s)') % payslip.version,
-            })
+        # Días trabajados y campos que dependen de ellos
+        with Metrics._track_stage('worked_days', self):
+            self.flush_recordset(WORKED_DAYS_FIELDS)
+        
+        with Metrics._track_stage('rules', self) as measure:
+            # Nóminas de lotes en modo vectorizado sin novedades
+            vectorized = self._get_vectorizable_payslips()
+            if vectorized:
+                vectorized._compute_sheet_vectorized()
+            
+            standard = self - vectorized
+            result = True
+            if standard:
+                # Congelar el espacio de nombres común del lote
+                self.env.cr.cache[RULE_NAMESPACE_CACHE_KEY] = standard._get_frozen_rule_namespace()
+                # Perfilado de reglas de las estructuras en modo diagnóstico
+                profile = standard.struct_id._start_rule_profiling()
+                if profile:
+                    self.env.cr.cache[RULE_PROFILE_CACHE_KEY] = profile
+                try:
+                    # Ejecutar los manejadores nativos por lote antes del recorrido de reglas
+                    self.env.cr.cache[NATIVE_AMOUNTS_CACHE_KEY] = standard.struct_id._compute_native_amounts(standard)
+                    # Llamar al método original
+                    result = super(HrPayslip, standard).compute_sheet()
+                finally:
+                    self.env.cr.cache.pop(RULE_NAMESPACE_CACHE_KEY, None)
+                    self.env.cr.cache.pop(NATIVE_AMOUNTS_CACHE_KEY, None)
+                    self.env.cr.cache.pop(RULE_PROFILE_CACHE_KEY, None)
+                if profile:
+                    self.env['hr.payroll.structure']._save_rule_profile(profile)
+            # Líneas creadas por el cálculo, ya presentes en la caché del ORM
+            measure['rows'] = len(self.line_ids)
+        
+        # Campos resumen calculados a partir de las líneas
+        with Metrics._track_stage('summary', self):
+            self.flush_recordset(LINE_SUMMARY_FIELDS)
+        
+        # Guardar la huella de entradas usada en este cálculo
+        for payslip, fingerprint in self._get_input_fingerprints().items():
+            payslip.input_fingerprint = fingerprint
+        
+        # Procesos adicionales para Colombia: histórico diferido hasta el commit
+        self._log_history('compute', lambda payslip: _('Nómina calculada (versión %s)') % payslip.version)
         
         return result
     
+    def _compute_sheet_incremental(self):
+        """
+        Recalcula solo las nóminas cuyas entradas cambiaron desde el último cálculo
+        
+        :return: Recordset de nóminas omitidas por no tener cambios
+        """
+        if self.env.context.get('payslip_force_compute'):
+            unchanged = self.browse()
+        else:
+            fingerprints = self._get_input_fingerprints()
+            unchanged = self.filtered(lambda p: (
+                p.state == 'verify'
+                and p.input_fingerprint
+                and p.input_fingerprint == fingerprints.get(p)
+                and p.line_ids
+            ))
+        
+        changed = self - unchanged
+        if changed:
+            changed.compute_sheet()
+        _logger.info("Recálculo incremental: %s nóminas calculadas, %s omitidas sin cambios",
+                     len(changed), len(unchanged))
+        return unchanged
+    
+    def _get_input_fingerprints(self):
+        """
+        Calcula la huella de las entradas de cada nómina en pocas consultas
+        
+        :return: Diccionario {nómina: huella sha256}
+        """
+        worked_days = {payslip_id: [] for payslip_id in self.ids}
+        for line in self.env['hr.payslip.worked_days'].search_read(
+                [('payslip_id', 'in', self.ids)],
+                ['payslip_id', 'work_entry_type_id', 'number_of_days', 'number_of_hours', 'amount']):
+            worked_days[line['payslip_id'][0]].append((
+                line['work_entry_type_id'] and line['work_entry_type_id'][0],
+                line['number_of_days'], line['number_of_hours'], line['amount']))
+        
+        inputs = {payslip_id: [] for payslip_id in self.ids}
+        for line in self.env['hr.payslip.input'].search_read(
+                [('payslip_id', 'in', self.ids)], ['payslip_id', 'input_type_id', 'amount']):
+            inputs[line['payslip_id'][0]].append((
+                line['input_type_id'] and line['input_type_id'][0], line['amount']))
+        
+        # Familiares de cada empleado (dependientes de la retención en la fuente)
+        family = {employee_id: [] for employee_id in self.employee_id.ids}
+        for member in self.env['hr.employee.family'].search_read(
+                [('employee_id', 'in', self.employee_id.ids)], ['employee_id'] + FINGERPRINT_FAMILY_FIELDS):
+            family[member['employee_id'][0]].append(tuple(
+                [member['id']] + [str(member[field_name]) for field_name in FINGERPRINT_FAMILY_FIELDS]))
+        
+        # Versiones de las reglas por estructura
+        rule_versions = {
+            structure.id: sorted((rule.id, str(rule.write_date)) for rule in structure.rule_ids)
+            for structure in self.struct_id
+        }
+        
+        fingerprints = {}
+        for payslip in self.filtered('id'):
+            contract = payslip.contract_id
+            employee = payslip.employee_id
+            payload = (
+                employee.id,
+                [employee[field_name] for field_name in FINGERPRINT_EMPLOYEE_FIELDS],
+                sorted(family.get(employee.id, [])),
+                str(payslip.date_from),
+                str(payslip.date_to),
+                payslip.struct_id.id,
+                contract.id,
+                [contract[field_name] for field_name in FINGERPRINT_CONTRACT_FIELDS],
+                sorted(worked_days[payslip.id]),
+                sorted(inputs[payslip.id]),
+                sorted(payslip._get_legal_values().items()) if payslip.date_to else None,
+                rule_versions.get(payslip.struct_id.id),
+            )
+            fingerprints[payslip] = hashlib.sha256(repr(payload).encode()).hexdigest()
+        return fingerprints
+    
+    def _log_history(self, action, notes):
+        """
+        Registra un evento de histórico por nómina en el buffer de auditoría
+        
+        :param action: Acción del histórico
+        :param notes: Texto, o función que recibe la nómina y retorna el texto
+        """
+        self.env['hr.payslip.history']._buffer_events([{
+            'payslip_id': payslip.id,
+            'employee_id': payslip.employee_id.id,
+            'action': action,
+            'notes': notes(payslip) if callable(notes) else notes,
+        } for payslip in self])
+    
+    def _get_vectorizable_payslips(self):
+        """
+        Filtra las nóminas que puede calcular la calculadora vectorizada: lotes en
+        modo vectorizado, salario fijo, estructura con todas sus reglas
+        vectorizables y sin novedades (entradas ni días distintos a trabajo normal).
+        
+        :return: Recordset de nóminas vectorizables
+        """
+        candidates = self.filtered(lambda p: (
+            p.state in ['draft', 'verify']
+            and p.payslip_run_id.compute_mode == 'vectorized'
+            and p.contract_id
+            and p.contract_id.wage_type != 'integral'
+            and p.struct_id
+        ))
+        if not candidates:
+            return candidates
+        
+        # Las estructuras en perfilado pasan por el recorrido de reglas para medirlas
+        structures = candidates.struct_id.filtered(
+            lambda s: can_vectorize_structure(s) and not s.sudo().rule_profiling)
+        candidates = candidates.filtered(lambda p: p.struct_id in structures)
+        
+        # Nóminas con novedades, resueltas con dos consultas agrupadas
+        with_novelties = set()
+        for payslip, in self.env['hr.payslip.worked_days']._read_group(
+                [('payslip_id', 'in', candidates.ids),
+                 ('work_entry_type_id.code', 'not in', NORMAL_WORK_ENTRY_CODES)],
+                ['payslip_id']):
+            with_novelties.add(payslip.id)
+        for payslip, in self.env['hr.payslip.input']._read_group(
+                [('payslip_id', 'in', candidates.ids)], ['payslip_id']):
+            with_novelties.add(payslip.id)
+        
+        return candidates.filtered(lambda p: p.id not in with_novelties)
+    
+    def _compute_sheet_vectorized(self):
+        """
+        Calcula las nóminas con la calculadora vectorizada y crea todas las
+        líneas en inserciones masivas
+        """
+        self.line_ids.unlink()
+        
+        for payslip in self.filtered(lambda p: not p.number):
+            payslip.number = self.env['ir.sequence'].next_by_code('salary.slip')
+        self.write({'state': 'verify', 'compute_date': fields.Date.today()})
+        
+        vals_list = []
+        for structure in self.struct_id:
+            vals_list += compute_line_values(structure, self.filtered(lambda p: p.struct_id == structure))
+        
+        for vals_batch in split_every(LINE_CREATE_BATCH_SIZE, vals_list, list):
+            self.env['hr.payslip.line'].create(vals_batch)
+        
+        _logger.info("Cálculo vectorizado: %s nóminas, %s líneas", len(self), len(vals_list))
+        return True
+    
     # Métodos específicos para Colombia
     def _calculate_overtime(self, overtime_type, hours):
         """
@@ -630,8 +862,8 @@ def _compute_overtime(self):
         
         cesantias = self._calculate_cesantias()
         
-        # Tasa de interés: 12% anual
-        interest_rate = 0.12
+        # Tasa de interés anual según los parámetros legales del año
+        interest_rate = self._get_legal_values()['severance_interest_rate'] / 100.0
         
         # Días trabajados en el año
         # Esto es simplificado, en un caso real habría que calcular los días exactos
@@ -694,7 +926,16 @@ def _compute_overtime(self):
         if not self.contract_id:
             return 0.0
         
-        return self.contract_id._get_transport_allowance()
+        return self.contract_id._get_transport_allowance(self.date_to)
+    
+    def _get_legal_values(self):
+        """
+        Obtiene los parámetros legales vigentes en el período de la nómina
+        
+        :return: frozendict con SMMLV, auxilio de transporte, UVT y porcentajes
+        """
+        self.ensure_one()
+        return self.env['hr.payroll.legal.parameter']._get_legal_values(self.date_to)
     
     # Métodos para nómina electrónica
     def generate_electronic_payroll(self):
@@ -709,20 +950,46 @@ def _compute_overtime(self):
         if self.state != 'done':
             raise UserError(_("Solo se puede generar nómina electrónica para nóminas confirmadas."))
         
-        # Crear documento de nómina electrónica
-        electronic_payroll = self.env['hr.electronic.payroll'].create({
-            'payslip_id': self.id,
-            'employee_id': self.employee_id.id,
-            'date': self.date_to,
-            'company_id': self.company_id.id,
+        return self._create_electronic_payroll_documents()
+    
+    def _create_electronic_payroll_documents(self):
+        """
+        Crea en una sola operación los documentos de nómina electrónica de las
+        nóminas confirmadas que aún no lo tienen
+
+        Con la agrupación mensual (por defecto) se crea un único documento por
+        empleado y mes que suma todas sus nóminas del mes; con la agrupación
+        por nómina, un documento por cada nómina.
+
+        :return: Documentos hr.electronic.payroll creados
+        """
+        payslips = self.filtered(lambda p: p.state == 'done' and not p.electronic_payroll_id)
+        ElectronicPayroll = self.env['hr.electronic.payroll']
+        if ElectronicPayroll._get_grouping() == 'month':
+            documents = ElectronicPayroll
+            for (company, month), slips in groupby(payslips, key=lambda p: (p.company_id, p.date_to.replace(day=1))):
+                employees = self.browse([slip.id for slip in slips]).employee_id
+                documents |= ElectronicPayroll._aggregate_month(company, month, employees)
+            return documents
+
+        concepts = ElectronicPayroll._read_concept_values([('slip_id', 'in', payslips.ids)], 'slip_id')
+        documents = ElectronicPayroll.create([{
+            'payslip_id': payslip.id,
+            'employee_id': payslip.employee_id.id,
+            'date': payslip.date_to,
+            'period_start': payslip.date_from,
+            'period_end': payslip.date_to,
+            'company_id': payslip.company_id.id,
+            'concept_values': concepts[payslip][0] if payslip in concepts else False,
             'state': 'draft',
-        })
+        } for payslip in payslips])
         
         # Asociar a la nómina
-        self.electronic_payroll_id = electronic_payroll.id
-        self.electronic_payroll_status = 'generated'
+        for payslip, document in zip(payslips, documents):
+            payslip.electronic_payroll_id = document
+        payslips.electronic_payroll_status = 'generated'
         
-        return electronic_payroll
+        return documents
     
     def action_send_electronic_payroll(self):
         """
@@ -795,14 +1062,7 @@ def _compute_overtime(self):
         template.send_mail(self.id, force_send=True)
         
         # Crear histórico
-        self.env['hr.payslip.history'].create({
-            'payslip_id': self.id,
-            'employee_id': self.employee_id.id,
-            'date': fields.Date.today(),
-            'user_id': self.env.user.id,
-            'action': 'email',
-            'notes': _('Comprobante enviado por correo electrónico'),
-        })
+        self._log_history('email', _('Comprobante enviado por correo electrónico'))
         
         return True
     
@@ -825,14 +1085,7 @@ def _compute_overtime(self):
         })
         
         # Crear histórico
-        self.env['hr.payslip.history'].create({
-            'payslip_id': self.id,
-            'employee_id': self.employee_id.id,
-            'date': fields.Date.today(),
-            'user_id': self.env.user.id,
-            'action': 'sign',
-            'notes': _('Comprobante firmado electrónicamente'),
-        })
+        self._log_history('sign', _('Comprobante firmado electrónicamente'))
         
         return True
     
@@ -862,21 +1115,16 @@ def _compute_overtime(self):
         # Líneas del asiento (simplificado)
         # En un caso real, habría que detallar todas las cuentas
         
-        # Crear el asiento
-        move = self.env['account.move'].create(move_vals)
-        
-        # Asociar a la nómina
-        self.move_id = move.id
+        with self.env['hr.payroll.run.metrics']._track_stage('accounting', self) as measure:
+            # Crear el asiento
+            move = self.env['account.move'].create(move_vals)
+            
+            # Asociar a la nómina
+            self.move_id = move.id
+            measure['rows'] = len(move.line_ids) + 1
         
         # Crear histórico
-        self.env['hr.payslip.history'].create({
-            'payslip_id': self.id,
-            'employee_id': self.employee_id.id,
-            'date': fields.Date.today(),
-            'user_id': self.env.user.id,
-            'action': 'accounting',
-            'notes': _('Asiento contable creado'),
-        })
+        self._log_history('accounting', _('Asiento contable creado'))
         
         return move
     
@@ -916,14 +1164,7 @@ def _compute_overtime(self):
         self.payment_id = payment.id
         
         # Crear histórico
-        self.env['hr.payslip.history'].create({
-            'payslip_id': self.id,
-            'employee_id': self.employee_id.id,
-            'date': fields.Date.today(),
-            'user_id': self.env.user.id,
-            'action': 'payment',
-            'notes': _('Pago creado'),
-        })
+        self._log_history('payment', _('Pago creado'))
         
         return payment
     
@@ -998,4 +1239,97 @@ class HrPayslipHistory(models.Model):
     # Campos relacionados
     company_id = fields.Many2one(related='payslip_id.company_id')
     payslip_number = fields.Char(related='payslip_id.number', string='Número de Nómina')
-    payslip_state = fields.Selection(related='payslip_id.state', string='Estado de Nómina')
\ No newline at end of file
+    payslip_state = fields.Selection(related='payslip_id.state', string='Estado de Nómina')
+    
+    event_count = fields.Integer(
+        string='Número de Eventos', default=1,
+        help='Número de eventos que representa el registro (mayor a 1 en cálculos consolidados)')
+    
+    @api.model
+    def _buffer_events(self, vals_list):
+        """
+        Acumula eventos de histórico durante la transacción. Se insertan todos
+        juntos antes del commit (o antes de consultar el histórico).
+        
+        :param vals_list: Lista de diccionarios con payslip_id, employee_id, action y notes
+        """
+        if not vals_list:
+            return
+        precommit = self.env.cr.precommit
+        if HISTORY_BUFFER_KEY not in precommit.data:
+            precommit.data[HISTORY_BUFFER_KEY] = []
+            precommit.add(self._flush_history_buffer)
+        
+        today = fields.Date.context_today(self)
+        precommit.data[HISTORY_BUFFER_KEY].extend(
+            (vals['payslip_id'], vals['employee_id'], vals.get('date') or today,
+             vals.get('user_id') or self.env.uid, vals['action'], vals.get('notes'))
+            for vals in vals_list
+        )
+    
+    def _flush_history_buffer(self):
+        """Inserta los eventos acumulados con inserciones de múltiples filas"""
+        events = self.env.cr.precommit.data.pop(HISTORY_BUFFER_KEY, None)
+        if not events:
+            return
+        
+        for rows in split_every(HISTORY_INSERT_BATCH_SIZE, events, list):
+            self.env.cr.execute("""
+                INSERT INTO hr_payslip_history
+                    (payslip_id, employee_id, date, user_id, action, notes, event_count,
+                     create_uid, create_date, write_uid, write_date)
+                SELECT v.payslip_id, v.employee_id, v.date::date, v.user_id, v.action, v.notes, 1,
+                       v.user_id, now() at time zone 'UTC', v.user_id, now() at time zone 'UTC'
+                  FROM (VALUES %s) AS v(payslip_id, employee_id, date, user_id, action, notes)
+                  JOIN hr_payslip p ON p.id = v.payslip_id
+            """ % ', '.join(['%s'] * len(rows)), rows)
+        self.invalidate_model()
+    
+    def flush_model(self, fnames=None):
+        # Los eventos pendientes deben ser visibles para las consultas del histórico
+        self._flush_history_buffer()
+        return super(HrPayslipHistory, self).flush_model(fnames)
+    
+    @api.model
+    def _cron_rollup_compute_events(self, retention_days=None):
+        """
+        Consolida los eventos de cálculo anteriores al período de retención en un
+        solo registro por nómina con el número de eventos.
+        
+        :param retention_days: Días de retención (por defecto el parámetro del sistema)
+        :return: Número de registros eliminados
+        """
+        if retention_days is None:
+            retention_days = int(self.env['ir.config_parameter'].sudo().get_param(
+                'nomina_colombia.payslip_history_retention_days', DEFAULT_HISTORY_RETENTION_DAYS))
+        limit_date = fields.Date.subtract(fields.Date.context_today(self), days=retention_days)
+        self.flush_model()
+        
+        # Conservar el evento más reciente de cada nómina con el total acumulado
+        self.env.cr.execute("""
+            UPDATE hr_payslip_history h
+               SET event_count = agg.total,
+                   notes = %s,
+                   write_date = now() at time zone 'UTC'
+              FROM (SELECT max(id) AS keep_id, sum(event_count) AS total
+                      FROM hr_payslip_history
+                     WHERE action = 'compute' AND date < %s
+                  GROUP BY payslip_id
+                    HAVING count(*) > 1) agg
+             WHERE h.id = agg.keep_id
+        """, [_('Cálculos consolidados'), limit_date])
+        
+        self.env.cr.execute("""
+            DELETE FROM hr_payslip_history h
+             WHERE h.action = 'compute' AND h.date < %s
+               AND EXISTS (SELECT 1
+                             FROM hr_payslip_history k
+                            WHERE k.payslip_id = h.payslip_id
+                              AND k.action = 'compute'
+                              AND k.date < %s
+                              AND k.id > h.id)
+        """, [limit_date, limit_date])
+        removed = self.env.cr.rowcount
+        self.invalidate_model()
+        _logger.info("Histórico de nómina: %s eventos de cálculo consolidados", removed)
+        return removed
@@ -0,0 +1,332 @@
+from odoo import models, fields, api, _
+from odoo.exceptions import UserError, ValidationError
+from odoo.tools import split_every
+import logging
+import time
+
+_logger = logging.getLogger(__name__)
+
+# Tamaño por defecto de cada bloque de cálculo
+DEFAULT_COMPUTE_CHUNK_SIZE = 200
+
+# Tiempo máximo (segundos) que una ejecución del cron procesa bloques
+COMPUTE_CRON_TIME_LIMIT = 240
+
+
+class HrPayslipRun(models.Model):
+    _inherit = 'hr.payslip.run'
+
+    # Campos para el cálculo por bloques
+    compute_chunk_size = fields.Integer(
+        string='Nóminas por Bloque',
+        default=lambda self: int(self.env['ir.config_parameter'].sudo().get_param(
+            'nomina_colombia.payslip_chunk_size', DEFAULT_COMPUTE_CHUNK_SIZE)),
+        help='Número de nóminas que se calculan y confirman en cada transacción')
+
+    compute_mode = fields.Selection([
+        ('standard', 'Estándar'),
+        ('vectorized', 'Vectorizado'),
+    ], string='Modo de Cálculo', default='standard', required=True,
+        help='En modo vectorizado las nóminas de salario fijo sin novedades se calculan '
+             'en bloque; las demás usan el motor de reglas estándar')
+
+    compute_chunk_ids = fields.One2many(
+        'hr.payslip.run.chunk', 'run_id', string='Bloques de Cálculo', copy=False)
+
+    compute_state = fields.Selection([
+        ('none', 'Sin Programar'),
+        ('queued', 'En Cola'),
+        ('running', 'En Proceso'),
+        ('done', 'Completado'),
+        ('error', 'Con Errores'),
+    ], string='Estado del Cálculo', compute='_compute_compute_progress')
+
+    compute_progress = fields.Float(
+        string='Progreso del Cálculo (%)', compute='_compute_compute_progress')
+
+    compute_error_count = fields.Integer(
+        string='Bloques con Error', compute='_compute_compute_progress')
+
+    compute_skipped_count = fields.Integer(
+        string='Nóminas sin Cambios', compute='_compute_compute_progress',
+        help='Nóminas omitidas en el último cálculo porque sus entradas no cambiaron')
+
+    @api.depends('compute_chunk_ids.state', 'compute_chunk_ids.skipped_count')
+    def _compute_compute_progress(self):
+        for run in self:
+            chunks = run.compute_chunk_ids
+            if not chunks:
+                run.compute_state = 'none'
+                run.compute_progress = 0.0
+                run.compute_error_count = 0
+                run.compute_skipped_count = 0
+                continue
+
+            states = chunks.mapped('state')
+            finished = states.count('done') + states.count('error')
+            run.compute_error_count = states.count('error')
+            run.compute_skipped_count = sum(chunks.mapped('skipped_count'))
+            run.compute_progress = 100.0 * finished / len(chunks)
+            if finished < len(chunks):
+                run.compute_state = 'running' if finished else 'queued'
+            elif run.compute_error_count:
+                run.compute_state = 'error'
+            else:
+                run.compute_state = 'done'
+
+    @api.constrains('compute_chunk_size')
+    def _check_compute_chunk_size(self):
+        for run in self:
+            if run.compute_chunk_size < 1:
+                raise ValidationError(_('El número de nóminas por bloque debe ser mayor a cero.'))
+
+    def action_compute_sheet_chunked(self):
+        """
+        Divide las nóminas del lote en bloques y los encola para el cron de cálculo
+        """
+        for run in self:
+            slips = run.slip_ids.filtered(lambda s: s.state in ['draft', 'verify'])
+            if not slips:
+                raise UserError(_('No hay nóminas pendientes de cálculo en el lote %s.') % run.name)
+
+            # Reiniciar los bloques de una ejecución anterior
+            run.compute_chunk_ids.unlink()
+            self.env['hr.payslip.run.chunk'].create([{
+                'run_id': run.id,
+                'sequence': sequence,
+                'slip_ids': [(6, 0, list(slip_ids))],
+            } for sequence, slip_ids in enumerate(split_every(run.compute_chunk_size, slips.ids))])
+
+        self.env.ref('nomina_colombia.ir_cron_payslip_run_compute_chunks')._trigger()
+        return True
+
+    def action_compute_changed_sheets(self):
+        """
+        Recalcula en línea solo las nóminas del lote cuyas entradas cambiaron
+        """
+        slips = self.slip_ids.filtered(lambda s: s.state in ['draft', 'verify'])
+        if not slips:
+            raise UserError(_('No hay nóminas pendientes de cálculo en el lote.'))
+
+        skipped = slips._compute_sheet_incremental()
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': _('Recálculo Incremental'),
+                'message': _('%(computed)s nóminas recalculadas, %(skipped)s sin cambios omitidas.') % {
+                    'computed': len(slips) - len(skipped),
+                    'skipped': len(skipped),
+                },
+                'type': 'success',
+                'sticky': False,
+            }
+        }
+
+    def action_generate_electronic_batch(self):
+        """
+        Genera y firma en una sola pasada la nómina electrónica de todas las
+        nóminas confirmadas del lote
+        """
+        slips = self.slip_ids.filtered(lambda s: s.state == 'done')
+        if not slips:
+            raise UserError(_('No hay nóminas confirmadas para generar nómina electrónica.'))
+
+        slips._create_electronic_payroll_documents()
+        documents = slips.electronic_payroll_id.filtered(lambda d: d.state == 'draft')
+        run = self if len(self) == 1 else None
+        with self.env['hr.payroll.run.metrics']._track_stage(
+                'electronic', documents, run=run, period=min(self.mapped('date_end'))), \
+                documents._buffered_log(_('Generación de nómina electrónica del lote'), run=run):
+            generated = documents._generate_batch()
+
+        invalid = documents - generated
+        message = _('%s documentos generados y firmados.') % len(generated)
+        if invalid:
+            message += ' ' + _('%s documentos no pasan la validación estructural interna y quedaron en borrador.') % len(invalid)
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': _('Nómina Electrónica'),
+                'message': message,
+                'type': 'warning' if invalid else 'success',
+                'sticky': bool(invalid),
+            }
+        }
+
+    def action_send_electronic_batch(self):
+        """
+        Encola para envío a la DIAN los documentos firmados del lote
+        """
+        documents = self.slip_ids.electronic_payroll_id.filtered(
+            lambda d: d.state in ['generated', 'rejected'] and d.dian_cude)
+        if not documents:
+            raise UserError(_('No hay documentos de nómina electrónica firmados para enviar.'))
+
+        entries = self.env['hr.electronic.payroll.outbox']._enqueue(documents)
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': _('Nómina Electrónica'),
+                'message': _('%s documentos encolados para envío a la DIAN.') % len(entries),
+                'type': 'success',
+                'sticky': False,
+            }
+        }
+
+    def action_generate_adjustment_notes(self):
+        """
+        Genera y encola las notas de ajuste de los empleados del lote cuyos
+        valores cambiaron respecto al documento aceptado por la DIAN
+        """
+        ElectronicPayroll = self.env['hr.electronic.payroll']
+        notes = ElectronicPayroll
+        for run in self:
+            slips = run.slip_ids.filtered(lambda s: s.state == 'done')
+            with ElectronicPayroll._buffered_log(_('Notas de ajuste del lote'), run=run):
+                notes |= ElectronicPayroll._generate_adjustment_notes(
+                    run.company_id, run.date_end, slips.employee_id)
+        if not notes:
+            raise UserError(_('Ningún documento aceptado del lote tiene valores que ajustar.'))
+
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': _('Nómina Electrónica'),
+                'message': _('%(replace)s notas de reemplazo y %(delete)s notas de eliminación generadas.') % {
+                    'replace': len(notes.filtered(lambda n: n.dian_operation_type == '20')),
+                    'delete': len(notes.filtered(lambda n: n.dian_operation_type == '30')),
+                },
+                'type': 'success',
+                'sticky': False,
+            }
+        }
+
+    def action_retry_failed_chunks(self):
+        """
+        Vuelve a encolar los bloques que terminaron con error
+        """
+        failed = self.compute_chunk_ids.filtered(lambda c: c.state == 'error')
+        if not failed:
+            raise UserError(_('No hay bloques con error para reintentar.'))
+
+        failed.write({'state': 'pending', 'error_message': False})
+        self.env.ref('nomina_colombia.ir_cron_payslip_run_compute_chunks')._trigger()
+        return True
+
+
+class HrPayslipRunChunk(models.Model):
+    _name = 'hr.payslip.run.chunk'
+    _description = 'Bloque de Cálculo de Lote de Nómina'
+    _order = 'run_id, sequence, id'
+
+    run_id = fields.Many2one(
+        'hr.payslip.run', string='Lote de Nómina',
+        required=True, ondelete='cascade', index=True)
+
+    sequence = fields.Integer(string='Secuencia', default=0)
+
+    slip_ids = fields.One2many(
+        'hr.payslip', 'compute_chunk_id', string='Nóminas')
+
+    slip_count = fields.Integer(
+        string='Número de Nóminas', compute='_compute_slip_count')
+
+    state = fields.Selection([
+        ('pending', 'Pendiente'),
+        ('done', 'Completado'),
+        ('error', 'Error'),
+    ], string='Estado', default='pending', required=True, index=True)
+
+    date_done = fields.Datetime(string='Fecha de Finalización', readonly=True)
+
+    duration = fields.Float(
+        string='Duración (s)', readonly=True, digits=(16, 2),
+        help='Tiempo de cálculo del bloque en segundos')
+
+    error_message = fields.Text(string='Mensaje de Error', readonly=True)
+
+    skipped_count = fields.Integer(
+        string='Nóminas sin Cambios', readonly=True,
+        help='Nóminas del bloque omitidas porque sus entradas no cambiaron')
+
+    company_id = fields.Many2one(related='run_id.company_id')
+
+    def _compute_slip_count(self):
+        counts = {
+            chunk.id: count
+            for chunk, count in self.env['hr.payslip']._read_group(
+                [('compute_chunk_id', 'in', self.ids)], ['compute_chunk_id'], ['__count'])
+        }
+        for chunk in self:
+            chunk.slip_count = counts.get(chunk.id, 0)
+
+    @api.model
+    def _cron_process_compute_chunks(self, time_limit=COMPUTE_CRON_TIME_LIMIT):
+        """
+        Procesa bloques pendientes hasta agotar la cola o el tiempo disponible.
+
+        Cada bloque se reclama con FOR UPDATE SKIP LOCKED y se confirma en su propia
+        transacción, de modo que varias ejecuciones del cron (o copias del cron)
+        pueden trabajar en paralelo y, tras una caída, se continúa desde el
+        último bloque confirmado.
+        """
+        deadline = time.monotonic() + time_limit
+        processed = 0
+        while time.monotonic() < deadline:
+            chunk = self._claim_next_chunk()
+            if not chunk:
+                break
+            chunk._process_chunk()
+            self.env.cr.commit()
+            processed += 1
+
+        if processed and self._has_pending_chunks():
+            # Quedan bloques: programar otra ejecución inmediata
+            self.env.ref('nomina_colombia.ir_cron_payslip_run_compute_chunks')._trigger()
+        return processed
+
+    @api.model
+    def _claim_next_chunk(self):
+        """Bloquea y retorna el siguiente bloque pendiente que no esté tomado por otro proceso"""
+        self.env.cr.execute("""
+            SELECT id
+              FROM hr_payslip_run_chunk
+             WHERE state = 'pending'
+          ORDER BY run_id, sequence, id
+             LIMIT 1
+               FOR UPDATE SKIP LOCKED
+        """)
+        row = self.env.cr.fetchone()
+        return self.browse(row[0]) if row else self.browse()
+
+    @api.model
+    def _has_pending_chunks(self):
+        return bool(self.search_count([('state', '=', 'pending')], limit=1))
+
+    def _process_chunk(self):
+        """Calcula las nóminas del bloque y registra el resultado"""
+        self.ensure_one()
+        start = time.monotonic()
+        try:
+            with self.env.cr.savepoint():
+                skipped = self.slip_ids._compute_sheet_incremental()
+        except Exception as e:
+            _logger.exception("Error calculando el bloque %s del lote %s", self.sequence, self.run_id.name)
+            self.write({
+                'state': 'error',
+                'error_message': str(e),
+                'duration': time.monotonic() - start,
+                'date_done': fields.Datetime.now(),
+            })
+        else:
+            self.write({
+                'state': 'done',
+                'error_message': False,
+                'skipped_count': len(skipped),
+                'duration': time.monotonic() - start,
+                'date_done': fields.Datetime.now(),
+            })
@@ -2,12 +2,38 @@
 
 from odoo import models, fields, api, _
 from odoo.exceptions import UserError, ValidationError
-from datetime import datetime, date
+from odoo.tools import split_every
+from datetime import date
+from dateutil.relativedelta import relativedelta
 import base64
 import logging
 
+from .hr_pila_layout import HEADER_LAYOUT, DETAIL_LAYOUT, FOOTER_LAYOUT, CONTRIBUTION_ROUNDING, round_up
+
 _logger = logging.getLogger(__name__)
 
+# Código de regla salarial -> campo de total de la PILA
+PILA_TOTAL_FIELDS = {
+    'HEALTH': 'total_health',
+    'PENSION': 'total_pension',
+    'ARL': 'total_arl',
+    'SENA': 'total_parafiscal',
+    'ICBF': 'total_parafiscal',
+    'CCF': 'total_parafiscal',
+}
+
+# Estados de nómina que se reportan en la PILA
+PILA_PAYSLIP_STATES = ('done', 'paid')
+
+# Registros PILA por consulta de totales
+PILA_TOTALS_BATCH_SIZE = 500
+
+# Tipo de identificación del empleado -> tipo de documento PILA
+PILA_DOCUMENT_TYPES = {'PP': 'PA', 'NIT': 'NI'}
+
+# Tipos de identificación de cotizantes extranjeros
+FOREIGN_DOCUMENT_TYPES = ('CE', 'PP')
+
 class HrPila(models.Model):
     _name = 'hr.pila'
     _description = 'PILA Management'
@@ -79,35 +105,35 @@ class HrPila(models.Model):
     
     total_employees = fields.Integer(
         string='Total Employees',
-        compute='_compute_totals',
-        store=True
+        readonly=True,
+        copy=False
     )
     
     total_health = fields.Float(
         string='Total Health',
-        compute='_compute_totals',
-        store=True,
+        readonly=True,
+        copy=False,
         digits=(16, 2)
     )
     
     total_pension = fields.Float(
         string='Total Pension',
-        compute='_compute_totals',
-        store=True,
+        readonly=True,
+        copy=False,
         digits=(16, 2)
     )
     
     total_arl = fields.Float(
         string='Total ARL',
-        compute='_compute_totals',
-        store=True,
+        readonly=True,
+        copy=False,
         digits=(16, 2)
     )
     
     total_parafiscal = fields.Float(
         string='Total Parafiscal',
-        compute='_compute_totals',
-        store=True,
+        readonly=True,
+        copy=False,
         digits=(16, 2)
     )
     
@@ -120,36 +146,69 @@ class HrPila(models.Model):
         for vals in vals_list:
             if vals.get('name', _('New')) == _('New'):
                 vals['name'] = self.env['ir.sequence'].next_by_code('hr.pila') or _('New')
-        return super(HrPila, self).create(vals_list)
+        records = super(HrPila, self).create(vals_list)
+        records.filtered('payslip_ids')._compute_totals()
+        return records
+
+    def write(self, vals):
+        res = super(HrPila, self).write(vals)
+        if 'payslip_ids' in vals:
+            self._compute_totals()
+        return res
 
-    @api.depends('payslip_ids', 'payslip_ids.line_ids')
     def _compute_totals(self):
-        for pila in self:
-            payslips = pila.payslip_ids.filtered(lambda p: p.state in ['done', 'paid'])
-            
-            pila.total_employees = len(payslips.mapped('employee_id'))
-            
-            # Calcular totales de aportes
-            total_health = 0.0
-            total_pension = 0.0
-            total_arl = 0.0
-            total_parafiscal = 0.0
-            
-            for payslip in payslips:
-                for line in payslip.line_ids:
-                    if line.code == 'HEALTH':
-                        total_health += line.total
-                    elif line.code == 'PENSION':
-                        total_pension += line.total
-                    elif line.code == 'ARL':
-                        total_arl += line.total
-                    elif line.code in ['SENA', 'ICBF', 'CCF']:
-                        total_parafiscal += line.total
-            
-            pila.total_health = total_health
-            pila.total_pension = total_pension
-            pila.total_arl = total_arl
-            pila.total_parafiscal = total_parafiscal
+        """
+        Recalcula los totales de aportes de la PILA
+
+        Los totales no dependen de las líneas de nómina: se recalculan de
+        forma explícita al asignar nóminas y al generar el archivo. Las líneas
+        se suman en la base de datos con una consulta agrupada por PILA,
+        nómina y código de regla por cada lote de registros, sin cargarlas en
+        la caché del ORM. Como en el detalle del archivo, cada cotización de
+        una nómina se toma en valor absoluto y se aproxima al múltiplo de 100
+        superior, de modo que los totales coinciden con el registro tipo 3.
+        """
+        if not self:
+            return
+        self.flush_model(['payslip_ids'])
+        self.env['hr.payslip'].flush_model(['state', 'employee_id'])
+        self.env['hr.payslip.line'].flush_model(['slip_id', 'code', 'total'])
+
+        for batch in split_every(PILA_TOTALS_BATCH_SIZE, self.ids):
+            totals = {pila_id: dict.fromkeys(PILA_TOTAL_FIELDS.values(), 0.0) for pila_id in batch}
+            for vals in totals.values():
+                vals['total_employees'] = 0
+            # Las filas sin código llevan el número de empleados de la PILA
+            self.env.cr.execute("""
+                SELECT rel.pila_id, NULL::varchar, COUNT(DISTINCT slip.employee_id)::numeric
+                  FROM hr_pila_payslip_rel rel
+                  JOIN hr_payslip slip ON slip.id = rel.payslip_id
+                 WHERE rel.pila_id IN %(pila_ids)s
+                   AND slip.state IN %(states)s
+              GROUP BY rel.pila_id
+             UNION ALL
+                SELECT rel.pila_id, line.code, SUM(line.total)
+                  FROM hr_pila_payslip_rel rel
+                  JOIN hr_payslip slip ON slip.id = rel.payslip_id
+                  JOIN hr_payslip_line line ON line.slip_id = slip.id
+                 WHERE rel.pila_id IN %(pila_ids)s
+                   AND slip.state IN %(states)s
+                   AND line.code IN %(codes)s
+              GROUP BY rel.pila_id, slip.id, line.code
+            """, {
+                'pila_ids': tuple(batch),
+                'states': PILA_PAYSLIP_STATES,
+                'codes': tuple(PILA_TOTAL_FIELDS),
+            })
+            for pila_id, code, amount in self.env.cr.fetchall():
+                if code is None:
+                    totals[pila_id]['total_employees'] = int(amount)
+                else:
+                    field_name = PILA_TOTAL_FIELDS[code]
+                    totals[pila_id][field_name] += round_up(abs(float(amount or 0.0)), CONTRIBUTION_ROUNDING)
+
+            for pila_id, vals in totals.items():
+                self.browse(pila_id).write(vals)
 
     def action_generate_file(self):
         """Genera el archivo plano de PILA"""
@@ -158,21 +217,26 @@ class HrPila(models.Model):
             raise UserError(_('No payslips found for this period.'))
             
         try:
-            # Aquí va la lógica de generación del archivo plano
-            file_content = self._generate_pila_content()
-            
-            # Codificar el contenido en base64
-            file_data = base64.b64encode(file_content.encode('utf-8'))
-            
-            # Generar nombre del archivo
-            file_name = f"PILA_{self.company_id.vat}_{self.date_from.strftime('%Y%m')}_{self.date_to.strftime('%Y%m')}.txt"
-            
-            # Actualizar registro
-            self.write({
-                'file_data': file_data,
-                'file_name': file_name,
-                'state': 'generated'
-            })
+            with self.env['hr.payroll.run.metrics']._track_stage('pila', self) as measure:
+                # Los totales del pie se recalculan con los estados actuales de las nóminas
+                self._compute_totals()
+
+                # Aquí va la lógica de generación del archivo plano
+                file_content = self._generate_pila_content()
+                
+                # Codificar el contenido en base64
+                file_data = base64.b64encode(file_content.encode('utf-8'))
+                
+                # Generar nombre del archivo
+                file_name = f"PILA_{self.company_id.vat}_{self.date_from.strftime('%Y%m')}_{self.date_to.strftime('%Y%m')}.txt"
+                
+                # Actualizar registro
+                self.write({
+                    'file_data': file_data,
+                    'file_name': file_name,
+                    'state': 'generated'
+                })
+                measure['rows'] = file_content.count('\n') + 1
             
             return {
                 'type': 'ir.actions.act_url',
@@ -185,58 +249,157 @@ class HrPila(models.Model):
 
     def _generate_pila_content(self):
         """Genera el contenido del archivo PILA"""
-        content = []
-        
+        details = self._get_pila_detail_rows()
+
         # 1. Registro tipo 1 - Encabezado
-        header = self._generate_header()
-        content.append(header)
-        
-        # 2. Registro tipo 2 - Liquidación
-        for payslip in self.payslip_ids:
-            employee_record = self._generate_employee_record(payslip)
-            content.append(employee_record)
-        
-        # 3. Registro tipo 3 - Totales
-        footer = self._generate_footer()
-        content.append(footer)
-        
+        content = [self._generate_header(details)]
+
+        # 2. Registro tipo 2 - Liquidación, a partir de tuplas precargadas
+        records = [self._generate_employee_record(row) for row in details]
+        content.extend(records)
+
+        # 3. Registro tipo 3 - Totales de aportes de la PILA
+        content.append(self._generate_footer(len(records)))
+
         return '\n'.join(content)
 
-    def _generate_header(self):
-        """Genera el registro tipo 1 - Encabezado"""
-        company = self.company_id
-        return (
-            f"01"  # Tipo registro
-            f"{company.vat:>16}"  # NIT
-            f"{company.name:<200}"  # Razón social
-            f"{self.date_from.strftime('%Y%m'):>6}"  # Período
-            # ... más campos según especificación
-        )
+    def _get_pila_detail_rows(self):
+        """
+        Precarga los datos de los cotizantes en tuplas de liquidación
+
+        Las nóminas, empleados, contratos, entidades y totales de las líneas
+        se leen en bloque y cada tupla sigue el orden de DETAIL_LAYOUT.names.
+
+        :return: Lista de tuplas del registro tipo 2
+        """
+        payslips = self.payslip_ids.filtered(lambda payslip: payslip.state in PILA_PAYSLIP_STATES)
+        slips = payslips.read(['employee_id', 'contract_id', 'worked_days'], load=False)
+        employees = {
+            employee['id']: employee
+            for employee in payslips.employee_id.read([
+                'name', 'identification_type', 'identification_id', 'pila_code', 'pila_sub_type',
+                'pension_fund_id', 'eps_id', 'arl_id', 'arl_risk',
+            ], load=False)
+        }
+        contracts = {
+            contract['id']: contract
+            for contract in payslips.contract_id.read(['wage', 'date_start', 'date_end'], load=False)
+        }
+        entity_ids = {
+            employee[field_name]
+            for employee in employees.values()
+            for field_name in ('pension_fund_id', 'eps_id', 'arl_id')
+            if employee[field_name]
+        }
+        entity_codes = {
+            partner['id']: partner['ref']
+            for partner in self.env['res.partner'].browse(entity_ids).read(['ref'], load=False)
+        }
+        line_totals = {
+            (payslip.id, code): abs(total or 0.0)
+            for payslip, code, total in self.env['hr.payslip.line']._read_group(
+                [('slip_id', 'in', payslips.ids), ('code', 'in', list(PILA_TOTAL_FIELDS))],
+                ['slip_id', 'code'], ['total:sum'])
+        }
 
-    def _generate_employee_record(self, payslip):
-        """Genera el registro tipo 2 - Liquidación por empleado"""
-        employee = payslip.employee_id
-        contract = payslip.contract_id
-        
-        return (
-            f"02"  # Tipo registro
-            f"{employee.identification_id:>16}"  # Documento
-            f"{employee.name:<100}"  # Nombre
-            f"{contract.wage:015.2f}"  # IBC
-            # ... más campos según especificación
-        )
+        legal = self.env['hr.payroll.legal.parameter']._get_legal_values(self.date_to)
+        smmlv = legal['smmlv']
+        max_ibc = smmlv * legal['max_ibc_smmlv']
+        health_rate = legal['health_employee_rate'] / 100.0
+        pension_rate = legal['pension_employee_rate'] / 100.0
+        ccf_rate = legal['ccf_rate'] / 100.0
+        sena_rate = legal['sena_rate'] / 100.0
+        icbf_rate = legal['icbf_rate'] / 100.0
+        date_from, date_to = self.date_from, self.date_to
+
+        rows = []
+        for sequence, slip in enumerate(slips, 1):
+            slip_id = slip['id']
+            employee = employees[slip['employee_id']]
+            contract = contracts.get(slip['contract_id']) or {'wage': 0.0, 'date_start': False, 'date_end': False}
+            identification_type = employee['identification_type']
+            risk_class = employee['arl_risk'] or '1'
+            days = min(slip['worked_days'] or 30, 30)
+
+            # El IBC se limita entre 1 y el tope de SMMLV vigentes en el período
+            ibc = min(max(contract['wage'], smmlv), max_ibc)
+
+            contributor_type = employee['pila_code'] or '01'
+            contributor_sub_type = employee['pila_sub_type'] or '00'
+            if not all(code.isdigit() and len(code) <= 2 for code in (contributor_type, contributor_sub_type)):
+                raise UserError(_("El tipo (%(type)s) y el subtipo (%(sub_type)s) de cotizante PILA del "
+                                  "empleado %(employee)s deben ser códigos numéricos de dos dígitos.") % {
+                    'type': contributor_type,
+                    'sub_type': contributor_sub_type,
+                    'employee': employee['name'],
+                })
 
-    def _generate_footer(self):
-        """Genera el registro tipo 3 - Totales"""
-        return (
-            f"03"  # Tipo registro
-            f"{self.total_employees:06d}"  # Total empleados
-            f"{self.total_health:015.2f}"  # Total salud
-            f"{self.total_pension:015.2f}"  # Total pensión
-            f"{self.total_arl:015.2f}"  # Total ARL
-            f"{self.total_parafiscal:015.2f}"  # Total parafiscales
-            # ... más campos según especificación
-        )
+            rows.append((
+                sequence,
+                PILA_DOCUMENT_TYPES.get(identification_type, identification_type),
+                employee['identification_id'],
+                contributor_type,
+                contributor_sub_type,
+                'X' if identification_type in FOREIGN_DOCUMENT_TYPES else '',
+                employee['name'],
+                'X' if contract['date_start'] and date_from <= contract['date_start'] <= date_to else '',
+                'X' if contract['date_end'] and date_from <= contract['date_end'] <= date_to else '',
+                entity_codes.get(employee['pension_fund_id']),
+                entity_codes.get(employee['eps_id']),
+                entity_codes.get(employee['arl_id']),
+                days, days, days, days,
+                contract['wage'],
+                ibc, ibc, ibc, ibc,
+                pension_rate, line_totals.get((slip_id, 'PENSION'), 0.0),
+                health_rate, line_totals.get((slip_id, 'HEALTH'), 0.0),
+                legal['arl_rates'][risk_class] / 100.0, risk_class, line_totals.get((slip_id, 'ARL'), 0.0),
+                ccf_rate, line_totals.get((slip_id, 'CCF'), 0.0),
+                sena_rate, line_totals.get((slip_id, 'SENA'), 0.0),
+                icbf_rate, line_totals.get((slip_id, 'ICBF'), 0.0),
+            ))
+        return rows
+
+    def _generate_header(self, details):
+        """Genera el registro tipo 1 - Encabezado"""
+        company = self.company_id
+        nit, _sep, check_digit = (company.vat or '').partition('-')
+        ibc = DETAIL_LAYOUT.getter('ibc_salud')
+        return HEADER_LAYOUT.format((
+            company.name,
+            'NI',
+            nit,
+            check_digit,
+            'E',  # Planilla de empleados
+            '',
+            None,
+            'U',  # Presentación única
+            '',
+            '',
+            '',
+            self.date_from,
+            self.date_from + relativedelta(months=1),
+            0,
+            self.payment_date,
+            len(details),
+            sum(ibc(row) for row in details),
+            0,
+        ))
+
+    def _generate_employee_record(self, row):
+        """Genera el registro tipo 2 - Liquidación de un cotizante precargado"""
+        return DETAIL_LAYOUT.format(row)
+
+    def _generate_footer(self, record_count):
+        """
+        Genera el registro tipo 3 - Totales
+
+        Usa los totales guardados de la PILA (ver _compute_totals), que
+        suman las mismas cotizaciones redondeadas del detalle del archivo.
+
+        :param record_count: Número de registros tipo 2
+        """
+        totals = [self.total_health, self.total_pension, self.total_arl, self.total_parafiscal]
+        return FOOTER_LAYOUT.format((record_count, *totals, sum(totals)))
 
     def action_confirm(self):
         """Confirma la PILA"""
@@ -523,56 +686,26 @@ class HrPilaProcessing(models.Model):
             
         return errors
 
-    def _validate_header(self, header_line):
-        """Valida la estructura del encabezado"""
+    def _validate_record(self, layout, line):
+        """Valida un registro contra la misma especificación usada para generarlo"""
         try:
-            # Implementar validaciones específicas del encabezado
-            required_length = 500 
-            if len(header_line) != required_length:
-                return False
-            
-            # Validar tipo de registro
-            if header_line[:2] != '01':
-                return False
-                
-            # Más validaciones específicas...
+            layout.parse(line)
             return True
-        except Exception:
+        except ValueError as e:
+            _logger.info("PILA: registro inválido: %s", e)
             return False
 
+    def _validate_header(self, header_line):
+        """Valida la estructura del encabezado"""
+        return self._validate_record(HEADER_LAYOUT, header_line)
+
     def _validate_detail(self, detail_line):
         """Valida la estructura de una línea de detalle"""
-        try:
-            # Implementar validaciones específicas de las líneas de detalle
-            required_length = 800  
-            if len(detail_line) != required_length:
-                return False
-                
-            # Validar tipo de registro
-            if detail_line[:2] != '02':
-                return False
-                
-            # Más validaciones específicas...
-            return True
-        except Exception:
-            return False
+        return self._validate_record(DETAIL_LAYOUT, detail_line)
 
     def _validate_footer(self, footer_line):
         """Valida la estructura del pie"""
-        try:
-            # Implementar validaciones específicas del pie
-            required_length = 300 
-            if len(footer_line) != required_length:
-                return False
-                
-            # Validar tipo de registro
-            if footer_line[:2] != '03':
-                return False
-                
-            # Más validaciones específicas...
-            return True
-        except Exception:
-            return False
+        return self._validate_record(FOOTER_LAYOUT, footer_line)
 
     def action_validate(self):
         """Valida el proceso de PILA"""
@@ -0,0 +1,283 @@
+"""
+Registros de longitud fija del archivo plano PILA (Resolución 2388 de 2016).
+
+Cada tipo de registro se declara como una lista ordenada de campos con su
+posición (desde 1), longitud, tipo, relleno y redondeo. La especificación se
+compila una sola vez en una plantilla de formato para el generador y en los
+cortes de lectura para el validador, de modo que un cambio de formato es un
+cambio en una sola tabla.
+
+Redondeo de los campos numéricos: un redondeo positivo conserva esa cantidad
+de decimales (redondeo al más cercano); uno negativo aproxima siempre hacia
+arriba al múltiplo de 10, 100... siguiente, como exige la Resolución 2388 de
+2016 para las cotizaciones, que se ajustan al múltiplo de 100 superior. El
+valor se lleva primero a centavos para que el ruido de punto flotante no suba
+un múltiplo exacto.
+"""
+import math
+from collections import namedtuple
+from datetime import datetime
+from operator import itemgetter
+
+# Tipos de campo
+ALPHA = 'A'     # Alfanumérico, alineado a la izquierda con espacios
+NUMERIC = 'N'   # Numérico, alineado a la derecha con ceros
+DATE = 'D'      # Fecha AAAA-MM-DD
+PERIOD = 'P'    # Período AAAA-MM
+
+DATE_FORMATS = {DATE: '%Y-%m-%d', PERIOD: '%Y-%m'}
+
+# Relleno por defecto: carácter de relleno y alineación de str.format
+DEFAULT_PADDING = {ALPHA: ' <', NUMERIC: '0>', DATE: ' <', PERIOD: ' <'}
+
+# Redondeo de las cotizaciones: múltiplo de 100 superior
+CONTRIBUTION_ROUNDING = -2
+
+PilaField = namedtuple('PilaField', ['name', 'position', 'length', 'type', 'padding', 'rounding', 'value'])
+
+
+def pila_field(name, position, length, type=ALPHA, padding=None, rounding=0, value=None):
+    """
+    Declara un campo de un registro PILA
+
+    :param name: Nombre del campo
+    :param position: Posición inicial en el registro, desde 1
+    :param length: Longitud del campo
+    :param type: ALPHA, NUMERIC, DATE o PERIOD
+    :param padding: Carácter de relleno y alineación ('0>', ' <'), por defecto según el tipo
+    :param rounding: Decimales de los campos numéricos; negativo aproxima hacia arriba
+                     al múltiplo de 10, 100... siguiente (-2: ``math.ceil(valor / 100) * 100``)
+    :param value: Valor fijo del campo, que no se recibe al formatear
+    """
+    return PilaField(name, position, length, type, padding or DEFAULT_PADDING[type], rounding, value)
+
+
+def round_up(value, digits):
+    """
+    Aproxima el valor hacia arriba al múltiplo de 10 ** -digits siguiente
+
+    :param value: Valor no negativo
+    :param digits: Redondeo negativo (-2: múltiplo de 100)
+    """
+    unit = 10 ** -digits
+    return math.ceil(round(value, 2) / unit) * unit
+
+
+def _make_converter(spec):
+    """Función que prepara el valor de un campo para la plantilla de formato"""
+    if spec.type == NUMERIC:
+        digits = spec.rounding
+
+        def convert(value):
+            value = float(value or 0.0)
+            if value < 0:
+                raise ValueError('Campo %s: valor negativo %s' % (spec.name, value))
+            if digits < 0:
+                return round_up(value, digits)
+            value = round(value, digits)
+            return value if digits > 0 else int(value)
+        return convert
+
+    if spec.type in DATE_FORMATS:
+        date_format = DATE_FORMATS[spec.type]
+        return lambda value: value.strftime(date_format) if value else ''
+
+    return lambda value: '' if value is None or value is False else str(value)
+
+
+def _make_parser(spec):
+    """Función que convierte el texto de un campo en su valor"""
+    if spec.type == NUMERIC:
+        number = float if spec.rounding > 0 else int
+
+        def parse(text):
+            if text.strip() != text or not text.replace('.', '', 1).isdigit():
+                raise ValueError('Campo %s: valor numérico inválido %r' % (spec.name, text))
+            return number(text)
+        return parse
+
+    if spec.type in DATE_FORMATS:
+        date_format = DATE_FORMATS[spec.type]
+
+        def parse(text):
+            text = text.strip()
+            try:
+                return datetime.strptime(text, date_format).date() if text else None
+            except ValueError:
+                raise ValueError('Campo %s: fecha inválida %r' % (spec.name, text))
+        return parse
+
+    return str.rstrip
+
+
+def _format_spec(spec):
+    """Especificación de str.format del campo, que además trunca los textos"""
+    if spec.type == NUMERIC:
+        if spec.rounding > 0:
+            return '%s%s.%sf' % (spec.padding, spec.length, spec.rounding)
+        return '%s%sd' % (spec.padding, spec.length)
+    return '%s%s.%s' % (spec.padding, spec.length, spec.length)
+
+
+class RecordLayout:
+    """
+    Tipo de registro PILA compilado
+
+    Los valores a formatear se reciben como tuplas en el orden de ``names``,
+    que excluye los campos con valor fijo.
+    """
+
+    def __init__(self, name, length, fields):
+        self.name = name
+        self.length = length
+        self.fields = tuple(fields)
+        self._compile()
+
+    def _compile(self):
+        template = []
+        converters = []
+        names = []
+        slices = []
+        position = 1
+        for spec in self.fields:
+            if spec.position != position:
+                raise ValueError('Registro %s, campo %s: posición %s, se esperaba %s' % (
+                    self.name, spec.name, spec.position, position))
+            position += spec.length
+
+            field_spec = _format_spec(spec)
+            if spec.value is None:
+                template.append('{:%s}' % field_spec)
+                converters.append(_make_converter(spec))
+                names.append(spec.name)
+                fixed = None
+            else:
+                fixed = format(_make_converter(spec)(spec.value), field_spec)
+                template.append(fixed.replace('{', '{{').replace('}', '}}'))
+            slices.append((spec.name, spec.position - 1, position - 1, _make_parser(spec), fixed))
+
+        if position - 1 != self.length:
+            raise ValueError('Registro %s: los campos suman %s caracteres, se esperaban %s' % (
+                self.name, position - 1, self.length))
+
+        self.names = tuple(names)
+        self._format = ''.join(template).format
+        self._converters = tuple(converters)
+        self._slices = tuple(slices)
+
+    def getter(self, name):
+        """Función que extrae un campo de las tuplas de valores de este registro"""
+        return itemgetter(self.names.index(name))
+
+    def format(self, values):
+        """
+        Formatea un registro
+
+        :param values: Tupla de valores en el orden de ``names``
+        :return: Línea del registro
+        """
+        line = self._format(*[convert(value) for convert, value in zip(self._converters, values)])
+        if len(line) != self.length:
+            raise ValueError('Registro %s: longitud %s, se esperaban %s caracteres' % (
+                self.name, len(line), self.length))
+        return line
+
+    def parse(self, line):
+        """
+        Lee un registro y valida su estructura
+
+        :param line: Línea del registro
+        :return: Diccionario {campo: valor}
+        :raise ValueError: Si la longitud, un valor fijo o un campo no son válidos
+        """
+        if len(line) != self.length:
+            raise ValueError('Registro %s: longitud %s, se esperaban %s caracteres' % (
+                self.name, len(line), self.length))
+        values = {}
+        for name, start, end, parse, fixed in self._slices:
+            text = line[start:end]
+            if fixed is not None and text != fixed:
+                raise ValueError('Registro %s, campo %s: se esperaba %r' % (self.name, name, fixed))
+            values[name] = parse(text)
+        return values
+
+
+# Registro tipo 1: encabezado del aportante
+HEADER_LAYOUT = RecordLayout('encabezado', 500, [
+    pila_field('tipo_registro', 1, 2, NUMERIC, value=1),
+    pila_field('modalidad_planilla', 3, 1, NUMERIC, value=1),
+    pila_field('secuencia', 4, 4, NUMERIC, value=1),
+    pila_field('razon_social', 8, 200),
+    pila_field('tipo_documento', 208, 2),
+    pila_field('numero_documento', 210, 16),
+    pila_field('digito_verificacion', 226, 1, NUMERIC),
+    pila_field('tipo_planilla', 227, 1),
+    pila_field('planilla_asociada', 228, 10),
+    pila_field('fecha_planilla_asociada', 238, 10, DATE),
+    pila_field('forma_presentacion', 248, 1),
+    pila_field('codigo_sucursal', 249, 10),
+    pila_field('nombre_sucursal', 259, 40),
+    pila_field('codigo_arl', 299, 6),
+    pila_field('periodo_pension', 305, 7, PERIOD),
+    pila_field('periodo_salud', 312, 7, PERIOD),
+    pila_field('numero_radicacion', 319, 10, NUMERIC),
+    pila_field('fecha_pago', 329, 10, DATE),
+    pila_field('total_empleados', 339, 5, NUMERIC),
+    pila_field('total_nomina', 344, 12, NUMERIC),
+    pila_field('tipo_aportante', 356, 2, NUMERIC, value=1),
+    pila_field('codigo_operador', 358, 2, NUMERIC),
+    pila_field('reservado', 360, 141, value=''),
+])
+
+# Registro tipo 2: liquidación de aportes por cotizante
+DETAIL_LAYOUT = RecordLayout('liquidación', 800, [
+    pila_field('tipo_registro', 1, 2, NUMERIC, value=2),
+    pila_field('secuencia', 3, 5, NUMERIC),
+    pila_field('tipo_documento', 8, 2),
+    pila_field('numero_documento', 10, 16),
+    pila_field('tipo_cotizante', 26, 2, NUMERIC),
+    pila_field('subtipo_cotizante', 28, 2, NUMERIC),
+    pila_field('extranjero', 30, 1),
+    pila_field('nombre', 31, 100),
+    pila_field('ingreso', 131, 1),
+    pila_field('retiro', 132, 1),
+    pila_field('codigo_afp', 133, 6),
+    pila_field('codigo_eps', 139, 6),
+    pila_field('codigo_arl', 145, 6),
+    pila_field('dias_pension', 151, 2, NUMERIC),
+    pila_field('dias_salud', 153, 2, NUMERIC),
+    pila_field('dias_arl', 155, 2, NUMERIC),
+    pila_field('dias_ccf', 157, 2, NUMERIC),
+    pila_field('salario_basico', 159, 9, NUMERIC),
+    pila_field('ibc_pension', 168, 9, NUMERIC),
+    pila_field('ibc_salud', 177, 9, NUMERIC),
+    pila_field('ibc_arl', 186, 9, NUMERIC),
+    pila_field('ibc_ccf', 195, 9, NUMERIC),
+    # Tarifas como fracción y cotizaciones aproximadas al múltiplo de 100 superior
+    pila_field('tarifa_pension', 204, 7, NUMERIC, rounding=5),
+    pila_field('cotizacion_pension', 211, 9, NUMERIC, rounding=CONTRIBUTION_ROUNDING),
+    pila_field('tarifa_salud', 220, 7, NUMERIC, rounding=5),
+    pila_field('cotizacion_salud', 227, 9, NUMERIC, rounding=CONTRIBUTION_ROUNDING),
+    pila_field('tarifa_arl', 236, 9, NUMERIC, rounding=7),
+    pila_field('clase_riesgo', 245, 1, NUMERIC),
+    pila_field('cotizacion_arl', 246, 9, NUMERIC, rounding=CONTRIBUTION_ROUNDING),
+    pila_field('tarifa_ccf', 255, 7, NUMERIC, rounding=5),
+    pila_field('valor_ccf', 262, 9, NUMERIC, rounding=CONTRIBUTION_ROUNDING),
+    pila_field('tarifa_sena', 271, 7, NUMERIC, rounding=5),
+    pila_field('valor_sena', 278, 9, NUMERIC, rounding=CONTRIBUTION_ROUNDING),
+    pila_field('tarifa_icbf', 287, 7, NUMERIC, rounding=5),
+    pila_field('valor_icbf', 294, 9, NUMERIC, rounding=CONTRIBUTION_ROUNDING),
+    pila_field('reservado', 303, 498, value=''),
+])
+
+# Registro tipo 3: totales de la planilla
+FOOTER_LAYOUT = RecordLayout('totales', 300, [
+    pila_field('tipo_registro', 1, 2, NUMERIC, value=3),
+    pila_field('total_empleados', 3, 6, NUMERIC),
+    pila_field('total_salud', 9, 15, NUMERIC, rounding=2),
+    pila_field('total_pension', 24, 15, NUMERIC, rounding=2),
+    pila_field('total_arl', 39, 15, NUMERIC, rounding=2),
+    pila_field('total_parafiscales', 54, 15, NUMERIC, rounding=2),
+    pila_field('total_aportes', 69, 15, NUMERIC, rounding=2),
+    pila_field('reservado', 84, 217, value=''),
+])
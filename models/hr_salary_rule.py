@@ -0,0 +1,245 @@
+from odoo import models, fields, api, tools, _
+from odoo.exceptions import UserError, ValidationError
+from odoo.tools.safe_eval import _BUILTINS, _SAFE_OPCODES, check_values, test_expr
+from .hr_salary_rule_handlers import BATCH_RULE_HANDLERS, LOCAL_RULE_HANDLERS, has_rule_handler
+from collections import defaultdict
+from contextlib import contextmanager
+import logging
+import math
+import time
+
+_logger = logging.getLogger(__name__)
+
+# Campos de código Python de la regla y el código por defecto si están vacíos
+RULE_CODE_FIELDS = {
+    'condition_python': 'result = False',
+    'amount_python_compute': 'result = 0.0',
+}
+
+# Clave en la caché del cursor para los montos precalculados por manejadores nativos
+NATIVE_AMOUNTS_CACHE_KEY = 'nomina_colombia.native_rule_amounts'
+
+# Clave en la caché del cursor para las muestras del perfilado de reglas
+RULE_PROFILE_CACHE_KEY = 'nomina_colombia.rule_profile'
+
+
+class HrSalaryRule(models.Model):
+    _inherit = 'hr.salary.rule'
+
+    compute_engine = fields.Selection([
+        ('safe_eval', 'Código Python'),
+        ('native', 'Manejador Nativo'),
+    ], string='Motor de Cálculo', default='safe_eval', required=True,
+        help='Los manejadores nativos calculan las reglas estándar sin evaluar código, '
+             'por lotes de nóminas cuando es posible')
+
+    include_in_provisions = fields.Boolean(
+        string='Incluir en Provisiones',
+        help='Las líneas de la regla suman a la base de las provisiones de prima, '
+             'cesantías, intereses y vacaciones')
+
+    @api.constrains('compute_engine', 'code')
+    def _check_compute_engine(self):
+        for rule in self.filtered(lambda r: r.compute_engine == 'native'):
+            if not has_rule_handler(rule.code):
+                raise ValidationError(_('No existe un manejador nativo para la regla %s.') % rule.code)
+
+    def write(self, vals):
+        result = super(HrSalaryRule, self).write(vals)
+        # write_date no cambia dentro de la misma transacción
+        if RULE_CODE_FIELDS.keys() & vals.keys():
+            self.env.registry.clear_cache()
+        return result
+
+    @api.model
+    @tools.ormcache('rule_id', 'write_date', 'field_name')
+    def _compile_rule_code(self, rule_id, write_date, field_name):
+        """
+        Compila el código Python de una regla una sola vez por versión
+
+        La compilación pasa por test_expr de safe_eval, que rechaza los
+        opcodes y nombres no permitidos. La clave incluye write_date, de modo
+        que cualquier modificación de la regla genera una nueva compilación en
+        todos los procesos; write limpia además la caché cuando cambia el
+        código dentro de la misma transacción.
+        """
+        rule = self.browse(rule_id)
+        source = rule[field_name] or RULE_CODE_FIELDS[field_name]
+        return test_expr(source, _SAFE_OPCODES, mode='exec', filename='%s:%s' % (rule.code, field_name))
+
+    def _eval_rule_code(self, field_name, localdict, error_type):
+        """
+        Ejecuta el código compilado de la regla sobre el diccionario local de la nómina
+
+        Igual que safe_eval, valida en cada evaluación todos los valores del
+        diccionario local y restablece los builtins permitidos; solo se evita
+        volver a compilar el código de la regla para cada nómina.
+        """
+        try:
+            code = self._compile_rule_code(self.id, self.write_date, field_name)
+            check_values(localdict)
+            localdict['__builtins__'] = dict(_BUILTINS)
+            eval(code, localdict)  # pylint: disable=eval-used
+        except Exception as e:
+            self._raise_rule_error(localdict, error_type, e)
+
+    def _raise_rule_error(self, localdict, error_type, error):
+        raise UserError(_("%(error_type)s\n- Empleado: %(employee)s\n- Contrato: %(contract)s\n"
+                          "- Nómina: %(payslip)s\n- Regla salarial: %(rule)s (%(code)s)\n- Error: %(error)s") % {
+            'error_type': error_type,
+            'employee': localdict['employee'].name,
+            'contract': localdict['contract'].name,
+            'payslip': localdict['payslip'].name,
+            'rule': self.name,
+            'code': self.code,
+            'error': error,
+        })
+
+    def _get_native_amounts(self, payslip):
+        """
+        Retorna los montos del manejador por lote de la regla para la nómina.
+
+        Usa los montos precalculados del lote en compute_sheet; fuera de él
+        (por ejemplo, una sola nómina) ejecuta el manejador para esa nómina.
+        """
+        batch_amounts = self.env.cr.cache.get(NATIVE_AMOUNTS_CACHE_KEY, {})
+        if self.id in batch_amounts:
+            return batch_amounts[self.id]
+        return BATCH_RULE_HANDLERS[self.code](self, payslip)
+
+    @contextmanager
+    def _profile_evaluation(self, localdict):
+        """
+        Acumula el tiempo y las consultas de la evaluación de la regla para la
+        nómina del diccionario local, si su estructura se está perfilando
+        """
+        profile = self.env.cr.cache.get(RULE_PROFILE_CACHE_KEY)
+        if not profile or self.id not in profile:
+            yield
+            return
+
+        cr = self.env.cr
+        queries_before = cr.sql_log_count
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            sample = profile[self.id]
+            sample['durations'][localdict['payslip'].id] += (time.perf_counter_ns() - start) / 1000.0
+            sample['queries'] += cr.sql_log_count - queries_before
+
+    def _satisfy_condition(self, localdict):
+        # La condición se evalúa siempre con la configuración de la regla,
+        # también para las reglas con manejador nativo
+        self.ensure_one()
+        with self._profile_evaluation(localdict):
+            if self.condition_select != 'python' or self.env.context.get('disable_compiled_rules'):
+                return super(HrSalaryRule, self)._satisfy_condition(localdict)
+            self._eval_rule_code('condition_python', localdict, _("Condición Python incorrecta en:"))
+            return localdict.get('result', False)
+
+    def _compute_rule(self, localdict):
+        self.ensure_one()
+        with self._profile_evaluation(localdict):
+            return self._compute_rule_colombia(localdict)
+
+    def _compute_rule_colombia(self, localdict):
+        if self.compute_engine == 'native' and has_rule_handler(self.code):
+            localdict['localdict'] = localdict
+            if self.code in BATCH_RULE_HANDLERS:
+                return self._get_native_amounts(localdict['payslip'])[localdict['payslip'].id]
+            return LOCAL_RULE_HANDLERS[self.code](self, localdict)
+
+        if self.amount_select != 'code' or self.env.context.get('disable_compiled_rules'):
+            return super(HrSalaryRule, self)._compute_rule(localdict)
+
+        localdict['localdict'] = localdict
+        error_type = _("Código Python incorrecto en:")
+        self._eval_rule_code('amount_python_compute', localdict, error_type)
+        try:
+            return float(localdict['result']), localdict.get('result_qty', 1.0), localdict.get('result_rate', 100.0)
+        except Exception as e:
+            self._raise_rule_error(localdict, error_type, e)
+
+
+class HrPayrollStructure(models.Model):
+    _inherit = 'hr.payroll.structure'
+
+    rule_profiling = fields.Boolean(
+        string='Perfilar Reglas', groups='base.group_no_one',
+        help='Mide el tiempo y las consultas SQL de cada regla durante el cálculo de nómina '
+             'y los registra en el reporte de perfilado. Solo para diagnóstico.')
+    rule_profile_ids = fields.One2many(
+        'hr.payroll.rule.profile', 'structure_id', string='Perfilado de Reglas',
+        groups='base.group_no_one')
+
+    def _compute_native_amounts(self, payslips):
+        """
+        Ejecuta una sola vez por lote los manejadores nativos de las reglas
+
+        :param payslips: Nóminas del lote
+        :return: Diccionario {id de regla: {id de nómina: (monto, cantidad, tasa)}}
+        """
+        amounts = {}
+        profile = self.env.cr.cache.get(RULE_PROFILE_CACHE_KEY) or {}
+        rules = self.rule_ids.filtered(
+            lambda r: r.compute_engine == 'native' and r.code in BATCH_RULE_HANDLERS)
+        for rule in rules:
+            if rule.id not in profile:
+                amounts[rule.id] = BATCH_RULE_HANDLERS[rule.code](rule, payslips)
+                continue
+            # El tiempo del manejador por lote se suma al total de la regla
+            queries_before = self.env.cr.sql_log_count
+            start = time.perf_counter_ns()
+            amounts[rule.id] = BATCH_RULE_HANDLERS[rule.code](rule, payslips)
+            profile[rule.id]['batch_time'] += (time.perf_counter_ns() - start) / 1000.0
+            profile[rule.id]['queries'] += self.env.cr.sql_log_count - queries_before
+        return amounts
+
+    def _start_rule_profiling(self):
+        """
+        Prepara las muestras del perfilado para las reglas de las estructuras
+        con el perfilado activo
+
+        :return: Diccionario {id de regla: muestras}, vacío si no se perfila
+        """
+        profile = {}
+        for structure in self.sudo().filtered('rule_profiling'):
+            for rule in structure.rule_ids:
+                profile[rule.id] = {
+                    'structure_id': structure.id,
+                    'durations': defaultdict(float),
+                    'batch_time': 0.0,
+                    'queries': 0,
+                }
+        return profile
+
+    @api.model
+    def _save_rule_profile(self, profile):
+        """
+        Registra en el reporte de perfilado una línea por regla evaluada
+
+        :param profile: Muestras acumuladas durante el cálculo
+        """
+        now = fields.Datetime.now()
+        vals_list = []
+        for rule_id, sample in profile.items():
+            durations = sorted(sample['durations'].values())
+            if not durations and not sample['batch_time']:
+                continue
+            calls = len(durations)
+            total = sum(durations) + sample['batch_time']
+            vals_list.append({
+                'date': now,
+                'structure_id': sample['structure_id'],
+                'rule_id': rule_id,
+                'calls': calls,
+                'total_us': total,
+                'mean_us': total / calls if calls else total,
+                # Percentil 95 por rango más cercano sobre el tiempo por nómina
+                'p95_us': durations[max(math.ceil(0.95 * calls) - 1, 0)] if calls else 0.0,
+                'max_us': durations[-1] if calls else 0.0,
+                'batch_us': sample['batch_time'],
+                'query_count': sample['queries'],
+            })
+        self.env['hr.payroll.rule.profile'].sudo().create(vals_list)
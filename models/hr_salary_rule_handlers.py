@@ -0,0 +1,160 @@
+"""
+Manejadores nativos de las reglas salariales colombianas.
+
+Cada manejador reemplaza la evaluación con safe_eval de una regla estándar y
+retorna la misma tupla (monto, cantidad, tasa) que hr.salary.rule._compute_rule.
+
+Hay dos tipos de manejadores:
+
+* Por lote: reciben la regla y el recordset completo de nóminas y retornan
+  {id de nómina: (monto, cantidad, tasa)} en una sola llamada, con una
+  entrada por cada nómina. La condición de la regla se sigue evaluando por
+  nómina con su configuración normal; el manejador solo reemplaza el monto.
+* Locales: reciben la regla y el diccionario local de una nómina. Se usan para
+  las reglas que dependen de las categorías acumuladas durante el cálculo
+  (parafiscales, provisiones, neto), que no se conocen antes del recorrido.
+
+Las reglas que dependen de las líneas ya generadas en el cálculo, como la
+retención en la fuente por porcentaje, no tienen manejador nativo.
+"""
+from collections import defaultdict
+
+from odoo.tools.safe_eval import safe_eval
+
+BATCH_RULE_HANDLERS = {}
+LOCAL_RULE_HANDLERS = {}
+
+# Horas mensuales y recargo de la hora extra diurna
+MONTHLY_HOURS = 240
+DAYTIME_OVERTIME_FACTOR = 1.25
+
+# Categorías que suman en el neto a pagar
+NET_CATEGORIES = ['BASIC', 'AUX', 'EXTRA', 'COMP', 'DED', 'SOC']
+
+# Regla de provisión -> categoría base del porcentaje
+PROVISION_BASE_CATEGORIES = {
+    'PRIMA_PROV': 'GROSS',
+    'CES_PROV': 'GROSS',
+    'INT_CES_PROV': 'GROSS',
+    'VAC_PROV': 'BASIC',
+}
+
+
+def batch_rule_handler(*codes):
+    """Registra un manejador por lote para los códigos de regla indicados"""
+    def decorator(handler):
+        for code in codes:
+            BATCH_RULE_HANDLERS[code] = handler
+        return handler
+    return decorator
+
+
+def local_rule_handler(*codes):
+    """Registra un manejador local para los códigos de regla indicados"""
+    def decorator(handler):
+        for code in codes:
+            LOCAL_RULE_HANDLERS[code] = handler
+        return handler
+    return decorator
+
+
+def has_rule_handler(code):
+    return code in BATCH_RULE_HANDLERS or code in LOCAL_RULE_HANDLERS
+
+
+def category_total(localdict, code):
+    """Total acumulado de una categoría en el diccionario local de la nómina"""
+    categories = localdict['categories']
+    if isinstance(categories, dict):
+        return categories.get(code, 0.0) or 0.0
+    return getattr(categories, code, 0.0) or 0.0
+
+
+def _legal_values(payslip):
+    return payslip.env['hr.payroll.legal.parameter']._get_legal_values(payslip.date_to)
+
+
+@batch_rule_handler('BASIC')
+def _handle_basic(rule, payslips):
+    return {payslip.id: (payslip.contract_id.wage, 1.0, 100.0) for payslip in payslips}
+
+
+@batch_rule_handler('TRANS')
+def _handle_transport(rule, payslips):
+    return {payslip.id: (_legal_values(payslip)['transport_allowance'], 1.0, 100.0) for payslip in payslips}
+
+
+@batch_rule_handler('HEALTH', 'PENSION')
+def _handle_employee_contribution(rule, payslips):
+    rate_key = 'health_employee_rate' if rule.code == 'HEALTH' else 'pension_employee_rate'
+    return {
+        payslip.id: (-payslip.contract_id.wage * _legal_values(payslip)[rate_key] / 100.0, 1.0, 100.0)
+        for payslip in payslips
+    }
+
+
+@batch_rule_handler('ARL')
+def _handle_arl(rule, payslips):
+    return {
+        payslip.id: (
+            payslip.contract_id.wage * _legal_values(payslip)['arl_rates'][payslip.contract_id.risk_level or '1'] / 100.0,
+            1.0, 100.0)
+        for payslip in payslips
+    }
+
+
+@batch_rule_handler('HED')
+def _handle_daytime_overtime(rule, payslips):
+    hours = defaultdict(float)
+    for payslip, number_of_hours in payslips.env['hr.payslip.worked_days']._read_group(
+            [('payslip_id', 'in', payslips.ids), ('code', '=', 'HED')],
+            ['payslip_id'], ['number_of_hours:sum']):
+        hours[payslip.id] = number_of_hours
+    return {
+        payslip.id: (
+            hours[payslip.id] * (payslip.contract_id.wage / MONTHLY_HOURS) * DAYTIME_OVERTIME_FACTOR, 1.0, 100.0)
+        for payslip in payslips
+    }
+
+
+def _helper_amounts(payslips, helper):
+    """Montos de un método de cálculo de la nómina, para que ambos motores no diverjan"""
+    return {payslip.id: (getattr(payslip, helper)(), 1.0, 100.0) for payslip in payslips}
+
+
+@batch_rule_handler('PRIMA', 'CO_PRIMA')
+def _handle_prima(rule, payslips):
+    return _helper_amounts(payslips, '_calculate_prima')
+
+
+@batch_rule_handler('CESANTIAS', 'CO_CESANTIAS')
+def _handle_cesantias(rule, payslips):
+    return _helper_amounts(payslips, '_calculate_cesantias')
+
+
+@batch_rule_handler('INT_CESANTIAS', 'CO_INT_CESANTIAS')
+def _handle_intereses_cesantias(rule, payslips):
+    return _helper_amounts(payslips, '_calculate_intereses_cesantias')
+
+
+@local_rule_handler('SENA', 'ICBF', 'CCF')
+def _handle_parafiscal(rule, localdict):
+    rate_key = '%s_rate' % rule.code.lower()
+    return category_total(localdict, 'GROSS') * localdict['legal'][rate_key] / 100.0, 1.0, 100.0
+
+
+def rule_quantity(rule, localdict):
+    """Cantidad de la regla, una expresión evaluada sobre el diccionario local como en el motor estándar"""
+    return float(safe_eval(rule.quantity or '1.0', localdict))
+
+
+@local_rule_handler(*PROVISION_BASE_CATEGORIES)
+def _handle_provision(rule, localdict):
+    # Misma tupla que la rama de porcentaje: (base, cantidad, porcentaje)
+    base = category_total(localdict, PROVISION_BASE_CATEGORIES[rule.code])
+    return base, rule_quantity(rule, localdict), rule.amount_percentage
+
+
+@local_rule_handler('NET')
+def _handle_net(rule, localdict):
+    return sum(category_total(localdict, code) for code in NET_CATEGORIES), 1.0, 100.0
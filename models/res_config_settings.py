@@ -30,6 +30,57 @@ class ResConfigSettings(models.TransientModel):
         config_parameter='nomina_colombia.electronic_payroll_enabled'
     )
 
+    electronic_payroll_grouping = fields.Selection([
+        ('month', 'Un documento por empleado y mes'),
+        ('payslip', 'Un documento por nómina'),
+    ], string="Agrupación de Nómina Electrónica",
+        config_parameter='nomina_colombia.electronic_payroll_grouping',
+        default='month',
+        help="La DIAN espera un documento por empleado y mes que sume todas sus nóminas del mes."
+    )
+
+    dian_send_mode = fields.Selection([
+        ('zip', 'Paquetes ZIP (asíncrono)'),
+        ('single', 'Documento por documento (síncrono)'),
+    ], string="Modo de Envío DIAN",
+        config_parameter='nomina_colombia.dian_send_mode',
+        default='zip'
+    )
+
+    dian_zip_max_documents = fields.Integer(
+        string="Documentos por Paquete ZIP",
+        config_parameter='nomina_colombia.dian_zip_max_documents',
+        default=50
+    )
+
+    dian_send_concurrency = fields.Integer(
+        string="Envíos Simultáneos a DIAN",
+        config_parameter='nomina_colombia.dian_send_concurrency',
+        default=8
+    )
+
+    dian_send_timeout = fields.Integer(
+        string="Tiempo de Espera DIAN (s)",
+        config_parameter='nomina_colombia.dian_send_timeout',
+        default=30
+    )
+
+    dian_send_max_attempts = fields.Integer(
+        string="Intentos por Envío",
+        config_parameter='nomina_colombia.dian_send_max_attempts',
+        default=4
+    )
+
+    xml_storage_codec = fields.Selection([
+        ('zstd', 'Zstandard'),
+        ('gzip', 'gzip'),
+        ('none', 'Sin compresión'),
+    ], string="Compresión de XML",
+        config_parameter='nomina_colombia.xml_storage_codec',
+        default='gzip',
+        help="Compresión de los XML guardados en adjuntos. Zstandard requiere el paquete zstandard."
+    )
+
     # Configuraciones del Operador PILA
     pila_operator = fields.Selection([
         ('simple', 'Operador Simple'),
@@ -493,15 +544,8 @@ class ResConfigSettings(models.TransientModel):
             }
 
     def _get_uvt_from_dian(self, year):
-        """Obtiene el valor de la UVT desde la DIAN"""
-        # Implementar lógica de conexión con DIAN
-        # Esta es una implementación de ejemplo
-        uvt_values = {
-            2024: 47065,
-            2023: 42412,
-            2022: 38004,
-        }
-        return uvt_values.get(year, 0)
+        """Obtiene el valor de la UVT del año desde los parámetros legales"""
+        return self.env['hr.payroll.legal.parameter']._get_legal_values_for_year(year)['uvt']
     class ResConfigSettings(models.TransientModel):
         _inherit = 'res.config.settings'
 
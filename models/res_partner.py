@@ -0,0 +1,10 @@
+from odoo import fields, models
+
+
+class ResPartner(models.Model):
+    _inherit = 'res.partner'
+
+    # Responsabilidades fiscales del RUT que se reportan a la DIAN
+    dian_fiscal_responsibilities = fields.Char(
+        string='Responsabilidades Fiscales DIAN',
+        help='Códigos de responsabilidad del RUT separados por punto y coma, por ejemplo O-13;O-15 o R-99-PN')
@@ -5,4 +5,30 @@ from . import test_hr_electronic_payroll
 from . import test_hr_pila
 from . import test_hr_provisions
 from . import test_hr_payroll_reports
-from . import test_hr_severance_payment
\ No newline at end of file
+from . import test_hr_severance_payment
+from . import test_hr_payslip_summary
+from . import test_hr_legal_parameter
+from . import test_hr_salary_rule_cache
+from . import test_hr_salary_rule_handlers
+from . import test_hr_payroll_vectorized
+from . import test_hr_payslip_fingerprint
+from . import test_hr_payslip_history
+from . import test_hr_payroll_run_metrics
+from . import test_hr_payroll_rule_profile
+from . import test_hr_payroll_benchmark
+from . import test_hr_payroll_query_budget
+from . import test_hr_electronic_payroll_batch
+from . import test_hr_electronic_payroll_signature
+from . import test_hr_electronic_payroll_outbox
+from . import test_hr_electronic_payroll_zip
+from . import test_hr_electronic_payroll_status
+from . import test_hr_electronic_payroll_storage
+from . import test_hr_electronic_payroll_schema
+from . import test_hr_electronic_payroll_monthly
+from . import test_hr_electronic_payroll_adjustment
+from . import test_hr_electronic_payroll_numbering
+from . import test_hr_electronic_payroll_log
+from . import test_hr_pila_totals
+from . import test_hr_pila_layout
+from . import test_hr_payslip_run_chunk
+from . import test_import_employee_wizard
\ No newline at end of file
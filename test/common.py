@@ -0,0 +1,230 @@
+import base64
+from datetime import datetime, time, timedelta, timezone
+
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.hazmat.primitives.serialization import pkcs12
+from cryptography.x509.oid import NameOID
+
+from odoo import fields
+from odoo.tests.common import TransactionCase
+
+# Jornada en UTC equivalente a 8:00-17:00 en Colombia (UTC-5)
+WORK_START = time(13, 0)
+WORK_HOURS = 8
+OVERTIME_START = time(22, 0)
+OVERTIME_HOURS = 2
+
+CERTIFICATE_PASSWORD = 'secreto'
+
+
+def make_pkcs12(password=CERTIFICATE_PASSWORD, common_name='Empresa Pruebas'):
+    """Certificado autofirmado en formato PKCS#12, como lo entrega la certificadora"""
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, common_name)])
+    now = datetime.now(timezone.utc)
+    certificate = (x509.CertificateBuilder()
+                   .subject_name(name).issuer_name(name)
+                   .public_key(key.public_key())
+                   .serial_number(x509.random_serial_number())
+                   .not_valid_before(now - timedelta(days=1))
+                   .not_valid_after(now + timedelta(days=365))
+                   .sign(key, hashes.SHA256()))
+    return pkcs12.serialize_key_and_certificates(
+        b'nomina', key, certificate, None, serialization.BestAvailableEncryption(password.encode()))
+
+
+class PayrollDataCase(TransactionCase):
+    """
+    Base de las pruebas que necesitan una compañía colombiana con empleados
+    afiliados, contratos vigentes, entradas de trabajo y un lote de nómina
+    """
+
+    _payroll_company_count = 0
+
+    @classmethod
+    def _create_payroll_company(cls, employee_count, date_from):
+        """
+        Crea una compañía de pruebas con una nómina por empleado. Uno de cada
+        tres empleados tiene horas extra y uno de cada diez una incapacidad.
+
+        :param employee_count: Número de empleados
+        :param date_from: Primer día del mes de nómina
+        :return: Diccionario con la compañía, empleados, contratos, lote y nóminas
+        """
+        PayrollDataCase._payroll_company_count += 1
+        offset = PayrollDataCase._payroll_company_count * 10 ** 5
+        date_from = fields.Date.to_date(date_from).replace(day=1)
+        date_to = (date_from + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+        legal = cls.env['hr.payroll.legal.parameter']._get_legal_values(date_to)
+        colombia = cls.env.ref('base.co')
+
+        company = cls.env['res.company'].create({
+            'name': 'Compañía Pruebas Nómina %s' % offset,
+            'country_id': colombia.id,
+            'vat': '900%06d' % offset,
+        })
+        company.partner_id.dian_fiscal_responsibilities = 'O-13'
+        env = cls.env(context=dict(cls.env.context, allowed_company_ids=[company.id]))
+
+        entities = {}
+        for key, name in [('eps', 'EPS Pruebas'), ('pension', 'AFP Pruebas'),
+                          ('severance', 'Cesantías Pruebas'), ('arl', 'ARL Pruebas')]:
+            entities[key] = env['res.partner'].create({
+                'name': name,
+                'is_company': True,
+                'company_id': company.id,
+            })
+        bank = env['res.bank'].create({'name': 'Banco Pruebas', 'country': colombia.id})
+
+        indexes = range(offset, offset + employee_count)
+        partners = env['res.partner'].create([{
+            'name': 'Empleado Pruebas %s' % index,
+            'company_id': company.id,
+        } for index in indexes])
+        accounts = env['res.partner.bank'].create([{
+            'partner_id': partner.id,
+            'acc_number': '%011d' % (10 ** 10 + index),
+            'bank_id': bank.id,
+            'company_id': company.id,
+        } for index, partner in zip(indexes, partners)])
+        employees = env['hr.employee'].create([{
+            'name': partner.name,
+            'first_name': 'Empleado',
+            'first_surname': 'Pruebas',
+            'second_surname': str(index),
+            'identification_type': 'CC',
+            'identification_id': str(10 ** 9 + index),
+            'private_street': 'Calle %s # 10-20' % (index % 100 + 1),
+            'private_city': 'Bogotá',
+            'private_country_id': colombia.id,
+            'company_id': company.id,
+            'work_contact_id': partner.id,
+            'bank_account_id': account.id,
+            'account_type': 'savings',
+            'eps_id': entities['eps'].id,
+            'pension_fund_id': entities['pension'].id,
+            'severance_fund_id': entities['severance'].id,
+            'arl_id': entities['arl'].id,
+            'arl_risk': '1',
+        } for index, partner, account in zip(indexes, partners, accounts)])
+
+        structure = cls.env.ref('nomina_colombia.hr_payroll_structure_col_standard')
+        multipliers = [1.0, 1.5, 2.0, 3.0, 5.0]
+        contracts = env['hr.contract'].create([{
+            'name': 'Contrato %s' % employee.name,
+            'employee_id': employee.id,
+            'company_id': company.id,
+            'wage': legal['smmlv'] * multipliers[position % len(multipliers)],
+            'state': 'open',
+            'date_start': date_from.replace(month=1, day=1),
+            'contract_term': 'indefinido',
+            'transport_allowance': multipliers[position % len(multipliers)] <= legal['transport_max_smmlv'],
+            'risk_level': '1',
+            'struct_id': structure.id,
+        } for position, employee in enumerate(employees)])
+
+        cls._create_work_entries(env, contracts, date_from, date_to)
+
+        payslip_run = env['hr.payslip.run'].create({
+            'name': 'Lote Pruebas %s' % date_from.strftime('%Y-%m'),
+            'date_start': date_from,
+            'date_end': date_to,
+            'company_id': company.id,
+        })
+        payslips = env['hr.payslip'].create([{
+            'name': 'Nómina %s' % contract.employee_id.name,
+            'employee_id': contract.employee_id.id,
+            'contract_id': contract.id,
+            'struct_id': structure.id,
+            'payslip_run_id': payslip_run.id,
+            'company_id': company.id,
+            'date_from': date_from,
+            'date_to': date_to,
+        } for contract in contracts])
+
+        return {
+            'company': company,
+            'employees': employees,
+            'contracts': contracts,
+            'payslip_run': payslip_run,
+            'payslips': payslips,
+            'date_from': date_from,
+            'date_to': date_to,
+        }
+
+    @classmethod
+    def _create_work_entries(cls, env, contracts, date_from, date_to):
+        attendance = cls.env.ref('hr_work_entry.work_entry_type_attendance')
+        overtime = cls.env.ref('nomina_colombia.work_entry_type_hed_col')
+        disability = cls.env.ref('nomina_colombia.work_entry_type_inc_col')
+        workdays = [
+            date_from + timedelta(days=offset)
+            for offset in range((date_to - date_from).days + 1)
+            if (date_from + timedelta(days=offset)).weekday() < 5
+        ]
+
+        def entry(contract, work_entry_type, day, start, hours):
+            date_start = datetime.combine(day, start)
+            return {
+                'name': work_entry_type.name,
+                'employee_id': contract.employee_id.id,
+                'contract_id': contract.id,
+                'company_id': contract.company_id.id,
+                'work_entry_type_id': work_entry_type.id,
+                'date_start': date_start,
+                'date_stop': date_start + timedelta(hours=hours),
+            }
+
+        vals_list = []
+        for position, contract in enumerate(contracts):
+            for day_index, day in enumerate(workdays):
+                work_entry_type = disability if position % 10 == 9 and day_index < 3 else attendance
+                vals_list.append(entry(contract, work_entry_type, day, WORK_START, WORK_HOURS))
+            if position % 3 == 2:
+                vals_list.append(entry(contract, overtime, workdays[-1], OVERTIME_START, OVERTIME_HOURS))
+        env['hr.work.entry'].create(vals_list)
+
+
+class ElectronicPayrollDataCase(PayrollDataCase):
+    """
+    Base de las pruebas de nómina electrónica: nóminas confirmadas, un
+    certificado de firma y documentos con todos los datos que exige
+    _validate_required_data
+    """
+
+    @classmethod
+    def _create_electronic_payroll_company(cls, employee_count, date_from, number_prefix=None):
+        """
+        Crea una compañía de pruebas con sus documentos de nómina electrónica en borrador
+
+        :param employee_count: Número de empleados
+        :param date_from: Primer día del mes de nómina
+        :param number_prefix: Prefijo de los números DIAN fijos de los documentos;
+                              sin prefijo, los documentos se numeran al generarse
+        :return: Diccionario de _create_payroll_company con el certificado y los documentos
+        """
+        data = cls._create_payroll_company(employee_count, date_from)
+        payslips = data['payslips']
+        payslips.compute_sheet()
+        payslips.action_payslip_done()
+
+        certificate = cls.env['hr.electronic.certificate'].create({
+            'name': 'Certificado %s' % data['company'].name,
+            'company_id': data['company'].id,
+            'certificate_file': base64.b64encode(make_pkcs12()),
+            'password': CERTIFICATE_PASSWORD,
+        })
+        documents = payslips._create_electronic_payroll_documents()
+        documents.write({
+            'certificate_id': certificate.id,
+            'software_id': 'SOFT-ID',
+            'software_security_code': 'PIN',
+        })
+        if number_prefix:
+            for index, document in enumerate(documents):
+                document.dian_number = '%s%s' % (number_prefix, index + 1)
+
+        data.update(certificate=certificate, documents=documents)
+        return data
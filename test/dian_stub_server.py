@@ -0,0 +1,220 @@
+"""
+Servidor local que simula el servicio web de nómina electrónica de la DIAN.
+
+Responde con el formato de DianResponse, registra cada solicitud y guarda
+los documentos recibidos por su CUDE. Permite simular fallas 5xx, rechazos y
+respuestas lentas para probar el despachador de la bandeja.
+
+Los paquetes ZIP (Content-Type application/zip) se responden como
+SendBillAsync: un ZipKey por paquete y la lista de archivos con errores. Las
+consultas GetStatus y GetStatusZip (sobre SOAP 1.2 con la acción en
+wsa:Action) responden el estado de un documento o de todos los documentos de
+un paquete; GetStatus responde 90 (TrackId no encontrado) para los
+documentos individuales que no ha recibido.
+"""
+import hashlib
+import io
+import threading
+import time
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from lxml import etree
+
+from odoo.addons.nomina_colombia.models.hr_electronic_payroll_status import (
+    DIAN_NOT_FOUND_CODE, SOAP_ACTION_GET_STATUS_ZIP)
+
+RESPONSE_TEMPLATE = (
+    '<?xml version="1.0" encoding="utf-8"?>'
+    '<DianResponse xmlns:b="http://schemas.datacontract.org/2004/07/DianResponse">'
+    '<b:StatusCode>%(code)s</b:StatusCode>'
+    '<b:StatusDescription>%(description)s</b:StatusDescription>'
+    '<b:XmlDocumentKey>%(key)s</b:XmlDocumentKey>'
+    '</DianResponse>'
+)
+
+ZIP_RESPONSE_TEMPLATE = (
+    '<?xml version="1.0" encoding="utf-8"?>'
+    '<UploadDocumentResponse'
+    ' xmlns:b="http://schemas.datacontract.org/2004/07/UploadDocumentResponse"'
+    ' xmlns:c="http://schemas.datacontract.org/2004/07/XmlParamsResponseTrackId">'
+    '<b:ErrorMessageList>%(errors)s</b:ErrorMessageList>'
+    '<b:ZipKey>%(zip_key)s</b:ZipKey>'
+    '</UploadDocumentResponse>'
+)
+
+ZIP_ERROR_TEMPLATE = (
+    '<c:XmlParamsResponseTrackId>'
+    '<c:XmlFileName>%(filename)s</c:XmlFileName>'
+    '<c:ProcessedMessage>Documento con errores en campos mandatorios</c:ProcessedMessage>'
+    '<c:Success>false</c:Success>'
+    '</c:XmlParamsResponseTrackId>'
+)
+
+STATUS_TEMPLATE = (
+    '<b:DianResponse>'
+    '<b:StatusCode>%(code)s</b:StatusCode>'
+    '<b:StatusDescription>%(description)s</b:StatusDescription>'
+    '<b:XmlDocumentKey>%(key)s</b:XmlDocumentKey>'
+    '<b:XmlFileName>%(filename)s</b:XmlFileName>'
+    '</b:DianResponse>'
+)
+
+STATUS_ZIP_TEMPLATE = (
+    '<?xml version="1.0" encoding="utf-8"?>'
+    '<GetStatusZipResult xmlns:b="http://schemas.datacontract.org/2004/07/DianResponse">'
+    '%(responses)s'
+    '</GetStatusZipResult>'
+)
+
+STATUS_DESCRIPTIONS = {
+    '00': 'Procesado Correctamente',
+    '98': 'En Proceso de Validación',
+    '99': 'Validación contiene errores en campos mandatorios',
+    DIAN_NOT_FOUND_CODE: 'TrackId no encontrado',
+}
+
+
+class DianStubServer:
+    """
+    Uso::
+
+        with DianStubServer(failures=2) as server:
+            items = [DispatchItem(outbox.id, server.url, payload, cude), ...]
+            ...
+            server.documents  # CUDE recibidos
+            server.requests   # CUDE, ZipKey o trackId de cada solicitud
+    """
+
+    def __init__(self, failures=0, delay=0.0, reject=False, invalid_files=(), processing=0,
+                 status_codes=None):
+        self.failures = failures
+        self.delay = delay
+        self.reject = reject
+        self.invalid_files = set(invalid_files)
+        # Consultas de estado que responden "en proceso" antes del estado final
+        self.processing = processing
+        # Código final por nombre de archivo o CUDE (por defecto 00 si el
+        # documento fue recibido)
+        self.status_codes = dict(status_codes or {})
+        self.requests = []
+        self.status_requests = []
+        self.documents = {}
+        self.packages = {}
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), self._make_handler())
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:%s/NominaElectronica' % self.server.server_address[1]
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+    def _respond_zip(self, zip_key, payload):
+        errors = []
+        with zipfile.ZipFile(io.BytesIO(payload)) as package:
+            with self.lock:
+                self.packages.setdefault(zip_key, package.namelist())
+            for filename in package.namelist():
+                if filename in self.invalid_files:
+                    errors.append(ZIP_ERROR_TEMPLATE % {'filename': filename})
+                    continue
+                with self.lock:
+                    self.documents.setdefault(filename, package.read(filename))
+        return 200, (ZIP_RESPONSE_TEMPLATE % {'errors': ''.join(errors), 'zip_key': zip_key}).encode()
+
+    def _status_response(self, filename, key, processing):
+        if processing:
+            code = '98'
+        elif filename in self.invalid_files:
+            code = '99'
+        elif filename in self.status_codes or key in self.status_codes:
+            code = self.status_codes.get(filename) or self.status_codes.get(key)
+        elif filename or key in self.documents:
+            code = '00'
+        else:
+            code = DIAN_NOT_FOUND_CODE
+        return STATUS_TEMPLATE % {
+            'code': code, 'description': STATUS_DESCRIPTIONS.get(code, ''), 'key': key, 'filename': filename}
+
+    def _respond_status(self, track_id, soap_action):
+        with self.lock:
+            self.status_requests.append(track_id)
+            processing = self.processing > 0
+            if processing:
+                self.processing -= 1
+        if soap_action == SOAP_ACTION_GET_STATUS_ZIP:
+            responses = []
+            for filename in self.packages.get(track_id, []):
+                content = self.documents.get(filename)
+                key = etree.fromstring(content).findtext('{*}CUDE') if content else ''
+                responses.append(self._status_response(filename, key, processing))
+            return 200, (STATUS_ZIP_TEMPLATE % {'responses': ''.join(responses)}).encode()
+        response = self._status_response('', track_id, processing)
+        return 200, ('<?xml version="1.0" encoding="utf-8"?>' + response.replace(
+            '<b:DianResponse>',
+            '<b:DianResponse xmlns:b="http://schemas.datacontract.org/2004/07/DianResponse">', 1)).encode()
+
+    def _respond(self, key, payload, content_type=None, soap_action=None):
+        with self.lock:
+            self.requests.append(key)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            failing = self.failures > 0
+            if failing:
+                self.failures -= 1
+        try:
+            if self.delay:
+                time.sleep(self.delay)
+            if failing:
+                return 503, b'Servicio no disponible'
+            if soap_action:
+                return self._respond_status(key, soap_action)
+            if content_type == 'application/zip':
+                return self._respond_zip(key, payload)
+            with self.lock:
+                if key not in self.documents:
+                    self.documents[key] = payload
+            code, description = ('99', 'Documento con errores') if self.reject else ('00', 'Procesado Correctamente')
+            return 200, (RESPONSE_TEMPLATE % {'code': code, 'description': description, 'key': key}).encode()
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+    def _make_handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                payload = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                content_type = self.headers.get('Content-Type', '')
+                soap_action = None
+                if content_type.startswith('application/soap+xml'):
+                    envelope = etree.fromstring(payload)
+                    soap_action = envelope.findtext('{*}Header/{*}Action')
+                    key = envelope.findtext('.//{*}trackId')
+                elif content_type == 'application/zip':
+                    key = hashlib.sha1(payload).hexdigest()
+                else:
+                    key = etree.fromstring(payload).findtext('{*}CUDE')
+                status, body = stub._respond(key, payload, content_type, soap_action)
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/xml')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,118 @@
+from datetime import date
+
+from lxml import etree
+
+from odoo.tests.common import tagged
+
+from odoo.addons.nomina_colombia.models import hr_electronic_payroll_concepts as concepts
+from odoo.addons.nomina_colombia.models.hr_electronic_payroll_schema import validate_document
+from odoo.addons.nomina_colombia.models.hr_electronic_payroll_xml import nomina_tag
+
+from .common import ElectronicPayrollDataCase
+
+SALARY = 'Devengados/Basico/SueldoTrabajado'
+
+
+@tagged('post_install', '-at_install')
+class TestHrElectronicPayrollAdjustment(ElectronicPayrollDataCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super(TestHrElectronicPayrollAdjustment, cls).setUpClass()
+        cls.env['ir.config_parameter'].sudo().set_param('nomina_colombia.electronic_payroll_grouping', 'month')
+        data = cls._create_electronic_payroll_company(4, '2024-09-01', number_prefix='NEJ')
+        cls.company = data['company']
+        cls.payslips = data['payslips']
+        cls.documents = data['documents']
+        cls.documents._generate_batch()
+        cls.documents.write({'state': 'accepted'})
+
+    def _generate_notes(self, **kwargs):
+        return self.env['hr.electronic.payroll']._generate_adjustment_notes(
+            self.company, date(2024, 9, 1), **kwargs)
+
+    def _raise_salary(self, document, amount):
+        line = document.payslip_ids.line_ids.filtered(lambda l: l.code == 'BASIC')
+        line.amount += amount
+
+    def test_01_diff_concepts(self):
+        old = {SALARY: 1300000.0, 'Deducciones/Salud/Deduccion': 52000.0}
+        self.assertEqual(concepts.diff_concepts(old, dict(old)), {})
+        new = dict(old, **{SALARY: 1400000.0, 'Devengados/Primas/Pago': 10.0})
+        self.assertEqual(concepts.diff_concepts(old, new), {
+            SALARY: (1300000.0, 1400000.0),
+            'Devengados/Primas/Pago': (0.0, 10.0),
+        })
+        self.assertEqual(concepts.diff_concepts(old, dict(old, **{SALARY: 1300000.004})), {})
+
+    def test_02_no_changes_no_notes(self):
+        self.assertFalse(self._generate_notes(send=False))
+
+    def test_03_replacement_only_where_values_changed(self):
+        original = self.documents[0]
+        self._raise_salary(original, 100000.0)
+        notes = self._generate_notes(send=False)
+
+        self.assertEqual(len(notes), 1)
+        self.assertEqual(notes.employee_id, original.employee_id)
+        self.assertEqual(notes.dian_operation_type, '20')
+        self.assertTrue(notes.is_adjustment_note)
+        self.assertEqual(notes.original_electronic_payroll_id, original)
+        self.assertEqual(notes.state, 'generated')
+        self.assertAlmostEqual(notes.concept_values[SALARY], original.concept_values[SALARY] + 100000.0, places=2)
+
+        signed = notes._get_signed_payloads()[notes.id]
+        root = etree.fromstring(signed)
+        predecessor = root.find(nomina_tag('ReemplazandoPredecesor'))
+        self.assertEqual(predecessor.get('CUNEPred'), original.dian_cude)
+        self.assertEqual(predecessor.get('NumeroPred'), original.dian_number)
+
+    def test_04_deletion_when_payslips_removed(self):
+        original = self.documents[1]
+        original.payslip_ids.write({'state': 'cancel'})
+        notes = self._generate_notes(send=False)
+
+        self.assertEqual(len(notes), 1)
+        self.assertEqual(notes.dian_operation_type, '30')
+        self.assertEqual(notes.concept_values, original.concept_values)
+        self.assertEqual(notes.payslip_ids, original.payslip_ids)
+
+    def test_05_pending_note_not_duplicated(self):
+        self._raise_salary(self.documents[0], 50000.0)
+        self.assertEqual(len(self._generate_notes(send=False)), 1)
+        self.assertFalse(self._generate_notes(send=False))
+
+    def test_06_accepted_note_becomes_reference(self):
+        self._raise_salary(self.documents[0], 50000.0)
+        note = self._generate_notes(send=False)
+        note.state = 'accepted'
+        self.assertFalse(self._generate_notes(send=False))
+
+        self._raise_salary(self.documents[0], 25000.0)
+        second = self._generate_notes(send=False)
+        self.assertEqual(second.original_electronic_payroll_id, note)
+
+    def test_07_notes_valid_and_enqueued(self):
+        for document in self.documents[:3]:
+            self._raise_salary(document, 10000.0)
+        notes = self._generate_notes()
+
+        self.assertEqual(len(notes), 3)
+        for note in notes:
+            self.assertEqual(validate_document(note._get_signed_payloads()[note.id]), [])
+        entries = self.env['hr.electronic.payroll.outbox'].search([('electronic_payroll_id', 'in', notes.ids)])
+        self.assertEqual(entries.electronic_payroll_id, notes)
+        self.assertEqual(set(entries.mapped('state')), {'pending'})
+
+    def test_08_deletion_note_only_references_predecessor(self):
+        original = self.documents[1]
+        original.payslip_ids.write({'state': 'cancel'})
+        note = self._generate_notes(send=False)
+
+        signed = note._get_signed_payloads()[note.id]
+        root = etree.fromstring(signed)
+        predecessor = root.find(nomina_tag('EliminandoPredecesor'))
+        self.assertEqual(predecessor.get('CUNEPred'), original.dian_cude)
+        for node in ('Trabajador', 'Pago', 'Devengados', 'Deducciones', 'ComprobanteTotal'):
+            self.assertIsNone(root.find(nomina_tag(node)), node)
+        self.assertEqual(validate_document(signed), [])
@@ -0,0 +1,99 @@
+import base64
+
+from lxml import etree
+
+from odoo.tests.common import tagged
+
+from odoo.addons.nomina_colombia.models.hr_electronic_payroll_xml import (
+    NOMINA_NAMESPACE, NominaIndividualBuilder, nomina_tag)
+
+from .common import ElectronicPayrollDataCase
+
+
+@tagged('post_install', '-at_install')
+class TestHrElectronicPayrollBatch(ElectronicPayrollDataCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super(TestHrElectronicPayrollBatch, cls).setUpClass()
+        data = cls._create_electronic_payroll_company(5, '2024-09-01', number_prefix='NE')
+        cls.company = data['company']
+        cls.payslips = data['payslips']
+        cls.certificate = data['certificate']
+        cls.documents = data['documents']
+
+    def test_01_documents_created_in_batch(self):
+        self.assertEqual(len(self.documents), len(self.payslips))
+        self.assertEqual(self.payslips.electronic_payroll_id, self.documents)
+        self.assertEqual(set(self.payslips.mapped('electronic_payroll_status')), {'generated'})
+
+    def test_02_builder_single_serialization(self):
+        """El constructor produce el documento con el espacio de nombres DIAN"""
+        builder = NominaIndividualBuilder(self.company)
+        document = self.documents[0]
+        content = builder.tostring(builder.build(document))
+
+        self.assertTrue(content.startswith(b"<?xml version='1.0' encoding='UTF-8'?>"))
+        root = etree.fromstring(content)
+        self.assertEqual(root.tag, nomina_tag('NominaIndividual'))
+        self.assertEqual(root.nsmap[None], NOMINA_NAMESPACE)
+        namespaces = {'n': NOMINA_NAMESPACE}
+        self.assertEqual(
+            root.findtext('n:Trabajador/n:NumeroDocumento', namespaces=namespaces),
+            document.employee_identification or '')
+        self.assertEqual(
+            root.findtext('n:Devengados/n:Basico/n:SueldoTrabajado', namespaces=namespaces),
+            str(document.payslip_wage))
+
+    def test_03_single_document_matches_builder(self):
+        document = self.documents[0]
+        builder = NominaIndividualBuilder(self.company)
+        self.assertEqual(
+            document._generate_xml(),
+            builder.tostring(builder.build(document), pretty_print=True))
+
+    def test_04_batch_writes_signed_documents_to_filestore(self):
+        documents = self.documents._generate_batch()
+
+        self.assertEqual(documents, self.documents)
+        self.assertEqual(set(documents.mapped('state')), {'generated'})
+        attachments = self.env['ir.attachment'].sudo().search([
+            ('res_model', '=', 'hr.electronic.payroll'),
+            ('res_field', '=', 'xml_signed_file'),
+            ('res_id', 'in', documents.ids),
+        ])
+        self.assertEqual(len(attachments), len(documents))
+        for document in documents:
+            self.assertTrue(document.dian_cude)
+            self.assertTrue(document.can_be_sent)
+            self.assertFalse(document.xml_file, "El lote no guarda la copia sin firmar")
+            root = etree.fromstring(base64.b64decode(document.xml_signed_file))
+            self.assertEqual(root.findtext(nomina_tag('CUDE')), document.dian_cude)
+            self.assertIsNotNone(root.find('.//{http://www.w3.org/2000/09/xmldsig#}SignatureValue'))
+        self.assertEqual(
+            len(self.env['hr.electronic.payroll.log'].search([
+                ('electronic_payroll_id', 'in', documents.ids), ('action_type', '=', 'generate')])),
+            len(documents))
+
+    def test_05_batch_skips_generated_documents(self):
+        self.documents[:2]._generate_batch()
+        documents = self.documents._generate_batch()
+        self.assertEqual(documents, self.documents[2:])
+
+    def test_06_payslip_run_generates_batch(self):
+        run = self.payslips.payslip_run_id
+        run.action_generate_electronic_batch()
+        self.assertEqual(set(self.documents.mapped('state')), {'generated'})
+
+    def test_07_missing_data_skips_document(self):
+        """Un documento sin datos requeridos queda en borrador sin detener el lote"""
+        failing = self.documents[1]
+        failing.employee_id.private_street = False
+        documents = self.documents._generate_batch()
+
+        self.assertEqual(documents, self.documents - failing)
+        self.assertEqual(failing.state, 'draft')
+        self.assertFalse(failing.dian_cude)
+        self.assertIn('dirección particular', failing.xml_validation_errors)
+        self.assertTrue(self.env['hr.electronic.payroll.log'].search_count([
+            ('electronic_payroll_id', '=', failing.id), ('action_type', '=', 'error')]))
@@ -0,0 +1,124 @@
+from odoo.tests.common import tagged
+
+from .common import ElectronicPayrollDataCase
+
+
+@tagged('post_install', '-at_install')
+class TestHrElectronicPayrollLog(ElectronicPayrollDataCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super(TestHrElectronicPayrollLog, cls).setUpClass()
+        data = cls._create_electronic_payroll_company(4, '2024-09-01', number_prefix='NEL')
+        cls.company = data['company']
+        cls.employee = data['employees'][0]
+        cls.documents = data['documents']
+        cls.Log = cls.env['hr.electronic.payroll.log']
+        cls.Message = cls.env['mail.message']
+
+    def _enable_document_notes(self):
+        self.env['ir.config_parameter'].sudo().set_param('nomina_colombia.electronic_payroll_document_notes', 'True')
+
+    def _logs(self):
+        return self.Log.search([('electronic_payroll_id', 'in', self.documents.ids)])
+
+    def _messages(self, records):
+        return self.Message.search([('model', '=', records._name), ('res_id', 'in', records.ids)])
+
+    def test_01_events_flushed_at_exit(self):
+        self._enable_document_notes()
+        messages_before = self._messages(self.documents)
+        with self.documents._buffered_log('Prueba'):
+            self.documents._create_log('generate', 'Generado')
+            self.documents._create_log('sign', 'Firmado')
+            self.assertFalse(self._logs())
+
+        logs = self._logs()
+        self.assertEqual(len(logs), 2 * len(self.documents))
+        self.assertEqual(set(logs.mapped('action_type')), {'generate', 'sign'})
+
+        # Una sola nota por documento con todos sus eventos
+        messages = self._messages(self.documents) - messages_before
+        self.assertEqual(len(messages), len(self.documents))
+        for message in messages:
+            self.assertIn('Generado', message.body)
+            self.assertIn('Firmado', message.body)
+        self.assertFalse(messages.notification_ids)
+
+    def test_02_without_buffer_logs_immediately(self):
+        self._enable_document_notes()
+        document = self.documents[0]
+        document._create_log('other', 'Inmediato')
+        self.assertEqual(self._logs().mapped('description'), ['Inmediato'])
+        self.assertIn('Inmediato', self._messages(document)[0].body)
+
+    def test_03_nested_buffers_flush_once(self):
+        self._enable_document_notes()
+        with self.documents._buffered_log('Externo'):
+            with self.documents._buffered_log('Interno'):
+                self.documents[0]._create_log('generate', 'Interno')
+            self.assertFalse(self._logs())
+            self.documents[0]._create_log('sign', 'Externo')
+        self.assertEqual(len(self._logs()), 2)
+        self.assertEqual(len(self._messages(self.documents[0]).filtered(
+            lambda m: 'Interno' in m.body and 'Externo' in m.body)), 1)
+
+    def test_04_failed_operation_discards_events(self):
+        with self.assertRaises(ValueError):
+            with self.documents._buffered_log('Fallida'):
+                self.documents._create_log('generate', 'Generado')
+                raise ValueError()
+        self.assertFalse(self._logs())
+        self.documents[0]._create_log('other', 'Después')
+        self.assertEqual(len(self._logs()), 1)
+
+    def test_05_run_summary(self):
+        messages_before = self._messages(self.employee)
+        with self.documents._buffered_log('Lote de prueba', run=self.employee):
+            self.documents._create_log('generate', 'Generado')
+            self.documents[0]._create_log('error', 'Error')
+        summary = self._messages(self.employee) - messages_before
+        self.assertEqual(len(summary), 1)
+        self.assertIn('Lote de prueba', summary.body)
+        self.assertIn('%s documentos' % len(self.documents), summary.body)
+
+    def test_06_batch_generation_single_note_per_document(self):
+        self._enable_document_notes()
+        messages_before = self._messages(self.documents)
+        self.documents._generate_batch()
+        messages = (self._messages(self.documents) - messages_before).filtered(
+            lambda m: 'Generación y firma por lote' in m.body)
+        self.assertEqual(len(messages), len(self.documents))
+        self.assertEqual(len(self._logs().filtered(lambda l: l.action_type == 'generate')), len(self.documents))
+
+    def test_07_document_notes_opt_in(self):
+        messages_before = self._messages(self.documents)
+        with self.documents._buffered_log('Sin notas'):
+            self.documents._create_log('generate', 'Generado')
+        self.documents[0]._create_log('other', 'Inmediato')
+        self.assertEqual(len(self._logs()), len(self.documents) + 1)
+        self.assertEqual(self._messages(self.documents), messages_before)
+
+    def test_08_cron_summary_on_run_or_company(self):
+        target = self.documents[0]._get_log_summary_target()
+        for document in self.documents:
+            self.assertEqual(document._get_log_summary_target(), target)
+        messages_before = self._messages(target)
+        with self.documents._buffered_log('Consulta de prueba', summary=True):
+            self.documents._create_log('send', 'Aceptado')
+        summary = self._messages(target) - messages_before
+        self.assertEqual(len(summary), 1)
+        self.assertIn('Consulta de prueba', summary.body)
+        self.assertIn('%s documentos' % len(self.documents), summary.body)
+        self.assertFalse(self._messages(self.documents).filtered(lambda m: 'Consulta de prueba' in m.body))
+
+    def test_09_rolled_back_savepoint_discards_events(self):
+        with self.documents._buffered_log('Savepoint'):
+            self.documents[0]._create_log('generate', 'Conservado')
+            with self.assertRaises(ValueError):
+                with self.documents._log_savepoint():
+                    self.documents[1]._create_log('pdf', 'Revertido')
+                    raise ValueError()
+            with self.documents._log_savepoint():
+                self.documents[2]._create_log('pdf', 'Confirmado')
+        self.assertEqual(sorted(self._logs().mapped('description')), ['Confirmado', 'Conservado'])
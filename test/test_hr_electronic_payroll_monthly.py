@@ -0,0 +1,171 @@
+from datetime import date
+
+from lxml import etree
+
+from odoo.exceptions import UserError
+from odoo.tests.common import tagged
+
+from odoo.addons.nomina_colombia.models import hr_electronic_payroll_concepts as concepts
+from odoo.addons.nomina_colombia.models.hr_electronic_payroll_schema import validate_document
+from odoo.addons.nomina_colombia.models.hr_electronic_payroll_xml import NominaIndividualBuilder, nomina_tag
+
+from .common import PayrollDataCase
+
+
+@tagged('post_install', '-at_install')
+class TestHrElectronicPayrollMonthly(PayrollDataCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super(TestHrElectronicPayrollMonthly, cls).setUpClass()
+        data = cls._create_payroll_company(3, '2024-09-01')
+        cls.company = data['company']
+        cls.employees = data['employees']
+
+        # Nómina quincenal: primera y segunda quincena de cada empleado
+        first = data['payslips']
+        first.write({'date_to': date(2024, 9, 15)})
+        second = cls.env['hr.payslip'].create([{
+            'name': 'Segunda quincena %s' % payslip.employee_id.name,
+            'employee_id': payslip.employee_id.id,
+            'contract_id': payslip.contract_id.id,
+            'struct_id': payslip.struct_id.id,
+            'company_id': cls.company.id,
+            'date_from': date(2024, 9, 16),
+            'date_to': date(2024, 9, 30),
+        } for payslip in first])
+        cls.payslips = first | second
+        cls.payslips.compute_sheet()
+        cls.payslips.action_payslip_done()
+        cls.env['ir.config_parameter'].sudo().set_param('nomina_colombia.electronic_payroll_grouping', 'month')
+
+    def _line_total(self, payslips, code):
+        return sum(payslips.line_ids.filtered(lambda line: line.code == code).mapped('total'))
+
+    def test_01_rule_concept_map(self):
+        values = {}
+        self.assertEqual(concepts.add_rule_total(values, 'BASIC', 650000.0), 'Devengados/Basico/SueldoTrabajado')
+        concepts.add_rule_total(values, 'BASIC', 650000.0)
+        concepts.add_rule_total(values, 'HEALTH', -52000.0)
+        self.assertIsNone(concepts.add_rule_total(values, 'CES_PROV', 108000.0))
+        self.assertEqual(values, {
+            'Devengados/Basico/SueldoTrabajado': 1300000.0,
+            'Deducciones/Salud/Deduccion': 52000.0,
+        })
+        self.assertEqual(concepts.concept_totals(values), (1300000.0, 52000.0))
+
+    def test_02_one_document_per_employee(self):
+        documents = self.payslips._create_electronic_payroll_documents()
+
+        self.assertEqual(len(documents), len(self.employees))
+        self.assertEqual(documents.employee_id, self.employees)
+        self.assertEqual(self.payslips.electronic_payroll_id, documents)
+        for document in documents:
+            employee_slips = self.payslips.filtered(lambda p: p.employee_id == document.employee_id)
+            self.assertEqual(document.payslip_ids, employee_slips)
+            self.assertEqual(document.period_start, date(2024, 9, 1))
+            self.assertEqual(document.period_end, date(2024, 9, 30))
+
+    def test_03_concepts_sum_all_payslips(self):
+        documents = self.payslips._create_electronic_payroll_documents()
+        for document in documents:
+            payslips = document.payslip_ids
+            values = document.concept_values
+            self.assertAlmostEqual(values['Devengados/Basico/SueldoTrabajado'], self._line_total(payslips, 'BASIC'), places=2)
+            self.assertAlmostEqual(values['Deducciones/Salud/Deduccion'], -self._line_total(payslips, 'HEALTH'), places=2)
+            self.assertAlmostEqual(values['Deducciones/FondoPension/Deduccion'], -self._line_total(payslips, 'PENSION'), places=2)
+            self.assertEqual(values[concepts.WORKED_DAYS_CONCEPT],
+                             min(sum(payslips.mapped('worked_days')), concepts.MAX_WORKED_DAYS))
+
+    def test_04_aggregation_is_idempotent(self):
+        Document = self.env['hr.electronic.payroll']
+        documents = Document._aggregate_month(self.company, date(2024, 9, 20))
+        again = Document._aggregate_month(self.company, date(2024, 9, 1))
+        self.assertEqual(again, documents)
+
+        # Un documento ya generado no se vuelve a agregar ni se duplica
+        documents[0].state = 'generated'
+        again = Document._aggregate_month(self.company, date(2024, 9, 1))
+        self.assertEqual(again, documents - documents[0])
+        self.assertEqual(Document.search_count([('company_id', '=', self.company.id)]), len(documents))
+
+    def test_05_builder_output_is_valid(self):
+        documents = self.payslips._create_electronic_payroll_documents()
+        builder = NominaIndividualBuilder(self.company)
+        for document in documents:
+            content = builder.tostring(builder.build(document))
+            self.assertEqual(validate_document(content), [])
+
+            root = etree.fromstring(content)
+            devengados, deducciones = concepts.concept_totals(document.concept_values)
+            self.assertEqual(root.findtext(nomina_tag('DevengadosTotal')), '%.2f' % devengados)
+            self.assertEqual(root.findtext(nomina_tag('ComprobanteTotal')), '%.2f' % (devengados - deducciones))
+
+    def test_06_payslip_grouping(self):
+        self.env['ir.config_parameter'].sudo().set_param('nomina_colombia.electronic_payroll_grouping', 'payslip')
+        documents = self.payslips._create_electronic_payroll_documents()
+        self.assertEqual(len(documents), len(self.payslips))
+        self.assertFalse(documents.payslip_ids)
+        for document in documents:
+            self.assertAlmostEqual(document.concept_values['Devengados/Basico/SueldoTrabajado'],
+                                   self._line_total(document.payslip_id, 'BASIC'), places=2)
+
+    def test_07_overtime_reported_by_type(self):
+        """Cada tipo de hora extra o recargo se reporta en su propio nodo DIAN"""
+        values = {}
+        for code in ('HED', 'HEO', 'HEN', 'HENO', 'HEDO', 'HEDN', 'HENN'):
+            concepts.add_rule_total(values, code, 10000.0)
+        self.assertEqual(values, {
+            'Devengados/HEDs/HED/Pago': 20000.0,
+            'Devengados/HENs/HEN/Pago': 10000.0,
+            'Devengados/HRNs/HRN/Pago': 10000.0,
+            'Devengados/HEDDFs/HEDDF/Pago': 10000.0,
+            'Devengados/HENDFs/HENDF/Pago': 10000.0,
+            'Devengados/HRNDFs/HRNDF/Pago': 10000.0,
+        })
+
+        document = self.payslips._create_electronic_payroll_documents()[0]
+        document.concept_values = dict(document.concept_values, **values)
+        builder = NominaIndividualBuilder(self.company)
+        content = builder.tostring(builder.build(document))
+        self.assertEqual(validate_document(content), [])
+        devengados = etree.fromstring(content).find(nomina_tag('Devengados'))
+        self.assertEqual(
+            [etree.QName(node).localname for node in devengados if etree.QName(node).localname.startswith('H')],
+            ['HEDs', 'HENs', 'HRNs', 'HEDDFs', 'HENDFs', 'HRNDFs'])
+
+    def test_08_overtime_and_novelty_codes_mapped(self):
+        """Los códigos de las entradas de trabajo, incapacidades y licencias tienen nodo DIAN"""
+        values = {}
+        for code in ('HEFD', 'HEFN', 'RN', 'RF', 'RNF', 'DISABILITY', 'LEAVE'):
+            self.assertTrue(concepts.add_rule_total(values, code, 10000.0), code)
+        self.assertEqual(values[concepts.DISABILITY_CONCEPT], 10000.0)
+        self.assertEqual(concepts.unmapped_rule_codes(['BASIC', 'NET', 'CES_PROV', 'BONO']), ['BONO'])
+
+    def test_09_unmapped_rule_raises(self):
+        payslip = self.payslips[0]
+        line = payslip.line_ids[0]
+        line.copy({'slip_id': payslip.id, 'code': 'BONO_SIN_CONCEPTO'})
+        with self.assertRaisesRegex(UserError, 'BONO_SIN_CONCEPTO'):
+            self.env['hr.electronic.payroll']._aggregate_month(self.company, date(2024, 9, 1))
+
+    def test_10_late_fortnight_flagged_for_adjustment(self):
+        """La quincena confirmada después de generar el documento queda pendiente de ajuste"""
+        Document = self.env['hr.electronic.payroll']
+        second = self.payslips.filtered(lambda p: p.date_from.day == 16)
+        second.write({'state': 'draft'})
+        documents = Document._aggregate_month(self.company, date(2024, 9, 1))
+        documents.write({'state': 'generated'})
+
+        second.write({'state': 'done'})
+        self.assertFalse(Document._aggregate_month(self.company, date(2024, 9, 1)))
+        for document in documents:
+            late = second.filtered(lambda p: p.employee_id == document.employee_id)
+            self.assertEqual(document.pending_payslip_ids, late)
+            self.assertNotIn(late, document.payslip_ids)
+            self.assertTrue(document.log_ids.filtered(lambda log: late.name in log.description))
+
+        # Una segunda agregación no vuelve a registrar las mismas nóminas
+        logs = documents.log_ids
+        Document._aggregate_month(self.company, date(2024, 9, 1))
+        self.assertEqual(documents.log_ids, logs)
@@ -0,0 +1,95 @@
+from odoo.exceptions import UserError
+from odoo.tests.common import tagged
+
+from .common import ElectronicPayrollDataCase
+
+
+@tagged('post_install', '-at_install')
+class TestHrElectronicPayrollNumbering(ElectronicPayrollDataCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super(TestHrElectronicPayrollNumbering, cls).setUpClass()
+        data = cls._create_electronic_payroll_company(5, '2024-09-01')
+        cls.company = data['company']
+        cls.documents = data['documents']
+        cls.documents.dian_prefix = 'NE'
+        cls.sequence = cls.env.ref('nomina_colombia.seq_dian_electronic_payroll')
+        cls.Block = cls.env['hr.electronic.payroll.number.block']
+        cls.Unused = cls.env['hr.electronic.payroll.number.unused']
+
+    def _unused(self, blocks):
+        self.env.flush_all()
+        return self.Unused.search([('block_id', 'in', blocks.ids)])
+
+    def test_01_block_reserved_in_one_step(self):
+        number_next = self.sequence.number_next_actual
+        numbered = self.documents._assign_dian_numbers()
+
+        self.assertEqual(numbered, self.documents)
+        block = self.documents.dian_number_block_id
+        self.assertEqual(len(block), 1)
+        self.assertEqual(block.number_from, number_next)
+        self.assertEqual(block.size, len(self.documents))
+        self.assertEqual(self.sequence.number_next_actual, number_next + len(self.documents))
+
+        consecutives = sorted(self.documents.mapped('dian_consecutive'))
+        self.assertEqual(consecutives, list(range(block.number_from, block.number_to + 1)))
+        for document in self.documents:
+            self.assertEqual(document.dian_number, 'NE%s' % document.dian_consecutive)
+
+    def test_02_numbered_documents_keep_their_number(self):
+        self.documents[0]._assign_dian_numbers()
+        number = self.documents[0].dian_number
+        self.documents._assign_dian_numbers()
+        self.assertEqual(self.documents[0].dian_number, number)
+        self.assertEqual(len(self.documents.dian_number_block_id), 2)
+        self.assertEqual(len(set(self.documents.mapped('dian_number'))), len(self.documents))
+
+    def test_03_blocks_do_not_overlap(self):
+        first = self.Block._reserve(self.company, 'NE', 3)
+        second = self.Block._reserve(self.company, 'NE', 2)
+        self.assertEqual(second.number_from, first.number_to + 1)
+
+    def test_04_unused_numbers_report(self):
+        self.documents._assign_dian_numbers()
+        block = self.documents.dian_number_block_id
+        self.assertFalse(self._unused(block))
+
+        cancelled = self.documents[2]
+        cancelled.action_cancel()
+        unused = self._unused(block)
+        self.assertEqual(unused.mapped('number'), [cancelled.dian_consecutive])
+        self.assertEqual(unused.reason, 'cancelled')
+        self.assertEqual(unused.electronic_payroll_id, cancelled)
+
+        # Bloque reservado cuya transacción no alcanzó a asignar los números
+        spare = self.Block._reserve(self.company, 'NE', 3)
+        unused = self._unused(spare)
+        self.assertEqual(unused.mapped('number'), list(range(spare.number_from, spare.number_to + 1)))
+        self.assertEqual(set(unused.mapped('reason')), {'unassigned'})
+
+    def test_05_no_gap_sequence(self):
+        self.sequence.implementation = 'no_gap'
+        number_next = self.sequence.number_next
+        block = self.Block._reserve(self.company, 'NE', 3)
+        self.assertEqual(block.number_from, number_next)
+        self.assertEqual(self.sequence.number_next, number_next + 3)
+        self.assertEqual(self.Block._reserve(self.company, 'NE', 1).number_from, block.number_to + 1)
+
+    def test_06_batch_generation_numbers_in_block(self):
+        generated = self.documents._generate_batch()
+        self.assertEqual(generated, self.documents)
+        self.assertEqual(len(self.documents.dian_number_block_id), 1)
+        self.assertTrue(all(self.documents.mapped('dian_number')))
+
+    def test_07_sequence_without_date_ranges(self):
+        self.sequence.use_date_range = True
+        with self.assertRaises(UserError):
+            self.documents._assign_dian_numbers()
+
+    def test_08_next_by_id_continues_after_block(self):
+        block = self.Block._reserve(self.company, 'NE', 4)
+        self.assertEqual(self.sequence.number_increment, 1)
+        self.assertEqual(self.sequence.next_by_id(), self.sequence.get_next_char(block.number_to + 1))
+        self.assertEqual(self.Block._reserve(self.company, 'NE', 1).number_from, block.number_to + 2)
@@ -0,0 +1,167 @@
+import base64
+from unittest.mock import patch
+
+from odoo import fields
+from odoo.tests.common import tagged
+
+from odoo.addons.nomina_colombia.models.hr_electronic_payroll_outbox import OUTBOX_MAX_ROUNDS
+
+from .common import ElectronicPayrollDataCase
+from .dian_stub_server import DianStubServer
+
+
+@tagged('post_install', '-at_install')
+class TestHrElectronicPayrollOutbox(ElectronicPayrollDataCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super(TestHrElectronicPayrollOutbox, cls).setUpClass()
+        data = cls._create_electronic_payroll_company(6, '2024-09-01', number_prefix='NEB')
+        cls.documents = data['documents']
+        cls.documents._generate_batch()
+
+        ICPSudo = cls.env['ir.config_parameter'].sudo()
+        ICPSudo.set_param('nomina_colombia.dian_send_concurrency', 3)
+        ICPSudo.set_param('nomina_colombia.dian_send_max_attempts', 3)
+        ICPSudo.set_param('nomina_colombia.dian_send_mode', 'single')
+        cls.Outbox = cls.env['hr.electronic.payroll.outbox']
+
+    def _dispatch(self, server):
+        """Despacha la bandeja contra el servidor simulado, sin confirmar la transacción"""
+        Document = type(self.env['hr.electronic.payroll'])
+        with patch.object(Document, '_get_dian_url', return_value=server.url), \
+                patch.object(Document, 'action_generate_pdf', return_value=True), \
+                patch('odoo.addons.nomina_colombia.models.hr_electronic_payroll_dispatcher.backoff_delay',
+                      return_value=0.0):
+            entries = self.Outbox._claim_batch()
+            entries._dispatch()
+        return entries
+
+    def test_01_enqueue_is_idempotent_by_cude(self):
+        entries = self.Outbox._enqueue(self.documents)
+        self.assertEqual(len(entries), len(self.documents))
+        self.assertEqual(set(entries.mapped('cude')), set(self.documents.mapped('dian_cude')))
+        self.assertFalse(self.Outbox._enqueue(self.documents))
+
+    def test_02_dispatch_accepted(self):
+        self.Outbox._enqueue(self.documents)
+        with DianStubServer() as server:
+            entries = self._dispatch(server)
+
+        self.assertEqual(len(entries), len(self.documents))
+        self.assertEqual(set(entries.mapped('state')), {'done'})
+        self.assertEqual(set(self.documents.mapped('state')), {'accepted'})
+        self.assertEqual(set(server.documents), set(self.documents.mapped('dian_cude')))
+        self.assertEqual(self.documents[0].dian_transaction_id, self.documents[0].dian_cude)
+        # El cuerpo enviado es el XML firmado tal cual está en el filestore
+        self.assertEqual(
+            server.documents[self.documents[0].dian_cude],
+            base64.b64decode(self.documents[0].xml_signed_file))
+
+    def test_03_server_errors_retried_with_backoff(self):
+        self.Outbox._enqueue(self.documents)
+        with DianStubServer(failures=2) as server:
+            entries = self._dispatch(server)
+
+        self.assertEqual(set(entries.mapped('state')), {'done'})
+        self.assertEqual(sum(entries.mapped('attempt_count')), len(self.documents) + 2)
+        self.assertEqual(len(server.documents), len(self.documents))
+
+    def test_04_exhausted_rounds_fail(self):
+        entries = self.Outbox._enqueue(self.documents[:1])
+        with DianStubServer(failures=100) as server:
+            self._dispatch(server)
+            self.assertEqual(entries.state, 'pending')
+            self.assertEqual(entries.round_count, 1)
+            self.assertEqual(entries.attempt_count, 3)
+            self.assertEqual(entries.http_status, 503)
+
+            for _round in range(OUTBOX_MAX_ROUNDS - 1):
+                entries.next_attempt = fields.Datetime.now()
+                self._dispatch(server)
+
+        self.assertEqual(entries.state, 'failed')
+        self.assertEqual(self.documents[0].state, 'generated')
+        self.assertTrue(self.documents[0].log_ids.filtered(lambda log: log.action_type == 'error'))
+
+        entries.action_retry()
+        self.assertEqual(entries.state, 'pending')
+
+    def test_05_concurrency_limit(self):
+        self.Outbox._enqueue(self.documents)
+        with DianStubServer(delay=0.2) as server:
+            self._dispatch(server)
+        self.assertGreater(server.max_in_flight, 1)
+        self.assertLessEqual(server.max_in_flight, 3)
+
+    def test_06_rejected_response(self):
+        self.Outbox._enqueue(self.documents[:1])
+        with DianStubServer(reject=True) as server:
+            entries = self._dispatch(server)
+        self.assertEqual(entries.state, 'done')
+        self.assertEqual(self.documents[0].state, 'rejected')
+        self.assertEqual(self.documents[0].dian_response_code, '99')
+
+    def test_07_action_send_only_enqueues(self):
+        document = self.documents[0]
+        document.action_send()
+        self.assertEqual(document.state, 'generated')
+        self.assertEqual(document.outbox_ids.state, 'pending')
+
+    def test_08_cron_isolates_failed_batches(self):
+        """Un bloque que falla queda fallido sin detener los demás bloques"""
+        self.Outbox._enqueue(self.documents)
+        Outbox = type(self.Outbox)
+        claim, dispatch = Outbox._claim_batch, Outbox._dispatch
+        failing = self.documents[0]
+
+        def dispatch_or_fail(entries):
+            if failing in entries.electronic_payroll_id:
+                entries.write({'last_error': 'Cambio revertido'})
+                raise ValueError('Falla simulada')
+            return dispatch(entries)
+
+        self.patch(self.env.cr, 'commit', lambda: None)
+        Document = type(self.env['hr.electronic.payroll'])
+        with DianStubServer() as server, \
+                patch.object(Document, '_get_dian_url', return_value=server.url), \
+                patch.object(Document, 'action_generate_pdf', return_value=True), \
+                patch.object(type(self.env['ir.cron']), '_trigger'), \
+                patch.object(Outbox, '_claim_batch', autospec=True,
+                             side_effect=lambda outbox: claim(outbox, limit=3)), \
+                patch.object(Outbox, '_dispatch', autospec=True, side_effect=dispatch_or_fail):
+            self.assertEqual(self.Outbox._cron_dispatch(), len(self.documents))
+
+        entries = self.documents.outbox_ids
+        failed = entries.filtered(lambda e: e.state == 'failed')
+        self.assertEqual(len(failed), 3)
+        self.assertIn(failing, failed.electronic_payroll_id)
+        self.assertEqual(set(failed.mapped('last_error')), {'Falla simulada'})
+        self.assertEqual(set((entries - failed).mapped('state')), {'done'})
+
+    def test_09_retried_documents_checked_before_resend(self):
+        """Un documento que la DIAN ya recibió no se reenvía en la siguiente ronda"""
+        received, lost = self.documents[:2]
+        entries = self.Outbox._enqueue(received | lost)
+        # La ronda anterior terminó en tiempo de espera y solo un documento llegó
+        entries.write({'round_count': 1, 'attempt_count': 1})
+        with DianStubServer() as server:
+            server.documents[received.dian_cude] = base64.b64decode(received.xml_signed_file)
+            self._dispatch(server)
+
+        self.assertEqual(sorted(server.status_requests), sorted([received.dian_cude, lost.dian_cude]))
+        # Una consulta para el recibido; consulta y envío para el perdido
+        self.assertEqual(server.requests.count(received.dian_cude), 1)
+        self.assertEqual(server.requests.count(lost.dian_cude), 2)
+        self.assertEqual(set(entries.mapped('state')), {'done'})
+        self.assertEqual(set((received | lost).mapped('state')), {'accepted'})
+
+    def test_10_read_timeout_not_resent_in_round(self):
+        """Un envío sin respuesta pudo llegar: se deja para la siguiente ronda"""
+        entries = self.Outbox._enqueue(self.documents[:1])
+        self.env['ir.config_parameter'].sudo().set_param('nomina_colombia.dian_send_timeout', 0.1)
+        with DianStubServer(delay=0.5) as server:
+            self._dispatch(server)
+        self.assertEqual(server.requests, [entries.cude])
+        self.assertEqual(entries.state, 'pending')
+        self.assertEqual(entries.attempt_count, 1)
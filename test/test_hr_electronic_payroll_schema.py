@@ -0,0 +1,95 @@
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+from odoo.exceptions import ValidationError
+from odoo.tests.common import tagged
+
+from odoo.addons.nomina_colombia.models import hr_electronic_payroll
+from odoo.addons.nomina_colombia.models import hr_electronic_payroll_schema as schema
+from odoo.addons.nomina_colombia.models.hr_electronic_payroll_xml import NominaIndividualBuilder
+
+from .common import ElectronicPayrollDataCase
+
+
+@tagged('post_install', '-at_install')
+class TestHrElectronicPayrollSchema(ElectronicPayrollDataCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super(TestHrElectronicPayrollSchema, cls).setUpClass()
+        data = cls._create_electronic_payroll_company(4, '2024-09-01', number_prefix='NEX')
+        cls.company = data['company']
+        cls.documents = data['documents']
+
+    def test_01_schema_compiled_once(self):
+        self.assertIs(schema.get_schema(), schema.get_schema())
+
+    def test_02_builder_output_is_valid(self):
+        builder = NominaIndividualBuilder(self.company)
+        for document in self.documents:
+            content = builder.tostring(builder.build(document))
+            self.assertEqual(schema.validate_document(content), [])
+
+    def test_03_errors_reported_with_xpath_and_line(self):
+        self.documents[0].employee_id.first_surname = False
+        builder = NominaIndividualBuilder(self.company)
+        content = builder.tostring(builder.build(self.documents[0]), pretty_print=True)
+
+        errors = schema.validate_document(content)
+        self.assertEqual(len(errors), 1)
+        self.assertIn('PrimerApellido', errors[0].message)
+        self.assertEqual(errors[0].path, '/*/*[3]/*[3]')
+        self.assertEqual(content.splitlines()[errors[0].line - 1].strip(), b'<PrimerApellido></PrimerApellido>')
+
+        syntax_errors = schema.validate_document(b'<NominaIndividual>')
+        self.assertEqual(len(syntax_errors), 1)
+
+    def test_04_parallel_validation_matches_sequential(self):
+        builder = NominaIndividualBuilder(self.company)
+        contents = [builder.tostring(builder.build(document)) for document in self.documents]
+        contents.append(b'<NominaIndividual/>')
+        sequential = schema.validate_documents(contents)
+        with patch.object(schema, 'SCHEMA_MIN_DOCUMENTS_PER_WORKER', 1):
+            parallel = schema.validate_documents(contents, max_workers=2)
+        self.assertEqual(parallel, sequential)
+        self.assertEqual([bool(errors) for errors in sequential], [False] * len(self.documents) + [True])
+
+    def test_05_invalid_documents_not_signed_in_batch(self):
+        invalid = self.documents[1]
+        invalid.employee_id.first_name = False
+        generated = self.documents._generate_batch()
+
+        self.assertEqual(generated, self.documents - invalid)
+        self.assertEqual(set(generated.mapped('state')), {'generated'})
+        self.assertFalse(any(generated.mapped('xml_validation_errors')))
+
+        self.assertEqual(invalid.state, 'draft')
+        self.assertFalse(invalid.dian_cude)
+        self.assertFalse(invalid.xml_signed_file)
+        self.assertIn('PrimerNombre', invalid.xml_validation_errors)
+        self.assertTrue(invalid.log_ids.filtered(lambda log: log.action_type == 'error'))
+
+        # Corregido el dato, el documento se genera en el siguiente lote
+        invalid.employee_id.first_name = 'Corregido'
+        self.assertEqual(invalid._generate_batch(), invalid)
+        self.assertFalse(invalid.xml_validation_errors)
+
+    def test_06_action_sign_validates_before_signing(self):
+        document = self.documents[0]
+        document.xml_filename = 'invalido.xml'
+        document._store_xml_payloads('xml_file', {
+            document.id: b'<NominaIndividual xmlns="dian:gov:co:facturaelectronica:NominaIndividual"/>'})
+        with self.assertRaises(ValidationError):
+            document.action_sign()
+        self.assertFalse(document.xml_signed_file)
+
+    def test_07_one_pool_per_batch_generation(self):
+        self.env['ir.config_parameter'].sudo().set_param('nomina_colombia.signature_workers', '2')
+        with patch.object(hr_electronic_payroll, 'ELECTRONIC_BATCH_SIZE', 2), \
+                patch.object(schema, 'SCHEMA_MIN_DOCUMENTS_PER_WORKER', 1), \
+                patch.object(hr_electronic_payroll, 'process_pool',
+                             side_effect=lambda workers: ThreadPoolExecutor(workers)) as pool:
+            generated = self.documents._generate_batch()
+
+        self.assertEqual(generated, self.documents)
+        pool.assert_called_once_with(2)
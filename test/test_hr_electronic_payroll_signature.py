@@ -0,0 +1,140 @@
+import base64
+import hashlib
+from datetime import timezone
+from unittest.mock import Mock, patch
+
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import padding
+from lxml import etree
+
+from odoo.tests.common import TransactionCase, tagged
+
+from odoo.addons.nomina_colombia.models import hr_electronic_payroll_signature as signature
+from odoo.addons.nomina_colombia.models.hr_electronic_payroll_xml import NOMINA_NSMAP, nomina_tag
+
+from .common import make_pkcs12
+
+NAMESPACES = {'ds': signature.DS_NAMESPACE, 'xades': signature.XADES_NAMESPACE}
+
+
+@tagged('post_install', '-at_install')
+class TestHrElectronicPayrollSignature(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super(TestHrElectronicPayrollSignature, cls).setUpClass()
+        cls.certificate = cls.env['hr.electronic.certificate'].create({
+            'name': 'Certificado Firma',
+            'certificate_file': base64.b64encode(make_pkcs12()),
+            'password': 'secreto',
+        })
+
+    def _document(self):
+        root = etree.Element(nomina_tag('NominaIndividual'), nsmap=NOMINA_NSMAP)
+        etree.SubElement(root, nomina_tag('NumeroDocumento')).text = '1234567890'
+        return etree.tostring(root, xml_declaration=True, encoding='UTF-8')
+
+    def _digest(self, element):
+        return base64.b64encode(hashlib.sha256(etree.tostring(element, method='c14n')).digest()).decode()
+
+    def _assert_valid_signature(self, content, material):
+        root = etree.fromstring(content)
+        signature_node = root.find('.//ds:Signature', NAMESPACES)
+        self.assertIsNotNone(signature_node)
+        self.assertEqual(root[0].tag, '{%s}UBLExtensions' % signature.EXT_NAMESPACE)
+
+        references = signature_node.findall('ds:SignedInfo/ds:Reference', NAMESPACES)
+        self.assertEqual(len(references), 3)
+        by_uri = {reference.get('URI'): reference.findtext('ds:DigestValue', namespaces=NAMESPACES)
+                  for reference in references}
+
+        signature_id = signature_node.get('Id')
+        key_info = signature_node.find('ds:KeyInfo', NAMESPACES)
+        signed_properties = signature_node.find('.//xades:SignedProperties', NAMESPACES)
+        self.assertEqual(by_uri['#%s-keyinfo' % signature_id], self._digest(key_info))
+        self.assertEqual(by_uri['#%s-signedprops' % signature_id], self._digest(signed_properties))
+
+        # Transformación enveloped: el documento sin el nodo ds:Signature
+        signature_node.getparent().remove(signature_node)
+        self.assertEqual(by_uri[''], self._digest(root))
+
+        signed_info = etree.fromstring(content).find('.//ds:SignedInfo', NAMESPACES)
+        material.certificate.public_key().verify(
+            base64.b64decode(etree.fromstring(content).findtext('.//ds:SignatureValue', namespaces=NAMESPACES)),
+            etree.tostring(signed_info, method='c14n'), padding.PKCS1v15(), hashes.SHA256())
+
+    def test_01_certificate_info_extracted(self):
+        self.assertEqual(self.certificate.subject, 'CN=Empresa Pruebas')
+        self.assertEqual(self.certificate.issuer, 'CN=Empresa Pruebas')
+        self.assertEqual(self.certificate.state, 'valid')
+
+    def test_02_key_material_parsed_once(self):
+        self.env.registry.clear_cache()
+        with patch.object(signature.pkcs12, 'load_key_and_certificates',
+                          wraps=signature.pkcs12.load_key_and_certificates) as load:
+            first = self.certificate._get_key_material()
+            second = self.certificate._get_key_material()
+        self.assertIs(first, second)
+        self.assertEqual(load.call_count, 1)
+
+    def test_03_cache_invalidated_on_write(self):
+        first = self.certificate._get_key_material()
+        self.certificate.write({'certificate_file': base64.b64encode(make_pkcs12(common_name='Nuevo'))})
+        second = self.certificate._get_key_material()
+        self.assertIsNot(first, second)
+        self.assertEqual(self.certificate.subject, 'CN=Nuevo')
+
+    def test_04_enveloped_xades_signature(self):
+        material = self.certificate._get_key_material()
+        content = signature.sign_document(self._document(), material.signer)
+        self._assert_valid_signature(content, material)
+
+        root = etree.fromstring(content)
+        self.assertEqual(
+            root.findtext('.//xades:SigPolicyId/xades:Identifier', namespaces=NAMESPACES),
+            signature.DIAN_POLICY_IDENTIFIER)
+        self.assertEqual(
+            root.findtext('.//xades:CertDigest/ds:DigestValue', namespaces=NAMESPACES),
+            base64.b64encode(hashlib.sha256(material.signer.certificate_der).digest()).decode())
+
+    def test_05_process_pool_signing(self):
+        material = self.certificate._get_key_material()
+        contents = [self._document() for _index in range(6)]
+        signed = signature.sign_documents(contents, material.signer, max_workers=2)
+        self.assertEqual(len(signed), len(contents))
+        for content in signed:
+            self._assert_valid_signature(content, material)
+
+    def test_06_invalid_password(self):
+        certificate = self.env['hr.electronic.certificate'].create({
+            'name': 'Certificado Inválido',
+            'certificate_file': base64.b64encode(make_pkcs12()),
+            'password': 'otra',
+        })
+        self.assertFalse(certificate.valid_to)
+        self.assertEqual(certificate.state, 'draft')
+
+    def test_07_validity_before_cryptography_42(self):
+        """Sin los atributos *_utc se usan los atributos sin zona horaria"""
+        certificate = self.certificate._get_key_material().certificate
+        valid_from, valid_to = signature.certificate_validity(certificate)
+        self.assertEqual(valid_from.tzinfo, timezone.utc)
+
+        legacy = Mock(spec=['not_valid_before', 'not_valid_after'],
+                      not_valid_before=valid_from.replace(tzinfo=None),
+                      not_valid_after=valid_to.replace(tzinfo=None))
+        self.assertEqual(signature.certificate_validity(legacy), (valid_from, valid_to))
+        self.assertEqual(self.certificate.valid_to, valid_to.date())
+
+    def test_08_private_key_cache_follows_certificate(self):
+        signature.sign_document(self._document(), self.certificate._get_key_material().signer)
+        first_key = signature._PRIVATE_KEYS[self.certificate.id][1]
+
+        self.certificate.write({'certificate_file': base64.b64encode(make_pkcs12(common_name='Nuevo'))})
+        self.assertNotIn(self.certificate.id, signature._PRIVATE_KEYS)
+        signature.sign_document(self._document(), self.certificate._get_key_material().signer)
+        self.assertIsNot(signature._PRIVATE_KEYS[self.certificate.id][1], first_key)
+
+        certificate_id = self.certificate.id
+        self.certificate.unlink()
+        self.assertNotIn(certificate_id, signature._PRIVATE_KEYS)
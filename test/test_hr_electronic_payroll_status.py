@@ -0,0 +1,170 @@
+from unittest.mock import patch
+
+from lxml import etree
+
+from odoo import fields
+from odoo.tests.common import tagged
+
+from odoo.addons.nomina_colombia.models.hr_electronic_payroll import STATUS_MAX_CHECKS
+from odoo.addons.nomina_colombia.models.hr_electronic_payroll_status import (
+    SOAP_ACTION_GET_STATUS_ZIP, parse_status_response, status_request)
+
+from .common import ElectronicPayrollDataCase
+from .dian_stub_server import RESPONSE_TEMPLATE, DianStubServer
+
+
+@tagged('post_install', '-at_install')
+class TestHrElectronicPayrollStatus(ElectronicPayrollDataCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super(TestHrElectronicPayrollStatus, cls).setUpClass()
+        data = cls._create_electronic_payroll_company(5, '2024-09-01', number_prefix='NES')
+        cls.documents = data['documents']
+        cls.documents._generate_batch()
+
+        ICPSudo = cls.env['ir.config_parameter'].sudo()
+        ICPSudo.set_param('nomina_colombia.dian_send_mode', 'zip')
+        ICPSudo.set_param('nomina_colombia.dian_zip_max_documents', 3)
+        cls.Document = cls.env['hr.electronic.payroll']
+        cls.Outbox = cls.env['hr.electronic.payroll.outbox']
+
+    def _patches(self, server):
+        Document = type(self.Document)
+        return (patch.object(Document, '_get_dian_url', return_value=server.url),
+                patch.object(Document, 'action_generate_pdf', return_value=True))
+
+    def _send(self, server):
+        url_patch, pdf_patch = self._patches(server)
+        self.Outbox._enqueue(self.documents)
+        with url_patch, pdf_patch:
+            self.Outbox._claim_batch()._dispatch()
+
+    def _poll(self, server):
+        """Vence la consulta de los documentos enviados y ejecuta una ronda de consultas"""
+        self.documents.filtered(lambda d: d.state == 'sent' and d.dian_status_next_check).write({
+            'dian_status_next_check': fields.Datetime.now()})
+        url_patch, pdf_patch = self._patches(server)
+        with url_patch, pdf_patch:
+            documents = self.Document._claim_status_batch()
+            documents._poll_dian_status()
+        return documents
+
+    def test_01_one_query_per_zip_key(self):
+        with DianStubServer() as server:
+            self._send(server)
+            self.assertEqual(set(self.documents.mapped('state')), {'sent'})
+            self.assertTrue(all(self.documents.mapped('dian_status_next_check')))
+            # La primera consulta espera a que la DIAN procese el paquete
+            self.assertFalse(self.Document._claim_status_batch())
+
+            polled = self._poll(server)
+
+        self.assertEqual(polled, self.documents)
+        self.assertEqual(sorted(server.status_requests), sorted(set(self.documents.mapped('dian_zip_key'))))
+        self.assertEqual(set(self.documents.mapped('state')), {'accepted'})
+        self.assertEqual(set(self.documents.mapped('dian_response_code')), {'00'})
+        for document in self.documents:
+            self.assertEqual(document.dian_transaction_id, document.dian_cude)
+        self.assertFalse(any(self.documents.mapped('dian_status_next_check')))
+        # Los documentos en estado final no se vuelven a consultar
+        self.assertFalse(self.Document._claim_status_batch())
+
+    def test_02_in_process_documents_rescheduled(self):
+        with DianStubServer(processing=2) as server:
+            self._send(server)
+            self._poll(server)
+            self.assertEqual(set(self.documents.mapped('state')), {'sent'})
+            self.assertEqual(set(self.documents.mapped('dian_status_check_count')), {1})
+            self.assertFalse(self.Document._claim_status_batch())
+
+            self._poll(server)
+            self.assertEqual(set(self.documents.mapped('state')), {'accepted'})
+
+    def test_03_rejected_document_in_package(self):
+        rejected = self.documents[2]
+        with DianStubServer(status_codes={rejected.xml_signed_filename: '99'}) as server:
+            self._send(server)
+            self._poll(server)
+        self.assertEqual(rejected.state, 'rejected')
+        self.assertEqual(rejected.dian_response_code, '99')
+        self.assertEqual(set((self.documents - rejected).mapped('state')), {'accepted'})
+
+    def test_04_single_documents_queried_by_track_id(self):
+        document = self.documents[0]
+        document._mark_sent()
+        with DianStubServer(status_codes={document.dian_cude: '00'}) as server:
+            self._poll(server)
+        self.assertEqual(server.status_requests, [document.dian_cude])
+        self.assertEqual(document.state, 'accepted')
+
+    def test_05_failed_queries_rescheduled(self):
+        with DianStubServer() as server:
+            self._send(server)
+            self.env['ir.config_parameter'].sudo().set_param('nomina_colombia.dian_send_max_attempts', 1)
+            server.failures = 100
+            self._poll(server)
+        self.assertEqual(set(self.documents.mapped('state')), {'sent'})
+        self.assertEqual(set(self.documents.mapped('dian_status_check_count')), {1})
+
+    def test_06_polling_stops_after_max_checks(self):
+        document = self.documents[0]
+        document._mark_sent()
+        document.dian_status_check_count = STATUS_MAX_CHECKS - 1
+        with DianStubServer(processing=100, status_codes={document.dian_cude: '00'}) as server:
+            self._poll(server)
+            self.assertEqual(document.state, 'sent')
+            self.assertFalse(document.dian_status_next_check)
+            self.assertTrue(document.log_ids.filtered(lambda log: log.action_type == 'error'))
+
+            url_patch, pdf_patch = self._patches(server)
+            server.processing = 0
+            with url_patch, pdf_patch:
+                document.action_check_dian_status()
+        self.assertEqual(document.state, 'accepted')
+
+    def test_07_pdf_error_does_not_block_statuses(self):
+        """Un error al generar el PDF no revierte el estado DIAN de los documentos"""
+        failing = self.documents[0]
+        Document = type(self.Document)
+
+        def generate_pdf(document):
+            if document == failing:
+                raise ValueError('Reporte no disponible')
+            return True
+
+        with DianStubServer() as server:
+            self._send(server)
+            self.documents.write({'dian_status_next_check': fields.Datetime.now()})
+            with patch.object(Document, '_get_dian_url', return_value=server.url), \
+                    patch.object(Document, 'action_generate_pdf', autospec=True, side_effect=generate_pdf):
+                self.Document._claim_status_batch()._poll_dian_status()
+
+        self.assertEqual(set(self.documents.mapped('state')), {'accepted'})
+        errors = failing.log_ids.filtered(lambda log: log.action_type == 'error')
+        self.assertIn('Reporte no disponible', '\n'.join(errors.mapped('description')))
+
+    def test_08_empty_status_code_is_pending(self):
+        response = RESPONSE_TEMPLATE % {'code': ' ', 'description': '', 'key': 'CUDE-1'}
+        status, = parse_status_response(response.encode())
+        self.assertEqual(status['status_code'], '')
+        self.assertFalse(status['final'])
+
+    def test_09_cron_retriggers_while_checks_due(self):
+        self.documents._mark_sent()
+        self.documents.write({'dian_status_next_check': fields.Datetime.now()})
+
+        self.patch(self.env.cr, 'commit', lambda: None)
+        with patch.object(type(self.Document), '_poll_dian_status'), \
+                patch.object(type(self.env['ir.cron']), '_trigger') as trigger:
+            self.assertTrue(self.Document._cron_poll_dian_status(time_limit=0.05))
+        trigger.assert_called_once_with()
+
+    def test_10_status_request_soap_envelope(self):
+        payload, headers = status_request('ZIP-KEY', 'https://dian.test/WcfDianCustomerServices.svc', zip_status=True)
+        root = etree.fromstring(payload)
+        self.assertEqual(etree.QName(root).localname, 'Envelope')
+        self.assertEqual(root.findtext('{*}Header/{*}Action'), SOAP_ACTION_GET_STATUS_ZIP)
+        self.assertEqual(root.findtext('{*}Header/{*}To'), 'https://dian.test/WcfDianCustomerServices.svc')
+        self.assertEqual(root.findtext('{*}Body/{*}GetStatusZip/{*}trackId'), 'ZIP-KEY')
+        self.assertIn('application/soap+xml', headers['Content-Type'])
@@ -0,0 +1,118 @@
+import base64
+import io
+from unittest import skipIf
+from unittest.mock import patch
+
+from lxml import etree
+
+from odoo.tests.common import tagged
+from odoo.tools import human_size
+
+from odoo.addons.nomina_colombia.models import hr_electronic_payroll_storage as storage
+from odoo.addons.nomina_colombia.models.hr_electronic_payroll_xml import nomina_tag
+
+from .common import ElectronicPayrollDataCase
+
+
+@tagged('post_install', '-at_install')
+class TestHrElectronicPayrollStorage(ElectronicPayrollDataCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super(TestHrElectronicPayrollStorage, cls).setUpClass()
+        data = cls._create_electronic_payroll_company(3, '2024-09-01', number_prefix='NEA')
+        cls.documents = data['documents']
+        cls.ICPSudo = cls.env['ir.config_parameter'].sudo()
+        cls.ICPSudo.set_param('nomina_colombia.xml_storage_codec', 'gzip')
+
+    def _attachments(self, documents, fname):
+        return self.env['ir.attachment'].sudo().search([
+            ('res_model', '=', 'hr.electronic.payroll'),
+            ('res_field', '=', fname),
+            ('res_id', 'in', documents.ids),
+        ])
+
+    def test_01_codecs(self):
+        content = b'<?xml version="1.0"?><Nomina>' + b'<Linea>1</Linea>' * 200 + b'</Nomina>'
+        for codec in ('gzip', 'none') + (('zstd',) if storage.zstandard else ()):
+            compressed = storage.compress(content, codec)
+            self.assertEqual(storage.detect_codec(compressed), codec)
+            self.assertEqual(storage.content_size(io.BytesIO(compressed), len(compressed)), len(content))
+            # Compresión determinística: mismo contenido, mismos bytes
+            self.assertEqual(storage.compress(content, codec), compressed)
+            self.assertEqual(storage.decompress(compressed), content)
+            with storage.open_stream(io.BytesIO(compressed)) as stream:
+                self.assertEqual(stream.read(), content)
+        self.assertLess(len(storage.compress(content, 'gzip')), len(content))
+
+    def test_02_signed_xml_stored_compressed(self):
+        self.documents._generate_batch()
+        attachments = self._attachments(self.documents, 'xml_signed_file')
+        self.assertEqual(len(attachments), len(self.documents))
+        self.assertEqual(set(attachments.mapped('mimetype')), {'application/gzip'})
+        for attachment in attachments:
+            self.assertTrue(attachment.raw.startswith(storage.GZIP_MAGIC))
+
+        document = self.documents[0]
+        signed = document._get_signed_payloads()[document.id]
+        self.assertEqual(base64.b64decode(document.xml_signed_file), signed)
+        root = etree.fromstring(signed)
+        self.assertEqual(root.findtext(nomina_tag('CUDE')), document.dian_cude)
+        self.assertTrue(document.can_be_sent)
+
+    def test_03_bin_size_does_not_read_payload(self):
+        self.documents._generate_batch()
+        document = self.documents[0].with_context(bin_size=True)
+        with patch('odoo.addons.nomina_colombia.models.hr_electronic_payroll.decompress',
+                   side_effect=AssertionError('contenido leído')):
+            size = document.xml_signed_file
+        # Tamaño del XML descomprimido, no el del adjunto
+        signed = document._get_signed_payloads()[document.id]
+        self.assertEqual(size, human_size(len(signed)).encode())
+
+    def test_04_streaming_access(self):
+        self.documents._generate_batch()
+        document = self.documents[0]
+        with document._open_xml_payload('xml_signed_file') as stream:
+            root = etree.parse(stream).getroot()
+        self.assertEqual(root.findtext(nomina_tag('CUDE')), document.dian_cude)
+
+    def test_05_identical_content_deduplicated(self):
+        content = b'<?xml version="1.0"?><DianResponse>Procesado</DianResponse>'
+        self.documents._store_xml_payloads('dian_response_file', {
+            document.id: content for document in self.documents})
+        attachments = self._attachments(self.documents, 'dian_response_file')
+        self.assertEqual(len(attachments), len(self.documents))
+        self.assertEqual(len(set(attachments.mapped('checksum'))), 1)
+
+    def test_06_write_and_clear_through_field(self):
+        self.ICPSudo.set_param('nomina_colombia.xml_storage_codec', 'none')
+        document = self.documents[0]
+        document.write({'xml_file': base64.b64encode(b'<Nomina/>')})
+        attachment = self._attachments(document, 'xml_file')
+        self.assertEqual(attachment.raw, b'<Nomina/>')
+        self.assertEqual(base64.b64decode(document.xml_file), b'<Nomina/>')
+
+        document.write({'xml_file': False})
+        self.assertFalse(self._attachments(document, 'xml_file'))
+        self.assertFalse(document.xml_file)
+
+    @skipIf(storage.zstandard is None, "zstandard no está instalado")
+    def test_07_zstd_codec(self):
+        self.ICPSudo.set_param('nomina_colombia.xml_storage_codec', 'zstd')
+        self.documents._generate_batch()
+        attachments = self._attachments(self.documents, 'xml_signed_file')
+        self.assertEqual(set(attachments.mapped('mimetype')), {'application/zstd'})
+        self.assertTrue(all(a.raw.startswith(storage.ZSTD_MAGIC) for a in attachments))
+        self.assertTrue(base64.b64decode(self.documents[0].xml_signed_file).startswith(b'<?xml'))
+
+    def test_08_fields_computed_separately(self):
+        """Leer un XML no descomprime los otros campos del documento"""
+        self.documents._generate_batch()
+        document = self.documents[0]
+        document._store_xml_payloads('dian_response_file', {document.id: b'<DianResponse/>'})
+        document.invalidate_recordset()
+        with patch('odoo.addons.nomina_colombia.models.hr_electronic_payroll.decompress',
+                   wraps=storage.decompress) as decompress:
+            self.assertTrue(document.xml_signed_file)
+        self.assertEqual(decompress.call_count, 1)
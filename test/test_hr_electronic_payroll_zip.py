@@ -0,0 +1,108 @@
+import io
+import zipfile
+from unittest.mock import patch
+
+from odoo.tests.common import tagged
+
+from odoo.addons.nomina_colombia.models.hr_electronic_payroll_zip import (
+    build_zip, package_key, parse_zip_response, zip_filename)
+
+from .common import ElectronicPayrollDataCase
+from .dian_stub_server import DianStubServer, ZIP_ERROR_TEMPLATE, ZIP_RESPONSE_TEMPLATE
+
+
+@tagged('post_install', '-at_install')
+class TestHrElectronicPayrollZip(ElectronicPayrollDataCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super(TestHrElectronicPayrollZip, cls).setUpClass()
+        data = cls._create_electronic_payroll_company(7, '2024-09-01', number_prefix='NEZ')
+        cls.documents = data['documents']
+        cls.documents._generate_batch()
+
+        ICPSudo = cls.env['ir.config_parameter'].sudo()
+        ICPSudo.set_param('nomina_colombia.dian_send_mode', 'zip')
+        ICPSudo.set_param('nomina_colombia.dian_zip_max_documents', 3)
+        cls.Outbox = cls.env['hr.electronic.payroll.outbox']
+
+    def _dispatch(self, server):
+        Document = type(self.env['hr.electronic.payroll'])
+        with patch.object(Document, '_get_dian_url', return_value=server.url):
+            entries = self.Outbox._claim_batch()
+            entries._dispatch()
+        return entries
+
+    def test_01_zip_helpers(self):
+        content = build_zip([('a.xml', b'<a/>'), ('b.xml', b'<b/>')])
+        with zipfile.ZipFile(io.BytesIO(content)) as package:
+            self.assertEqual(package.namelist(), ['a.xml', 'b.xml'])
+            self.assertEqual(package.getinfo('a.xml').compress_type, zipfile.ZIP_DEFLATED)
+
+        self.assertEqual(zip_filename('900.123.456-7', 255), 'z90012345670000000ff.zip')
+        self.assertEqual(package_key(['B', 'A']), package_key(['A', 'B']))
+
+        response = ZIP_RESPONSE_TEMPLATE % {
+            'errors': ZIP_ERROR_TEMPLATE % {'filename': 'b.xml'}, 'zip_key': 'KEY-1'}
+        zip_key, errors = parse_zip_response(response.encode())
+        self.assertEqual(zip_key, 'KEY-1')
+        self.assertEqual(list(errors), ['b.xml'])
+
+    def test_02_documents_packaged_per_request(self):
+        self.Outbox._enqueue(self.documents)
+        with DianStubServer() as server:
+            entries = self._dispatch(server)
+
+        # 7 documentos en paquetes de máximo 3: tres solicitudes
+        self.assertEqual(len(server.requests), 3)
+        self.assertEqual(sorted(len(files) for files in server.packages.values()), [1, 3, 3])
+        self.assertEqual(set(server.documents), set(self.documents.mapped('xml_signed_filename')))
+
+        self.assertEqual(set(entries.mapped('state')), {'done'})
+        self.assertEqual(set(entries.mapped('zip_key')), set(server.packages))
+        self.assertEqual(set(self.documents.mapped('state')), {'sent'})
+        for entry in entries:
+            self.assertEqual(entry.electronic_payroll_id.dian_zip_key, entry.zip_key)
+            self.assertIn(entry.electronic_payroll_id.xml_signed_filename, server.packages[entry.zip_key])
+
+    def test_03_initial_errors_mapped_to_documents(self):
+        invalid = self.documents[1]
+        self.Outbox._enqueue(self.documents)
+        with DianStubServer(invalid_files=[invalid.xml_signed_filename]) as server:
+            self._dispatch(server)
+
+        self.assertEqual(invalid.state, 'rejected')
+        self.assertEqual(invalid.dian_response_code, 'ZIP')
+        self.assertTrue(invalid.dian_zip_key)
+        self.assertEqual(set((self.documents - invalid).mapped('state')), {'sent'})
+
+    def test_04_failed_package_retried(self):
+        self.Outbox._enqueue(self.documents[:3])
+        self.env['ir.config_parameter'].sudo().set_param('nomina_colombia.dian_send_max_attempts', 1)
+        with DianStubServer(failures=1) as server:
+            entries = self._dispatch(server)
+        self.assertEqual(set(entries.mapped('state')), {'pending'})
+        self.assertEqual(set(entries.mapped('round_count')), {1})
+        self.assertEqual(set(self.documents[:3].mapped('state')), {'generated'})
+
+    def test_05_invalid_response_fails_only_its_package(self):
+        self.Outbox._enqueue(self.documents)
+        responses = []
+
+        def parse_or_fail(content):
+            responses.append(content)
+            if len(responses) == 1:
+                content = content[:20]
+            return parse_zip_response(content)
+
+        with DianStubServer() as server, \
+                patch('odoo.addons.nomina_colombia.models.hr_electronic_payroll_outbox.parse_zip_response',
+                      side_effect=parse_or_fail):
+            entries = self._dispatch(server)
+
+        failed = entries.filtered(lambda e: e.state == 'failed')
+        self.assertEqual(len(failed), 3)
+        self.assertIn('Respuesta del envío ZIP inválida', failed[0].last_error)
+        self.assertEqual(set(failed.electronic_payroll_id.mapped('state')), {'generated'})
+        self.assertEqual(set((entries - failed).mapped('state')), {'done'})
+        self.assertEqual(set((entries - failed).electronic_payroll_id.mapped('state')), {'sent'})
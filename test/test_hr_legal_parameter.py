@@ -0,0 +1,65 @@
+from odoo.tests.common import TransactionCase, tagged
+from odoo.exceptions import UserError
+
+
+@tagged('post_install', '-at_install')
+class TestHrLegalParameter(TransactionCase):
+    def setUp(self):
+        super(TestHrLegalParameter, self).setUp()
+        self.LegalParameter = self.env['hr.payroll.legal.parameter']
+
+        self.employee = self.env['hr.employee'].create({
+            'name': 'Empleado Parámetros',
+            'identification_type': 'CC',
+            'identification_id': '5566778899',
+        })
+
+        self.contract = self.env['hr.contract'].create({
+            'name': 'Contrato Parámetros',
+            'employee_id': self.employee.id,
+            'wage': 1300000.0,
+            'state': 'open',
+            'date_start': '2023-01-01',
+            'contract_type': 'fijo',
+            'transport_allowance': True,
+        })
+
+    def test_01_values_by_year(self):
+        """Prueba que cada período resuelve los valores de su año"""
+        values_2023 = self.LegalParameter._get_legal_values('2023-06-30')
+        values_2024 = self.LegalParameter._get_legal_values('2024-06-30')
+
+        self.assertEqual(values_2023['smmlv'], 1160000.0)
+        self.assertEqual(values_2024['smmlv'], 1300000.0)
+        self.assertEqual(values_2024['uvt'], 47065.0)
+        self.assertEqual(values_2024['arl_rates']['1'], 0.522)
+
+    def test_02_retroactive_transport_allowance(self):
+        """Prueba que el auxilio de transporte usa el valor del año del período"""
+        self.assertEqual(self.contract._get_transport_allowance('2023-03-31'), 140606.0)
+        self.assertEqual(self.contract._get_transport_allowance('2024-03-31'), 162000.0)
+
+    def test_03_cache_invalidated_on_write(self):
+        """Prueba que modificar un parámetro invalida la caché"""
+        self.assertEqual(self.LegalParameter._get_legal_values_for_year(2024)['uvt'], 47065.0)
+
+        self.env.ref('nomina_colombia.hr_payroll_legal_parameter_2024').uvt = 50000.0
+
+        self.assertEqual(self.LegalParameter._get_legal_values_for_year(2024)['uvt'], 50000.0)
+
+    def test_04_fallback_and_missing_year(self):
+        """Prueba el uso del último año configurado y el error sin parámetros"""
+        latest = self.LegalParameter.search([], order='year desc', limit=1)
+        self.assertEqual(self.LegalParameter._get_legal_values_for_year(latest.year + 5)['year'], latest.year)
+
+        with self.assertRaises(UserError):
+            self.LegalParameter._get_legal_values_for_year(1990)
+
+    def test_05_fsp_rate(self):
+        """Prueba los tramos del Fondo de Solidaridad Pensional"""
+        smmlv = self.LegalParameter._get_legal_values('2024-01-31')['smmlv']
+
+        self.assertEqual(self.LegalParameter._get_fsp_rate(smmlv * 2, '2024-01-31'), 0.0)
+        self.assertEqual(self.LegalParameter._get_fsp_rate(smmlv * 5, '2024-01-31'), 1.0)
+        self.assertEqual(self.LegalParameter._get_fsp_rate(smmlv * 16.5, '2024-01-31'), 1.2)
+        self.assertEqual(self.LegalParameter._get_fsp_rate(smmlv * 25, '2024-01-31'), 2.0)
@@ -0,0 +1,46 @@
+import json
+import os
+
+from odoo.exceptions import AccessError
+from odoo.tests.common import TransactionCase, new_test_user, tagged
+
+
+@tagged('post_install', '-at_install')
+class TestHrPayrollBenchmark(TransactionCase):
+    def test_01_generator(self):
+        """El generador crea la compañía sintética completa"""
+        data = self.env['hr.payroll.benchmark']._generate_company(5, '2024-08-01')
+
+        employees = data['employees']
+        self.assertEqual(len(employees), 5)
+        self.assertTrue(all(employees.mapped('eps_id')))
+        self.assertTrue(all(employees.mapped('pension_fund_id')))
+        self.assertTrue(all(employees.mapped('arl_id')))
+        self.assertTrue(all(employees.mapped('bank_account_id')))
+        self.assertEqual(len(data['contracts']), 5)
+        self.assertEqual(data['payslips'].payslip_run_id, data['payslip_run'])
+        self.assertTrue(self.env['hr.work.entry'].search_count([('employee_id', 'in', employees.ids)]))
+
+    def test_02_results_file(self):
+        """Los escenarios se escriben en el JSON con tiempo y consultas"""
+        report = self.env['hr.payroll.benchmark']._run_benchmark(
+            employee_count=3, date_from='2024-08-01', scenarios=['run_compute', 'pila'], label='test')
+        path = report['output_path']
+        self.addCleanup(os.remove, path)
+
+        with open(path, encoding='utf-8') as results_file:
+            report = json.load(results_file)
+
+        self.assertEqual(report['employee_count'], 3)
+        self.assertEqual(report['label'], 'test')
+        self.assertEqual([result['scenario'] for result in report['scenarios']], ['run_compute', 'pila'])
+        run_compute = report['scenarios'][0]
+        self.assertEqual(run_compute['status'], 'ok')
+        self.assertEqual(run_compute['records'], 3)
+        self.assertGreater(run_compute['queries'], 0)
+
+    def test_03_requires_administrator(self):
+        """Solo los administradores pueden ejecutar el benchmark"""
+        user = new_test_user(self.env, login='benchmark_user', groups='hr.group_hr_manager')
+        with self.assertRaises(AccessError):
+            self.env['hr.payroll.benchmark'].with_user(user)._run_benchmark(employee_count=1)
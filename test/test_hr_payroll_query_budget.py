@@ -0,0 +1,129 @@
+import base64
+
+from odoo.tests.common import tagged
+
+from .common import PayrollDataCase
+
+# Tamaños comparados y crecimiento máximo de consultas permitido entre ellos.
+# Con 10 veces más registros, un patrón N+1 multiplica las consultas por ~10.
+SMALL_SIZE = 10
+LARGE_SIZE = 100
+MAX_QUERY_GROWTH = 3.0
+
+
+@tagged('post_install', '-at_install')
+class TestHrPayrollQueryBudget(PayrollDataCase):
+    """
+    Presupuesto de consultas de los procesos masivos: el número de consultas
+    debe crecer de forma sublineal con el número de registros.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super(TestHrPayrollQueryBudget, cls).setUpClass()
+        cls.small = cls._create_payroll_company(SMALL_SIZE, '2024-09-01')
+        cls.large = cls._create_payroll_company(LARGE_SIZE, '2024-09-01')
+
+    def _count_queries(self, func):
+        self.env.flush_all()
+        self.env.invalidate_all()
+        queries_before = self.env.cr.sql_log_count
+        func()
+        self.env.flush_all()
+        return self.env.cr.sql_log_count - queries_before
+
+    def _assert_sublinear(self, process, make_func):
+        """
+        Mide el proceso con ambos conjuntos de datos y compara las consultas
+
+        :param process: Nombre del proceso para el mensaje de error
+        :param make_func: Función que recibe los datos generados y retorna la función a medir
+        """
+        small_queries = self._count_queries(make_func(self.small))
+        large_queries = self._count_queries(make_func(self.large))
+        self.assertLessEqual(
+            large_queries, small_queries * MAX_QUERY_GROWTH,
+            '%s: %s consultas con %s registros y %s con %s registros (máximo %.1f veces)' % (
+                process, small_queries, SMALL_SIZE, large_queries, LARGE_SIZE, MAX_QUERY_GROWTH))
+
+    def _confirm(self, data):
+        data['payslips'].compute_sheet()
+        data['payslips'].action_payslip_done()
+
+    def test_01_compute_sheet(self):
+        self._assert_sublinear('compute_sheet', lambda data: data['payslips'].compute_sheet)
+
+    def test_02_action_payslip_done(self):
+        for data in (self.small, self.large):
+            data['payslips'].compute_sheet()
+        self._assert_sublinear('action_payslip_done', lambda data: data['payslips'].action_payslip_done)
+
+    def test_03_pila_compute_totals(self):
+        for data in (self.small, self.large):
+            data['payslips'].compute_sheet()
+            data['pila'] = self.env['hr.pila'].create({
+                'company_id': data['company'].id,
+                'date_from': data['date_from'],
+                'date_to': data['date_to'],
+                'payslip_ids': [(6, 0, data['payslips'].ids)],
+            })
+        self._assert_sublinear('HrPila._compute_totals', lambda data: data['pila']._compute_totals)
+
+    def test_04_calculate_provisions(self):
+        for data in (self.small, self.large):
+            self._confirm(data)
+            data['provision_wizard'] = self.env['hr.payroll.provision.wizard'].create({
+                'date_from': data['date_from'],
+                'date_to': data['date_to'],
+                'employee_ids': [(6, 0, data['employees'].ids)],
+                'generate_journal_entries': False,
+            })
+
+        def make_func(data):
+            wizard = data['provision_wizard']
+            return lambda: wizard._calculate_provisions(data['employees'])
+        self._assert_sublinear('HrPayrollProvisionWizard._calculate_provisions', make_func)
+
+    def test_05_bank_single_file(self):
+        bank = self.env.ref('nomina_colombia.res_bank_bancolombia')
+        for data in (self.small, self.large):
+            self._confirm(data)
+            data['bank_wizard'] = self.env['hr.payroll.bank.file.wizard'].create({
+                'payslip_run_id': data['payslip_run'].id,
+                'bank_id': bank.id,
+                'file_format': 'bancolombia_pab',
+                'payment_date': data['date_to'],
+            })
+        self._assert_sublinear(
+            'HrPayrollBankFileWizard._generate_single_file',
+            lambda data: data['bank_wizard']._generate_single_file)
+
+    def test_06_certificates_zip(self):
+        for data in (self.small, self.large):
+            data['certificate_wizard'] = self.env['hr.payroll.certificate.wizard'].create({
+                'employee_ids': [(6, 0, data['employees'].ids)],
+                'certificate_type': 'labor',
+                'date_from': '2024-01-01',
+                'date_to': data['date_to'],
+                'include_signature': False,
+                'company_id': data['company'].id,
+            })
+        self._assert_sublinear(
+            'HrPayrollCertificateWizard._generate_certificates_zip',
+            lambda data: data['certificate_wizard']._generate_certificates_zip)
+
+    def test_07_import_employees(self):
+        def make_func(data):
+            size = len(data['employees'])
+            rows = ['identification_type,identification_id,name,work_email,mobile_phone,department']
+            rows += [
+                'CC,77%05d%s,Empleado Importado %s,importado%s@example.com,300%07d,Área %s' % (
+                    index, size, index, index, index, index % 5)
+                for index in range(size)
+            ]
+            wizard = self.env['hr.employee.import.wizard'].create({
+                'file': base64.b64encode('\n'.join(rows).encode('utf-8')),
+                'filename': 'empleados_%s.csv' % size,
+            })
+            return wizard.action_import
+        self._assert_sublinear('ImportEmployeeWizard.action_import', make_func)
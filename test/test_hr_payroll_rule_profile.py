@@ -0,0 +1,72 @@
+from odoo.tests.common import TransactionCase, tagged
+
+
+@tagged('post_install', '-at_install')
+class TestHrPayrollRuleProfile(TransactionCase):
+    def setUp(self):
+        super(TestHrPayrollRuleProfile, self).setUp()
+        self.company = self.env.company
+        self.company.country_id = self.env.ref('base.co')
+        self.structure = self.env.ref('nomina_colombia.hr_payroll_structure_col_standard')
+        self.Profile = self.env['hr.payroll.rule.profile']
+
+        # Regla con una búsqueda oculta por nómina, como las reglas de clientes
+        self.slow_rule = self.env['hr.salary.rule'].create({
+            'name': 'Regla Con Búsqueda',
+            'code': 'SLOW_SEARCH',
+            'category_id': self.env.ref('nomina_colombia.hr_salary_rule_category_basic_col').id,
+            'sequence': 200,
+            'condition_select': 'none',
+            'amount_select': 'code',
+            'amount_python_compute': "result = employee.search_count([('id', '!=', employee.id)]) * 0.0",
+            'struct_id': self.structure.id,
+        })
+        self.structure.rule_ids = [(4, self.slow_rule.id)]
+
+        self.payslips = self.env['hr.payslip']
+        for index in range(4):
+            employee = self.env['hr.employee'].create({
+                'name': 'Empleado Perfilado %s' % index,
+                'identification_type': 'CC',
+                'identification_id': '69000%s' % index,
+            })
+            contract = self.env['hr.contract'].create({
+                'name': 'Contrato Perfilado %s' % index,
+                'employee_id': employee.id,
+                'wage': 1400000.0,
+                'state': 'open',
+                'date_start': '2024-01-01',
+                'contract_type': 'fijo',
+                'transport_allowance': True,
+                'struct_id': self.structure.id,
+            })
+            self.payslips |= self.env['hr.payslip'].create({
+                'name': 'Nómina Perfilado %s' % index,
+                'employee_id': employee.id,
+                'contract_id': contract.id,
+                'struct_id': self.structure.id,
+                'date_from': '2024-07-01',
+                'date_to': '2024-07-31',
+            })
+
+    def test_01_profiling_disabled_by_default(self):
+        """Sin el interruptor no se registran resultados"""
+        self.payslips.compute_sheet()
+        self.assertFalse(self.Profile.search([('structure_id', '=', self.structure.id)]))
+
+    def test_02_profile_per_rule(self):
+        """Cada regla registra llamadas, tiempos y consultas"""
+        self.structure.rule_profiling = True
+        self.payslips.compute_sheet()
+
+        profiles = self.Profile.search([('structure_id', '=', self.structure.id)])
+        self.assertEqual(profiles.rule_id, self.structure.rule_ids)
+
+        slow = profiles.filtered(lambda p: p.rule_id == self.slow_rule)
+        self.assertEqual(slow.calls, 4)
+        self.assertGreaterEqual(slow.query_count, 4)
+        self.assertGreaterEqual(slow.queries_per_call, 1.0)
+        self.assertGreater(slow.total_us, 0.0)
+        self.assertLessEqual(slow.p95_us, slow.max_us)
+        self.assertAlmostEqual(slow.mean_us, slow.total_us / slow.calls)
+
@@ -0,0 +1,101 @@
+import os
+
+import psycopg2
+
+from odoo.tests.common import TransactionCase, tagged
+from odoo.tools import mute_logger
+
+
+@tagged('post_install', '-at_install')
+class TestHrPayrollRunMetrics(TransactionCase):
+    def setUp(self):
+        super(TestHrPayrollRunMetrics, self).setUp()
+        self.company = self.env.company
+        self.company.country_id = self.env.ref('base.co')
+        self.structure = self.env.ref('nomina_colombia.hr_payroll_structure_col_standard')
+        self.Metrics = self.env['hr.payroll.run.metrics']
+
+        self.payslip_run = self.env['hr.payslip.run'].create({
+            'name': 'Lote Métricas',
+            'date_start': '2024-06-01',
+            'date_end': '2024-06-30',
+        })
+        payslips_vals = []
+        for index in range(2):
+            employee = self.env['hr.employee'].create({
+                'name': 'Empleado Métricas %s' % index,
+                'identification_type': 'CC',
+                'identification_id': '68000%s' % index,
+            })
+            contract = self.env['hr.contract'].create({
+                'name': 'Contrato Métricas %s' % index,
+                'employee_id': employee.id,
+                'wage': 1600000.0,
+                'state': 'open',
+                'date_start': '2024-01-01',
+                'contract_type': 'fijo',
+                'transport_allowance': True,
+                'struct_id': self.structure.id,
+            })
+            payslips_vals.append({
+                'name': 'Nómina Métricas %s' % index,
+                'employee_id': employee.id,
+                'contract_id': contract.id,
+                'struct_id': self.structure.id,
+                'payslip_run_id': self.payslip_run.id,
+                'date_from': '2024-06-01',
+                'date_to': '2024-06-30',
+            })
+        self.payslips = self.env['hr.payslip'].create(payslips_vals)
+
+    def test_01_compute_sheet_records_stages(self):
+        """El cálculo registra una métrica por etapa asociada al lote"""
+        self.payslips.compute_sheet()
+
+        metrics = self.Metrics.search([('run_id', '=', self.payslip_run.id)])
+        self.assertEqual(set(metrics.mapped('stage')), {'worked_days', 'rules', 'summary'})
+        rules_metric = metrics.filtered(lambda m: m.stage == 'rules')
+        self.assertEqual(rules_metric.record_count, 2)
+        self.assertEqual(rules_metric.rows_written, len(self.payslips.line_ids))
+        self.assertGreater(rules_metric.query_count, 0)
+        self.assertEqual(str(rules_metric.period), '2024-06-01')
+
+    def test_02_metrics_disabled(self):
+        """Con las métricas desactivadas no se registra nada"""
+        self.env['ir.config_parameter'].sudo().set_param('nomina_colombia.run_metrics_enabled', 'False')
+        self.payslips.compute_sheet()
+        self.assertFalse(self.Metrics.search([('run_id', '=', self.payslip_run.id)]))
+
+    def test_03_prometheus_export(self):
+        """La exposición Prometheus agrega por compañía, mes y etapa"""
+        self.payslips.compute_sheet()
+
+        text = self.Metrics._get_prometheus_text(months=1200)
+        self.assertIn('# TYPE nomina_payroll_stage_seconds gauge', text)
+        self.assertIn('period="2024-06",stage="rules"', text)
+
+        path = self.Metrics._export_prometheus(months=1200)
+        self.assertTrue(os.path.exists(path))
+        with open(path, encoding='utf-8') as metrics_file:
+            self.assertIn('nomina_payroll_stage_queries{', metrics_file.read())
+
+    def test_04_failed_stage_recorded(self):
+        """Una etapa que falla también registra su métrica"""
+        with self.assertRaises(ValueError):
+            with self.Metrics._track_stage('bank', self.payslips, run=self.payslip_run) as measure:
+                measure['rows'] = 3
+                raise ValueError('Falla simulada')
+
+        metric = self.Metrics.search([('run_id', '=', self.payslip_run.id), ('stage', '=', 'bank')])
+        self.assertEqual(metric.rows_written, 3)
+        self.assertEqual(metric.record_count, 2)
+
+    @mute_logger('odoo.sql_db', 'odoo.addons.nomina_colombia.models.hr_payroll_run_metrics')
+    def test_05_failed_sql_stage_keeps_original_error(self):
+        """Un error SQL en la etapa se propaga sin quedar oculto por la métrica"""
+        with self.assertRaises(psycopg2.errors.DivisionByZero):
+            with self.env.cr.savepoint():
+                with self.Metrics._track_stage('bank', self.payslips, run=self.payslip_run):
+                    self.env.cr.execute("SELECT 1 / 0")
+        # La transacción principal sigue utilizable
+        self.assertTrue(self.payslips.exists())
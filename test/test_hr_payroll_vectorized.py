@@ -0,0 +1,154 @@
+from odoo.tests.common import TransactionCase, tagged
+from odoo.addons.nomina_colombia.models import hr_payroll_vectorized
+from unittest import skipIf
+from unittest.mock import patch
+import logging
+import time
+
+_logger = logging.getLogger(__name__)
+
+
+@tagged('post_install', '-at_install')
+class TestHrPayrollVectorized(TransactionCase):
+    def setUp(self):
+        super(TestHrPayrollVectorized, self).setUp()
+        self.company = self.env.company
+        self.company.country_id = self.env.ref('base.co')
+        self.structure = self.env.ref('nomina_colombia.hr_payroll_structure_col_standard')
+
+        self.overtime_type = self.env['hr.work.entry.type'].create({
+            'name': 'Hora Extra Diurna',
+            'code': 'HED',
+        })
+
+        # Contratos con distintos salarios, clases de riesgo y exoneraciones
+        self.contracts = self.env['hr.contract']
+        cases = [
+            (1300000.0, True, '1', False),
+            (2600000.0, True, '3', True),
+            (4500000.0, False, '5', True),
+            (15000000.0, False, '2', True),
+        ]
+        for index, (wage, transport, risk_level, exempt) in enumerate(cases):
+            employee = self.env['hr.employee'].create({
+                'name': 'Empleado Vectorizado %s' % index,
+                'identification_type': 'CC',
+                'identification_id': '88000%s' % index,
+            })
+            self.contracts |= self.env['hr.contract'].create({
+                'name': 'Contrato Vectorizado %s' % index,
+                'employee_id': employee.id,
+                'wage': wage,
+                'state': 'open',
+                'date_start': '2024-01-01',
+                'contract_type': 'fijo',
+                'transport_allowance': transport,
+                'risk_level': risk_level,
+                'parafiscal_exempt': exempt,
+                'struct_id': self.structure.id,
+            })
+
+    def _create_run(self, compute_mode, contracts):
+        run = self.env['hr.payslip.run'].create({
+            'name': 'Lote %s' % compute_mode,
+            'date_start': '2024-03-01',
+            'date_end': '2024-03-31',
+            'compute_mode': compute_mode,
+        })
+        self.env['hr.payslip'].create([{
+            'name': 'Nómina %s' % contract.name,
+            'employee_id': contract.employee_id.id,
+            'contract_id': contract.id,
+            'struct_id': self.structure.id,
+            'payslip_run_id': run.id,
+            'date_from': '2024-03-01',
+            'date_to': '2024-03-31',
+        } for contract in contracts])
+        return run
+
+    def _lines(self, run):
+        return sorted(
+            (line.contract_id.id, line.code, line.amount, line.quantity, line.rate, line.total)
+            for line in run.slip_ids.line_ids
+        )
+
+    @skipIf(hr_payroll_vectorized.np is None, "numpy no está instalado")
+    def test_01_vectorized_matches_standard(self):
+        """Prueba que el modo vectorizado produce las mismas líneas que el motor estándar"""
+        standard = self._create_run('standard', self.contracts)
+        vectorized = self._create_run('vectorized', self.contracts)
+
+        standard.slip_ids.compute_sheet()
+        self.assertEqual(len(vectorized.slip_ids._get_vectorizable_payslips()), len(self.contracts))
+        vectorized.slip_ids.compute_sheet()
+
+        self.assertEqual(self._lines(vectorized), self._lines(standard))
+        self.assertTrue(all(slip.state == 'verify' for slip in vectorized.slip_ids))
+        self.assertTrue(all(slip.number for slip in vectorized.slip_ids))
+
+    @skipIf(hr_payroll_vectorized.np is None, "numpy no está instalado")
+    def test_02_novelties_fall_back_to_standard(self):
+        """Prueba que las nóminas con novedades usan el motor de reglas"""
+        run = self._create_run('vectorized', self.contracts)
+        slip_with_overtime = run.slip_ids[0]
+        slip_with_overtime.worked_days_line_ids = [(0, 0, {
+            'name': 'Horas Extra Diurnas',
+            'work_entry_type_id': self.overtime_type.id,
+            'number_of_days': 1.0,
+            'number_of_hours': 8.0,
+        })]
+
+        vectorizable = run.slip_ids._get_vectorizable_payslips()
+        self.assertNotIn(slip_with_overtime, vectorizable)
+        self.assertEqual(len(vectorizable), len(self.contracts) - 1)
+
+        run.slip_ids.compute_sheet()
+        overtime_line = slip_with_overtime.line_ids.filtered(lambda l: l.code == 'HED')
+        self.assertGreater(overtime_line.total, 0.0)
+
+    @skipIf(hr_payroll_vectorized.np is None, "numpy no está instalado")
+    def test_03_vectorized_benchmark(self):
+        """Compara el tiempo de cálculo de un lote estándar contra el vectorizado"""
+        contracts = self.contracts
+        for _round in range(24):
+            contracts |= self.contracts.copy({'state': 'open'})
+        standard = self._create_run('standard', contracts)
+        vectorized = self._create_run('vectorized', contracts)
+
+        start = time.perf_counter()
+        standard.slip_ids.compute_sheet()
+        standard_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        vectorized.slip_ids.compute_sheet()
+        vectorized_time = time.perf_counter() - start
+
+        _logger.info(
+            "Lote de %s nóminas: estándar %.3fs, vectorizado %.3fs",
+            len(contracts), standard_time, vectorized_time)
+        self.assertEqual(len(vectorized.slip_ids.line_ids), len(standard.slip_ids.line_ids))
+
+    def test_04_without_numpy_uses_standard(self):
+        """Prueba que sin numpy el lote vectorizado se calcula con el motor de reglas"""
+        standard = self._create_run('standard', self.contracts)
+        vectorized = self._create_run('vectorized', self.contracts)
+        standard.slip_ids.compute_sheet()
+
+        with patch.object(hr_payroll_vectorized, 'np', None):
+            self.assertFalse(vectorized.slip_ids._get_vectorizable_payslips())
+            vectorized.slip_ids.compute_sheet()
+
+        self.assertEqual(self._lines(vectorized), self._lines(standard))
+
+    @skipIf(hr_payroll_vectorized.np is None, "numpy no está instalado")
+    def test_05_quantity_expression_uses_standard(self):
+        """Prueba que una regla con cantidad calculada saca la estructura del modo vectorizado"""
+        self.env.ref('nomina_colombia.hr_salary_rule_vacaciones_prov_col').quantity = \
+            'contract.wage > 3000000 and 2.0 or 1.0'
+        standard = self._create_run('standard', self.contracts)
+        vectorized = self._create_run('vectorized', self.contracts)
+        standard.slip_ids.compute_sheet()
+
+        self.assertFalse(vectorized.slip_ids._get_vectorizable_payslips())
+        vectorized.slip_ids.compute_sheet()
+        self.assertEqual(self._lines(vectorized), self._lines(standard))
@@ -0,0 +1,105 @@
+from odoo.tests.common import TransactionCase, tagged
+
+
+@tagged('post_install', '-at_install')
+class TestHrPayslipFingerprint(TransactionCase):
+    def setUp(self):
+        super(TestHrPayslipFingerprint, self).setUp()
+        self.company = self.env.company
+        self.company.country_id = self.env.ref('base.co')
+        self.structure = self.env.ref('nomina_colombia.hr_payroll_structure_col_standard')
+
+        self.contracts = self.env['hr.contract']
+        for index in range(3):
+            employee = self.env['hr.employee'].create({
+                'name': 'Empleado Huella %s' % index,
+                'identification_type': 'CC',
+                'identification_id': '66000%s' % index,
+            })
+            self.contracts |= self.env['hr.contract'].create({
+                'name': 'Contrato Huella %s' % index,
+                'employee_id': employee.id,
+                'wage': 1300000.0 + index * 100000.0,
+                'state': 'open',
+                'date_start': '2024-01-01',
+                'contract_type': 'fijo',
+                'transport_allowance': True,
+                'struct_id': self.structure.id,
+            })
+
+        self.payslips = self.env['hr.payslip'].create([{
+            'name': 'Nómina Huella %s' % contract.name,
+            'employee_id': contract.employee_id.id,
+            'contract_id': contract.id,
+            'struct_id': self.structure.id,
+            'date_from': '2024-04-01',
+            'date_to': '2024-04-30',
+        } for contract in self.contracts])
+        self.payslips.compute_sheet()
+
+    def test_01_unchanged_payslips_skipped(self):
+        """Prueba que las nóminas sin cambios no se recalculan"""
+        self.assertTrue(all(self.payslips.mapped('input_fingerprint')))
+        versions = self.payslips.mapped('version')
+
+        skipped = self.payslips._compute_sheet_incremental()
+
+        self.assertEqual(skipped, self.payslips)
+        self.assertEqual(self.payslips.mapped('version'), versions)
+
+    def test_02_changed_contract_recomputed(self):
+        """Prueba que un cambio en el contrato recalcula solo su nómina"""
+        changed = self.payslips[0]
+        changed.contract_id.wage = 1800000.0
+
+        skipped = self.payslips._compute_sheet_incremental()
+
+        self.assertEqual(skipped, self.payslips - changed)
+        basic = changed.line_ids.filtered(lambda l: l.code == 'BASIC')
+        self.assertEqual(basic.total, 1800000.0)
+
+    def test_03_legal_parameters_and_rules_in_fingerprint(self):
+        """Prueba que los parámetros legales y las reglas forman parte de la huella"""
+        fingerprints = self.payslips._get_input_fingerprints()
+
+        self.env.ref('nomina_colombia.hr_payroll_legal_parameter_2024').transport_allowance = 170000.0
+        self.assertNotEqual(self.payslips._get_input_fingerprints(), fingerprints)
+
+        fingerprints = self.payslips._get_input_fingerprints()
+        self.env.ref('nomina_colombia.hr_salary_rule_net_col').name = 'Neto'
+        self.env.ref('nomina_colombia.hr_salary_rule_net_col').flush_recordset()
+        self.assertFalse(self.payslips._compute_sheet_incremental())
+
+    def test_04_force_compute(self):
+        """Prueba que el contexto de forzado recalcula todas las nóminas"""
+        skipped = self.payslips.with_context(payslip_force_compute=True)._compute_sheet_incremental()
+        self.assertFalse(skipped)
+
+    def test_05_employee_inputs_in_fingerprint(self):
+        """Prueba que los datos del empleado y sus dependientes forman parte de la huella"""
+        employee = self.payslips[0].employee_id
+        fingerprints = self.payslips._get_input_fingerprints()
+
+        employee.arl_risk = '3'
+        changed = self.payslips._get_input_fingerprints()
+        self.assertNotEqual(changed[self.payslips[0]], fingerprints[self.payslips[0]])
+        self.assertEqual(changed[self.payslips[1]], fingerprints[self.payslips[1]])
+
+        fingerprints = changed
+        member = self.env['hr.employee.family'].create({
+            'employee_id': employee.id,
+            'relation_type': 'child',
+            'first_name': 'Hijo',
+            'first_surname': 'Huella',
+            'identification_type': 'RC',
+            'identification_id': '1100220033',
+            'birth_date': '2015-05-01',
+            'gender': 'male',
+        })
+        self.assertNotEqual(self.payslips._get_input_fingerprints(), fingerprints)
+
+        fingerprints = self.payslips._get_input_fingerprints()
+        member.is_dependent = True
+        self.assertEqual(
+            self.payslips._compute_sheet_incremental(), self.payslips - self.payslips[0])
+        self.assertNotEqual(self.payslips[0].input_fingerprint, fingerprints[self.payslips[0]])
@@ -0,0 +1,83 @@
+from datetime import timedelta
+
+from odoo import fields
+from odoo.tests.common import TransactionCase, tagged
+
+
+@tagged('post_install', '-at_install')
+class TestHrPayslipHistory(TransactionCase):
+    def setUp(self):
+        super(TestHrPayslipHistory, self).setUp()
+        self.company = self.env.company
+        self.company.country_id = self.env.ref('base.co')
+        self.structure = self.env.ref('nomina_colombia.hr_payroll_structure_col_standard')
+        self.History = self.env['hr.payslip.history']
+
+        employee = self.env['hr.employee'].create({
+            'name': 'Empleado Histórico',
+            'identification_type': 'CC',
+            'identification_id': '67000001',
+        })
+        contract = self.env['hr.contract'].create({
+            'name': 'Contrato Histórico',
+            'employee_id': employee.id,
+            'wage': 1500000.0,
+            'state': 'open',
+            'date_start': '2024-01-01',
+            'contract_type': 'fijo',
+            'transport_allowance': True,
+            'struct_id': self.structure.id,
+        })
+        self.payslip = self.env['hr.payslip'].create({
+            'name': 'Nómina Histórico',
+            'employee_id': employee.id,
+            'contract_id': contract.id,
+            'struct_id': self.structure.id,
+            'date_from': '2024-05-01',
+            'date_to': '2024-05-31',
+        })
+
+    def _compute_events(self):
+        return self.History.search([('payslip_id', '=', self.payslip.id), ('action', '=', 'compute')])
+
+    def test_01_events_buffered_until_flush(self):
+        """Los eventos se insertan en bloque al vaciar el buffer"""
+        self.payslip._log_history('compute', 'Prueba')
+        self.assertTrue(self.env.cr.precommit.data.get('nomina_colombia.payslip_history'))
+
+        self.env.cr.flush()
+        self.assertFalse(self.env.cr.precommit.data.get('nomina_colombia.payslip_history'))
+        events = self._compute_events()
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events.employee_id, self.payslip.employee_id)
+        self.assertEqual(events.user_id, self.env.user)
+        self.assertEqual(events.event_count, 1)
+
+    def test_02_search_sees_pending_events(self):
+        """Una búsqueda del histórico incluye los eventos pendientes"""
+        self.payslip.compute_sheet()
+        self.payslip.compute_sheet()
+        self.assertEqual(len(self._compute_events()), 2)
+
+    def test_03_rollup_old_compute_events(self):
+        """Los cálculos antiguos se consolidan en un registro con el conteo"""
+        old_date = fields.Date.today() - timedelta(days=200)
+        self.History._buffer_events([{
+            'payslip_id': self.payslip.id,
+            'employee_id': self.payslip.employee_id.id,
+            'date': old_date,
+            'action': action,
+            'notes': 'Antiguo',
+        } for action in ['compute', 'compute', 'compute', 'confirm']])
+        self.payslip._log_history('compute', 'Reciente')
+
+        removed = self.History._cron_rollup_compute_events(retention_days=90)
+        self.assertEqual(removed, 2)
+
+        events = self._compute_events()
+        self.assertEqual(len(events), 2)
+        rolled_up = events.filtered(lambda e: e.date == old_date)
+        self.assertEqual(rolled_up.event_count, 3)
+        self.assertEqual(events.filtered(lambda e: e.date != old_date).event_count, 1)
+        self.assertEqual(self.History.search_count([
+            ('payslip_id', '=', self.payslip.id), ('action', '=', 'confirm')]), 1)
@@ -0,0 +1,140 @@
+from unittest.mock import patch
+
+from odoo.exceptions import ValidationError
+from odoo.tests.common import TransactionCase, tagged
+
+
+class WorkerKilled(Exception):
+    pass
+
+
+@tagged('post_install', '-at_install')
+class TestHrPayslipRunChunk(TransactionCase):
+    def setUp(self):
+        super(TestHrPayslipRunChunk, self).setUp()
+        self.company = self.env.company
+        self.company.country_id = self.env.ref('base.co')
+        self.structure = self.env.ref('nomina_colombia.hr_payroll_structure_col_standard')
+
+        self.run = self.env['hr.payslip.run'].create({
+            'name': 'Lote Bloques',
+            'date_start': '2024-04-01',
+            'date_end': '2024-04-30',
+            'compute_chunk_size': 2,
+        })
+        contracts = self.env['hr.contract']
+        for index in range(5):
+            employee = self.env['hr.employee'].create({
+                'name': 'Empleado Bloque %s' % index,
+                'identification_type': 'CC',
+                'identification_id': '67000%s' % index,
+            })
+            contracts |= self.env['hr.contract'].create({
+                'name': 'Contrato Bloque %s' % index,
+                'employee_id': employee.id,
+                'wage': 1300000.0 + index * 100000.0,
+                'state': 'open',
+                'date_start': '2024-01-01',
+                'contract_type': 'fijo',
+                'struct_id': self.structure.id,
+            })
+        self.payslips = self.env['hr.payslip'].create([{
+            'name': 'Nómina Bloque %s' % contract.name,
+            'employee_id': contract.employee_id.id,
+            'contract_id': contract.id,
+            'struct_id': self.structure.id,
+            'payslip_run_id': self.run.id,
+            'date_from': '2024-04-01',
+            'date_to': '2024-04-30',
+        } for contract in contracts])
+
+        self.Chunk = self.env['hr.payslip.run.chunk']
+        # El cron confirma cada bloque; dentro de la prueba no se confirma nada
+        self.patch(self.env.cr, 'commit', lambda: None)
+        self.trigger = patch.object(type(self.env['ir.cron']), '_trigger', autospec=True)
+        self.trigger_mock = self.trigger.start()
+        self.addCleanup(self.trigger.stop)
+
+    def _queue(self):
+        self.run.action_compute_sheet_chunked()
+        return self.run.compute_chunk_ids.sorted('sequence')
+
+    def test_01_chunks_created(self):
+        chunks = self._queue()
+        self.assertEqual(chunks.mapped('slip_count'), [2, 2, 1])
+        self.assertEqual(chunks.slip_ids, self.payslips)
+        self.assertEqual(self.run.compute_state, 'queued')
+        self.assertEqual(self.trigger_mock.call_count, 1)
+
+    def test_02_chunk_size_must_be_positive(self):
+        with self.assertRaises(ValidationError):
+            self.run.compute_chunk_size = 0
+
+    def test_03_claim_in_order_and_only_pending(self):
+        chunks = self._queue()
+        self.assertEqual(self.Chunk._claim_next_chunk(), chunks[0])
+        chunks[0].state = 'done'
+        chunks[1].state = 'error'
+        self.assertEqual(self.Chunk._claim_next_chunk(), chunks[2])
+        chunks[2].state = 'done'
+        self.assertFalse(self.Chunk._claim_next_chunk())
+
+    def test_04_cron_processes_all_chunks(self):
+        chunks = self._queue()
+        processed = self.Chunk._cron_process_compute_chunks()
+
+        self.assertEqual(processed, len(chunks))
+        self.assertEqual(set(chunks.mapped('state')), {'done'})
+        self.assertTrue(all(self.payslips.mapped('line_ids')))
+        self.assertEqual(self.run.compute_state, 'done')
+        self.assertEqual(self.run.compute_progress, 100.0)
+
+    def test_05_failed_chunk_isolated(self):
+        chunks = self._queue()
+        Payslip = type(self.env['hr.payslip'])
+        compute = Payslip._compute_sheet_incremental
+        failing = chunks[1].slip_ids
+
+        def compute_or_fail(payslips):
+            if payslips & failing:
+                raise ValueError('Falla simulada')
+            return compute(payslips)
+
+        with patch.object(Payslip, '_compute_sheet_incremental', autospec=True, side_effect=compute_or_fail):
+            self.Chunk._cron_process_compute_chunks()
+
+        self.assertEqual(chunks.mapped('state'), ['done', 'error', 'done'])
+        self.assertIn('Falla simulada', chunks[1].error_message)
+        self.assertFalse(failing.line_ids)
+        self.assertEqual(self.run.compute_state, 'error')
+
+        # El reintento solo recalcula el bloque con error
+        versions = (self.payslips - failing).mapped('version')
+        self.run.action_retry_failed_chunks()
+        self.assertEqual(self.Chunk._cron_process_compute_chunks(), 1)
+        self.assertEqual(set(chunks.mapped('state')), {'done'})
+        self.assertEqual((self.payslips - failing).mapped('version'), versions)
+
+    def test_06_resume_after_interruption(self):
+        chunks = self._queue()
+        Chunk = type(self.Chunk)
+        process = Chunk._process_chunk
+
+        def process_once(chunk):
+            if chunk != chunks[0]:
+                raise WorkerKilled()
+            return process(chunk)
+
+        # El proceso muere después de confirmar el primer bloque
+        with patch.object(Chunk, '_process_chunk', autospec=True, side_effect=process_once):
+            with self.assertRaises(WorkerKilled):
+                self.Chunk._cron_process_compute_chunks()
+        self.assertEqual(chunks.mapped('state'), ['done', 'pending', 'pending'])
+
+        # La siguiente ejecución continúa desde el último bloque confirmado
+        versions = chunks[0].slip_ids.mapped('version')
+        self.trigger_mock.reset_mock()
+        self.assertEqual(self.Chunk._cron_process_compute_chunks(), 2)
+        self.assertEqual(set(chunks.mapped('state')), {'done'})
+        self.assertEqual(chunks[0].slip_ids.mapped('version'), versions)
+        self.assertFalse(self.trigger_mock.called)
@@ -0,0 +1,117 @@
+from odoo.tests.common import TransactionCase, tagged
+from odoo.addons.nomina_colombia.models.hr_payslip import LINE_CODE_SUMMARY_MAP, LINE_SUMMARY_FIELDS
+import logging
+import time
+
+_logger = logging.getLogger(__name__)
+
+
+@tagged('post_install', '-at_install')
+class TestHrPayslipSummary(TransactionCase):
+    def setUp(self):
+        super(TestHrPayslipSummary, self).setUp()
+        self.company = self.env.company
+        self.company.country_id = self.env.ref('base.co')
+
+        self.employee = self.env['hr.employee'].create({
+            'name': 'Empleado Resumen',
+            'identification_type': 'CC',
+            'identification_id': '1122334455',
+        })
+
+        self.contract = self.env['hr.contract'].create({
+            'name': 'Contrato Resumen',
+            'employee_id': self.employee.id,
+            'wage': 1300000.0,
+            'state': 'open',
+            'date_start': '2024-01-01',
+            'contract_type': 'fijo',
+        })
+
+        # Reglas y montos usados en todas las nóminas de prueba
+        self.rule_amounts = [
+            (self.env.ref('nomina_colombia.hr_salary_rule_sena_col'), 26000.0),
+            (self.env.ref('nomina_colombia.hr_salary_rule_icbf_col'), 39000.0),
+            (self.env.ref('nomina_colombia.hr_salary_rule_ccf_col'), 52000.0),
+        ]
+
+    def _create_payslips(self, count):
+        payslips = self.env['hr.payslip'].create([{
+            'name': 'Nómina Resumen %s' % index,
+            'employee_id': self.employee.id,
+            'contract_id': self.contract.id,
+            'date_from': '2024-01-01',
+            'date_to': '2024-01-31',
+        } for index in range(count)])
+        self.env['hr.payslip.line'].create([{
+            'slip_id': payslip.id,
+            'salary_rule_id': rule.id,
+            'contract_id': self.contract.id,
+            'employee_id': self.employee.id,
+            'name': rule.name,
+            'code': rule.code,
+            'amount': amount,
+            'quantity': 1.0,
+            'rate': 100.0,
+        } for payslip in payslips for rule, amount in self.rule_amounts])
+        return payslips
+
+    def _measure_summary(self, payslips):
+        """Retorna las consultas de recalcular los campos resumen"""
+        return self._measure_fused_summary(payslips)[0]
+
+    def _measure_fused_summary(self, payslips):
+        """Retorna (consultas, segundos) de recalcular los campos resumen con el agregador"""
+        payslips.invalidate_recordset()
+        self.env['hr.payslip.line'].invalidate_model()
+        queries_before = self.env.cr.sql_log_count
+        start = time.perf_counter()
+        payslips._compute_line_summary()
+        return self.env.cr.sql_log_count - queries_before, time.perf_counter() - start
+
+    def _measure_per_field_summary(self, payslips):
+        """
+        Retorna (consultas, segundos) de los computes separados que reemplaza el
+        agregador: cada campo se recalculaba por su lado, recorriendo line_ids
+        de cada nómina con las líneas recién leídas de la base de datos
+        """
+        payslips.invalidate_recordset()
+        queries_before = self.env.cr.sql_log_count
+        start = time.perf_counter()
+        for fname in LINE_SUMMARY_FIELDS:
+            self.env['hr.payslip.line'].invalidate_model()
+            codes = {code for code, field in LINE_CODE_SUMMARY_MAP.items() if field == fname}
+            for payslip in payslips:
+                sum(line.total for line in payslip.line_ids if line.code in codes)
+        return self.env.cr.sql_log_count - queries_before, time.perf_counter() - start
+
+    def test_01_summary_values(self):
+        """Prueba que el agregador llena los campos desde el mapa de códigos"""
+        payslip = self._create_payslips(1)
+        payslip._compute_line_summary()
+
+        self.assertEqual(payslip.parafiscal_sena, 26000.0)
+        self.assertEqual(payslip.parafiscal_icbf, 39000.0)
+        self.assertEqual(payslip.parafiscal_caja, 52000.0)
+        self.assertEqual(payslip.prima_value, 0.0)
+        self.assertEqual(payslip.withholding_tax, 0.0)
+
+    def test_02_summary_query_count_constant(self):
+        """Prueba que el número de consultas no crece con el número de nóminas"""
+        queries_small = self._measure_summary(self._create_payslips(5))
+        queries_large = self._measure_summary(self._create_payslips(50))
+
+        self.assertEqual(queries_small, queries_large)
+
+    def test_03_summary_gain_over_per_field_computes(self):
+        """Prueba que el agregador es más rápido y hace menos consultas que los computes por campo"""
+        payslips = self._create_payslips(200)
+
+        per_field_queries, per_field_time = self._measure_per_field_summary(payslips)
+        fused_queries, fused_time = self._measure_fused_summary(payslips)
+
+        _logger.info(
+            "Resumen de nómina (%s nóminas): por campo %s consultas / %.4fs, agregado %s consultas / %.4fs",
+            len(payslips), per_field_queries, per_field_time, fused_queries, fused_time)
+        self.assertLess(fused_queries * 2, per_field_queries)
+        self.assertLess(fused_time, per_field_time)
@@ -0,0 +1,116 @@
+from datetime import date
+
+from odoo.exceptions import UserError
+from odoo.tests.common import tagged
+
+from odoo.addons.nomina_colombia.models import hr_pila_layout as layout
+
+from .common import PayrollDataCase
+
+
+@tagged('post_install', '-at_install')
+class TestHrPilaLayout(PayrollDataCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super(TestHrPilaLayout, cls).setUpClass()
+        data = cls._create_payroll_company(4, '2024-09-01')
+        cls.payslips = data['payslips']
+        cls.payslips.compute_sheet()
+        cls.payslips.action_payslip_done()
+        cls.pila = cls.env['hr.pila'].create({
+            'company_id': data['company'].id,
+            'date_from': data['date_from'],
+            'date_to': data['date_to'],
+            'payment_date': date(2024, 10, 5),
+            'payslip_ids': [(6, 0, cls.payslips.ids)],
+        })
+        cls.Processing = cls.env['hr.pila.processing']
+
+    def test_01_record_lengths(self):
+        self.assertEqual(layout.HEADER_LAYOUT.length, 500)
+        self.assertEqual(layout.DETAIL_LAYOUT.length, 800)
+        self.assertEqual(layout.FOOTER_LAYOUT.length, 300)
+
+    def test_02_spec_must_be_contiguous(self):
+        with self.assertRaises(ValueError):
+            layout.RecordLayout('prueba', 10, [
+                layout.pila_field('a', 1, 4),
+                layout.pila_field('b', 6, 5),
+            ])
+        with self.assertRaises(ValueError):
+            layout.RecordLayout('prueba', 10, [layout.pila_field('a', 1, 4)])
+
+    def test_03_format_and_parse_roundtrip(self):
+        record = layout.RecordLayout('prueba', 30, [
+            layout.pila_field('tipo', 1, 2, layout.NUMERIC, value=2),
+            layout.pila_field('nombre', 3, 6),
+            layout.pila_field('valor', 9, 8, layout.NUMERIC, rounding=-2),
+            layout.pila_field('tarifa', 17, 7, layout.NUMERIC, rounding=5),
+            layout.pila_field('periodo', 24, 7, layout.PERIOD),
+        ])
+        line = record.format(('Nombre largo', 52049.9, 0.04, date(2024, 9, 1)))
+        self.assertEqual(line, '02Nombre000521000.040002024-09')
+        self.assertEqual(record.parse(line), {
+            'tipo': 2,
+            'nombre': 'Nombre',
+            'valor': 52100,
+            'tarifa': 0.04,
+            'periodo': date(2024, 9, 1),
+        })
+        with self.assertRaises(ValueError):
+            record.format(('Nombre', -1.0, 0.04, None))
+        with self.assertRaises(ValueError):
+            record.format(('Nombre', 10 ** 9, 0.04, None))
+        with self.assertRaises(ValueError):
+            record.parse('03' + line[2:])
+
+    def test_04_generated_file_passes_validation(self):
+        content = self.pila._generate_pila_content()
+        lines = content.split('\n')
+        self.assertEqual(len(lines), len(self.payslips) + 2)
+        self.assertEqual(self.Processing.validate_pila_structure(content), [])
+
+        header = layout.HEADER_LAYOUT.parse(lines[0])
+        self.assertEqual(header['periodo_pension'], date(2024, 9, 1))
+        self.assertEqual(header['periodo_salud'], date(2024, 10, 1))
+        self.assertEqual(header['total_empleados'], len(self.payslips))
+
+        details = [layout.DETAIL_LAYOUT.parse(line) for line in lines[1:-1]]
+        self.assertEqual([detail['secuencia'] for detail in details], list(range(1, len(self.payslips) + 1)))
+        self.assertEqual(
+            {detail['numero_documento'] for detail in details},
+            set(self.payslips.employee_id.mapped('identification_id')))
+
+        footer = layout.FOOTER_LAYOUT.parse(lines[-1])
+        self.assertEqual(footer['total_empleados'], len(details))
+        self.assertEqual(footer['total_salud'], sum(detail['cotizacion_salud'] for detail in details))
+        self.assertEqual(footer['total_pension'], sum(detail['cotizacion_pension'] for detail in details))
+        self.assertEqual(footer['total_parafiscales'], sum(
+            detail['valor_ccf'] + detail['valor_sena'] + detail['valor_icbf'] for detail in details))
+        self.assertEqual(footer['total_aportes'], footer['total_salud'] + footer['total_pension']
+                         + footer['total_arl'] + footer['total_parafiscales'])
+        for detail in details:
+            self.assertEqual(detail['cotizacion_salud'] % 100, 0)
+
+    def test_05_validator_rejects_malformed_records(self):
+        lines = self.pila._generate_pila_content().split('\n')
+        self.assertFalse(self.Processing._validate_header(lines[0][:-1]))
+        self.assertFalse(self.Processing._validate_detail('03' + lines[1][2:]))
+        self.assertFalse(self.Processing._validate_footer(lines[-1][:10] + 'X' + lines[-1][11:]))
+
+    def test_06_contributions_round_up_to_hundred(self):
+        record = layout.RecordLayout('prueba', 9, [
+            layout.pila_field('valor', 1, 9, layout.NUMERIC, rounding=-2),
+        ])
+        self.assertEqual(record.format((52000.0,)), '000052000')
+        self.assertEqual(record.format((52000.001,)), '000052000')
+        self.assertEqual(record.format((52000.01,)), '000052100')
+        self.assertEqual(record.format((52099.0,)), '000052100')
+        self.assertEqual(record.format((0.0,)), '000000000')
+
+    def test_07_non_numeric_contributor_type_reported(self):
+        employee = self.payslips[0].employee_id
+        employee.pila_code = 'CC%s' % employee.identification_id
+        with self.assertRaisesRegex(UserError, employee.name):
+            self.pila._generate_pila_content()
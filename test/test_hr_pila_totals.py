@@ -0,0 +1,77 @@
+from odoo.tests.common import tagged
+
+from odoo.addons.nomina_colombia.models.hr_pila import PILA_TOTAL_FIELDS
+from odoo.addons.nomina_colombia.models.hr_pila_layout import CONTRIBUTION_ROUNDING, FOOTER_LAYOUT, round_up
+
+from .common import PayrollDataCase
+
+
+@tagged('post_install', '-at_install')
+class TestHrPilaTotals(PayrollDataCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super(TestHrPilaTotals, cls).setUpClass()
+        data = cls._create_payroll_company(6, '2024-09-01')
+        cls.payslips = data['payslips']
+        cls.payslips.compute_sheet()
+        cls.payslips.action_payslip_done()
+        cls.pila = cls.env['hr.pila'].create({
+            'company_id': data['company'].id,
+            'date_from': data['date_from'],
+            'date_to': data['date_to'],
+            'payslip_ids': [(6, 0, cls.payslips.ids)],
+        })
+
+    def _expected(self, payslips):
+        expected = dict.fromkeys(PILA_TOTAL_FIELDS.values(), 0.0)
+        for payslip in payslips:
+            for code, field_name in PILA_TOTAL_FIELDS.items():
+                lines = payslip.line_ids.filtered(lambda l: l.code == code)
+                expected[field_name] += round_up(abs(sum(lines.mapped('total'))), CONTRIBUTION_ROUNDING)
+        return expected
+
+    def _assert_totals(self, pila, payslips):
+        self.assertEqual(pila.total_employees, len(payslips.employee_id))
+        for field_name, amount in self._expected(payslips).items():
+            self.assertAlmostEqual(pila[field_name], amount, places=2, msg=field_name)
+
+    def test_01_totals_on_create(self):
+        self._assert_totals(self.pila, self.payslips)
+        self.assertTrue(self.pila.total_health)
+
+    def test_02_only_done_payslips(self):
+        cancelled = self.payslips[:2]
+        cancelled.write({'state': 'cancel'})
+        self.pila._compute_totals()
+        self._assert_totals(self.pila, self.payslips - cancelled)
+
+    def test_03_line_changes_do_not_recompute(self):
+        total_health = self.pila.total_health
+        line = self.payslips.line_ids.filtered(lambda l: l.code == 'HEALTH')[:1]
+        line.amount += 1000.0
+        self.assertEqual(self.pila.total_health, total_health)
+
+        # Se recalcula de forma explícita al generar el archivo
+        self.pila.action_generate_file()
+        self._assert_totals(self.pila, self.payslips)
+
+    def test_04_write_payslips(self):
+        self.pila.write({'payslip_ids': [(3, self.payslips[0].id)]})
+        self._assert_totals(self.pila, self.payslips[1:])
+
+    def test_05_lines_not_loaded(self):
+        self.env.invalidate_all()
+        self.pila._compute_totals()
+        Line = self.env['hr.payslip.line']
+        self.assertFalse(self.env.cache.get_records(Line, Line._fields['total']))
+
+    def test_06_totals_match_file_footer(self):
+        self.assertFalse(self.pila.total_health % 100)
+        self.assertGreater(self.pila.total_pension, 0)
+
+        footer = FOOTER_LAYOUT.parse(self.pila._generate_pila_content().split('\n')[-1])
+        self.assertEqual(footer['total_salud'], self.pila.total_health)
+        self.assertEqual(footer['total_pension'], self.pila.total_pension)
+        self.assertEqual(footer['total_arl'], self.pila.total_arl)
+        self.assertEqual(footer['total_parafiscales'], self.pila.total_parafiscal)
@@ -0,0 +1,134 @@
+import logging
+import os
+import time
+from unittest.mock import patch
+
+from odoo.exceptions import UserError
+from odoo.tests.common import TransactionCase, tagged
+from odoo.tools import frozendict
+
+from odoo.addons.nomina_colombia.models import hr_salary_rule
+from odoo.addons.nomina_colombia.models.hr_payslip import RULE_NAMESPACE_CACHE_KEY
+
+_logger = logging.getLogger(__name__)
+
+
+@tagged('post_install', '-at_install')
+class TestHrSalaryRuleCache(TransactionCase):
+    def setUp(self):
+        super(TestHrSalaryRuleCache, self).setUp()
+        self.company = self.env.company
+        self.company.country_id = self.env.ref('base.co')
+        self.structure = self.env.ref('nomina_colombia.hr_payroll_structure_col_standard')
+        # Este caso evalúa el código de las reglas, no los manejadores nativos
+        self.structure.rule_ids.write({'compute_engine': 'safe_eval'})
+
+        self.employee = self.env['hr.employee'].create({
+            'name': 'Empleado Reglas',
+            'identification_type': 'CC',
+            'identification_id': '9988776655',
+        })
+
+        self.contract = self.env['hr.contract'].create({
+            'name': 'Contrato Reglas',
+            'employee_id': self.employee.id,
+            'wage': 1300000.0,
+            'state': 'open',
+            'date_start': '2024-01-01',
+            'contract_type': 'fijo',
+            'transport_allowance': True,
+            'struct_id': self.structure.id,
+        })
+
+    def _create_payslips(self, count):
+        return self.env['hr.payslip'].create([{
+            'name': 'Nómina Reglas %s' % index,
+            'employee_id': self.employee.id,
+            'contract_id': self.contract.id,
+            'struct_id': self.structure.id,
+            'date_from': '2024-01-01',
+            'date_to': '2024-01-31',
+        } for index in range(count)])
+
+    def _line_totals(self, payslips):
+        return sorted((line.slip_id.id, line.code, line.total) for line in payslips.line_ids)
+
+    def test_01_frozen_namespace_per_batch(self):
+        """Prueba que cada nómina parte del espacio de nombres congelado del lote"""
+        payslip = self._create_payslips(1)
+        self.env.cr.cache[RULE_NAMESPACE_CACHE_KEY] = frozendict({'marker': 1})
+        try:
+            localdict = payslip._get_base_local_dict()
+        finally:
+            self.env.cr.cache.pop(RULE_NAMESPACE_CACHE_KEY)
+        self.assertEqual(localdict['marker'], 1)
+        self.assertIn('legal', localdict)
+
+        payslip.compute_sheet()
+        self.assertNotIn(RULE_NAMESPACE_CACHE_KEY, self.env.cr.cache)
+        self.assertTrue(payslip.line_ids.filtered(lambda l: l.code == 'BASIC'))
+
+    def test_02_rule_code_sandboxed(self):
+        """Prueba que el código de las reglas se sigue evaluando con safe_eval"""
+        rule = self.env.ref('nomina_colombia.hr_salary_rule_basic_col')
+        rule.amount_python_compute = "result = __import__('os').getpid()"
+        with self.assertRaises(UserError):
+            self._create_payslips(1).compute_sheet()
+
+    def test_03_compiled_matches_safe_eval(self):
+        """Prueba que las reglas compiladas producen las mismas líneas que safe_eval"""
+        payslips = self._create_payslips(3)
+
+        payslips.with_context(disable_compiled_rules=True).compute_sheet()
+        expected = self._line_totals(payslips)
+
+        payslips.compute_sheet()
+        self.assertEqual(self._line_totals(payslips), expected)
+
+    def test_04_compiled_once_per_rule_version(self):
+        """Prueba que el código se compila una vez por regla y se renueva al modificarla"""
+        self.env.registry.clear_cache()
+        with patch.object(hr_salary_rule, 'test_expr', wraps=hr_salary_rule.test_expr) as compile_code:
+            self._create_payslips(5).compute_sheet()
+        rules = self.structure.rule_ids
+        self.assertTrue(compile_code.called)
+        self.assertLessEqual(compile_code.call_count, 2 * len(rules))
+
+        rule = self.env.ref('nomina_colombia.hr_salary_rule_basic_col')
+        code = rule._compile_rule_code(rule.id, rule.write_date, 'amount_python_compute')
+        self.assertIs(rule._compile_rule_code(rule.id, rule.write_date, 'amount_python_compute'), code)
+        rule.amount_python_compute = 'result = contract.wage / 2'
+        rule.flush_recordset()
+        self.assertIsNot(rule._compile_rule_code(rule.id, rule.write_date, 'amount_python_compute'), code)
+
+    def test_05_local_values_checked_on_every_evaluation(self):
+        """Prueba que un módulo en el diccionario local se rechaza como en safe_eval"""
+        payslip = self._create_payslips(1)
+        rule = self.env.ref('nomina_colombia.hr_salary_rule_basic_col')
+        localdict = {
+            'employee': self.employee,
+            'contract': self.contract,
+            'payslip': payslip,
+            'os': os,
+        }
+        with self.assertRaises(UserError):
+            rule._eval_rule_code('amount_python_compute', localdict, 'Prueba')
+
+    def test_06_compute_sheet_benchmark(self):
+        """Compara el tiempo por nómina de compute_sheet con safe_eval y con reglas compiladas"""
+        count = 50
+        legacy = self._create_payslips(count)
+        compiled = self._create_payslips(count)
+
+        start = time.perf_counter()
+        legacy.with_context(disable_compiled_rules=True).compute_sheet()
+        legacy_time = (time.perf_counter() - start) / count
+
+        start = time.perf_counter()
+        compiled.compute_sheet()
+        compiled_time = (time.perf_counter() - start) / count
+
+        _logger.info(
+            "compute_sheet por nómina (%s nóminas): safe_eval %.2f ms, compilado %.2f ms",
+            count, legacy_time * 1000, compiled_time * 1000)
+        self.assertEqual(len(legacy.line_ids), len(compiled.line_ids))
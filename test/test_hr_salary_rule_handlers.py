@@ -0,0 +1,158 @@
+from odoo.tests.common import TransactionCase, tagged
+from odoo.exceptions import ValidationError
+from odoo.tools import float_round
+
+
+@tagged('post_install', '-at_install')
+class TestHrSalaryRuleHandlers(TransactionCase):
+    def setUp(self):
+        super(TestHrSalaryRuleHandlers, self).setUp()
+        self.company = self.env.company
+        self.company.country_id = self.env.ref('base.co')
+        self.structure = self.env.ref('nomina_colombia.hr_payroll_structure_col_standard')
+        self.rules = self.structure.rule_ids
+
+        self.overtime_type = self.env['hr.work.entry.type'].create({
+            'name': 'Hora Extra Diurna',
+            'code': 'HED',
+        })
+
+        # Contratos que cubren los casos de las reglas estándar
+        self.contracts = self.env['hr.contract']
+        for index, (wage, transport, severance_base) in enumerate([
+            (1300000.0, True, 'legal'),     # Salario mínimo con auxilio
+            (2600000.0, True, 'all'),       # Límite de 2 SMMLV
+            (4500000.0, False, 'wage'),     # Sin auxilio, cesantías sobre salario
+            (25000000.0, False, 'legal'),   # Salario alto
+        ]):
+            employee = self.env['hr.employee'].create({
+                'name': 'Empleado Paridad %s' % index,
+                'identification_type': 'CC',
+                'identification_id': '77000%s' % index,
+            })
+            self.contracts |= self.env['hr.contract'].create({
+                'name': 'Contrato Paridad %s' % index,
+                'employee_id': employee.id,
+                'wage': wage,
+                'state': 'open',
+                'date_start': '2023-01-01',
+                'contract_type': 'fijo',
+                'transport_allowance': transport,
+                'severance_base': severance_base,
+                'struct_id': self.structure.id,
+            })
+
+    def _create_payslips(self, date_from, date_to):
+        return self.env['hr.payslip'].create([{
+            'name': 'Nómina Paridad %s' % contract.name,
+            'employee_id': contract.employee_id.id,
+            'contract_id': contract.id,
+            'struct_id': self.structure.id,
+            'date_from': date_from,
+            'date_to': date_to,
+            'worked_days_line_ids': [(0, 0, {
+                'name': 'Horas Extra Diurnas',
+                'work_entry_type_id': self.overtime_type.id,
+                'number_of_days': 1.0,
+                'number_of_hours': 10.0,
+            })],
+        } for contract in self.contracts])
+
+    def _lines_by_engine(self, engine, date_from, date_to):
+        self.rules.write({'compute_engine': engine})
+        payslips = self._create_payslips(date_from, date_to)
+        payslips.compute_sheet()
+        return {
+            (line.contract_id.id, line.code): (
+                float_round(line.amount, precision_digits=0),
+                line.quantity,
+                line.rate,
+                float_round(line.total, precision_digits=0),
+            )
+            for line in payslips.line_ids
+        }
+
+    def _assert_parity(self, date_from, date_to):
+        expected = self._lines_by_engine('safe_eval', date_from, date_to)
+        native = self._lines_by_engine('native', date_from, date_to)
+
+        self.assertEqual(set(native), set(expected))
+        for key, values in expected.items():
+            self.assertEqual(native[key], values, 'Diferencia en la regla %s' % key[1])
+
+    def test_01_parity_2024(self):
+        """Prueba que los manejadores nativos igualan a safe_eval al peso (2024)"""
+        self._assert_parity('2024-03-01', '2024-03-31')
+
+    def test_02_parity_retroactive_year(self):
+        """Prueba la paridad con los parámetros legales de un año anterior"""
+        self._assert_parity('2023-03-01', '2023-03-31')
+
+    def test_03_benefit_handlers_match_helpers(self):
+        """Prueba que los manejadores de prestaciones igualan los métodos de la nómina"""
+        from odoo.addons.nomina_colombia.models.hr_salary_rule_handlers import BATCH_RULE_HANDLERS
+
+        payslips = self._create_payslips('2024-06-01', '2024-06-30')
+        rule = self.rules[:1]
+        helpers = {
+            'PRIMA': '_calculate_prima',
+            'CESANTIAS': '_calculate_cesantias',
+            'INT_CESANTIAS': '_calculate_intereses_cesantias',
+        }
+        for code, helper in helpers.items():
+            amounts = BATCH_RULE_HANDLERS[code](rule, payslips)
+            for payslip in payslips:
+                self.assertEqual(
+                    float_round(amounts[payslip.id][0], precision_digits=0),
+                    float_round(getattr(payslip, helper)(), precision_digits=0),
+                    'Diferencia en %s para %s' % (code, payslip.name))
+
+    def test_04_parity_condition_false(self):
+        """Prueba que las reglas nativas respetan su condición cuando no se cumple"""
+        health = self.env.ref('nomina_colombia.hr_salary_rule_health_col')
+        health.write({
+            'condition_select': 'python',
+            'condition_python': 'result = contract.wage < 3000000',
+        })
+        self.env['hr.salary.rule'].create({
+            'name': 'Prima de Servicios',
+            'code': 'PRIMA',
+            'category_id': self.env.ref('nomina_colombia.hr_salary_rule_category_basic_col').id,
+            'struct_id': self.structure.id,
+            'sequence': 20,
+            'condition_select': 'python',
+            'condition_python': 'result = payslip.date_to.month in (6, 12)',
+            'amount_select': 'code',
+            'amount_python_compute': 'result = calculate_prima()',
+        })
+        self.rules = self.structure.rule_ids
+
+        self._assert_parity('2024-03-01', '2024-03-31')
+        native = self._lines_by_engine('native', '2024-03-01', '2024-03-31')
+        codes = {code for _contract, code in native}
+        self.assertNotIn('PRIMA', codes)
+        self.assertEqual(
+            {contract_id for contract_id, code in native if code == 'HEALTH'},
+            set(self.contracts.filtered(lambda c: c.wage < 3000000).ids))
+
+        # En junio la condición se cumple y el monto es el del método de la nómina
+        self._assert_parity('2024-06-01', '2024-06-30')
+
+    def test_05_native_requires_handler(self):
+        """Prueba que solo se permite el motor nativo con un manejador registrado"""
+        rule = self.env['hr.salary.rule'].create({
+            'name': 'Regla Sin Manejador',
+            'code': 'SIN_MANEJADOR',
+            'category_id': self.env.ref('nomina_colombia.hr_salary_rule_category_basic_col').id,
+            'struct_id': self.structure.id,
+            'amount_select': 'fix',
+            'amount_fix': 1.0,
+        })
+        with self.assertRaises(ValidationError):
+            rule.compute_engine = 'native'
+
+    def test_06_parity_quantity_expression(self):
+        """Prueba que la cantidad de la regla se evalúa como expresión, igual que en safe_eval"""
+        self.env.ref('nomina_colombia.hr_salary_rule_vacaciones_prov_col').quantity = \
+            'contract.wage > 3000000 and 2.0 or 1.0'
+        self._assert_parity('2024-03-01', '2024-03-31')
@@ -0,0 +1,57 @@
+import base64
+
+from odoo.tests.common import TransactionCase, tagged
+
+
+@tagged('post_install', '-at_install')
+class TestImportEmployeeWizard(TransactionCase):
+
+    def _import(self, rows):
+        lines = ['identification_type,identification_id,name,work_email,mobile_phone,department'] + rows
+        wizard = self.env['hr.employee.import.wizard'].create({
+            'file': base64.b64encode('\n'.join(lines).encode('utf-8')),
+            'filename': 'empleados.csv',
+        })
+        wizard.action_import()
+        return self.env['hr.employee.import.log'].search([], order='id desc', limit=1)
+
+    def test_01_invalid_rows_do_not_block_the_file(self):
+        """Las filas inválidas se reportan y las demás se importan"""
+        log = self._import([
+            'CC,7100001,Empleado Uno,uno@example.com,3000000001,Importación',
+            'XX,7100002,Empleado Tipo Inválido,dos@example.com,3000000002,Importación',
+            'CC,12AB,Empleado Cédula Inválida,tres@example.com,3000000003,Importación',
+            'CC,7100004,Empleado Cuatro,cuatro@example.com,3000000004,Importación',
+        ])
+
+        employees = self.env['hr.employee'].search([('identification_id', 'like', '71000')])
+        self.assertEqual(sorted(employees.mapped('identification_id')), ['7100001', '7100004'])
+        self.assertEqual(log.employees_created, 2)
+        self.assertIn('Error en línea 3', log.errors)
+        self.assertIn('Error en línea 4', log.errors)
+        self.assertNotIn('Error en línea 2', log.errors)
+
+    def test_02_existing_employee_updated(self):
+        """Las filas de empleados existentes actualizan el registro"""
+        self._import(['CC,7200001,Nombre Anterior,anterior@example.com,3000000001,Importación'])
+        log = self._import(['CC,7200001,Nombre Nuevo,nuevo@example.com,3000000001,Importación'])
+
+        employee = self.env['hr.employee'].search([('identification_id', '=', '7200001')])
+        self.assertEqual(employee.name, 'Nombre Nuevo')
+        self.assertEqual(log.employees_updated, 1)
+        self.assertFalse(log.errors)
+
+    def test_03_repeated_identification_counted_once(self):
+        """Una identificación repetida no se reporta como actualización"""
+        self._import(['CC,7300001,Empleado Existente,existente@example.com,3000000001,Importación'])
+        log = self._import([
+            'CC,7300001,Existente Primera,primera@example.com,3000000001,Importación',
+            'CC,7300001,Existente Segunda,segunda@example.com,3000000001,Importación',
+            'CC,7300002,Nuevo Primera,nuevo1@example.com,3000000002,Importación',
+            'CC,7300002,Nuevo Segunda,nuevo2@example.com,3000000002,Importación',
+        ])
+
+        self.assertEqual(log.employees_updated, 1)
+        self.assertEqual(log.employees_created, 1)
+        new_employee = self.env['hr.employee'].search([('identification_id', '=', '7300002')])
+        self.assertEqual(new_employee.name, 'Nuevo Segunda')
@@ -130,10 +130,12 @@ class HrPayrollBankFileWizard(models.TransientModel):
                 ) % '\n'.join(employees_without_account))
 
             # Generar archivo(s)
-            if self.group_by_department:
-                return self._generate_files_by_department()
-            else:
-                return self._generate_single_file()
+            with self.env['hr.payroll.run.metrics']._track_stage(
+                    'bank', self.payslip_run_id.slip_ids, run=self.payslip_run_id):
+                if self.group_by_department:
+                    return self._generate_files_by_department()
+                else:
+                    return self._generate_single_file()
 
         except Exception as e:
             raise ValidationError(_('Error generando archivo: %s') % str(e))
@@ -1,6 +1,5 @@
 from odoo import models, fields, api, _
 from odoo.exceptions import ValidationError
-from datetime import datetime, timedelta
 import calendar
 import logging
 
@@ -109,12 +108,17 @@ class HrPayrollProvisionWizard(models.TransientModel):
             if not employees:
                 raise ValidationError(_('No se encontraron empleados para calcular provisiones'))
 
+            Metrics = self.env['hr.payroll.run.metrics']
+
             # Calcular provisiones
-            provisions = self._calculate_provisions(employees)
+            with Metrics._track_stage('provision', employees, period=self.date_to):
+                provisions = self._calculate_provisions(employees)
 
             # Generar asientos contables si es necesario
             if self.generate_journal_entries:
-                move = self._create_journal_entries(provisions)
+                with Metrics._track_stage('accounting', employees, period=self.date_to) as measure:
+                    move = self._create_journal_entries(provisions)
+                    measure['rows'] = len(move.line_ids) + 1 if move else 0
 
             # Crear registro de provisiones
             provision_record = self._create_provision_record(provisions)
@@ -155,6 +159,8 @@ class HrPayrollProvisionWizard(models.TransientModel):
     def _calculate_provisions(self, employees):
         """Calcula provisiones para los empleados"""
         provisions = []
+        # Bases de todos los empleados en una sola consulta agrupada
+        bases = self._get_provision_bases(employees)
         
         for employee in employees:
             contract = employee.contract_id
@@ -162,7 +168,7 @@ class HrPayrollProvisionWizard(models.TransientModel):
                 continue
 
             # Calcular base para provisiones
-            base = self._calculate_provision_base(contract)
+            base = bases.get(employee.id, 0.0)
 
             # Calcular provisiones según tipo seleccionado
             if self.provision_types in ['all', 'prima']:
@@ -209,40 +215,44 @@ class HrPayrollProvisionWizard(models.TransientModel):
 
     def _calculate_provision_base(self, contract):
         """Calcula la base para provisiones"""
-        # Obtener nóminas del período
-        payslips = self.env['hr.payslip'].search([
-            ('employee_id', '=', contract.employee_id.id),
-            ('state', 'in', ['done', 'paid']),
-            ('date_from', '>=', self.date_from),
-            ('date_to', '<=', self.date_to)
-        ])
-
-        base_amount = 0
-        for payslip in payslips:
-            # Sumar conceptos base para provisiones
-            for line in payslip.line_ids:
-                if line.salary_rule_id.include_in_provisions:
-                    base_amount += line.total
-
-        return base_amount
+        return self._get_provision_bases(contract.employee_id).get(contract.employee_id.id, 0.0)
+
+    def _get_provision_bases(self, employees):
+        """
+        Suma los conceptos base para provisiones de las nóminas del período
+
+        :param employees: Empleados a calcular
+        :return: Diccionario {id de empleado: base}
+        """
+        bases = {}
+        for employee, total in self.env['hr.payslip.line']._read_group([
+            ('slip_id.employee_id', 'in', employees.ids),
+            ('slip_id.state', 'in', ['done', 'paid']),
+            ('slip_id.date_from', '>=', self.date_from),
+            ('slip_id.date_to', '<=', self.date_to),
+            ('salary_rule_id.include_in_provisions', '=', True),
+        ], ['employee_id'], ['total:sum']):
+            bases[employee.id] = total
+        return bases
 
     def _calculate_prima(self, contract, base_amount):
         """Calcula provisión de prima"""
         # Prima = (Salario + Auxilio de Transporte) / 12
-        transport = contract.transport_allowance or 0
+        transport = contract._get_transport_allowance(self.date_to)
         return (base_amount + transport) * 0.0833  # (1/12)
 
     def _calculate_cesantias(self, contract, base_amount):
         """Calcula provisión de cesantías"""
         # Cesantías = (Salario + Auxilio de Transporte) / 12
-        transport = contract.transport_allowance or 0
+        transport = contract._get_transport_allowance(self.date_to)
         return (base_amount + transport) * 0.0833  # (1/12)
 
     def _calculate_intereses(self, contract, base_amount):
         """Calcula provisión de intereses de cesantías"""
-        # Intereses = Cesantías * 12%
+        # Intereses = Cesantías * tasa legal del año (12%)
         cesantias = self._calculate_cesantias(contract, base_amount)
-        return cesantias * 0.12
+        legal = self.env['hr.payroll.legal.parameter']._get_legal_values(self.date_to)
+        return cesantias * legal['severance_interest_rate'] / 100.0
 
     def _calculate_vacaciones(self, contract, base_amount):
         """Calcula provisión de vacaciones"""
@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 
-from odoo import models, fields, api, _
+from odoo import models, fields, _
 from odoo.exceptions import ValidationError
 import base64
 import csv
@@ -55,43 +55,63 @@ class ImportEmployeeWizard(models.TransientModel):
             employees_created = 0
             employees_updated = 0
             errors = []
+            rows = list(file_reader)
+
+            # Departamentos y empleados existentes en una consulta cada uno
+            departments = self._get_import_departments({row['department'] for row in rows if row['department']})
+            employees = {
+                employee.identification_id: employee
+                for employee in self.env['hr.employee'].search([
+                    ('identification_id', 'in', [row['identification_id'] for row in rows])
+                ])
+            }
+            country = self.env.ref('base.co')
 
-            for row in file_reader:
+            # Validar las filas y actualizar los empleados existentes, cada fila en su savepoint
+            new_employees = {}
+            updated_ids = set()
+            for line_num, row in enumerate(rows, start=2):
                 try:
-                    # Buscar departamento
-                    department = self.env['hr.department'].search([
-                        ('name', '=', row['department'])
-                    ], limit=1)
-                    
-                    if not department:
-                        department = self.env['hr.department'].create({
-                            'name': row['department']
-                        })
-
-                    # Buscar o crear empleado
-                    employee = self.env['hr.employee'].search([
-                        ('identification_id', '=', row['identification_id'])
-                    ], limit=1)
-
+                    self._validate_import_row(row)
                     employee_vals = {
                         'identification_type': row['identification_type'],
                         'identification_id': row['identification_id'],
                         'name': row['name'],
                         'work_email': row['work_email'],
                         'mobile_phone': row['mobile_phone'],
-                        'department_id': department.id,
-                        'country_id': self.env.ref('base.co').id,
+                        'department_id': departments[row['department']].id,
+                        'country_id': country.id,
                     }
 
+                    employee = employees.get(row['identification_id'])
                     if employee:
-                        employee.write(employee_vals)
-                        employees_updated += 1
+                        with self.env.cr.savepoint():
+                            employee.write(employee_vals)
+                        # Una identificación repetida en el archivo cuenta una sola vez
+                        if row['identification_id'] not in updated_ids:
+                            updated_ids.add(row['identification_id'])
+                            employees_updated += 1
                     else:
-                        self.env['hr.employee'].create(employee_vals)
-                        employees_created += 1
+                        # Identificación repetida en el archivo: la última fila prevalece
+                        new_employees[row['identification_id']] = (line_num, employee_vals)
 
                 except Exception as e:
-                    errors.append(f"Error en línea {file_reader.line_num}: {str(e)}")
+                    errors.append(f"Error en línea {line_num}: {str(e)}")
+
+            # Empleados nuevos creados juntos; si el lote falla, fila por fila
+            if new_employees:
+                try:
+                    with self.env.cr.savepoint():
+                        self.env['hr.employee'].create([vals for _line, vals in new_employees.values()])
+                    employees_created += len(new_employees)
+                except Exception:
+                    for line_num, employee_vals in new_employees.values():
+                        try:
+                            with self.env.cr.savepoint():
+                                self.env['hr.employee'].create(employee_vals)
+                            employees_created += 1
+                        except Exception as e:
+                            errors.append(f"Error en línea {line_num}: {str(e)}")
 
             # Crear registro de log
             self.env['hr.employee.import.log'].create({
@@ -128,6 +148,37 @@ class ImportEmployeeWizard(models.TransientModel):
         except Exception as e:
             raise ValidationError(_('Error al procesar el archivo: %s') % str(e))
 
+    def _validate_import_row(self, row):
+        """
+        Valida los datos de una fila antes de escribirla
+
+        :param row: Fila del archivo
+        :raise ValidationError: Si falta un dato obligatorio o el tipo de identificación no existe
+        """
+        for column in ('identification_id', 'name', 'department'):
+            if not (row.get(column) or '').strip():
+                raise ValidationError(_('La columna %(column)s está vacía') % {'column': column})
+        identification_types = self.env['hr.employee']._fields['identification_type'].get_values(self.env)
+        if row['identification_type'] not in identification_types:
+            raise ValidationError(_('Tipo de identificación inválido: %(type)s') % {
+                'type': row['identification_type']})
+
+    def _get_import_departments(self, names):
+        """
+        Resuelve los departamentos del archivo por nombre, creando los que no existen
+
+        :param names: Nombres de departamento
+        :return: Diccionario {nombre: departamento}
+        """
+        Department = self.env['hr.department']
+        departments = {}
+        for department in Department.search([('name', 'in', list(names))]):
+            departments.setdefault(department.name, department)
+        missing = sorted(name for name in names if name not in departments)
+        for department in Department.create([{'name': name} for name in missing]):
+            departments[department.name] = department
+        return departments
+
     def action_download_template(self):
         """Descarga plantilla CSV"""
         template_content = "identification_type,identification_id,name,work_email,mobile_phone,department\n"